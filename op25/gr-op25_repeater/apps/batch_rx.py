@@ -0,0 +1,162 @@
+#!/bin/sh
+# This file is part of OP25
+#
+# OP25 is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+#
+# OP25 is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with OP25; see the file COPYING. If not, write to the Free
+# Software Foundation, Inc., 51 Franklin Street, Boston, MA
+# 02110-1301, USA.
+
+"true" '''\'
+DEFAULT_PYTHON2=/usr/bin/python
+DEFAULT_PYTHON3=/usr/bin/python3
+if [ -f op25_python ]; then
+    OP25_PYTHON=$(cat op25_python)
+else
+    OP25_PYTHON="/usr/bin/python"
+fi
+
+if [ -x $OP25_PYTHON ]; then
+    echo Using Python $OP25_PYTHON >&2
+    exec $OP25_PYTHON "$0" "$@"
+elif [ -x $DEFAULT_PYTHON2 ]; then
+    echo Using Python $DEFAULT_PYTHON2 >&2
+    exec $DEFAULT_PYTHON2 "$0" "$@"
+elif [ -x $DEFAULT_PYTHON3 ]; then
+    echo Using Python $DEFAULT_PYTHON3 >&2
+    exec $DEFAULT_PYTHON3 "$0" "$@"
+else
+    echo Unable to find Python >&2
+fi
+exit 127
+'''
+
+# Batch decoding of archived captures.
+#
+# Each capture file is decoded by its own "multi_rx.py --batch" process, using
+# a copy of a multi_rx config file in which the file source of the first
+# device points at the capture.  Up to --jobs captures are decoded at once.
+# Every run writes an NDJSON call journal, and when all runs are done the call
+# records are merged, in time order, into <output>/calls.ndjson.
+#
+# The device in the config file must be a file source ("iqsrc", "wavsrc" or
+# "symbols"; for "symbols" the capture is used as the raw_input of every
+# channel).  terminal, audio and metadata sections are dropped.
+#
+# Usage: batch_rx.py -c cfg.json [-j jobs] [-o output_dir] capture1 [capture2 ...]
+
+import os
+import sys
+import json
+import time
+import copy
+import subprocess
+from optparse import OptionParser
+from multiprocessing import Pool, cpu_count
+from call_journal import read_journal
+
+MULTI_RX = os.path.join(os.path.dirname(os.path.abspath(__file__)), "multi_rx.py")
+
+def capture_config(config, capture, run_dir):
+    # copy of config which decodes capture and journals to run_dir
+    cfg = copy.deepcopy(config)
+    for section in ['terminal', 'audio', 'metadata']:
+        cfg.pop(section, None)
+    dev = cfg['devices'][0]
+    if dev['args'] == 'iqsrc':
+        dev['iq_file'] = capture
+    elif dev['args'] == 'wavsrc':
+        dev['wav_file'] = capture
+    elif dev['args'] == 'symbols':
+        for chan in cfg['channels']:
+            chan['raw_input'] = capture
+    else:
+        raise ValueError("device '%s' is not a file source" % dev['name'])
+    cfg['trunking']['journal'] = {'path': run_dir, 'prefix': 'calls', 'format': 'ndjson',
+                                  'max_bytes': 1 << 40, 'rotate_secs': 1e9}
+    if 'recording' in cfg:
+        cfg['recording']['path'] = os.path.join(run_dir, 'recordings')
+    return cfg
+
+def decode_capture(args):
+    # pool worker: decode one capture in its own multi_rx process
+    config, capture, run_dir, verbosity = args
+    if not os.path.isdir(run_dir):
+        os.makedirs(run_dir)
+    cfg_file = os.path.join(run_dir, 'cfg.json')
+    with open(cfg_file, 'w') as fp:
+        json.dump(capture_config(config, capture, run_dir), fp, indent=4)
+    t0 = time.time()
+    with open(os.path.join(run_dir, 'stderr.log'), 'w') as log:
+        rc = subprocess.call([sys.executable, MULTI_RX, '--batch', '-v', str(verbosity), '-c', cfg_file],
+                             cwd=os.path.dirname(MULTI_RX), stdout=log, stderr=subprocess.STDOUT)
+    return capture, run_dir, rc, time.time() - t0
+
+def merge_calls(runs, out_file, all_events = False):
+    # merge the journal records of every run into one time ordered file
+    records = []
+    for capture, run_dir in runs:
+        for f in sorted(os.listdir(run_dir)):
+            if not (f.startswith('calls-') and f.endswith('.ndjson')):
+                continue
+            for d in read_journal(os.path.join(run_dir, f)):
+                if all_events or d['event'] == 'call':
+                    d['capture'] = os.path.basename(capture)
+                    records.append(d)
+    records.sort(key=lambda d: d['time'])
+    with open(out_file, 'w') as fp:
+        for d in records:
+            fp.write(json.dumps(d, separators=(',', ':')) + '\n')
+    return len(records)
+
+def main():
+    parser = OptionParser(usage="%prog -c cfg.json [options] capture [capture ...]")
+    parser.add_option("-c", "--config-file", type="string", default=None, help="multi_rx config file name")
+    parser.add_option("-j", "--jobs", type="int", default=cpu_count(), help="number of captures decoded at once")
+    parser.add_option("-o", "--output", type="string", default="batch", help="output directory")
+    parser.add_option("-a", "--all-events", action="store_true", default=False, help="merge grants, srcaddrs and patches as well as calls")
+    parser.add_option("-v", "--verbosity", type="int", default=0, help="message debug level")
+    (options, args) = parser.parse_args()
+    if options.config_file is None or not args:
+        parser.print_help()
+        sys.exit(1)
+
+    with open(options.config_file) as fp:
+        config = json.load(fp)
+    if 'trunking' not in config:
+        sys.stderr.write("%s has no trunking section; nothing to log\n" % options.config_file)
+        sys.exit(1)
+
+    jobs = []
+    for i, capture in enumerate(args):
+        name = "%03d-%s" % (i, os.path.splitext(os.path.basename(capture))[0])
+        jobs.append((config, os.path.abspath(capture), os.path.abspath(os.path.join(options.output, name)), options.verbosity))
+
+    t0 = time.time()
+    runs = []
+    failed = 0
+    pool = Pool(max(1, min(options.jobs, len(jobs))))
+    for capture, run_dir, rc, elapsed in pool.imap_unordered(decode_capture, jobs):
+        sys.stderr.write("%s: %s in %.1fs\n" % (capture, "done" if rc == 0 else "failed (rc %d, see %s/stderr.log)" % (rc, run_dir), elapsed))
+        if rc != 0:
+            failed += 1
+        runs.append((capture, run_dir))
+    pool.close()
+    pool.join()
+
+    out_file = os.path.join(options.output, 'calls.ndjson')
+    n = merge_calls(runs, out_file, options.all_events)
+    sys.stderr.write("%d captures (%d failed) in %.1fs, %d records merged into %s\n" % (len(jobs), failed, time.time() - t0, n, out_file))
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
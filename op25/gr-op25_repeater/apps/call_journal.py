@@ -0,0 +1,252 @@
+
+# This file is part of OP25
+#
+# OP25 is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+#
+# OP25 is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with OP25; see the file COPYING. If not, write to the Free
+# Software Foundation, Inc., 51 Franklin Street, Boston, MA
+# 02110-1301, USA.
+
+# Call event journal for offline analysis of grants, radio ids, encryption
+# flags and patches.
+#
+# The trunking modules call put() from the decode thread.  put() only appends
+# a tuple of raw values to a deque, so the decode thread does no formatting.
+# A background thread drains the deque in batches, encodes the records and
+# writes them to files that rotate by size and by age.
+#
+# Two output formats:
+#   "ndjson" - one JSON object per line
+#   "binary" - an 8 byte magic number, a length prefixed JSON header with the
+#              field names of each event type, then one record per event:
+#              u16 length, u8 event id, f64 time, followed by the fields, each
+#              as a u8 type tag and a value (int64, float64 or utf-8 string
+#              with a u16 length, truncated to 4096 bytes; other values and
+#              ints outside int64 are written as strings)
+# read_journal() reads either format back as dicts.  Running this module
+# as a script writes journal files to stdout as NDJSON.
+#
+# Configured in the "trunking" section of cfg.json:
+#   "journal": { "path": "journal", "format": "ndjson", "max_bytes": 16000000, "rotate_secs": 3600 }
+
+import sys
+import os
+import time
+import json
+import struct
+import threading
+from collections import deque
+from log_ts import log_ts
+
+JOURNAL_MAGIC = b'OP25JNL1'
+
+# event name -> field names, in the order passed to put()
+EVENTS = {
+    'grant':   ('sysid', 'freq', 'slot', 'tgid', 'rid', 'svcopts'),
+    'call':    ('sysid', 'rcvr', 'freq', 'slot', 'prio', 'tgid', 'tgtag', 'rid', 'rtag'),
+    'srcaddr': ('sysid', 'tgid', 'rid', 'svcopts'),
+    'patch':   ('sysid', 'sg', 'ga'),
+}
+EVENT_IDS = {name: i for i, name in enumerate(sorted(EVENTS))}
+
+_NONE, _INT, _FLOAT, _STR = range(4)
+_rec_hdr = struct.Struct('<HBd')
+_u16 = struct.Struct('<H')
+_MAX_STR = 4096             # longest string field (bytes), so that a record always fits its u16 length
+_INT64_MIN = -(1 << 63)
+_INT64_MAX = (1 << 63) - 1
+
+def _enc_value(v):
+    if v is None:
+        return b'\x00'
+    if (isinstance(v, bool) or isinstance(v, int)) and _INT64_MIN <= v <= _INT64_MAX:
+        return struct.pack('<Bq', _INT, v)
+    if isinstance(v, float):
+        return struct.pack('<Bd', _FLOAT, v)
+    if isinstance(v, bytes):
+        s = v
+    elif hasattr(v, 'encode'):
+        s = v.encode('utf-8')
+    else:
+        s = str(v).encode('utf-8')
+    s = s[:_MAX_STR]
+    return struct.pack('<BH', _STR, len(s)) + s
+
+def _dec_fields(buf, pos, end):
+    vals = []
+    while pos < end:
+        tag = buf[pos] if not isinstance(buf[pos], str) else ord(buf[pos])
+        pos += 1
+        if tag == _NONE:
+            vals.append(None)
+        elif tag == _INT:
+            vals.append(struct.unpack_from('<q', buf, pos)[0])
+            pos += 8
+        elif tag == _FLOAT:
+            vals.append(struct.unpack_from('<d', buf, pos)[0])
+            pos += 8
+        else:
+            n = _u16.unpack_from(buf, pos)[0]
+            vals.append(buf[pos + 2 : pos + 2 + n].decode('utf-8', 'replace'))
+            pos += 2 + n
+    return vals
+
+class call_journal(threading.Thread):
+    def __init__(self, config, debug = 0, **kwds):
+        threading.Thread.__init__(self, **kwds)
+        self.setDaemon(1)
+        self.debug = debug
+        self.path = str(config.get('path', 'journal'))
+        self.prefix = str(config.get('prefix', 'op25'))
+        self.binary = str(config.get('format', 'ndjson')) == 'binary'
+        self.max_bytes = int(config.get('max_bytes', 16000000))
+        self.rotate_secs = float(config.get('rotate_secs', 3600))
+        self.flush_interval = float(config.get('flush_interval', 1.0))
+        self.max_queue = int(config.get('max_queue', 100000))
+        self.q = deque()
+        self.wake = threading.Event()
+        self.keep_running = True
+        self.dropped = 0
+        self.written = 0
+        self.fp = None
+        self.fp_bytes = 0
+        self.fp_records = 0
+        self.fp_opened = 0.0
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+        self.start()
+
+    def set_debug(self, dbglvl):
+        self.debug = dbglvl
+
+    def put(self, event, ts, *fields):
+        # called from the decode thread: no formatting, just queue the raw values
+        if len(self.q) >= self.max_queue:
+            self.dropped += 1
+            return
+        self.q.append((event, ts, fields))
+
+    def stop(self):
+        self.keep_running = False
+        self.wake.set()
+        if self.is_alive():
+            self.join()
+
+    def run(self):
+        while self.keep_running:
+            self.wake.wait(self.flush_interval)
+            self.wake.clear()
+            self.flush()
+        self.flush()
+        self.close()
+
+    def flush(self):
+        if not self.q:
+            return
+        batch = []
+        popleft = self.q.popleft
+        try:
+            while True:
+                batch.append(popleft())
+        except IndexError:
+            pass
+        encode = self.encode_binary if self.binary else self.encode_ndjson
+        records = []
+        for e in batch:
+            try:
+                records.append(encode(e))
+            except (struct.error, TypeError, ValueError) as ex:
+                # drop the record rather than let the writer thread die
+                self.dropped += 1
+                sys.stderr.write("%s call_journal: dropped %s record: %s\n" % (log_ts.get(), e[0], ex))
+        try:
+            self.write(records)
+            self.written += len(records)
+        except (IOError, OSError) as ex:
+            sys.stderr.write("%s call_journal: write failed: %s\n" % (log_ts.get(), ex))
+            self.close()
+
+    def encode_ndjson(self, e):
+        event, ts, fields = e
+        d = {'event': event, 'time': ts}
+        d.update(zip(EVENTS[event], fields))
+        return (json.dumps(d, separators=(',', ':'), default=str) + '\n').encode('utf-8')
+
+    def encode_binary(self, e):
+        event, ts, fields = e
+        body = b''.join([_enc_value(v) for v in fields])
+        return _rec_hdr.pack(9 + len(body), EVENT_IDS[event], ts) + body
+
+    def write(self, records):
+        # size and age are checked before each record, so a file never holds more than
+        # max_bytes unless a single record is larger
+        now = time.time()
+        for data in records:
+            if self.fp is not None and self.fp_records > 0 and (self.fp_bytes + len(data) > self.max_bytes or now >= self.fp_opened + self.rotate_secs):
+                self.close()
+            if self.fp is None:
+                self.open(now)
+            self.fp.write(data)
+            self.fp_bytes += len(data)
+            self.fp_records += 1
+        if self.fp is not None:
+            self.fp.flush()
+
+    def open(self, now):
+        ext = 'bin' if self.binary else 'ndjson'
+        name = os.path.join(self.path, "%s-%s.%s" % (self.prefix, time.strftime("%Y%m%d-%H%M%S", time.localtime(now)), ext))
+        n = 1
+        while os.path.exists(name):     # more than one rotation within a second
+            name = os.path.join(self.path, "%s-%s-%d.%s" % (self.prefix, time.strftime("%Y%m%d-%H%M%S", time.localtime(now)), n, ext))
+            n += 1
+        self.fp = open(name, 'wb')
+        self.fp_bytes = 0
+        self.fp_records = 0
+        self.fp_opened = now
+        if self.binary:
+            hdr = json.dumps({'events': {ev: [EVENT_IDS[ev], list(EVENTS[ev])] for ev in EVENTS}}).encode('utf-8')
+            self.fp.write(JOURNAL_MAGIC + _u16.pack(len(hdr)) + hdr)
+            self.fp_bytes += len(JOURNAL_MAGIC) + 2 + len(hdr)
+        if self.debug >= 5:
+            sys.stderr.write("%s call_journal: writing %s\n" % (log_ts.get(), name))
+
+    def close(self):
+        if self.fp is not None:
+            self.fp.close()
+            self.fp = None
+
+def read_journal(filename):
+    # generator returning each record of a journal file (either format) as a dict
+    with open(filename, 'rb') as fp:
+        buf = fp.read()
+    if not buf.startswith(JOURNAL_MAGIC):
+        for line in buf.decode('utf-8').splitlines():
+            if line:
+                yield json.loads(line)
+        return
+    pos = len(JOURNAL_MAGIC)
+    n = _u16.unpack_from(buf, pos)[0]
+    hdr = json.loads(buf[pos + 2 : pos + 2 + n].decode('utf-8'))
+    names = {v[0]: (k, v[1]) for k, v in hdr['events'].items()}
+    pos += 2 + n
+    while pos + _rec_hdr.size <= len(buf):
+        length, eid, ts = _rec_hdr.unpack_from(buf, pos)
+        event, fields = names[eid]
+        d = {'event': event, 'time': ts}
+        d.update(zip(fields, _dec_fields(buf, pos + _rec_hdr.size, pos + 2 + length)))
+        yield d
+        pos += 2 + length
+
+if __name__ == "__main__":
+    for f in sys.argv[1:]:
+        for d in read_journal(f):
+            sys.stdout.write(json.dumps(d, separators=(',', ':')) + '\n')
@@ -0,0 +1,306 @@
+
+# This file is part of OP25
+#
+# OP25 is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+#
+# OP25 is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with OP25; see the file COPYING. If not, write to the Free
+# Software Foundation, Inc., 51 Franklin Street, Boston, MA
+# 02110-1301, USA.
+
+# Per-call audio recorder for multi_rx.
+#
+# Each recorded channel sends its audio to a pair of local udp ports owned by
+# the recorder (port and port+2, the same layout used by the frame assembler
+# for the two tdma slots) instead of its configured destination.  The recorder
+# thread copies every datagram on to the original destination, so audio
+# playback is unchanged, and keeps the PCM (S16LE, 8000 sps, mono) of any call
+# in progress on that channel.
+#
+# Call start and end times come from the trunking module's clock, which is the
+# capture time in batch mode, so the recorder takes that same clock for its
+# tail and split decisions rather than reading the system time.
+#
+# The trunking modules report call boundaries through call_start() and
+# call_end().  Both only append to a deque, so the trunking thread never waits
+# on the recorder.  When a call ends (after a short tail, so that audio still
+# in flight is kept) the audio is handed to a worker pool which writes the
+# audio file and a JSON sidecar with the call details.  Nothing is written to
+# disk by the recorder thread itself.
+#
+# Output formats:
+#   "wav"  - written with the python wave module
+#   "flac" - written by the soundfile module if installed, else the flac command
+#   "opus" - written by the opusenc command
+# If the encoder for flac or opus is unavailable the call is saved as wav.
+#
+# Configured in the top level "recording" section of cfg.json:
+#   "recording": { "path": "recordings", "format": "wav", "workers": 2, "min_duration": 1.0 }
+# Channels may set "record": false to opt out.
+
+import sys
+import os
+import time
+import json
+import wave
+import errno
+import socket
+import select
+import threading
+import subprocess
+from collections import deque
+from multiprocessing.pool import ThreadPool
+from log_ts import log_ts
+from trunk_clock import system_clock
+
+PCM_RATE = 8000             # frame assembler audio rate
+PCM_BYTES = 2               # bytes per sample
+RELAY_HOST = "127.0.0.1"
+
+class call_recorder(threading.Thread):
+    def __init__(self, config, clock = None, debug = 0, **kwds):
+        threading.Thread.__init__(self, **kwds)
+        self.setDaemon(1)
+        self.debug = debug
+        self.clock = clock if clock is not None else system_clock()
+        self.path = str(config.get('path', 'recordings'))
+        self.format = str(config.get('format', 'wav')).lower()
+        self.workers = int(config.get('workers', 2))
+        self.min_duration = float(config.get('min_duration', 1.0))  # shorter calls are discarded
+        self.max_duration = float(config.get('max_duration', 600))  # longer calls are split
+        self.tail = float(config.get('tail', 0.5))                  # audio accepted after call_end
+        self.events = deque()
+        self.channels = {}          # msgq_id -> channel state
+        self.sockets = {}           # socket -> (msgq_id, slot)
+        self.keep_running = True
+        self.recorded = 0
+        self.discarded = 0
+        self.pool = None
+        if self.format not in ('wav', 'flac', 'opus'):
+            sys.stderr.write("%s call_recorder: unknown format '%s', using wav\n" % (log_ts.get(), self.format))
+            self.format = 'wav'
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+
+    def set_debug(self, dbglvl):
+        self.debug = dbglvl
+
+    def add_channel(self, msgq_id, destination):
+        # returns the destination the channel's audio sink should use instead,
+        # or None if the channel cannot be recorded
+        if not destination.startswith('udp:'):
+            sys.stderr.write("%s call_recorder: channel %d destination '%s' is not udp, not recording\n" % (log_ts.get(), msgq_id, destination))
+            return None
+        host, port = destination[len('udp:'):].lstrip('/').rsplit(':', 1)
+        socks = self.bind_pair()
+        if socks is None:
+            sys.stderr.write("%s call_recorder: unable to allocate udp ports for channel %d\n" % (log_ts.get(), msgq_id))
+            return None
+        out = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        out.setblocking(0)
+        self.channels[msgq_id] = {'dest': (host, int(port)), 'out': out, 'call': None}
+        for slot, s in enumerate(socks):
+            self.sockets[s] = (msgq_id, slot)
+        return "udp://%s:%d" % (RELAY_HOST, socks[0].getsockname()[1])
+
+    def bind_pair(self):
+        # local sockets on an ephemeral port p and on p+2
+        for i in range(20):
+            a = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            a.bind((RELAY_HOST, 0))
+            b = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            try:
+                b.bind((RELAY_HOST, a.getsockname()[1] + 2))
+            except socket.error:
+                a.close()
+                b.close()
+                continue
+            a.setblocking(0)
+            b.setblocking(0)
+            return (a, b)
+        return None
+
+    def call_start(self, rcvr, ts, sysid, freq, slot, tgid, tgtag, rid, rtag):
+        # called from the trunking thread
+        self.events.append(('start', rcvr, ts, (sysid, freq, slot, tgid, tgtag, rid, rtag)))
+
+    def call_end(self, rcvr, ts, reason = ""):
+        # called from the trunking thread
+        self.events.append(('end', rcvr, ts, reason))
+
+    def stop(self):
+        self.keep_running = False
+        if self.is_alive():
+            self.join()
+
+    def run(self):
+        self.pool = ThreadPool(self.workers)
+        socks = list(self.sockets)
+        while self.keep_running:
+            if socks:
+                readable = select.select(socks, [], [], 0.1)[0]
+            else:
+                time.sleep(0.1)
+                readable = []
+            self.process_events()
+            for s in readable:
+                self.relay(s)
+            self.check_calls(self.clock.time())
+        self.process_events()
+        for msgq_id in self.channels:
+            self.finish_call(msgq_id)
+        self.pool.close()
+        self.pool.join()
+        for s in self.sockets:
+            s.close()
+        for chan in self.channels.values():
+            chan['out'].close()
+
+    def relay(self, s):
+        msgq_id, slot = self.sockets[s]
+        chan = self.channels[msgq_id]
+        while True:
+            try:
+                data = s.recv(4096)
+            except socket.error as ex:
+                if ex.args[0] not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    sys.stderr.write("%s call_recorder: channel %d recv failed: %s\n" % (log_ts.get(), msgq_id, ex))
+                return
+            try:
+                chan['out'].sendto(data, (chan['dest'][0], chan['dest'][1] + 2 * slot))
+            except socket.error:
+                pass                    # nobody listening, or the socket buffer is full
+            call = chan['call']
+            if call is not None and len(data) > 2:          # 2 byte datagrams are drain/drop flags
+                call['pcm'][slot].append(data)
+                call['bytes'][slot] += len(data)
+
+    def process_events(self):
+        popleft = self.events.popleft
+        while self.events:
+            ev, rcvr, ts, args = popleft()
+            if rcvr not in self.channels:
+                continue
+            if ev == 'start':
+                self.start_call(rcvr, ts, args)
+            else:
+                call = self.channels[rcvr]['call']
+                if call is not None and call['close_at'] is None:
+                    call['end'] = ts
+                    call['reason'] = args
+                    call['close_at'] = self.clock.time() + self.tail
+
+    def start_call(self, rcvr, ts, args):
+        sysid, freq, slot, tgid, tgtag, rid, rtag = args
+        call = self.channels[rcvr]['call']
+        if call is not None and call['close_at'] is None and call['tgid'] == tgid:
+            # same call, new or updated talker
+            if rid and rid not in call['rids']:
+                call['rids'].append(rid)
+                call['rtags'].append(rtag)
+            return
+        self.finish_call(rcvr)
+        self.channels[rcvr]['call'] = {'rcvr': rcvr, 'sysid': sysid, 'freq': freq, 'slot': slot,
+                                       'tgid': tgid, 'tgtag': tgtag,
+                                       'rids': [rid] if rid else [], 'rtags': [rtag] if rid else [],
+                                       'start': ts, 'end': None, 'reason': "", 'close_at': None,
+                                       'pcm': ([], []), 'bytes': [0, 0]}
+
+    def check_calls(self, now):
+        max_bytes = int(self.max_duration * PCM_RATE * PCM_BYTES)
+        for msgq_id, chan in self.channels.items():
+            call = chan['call']
+            if call is None:
+                continue
+            if call['close_at'] is not None and now >= call['close_at']:
+                self.finish_call(msgq_id)
+            elif max(call['bytes']) >= max_bytes:
+                # split a long call; the remainder continues in a new file
+                self.finish_call(msgq_id, now)
+                new = dict(call, start=now, end=None, rids=list(call['rids']), rtags=list(call['rtags']), pcm=([], []), bytes=[0, 0])
+                chan['call'] = new
+
+    def finish_call(self, msgq_id, end = None):
+        call = self.channels[msgq_id]['call']
+        self.channels[msgq_id]['call'] = None
+        if call is None:
+            return
+        if call['end'] is None:
+            call['end'] = end if end is not None else self.clock.time()
+        slot = 1 if call['slot'] == 1 else 0     # fdma grants carry no slot (None or 0)
+        pcm = b''.join(call['pcm'][slot])
+        if len(pcm) < self.min_duration * PCM_RATE * PCM_BYTES:
+            self.discarded += 1
+            return
+        meta = {'sysid': call['sysid'], 'tgid': call['tgid'], 'tgtag': call['tgtag'],
+                'rids': call['rids'], 'rtags': call['rtags'], 'freq': call['freq'], 'slot': call['slot'],
+                'rcvr': call['rcvr'], 'start': call['start'], 'end': call['end'],
+                'duration': float(len(pcm)) / (PCM_RATE * PCM_BYTES), 'reason': call['reason']}
+        name = "%s-%s-%s-%d" % (call['sysid'] if call['sysid'] is not None else 0,
+                                call['tgid'],
+                                time.strftime("%Y%m%d-%H%M%S", time.localtime(call['start'])),
+                                int((call['start'] % 1) * 1000))
+        self.recorded += 1
+        self.pool.apply_async(write_call, (os.path.join(self.path, name), self.format, pcm, meta, self.debug))
+
+_missing_encoders = set()
+
+def encode_external(cmd, pcm):
+    p = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    err = p.communicate(pcm)[1]
+    if p.returncode != 0:
+        raise IOError("%s exited with %d: %s" % (cmd[0], p.returncode, err.decode('utf-8', 'replace').strip()))
+
+def encode_call(basename, fmt, pcm):
+    # writes pcm as basename.<fmt>; returns the file name actually written
+    if fmt == 'flac' and 'flac' not in _missing_encoders:
+        try:
+            import numpy as np
+            import soundfile
+            soundfile.write(basename + '.flac', np.frombuffer(pcm, dtype='<i2'), PCM_RATE, subtype='PCM_16')
+            return basename + '.flac'
+        except ImportError:
+            pass
+        try:
+            encode_external(['flac', '--silent', '--force', '--force-raw-format', '--endian=little', '--sign=signed',
+                             '--channels=1', '--bps=16', '--sample-rate=%d' % PCM_RATE, '-o', basename + '.flac', '-'], pcm)
+            return basename + '.flac'
+        except OSError:
+            _missing_encoders.add(fmt)
+            sys.stderr.write("%s call_recorder: no flac encoder available, writing wav\n" % log_ts.get())
+    elif fmt == 'opus' and 'opus' not in _missing_encoders:
+        try:
+            encode_external(['opusenc', '--quiet', '--raw', '--raw-bits', '16', '--raw-rate', str(PCM_RATE),
+                             '--raw-chan', '1', '--raw-endianness', '0', '-', basename + '.opus'], pcm)
+            return basename + '.opus'
+        except OSError:
+            _missing_encoders.add(fmt)
+            sys.stderr.write("%s call_recorder: opusenc not found, writing wav\n" % log_ts.get())
+    w = wave.open(basename + '.wav', 'wb')
+    w.setnchannels(1)
+    w.setsampwidth(PCM_BYTES)
+    w.setframerate(PCM_RATE)
+    w.writeframes(pcm)
+    w.close()
+    return basename + '.wav'
+
+def write_call(basename, fmt, pcm, meta, debug = 0):
+    # worker pool task: audio file first, then the sidecar pointing at it
+    try:
+        filename = encode_call(basename, fmt, pcm)
+        meta['file'] = os.path.basename(filename)
+        meta['format'] = os.path.splitext(filename)[1][1:]
+        with open(basename + '.json', 'w') as fp:
+            json.dump(meta, fp, indent=1, sort_keys=True)
+        if debug >= 5:
+            sys.stderr.write("%s call_recorder: wrote %s (%.1fs)\n" % (log_ts.get(), filename, meta['duration']))
+    except Exception as ex:
+        sys.stderr.write("%s call_recorder: unable to write %s: %s\n" % (log_ts.get(), basename, ex))
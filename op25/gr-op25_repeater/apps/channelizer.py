@@ -0,0 +1,98 @@
+# This file is part of OP25
+#
+# OP25 is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+#
+# OP25 is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with OP25; see the file COPYING. If not, write to the Free
+# Software Foundation, Inc., 51 Franklin Street, Boston, MA
+# 02110-1301, USA.
+
+"""
+Per-device polyphase channelizer.
+
+Splits the full rate device stream into nchans bins once, so that channels
+sharing a device no longer each run their own full rate frequency translating
+filter.  Each output port carries one selected bin, 2x oversampled so that a
+channel anywhere within the bin (plus its own bandwidth) is alias free.  The
+channel demodulator then only has to remove the small residual offset from the
+bin center at the bin rate.  Retuning a channel switches the bin mapped to its
+output port, which can be done while the flowgraph is running.
+"""
+
+import sys
+from gnuradio import gr, filter, blocks
+from gnuradio.fft import window
+
+_def_oversample = 2         # bin output rate = oversample * bin spacing
+_def_signal_bw = 10000      # one sided bandwidth (Hz) which must pass at the bin edge
+
+class channelizer_ccf(gr.hier_block2):
+    def __init__(self, input_rate, if_rate, nports, usable_bw=1.0):
+        gr.hier_block2.__init__(self, "channelizer_ccf",
+                                gr.io_signature(1, 1, gr.sizeof_gr_complex),        # Input signature
+                                gr.io_signature(nports, nports, gr.sizeof_gr_complex)) # Output signature
+        self.input_rate = input_rate
+        self.if_rate = if_rate
+        self.usable_bw = usable_bw
+        self.nports = nports
+        self.next_port = 0
+
+        # bin spacing must be at least the if_rate so that the residual offset (up to half
+        # a bin) stays within what the channel demodulator can translate at the bin rate
+        self.nchans = self.bin_count(input_rate, if_rate)
+        self.bin_spacing = float(input_rate) / self.nchans
+        self.output_rate = self.bin_spacing * _def_oversample
+        pass_edge = (self.bin_spacing / 2) + _def_signal_bw
+        stop_edge = self.output_rate - pass_edge
+        self.taps = filter.firdes.low_pass(1.0, input_rate, (pass_edge + stop_edge) / 2, stop_edge - pass_edge, window.WIN_BLACKMAN_HARRIS)
+
+        self.s2ss = blocks.stream_to_streams(gr.sizeof_gr_complex, self.nchans)
+        self.pfb = filter.pfb_channelizer_ccf(self.nchans, self.taps, _def_oversample)
+        self.channel_map = list(range(self.nchans))
+        self.connect(self, self.s2ss)
+        for i in range(self.nchans):
+            self.connect((self.s2ss, i), (self.pfb, i))
+        for i in range(nports):
+            self.connect((self.pfb, i), (self, i))
+
+        sys.stderr.write("channelizer: input_rate=%d, bins=%d, bin_spacing=%d, output_rate=%d, taps=%d, ports=%d\n" % (input_rate, self.nchans, self.bin_spacing, self.output_rate, len(self.taps), nports))
+
+    @staticmethod
+    def bin_count(input_rate, if_rate):
+        return 2 * int(input_rate / (2 * if_rate))
+
+    @staticmethod
+    def usable(input_rate, if_rate):
+        # fewer than four bins would leave nothing to share, and bins narrower than twice the
+        # signal bandwidth leave no room for the filter transition band (stop_edge - pass_edge)
+        nchans = channelizer_ccf.bin_count(input_rate, if_rate)
+        if nchans < 4:
+            return False
+        bin_spacing = float(input_rate) / nchans
+        return (bin_spacing * (_def_oversample - 1)) - (2 * _def_signal_bw) > 0
+
+    def add_channel(self):
+        if self.next_port >= self.nports:
+            return None
+        port = self.next_port
+        self.next_port += 1
+        return port
+
+    def set_channel_freq(self, port, offset):
+        # offset is the channel frequency relative to the device center (Hz).  Returns the
+        # residual offset from the center of the selected bin, or None if out of range
+        if abs(offset) > (((self.input_rate * self.usable_bw) / 2) - (self.if_rate / 2)):
+            return None
+        k = int(round(offset / self.bin_spacing))
+        if self.channel_map[port] != k % self.nchans:
+            self.channel_map[port] = k % self.nchans
+            self.pfb.set_channel_map(self.channel_map)
+        return offset - (k * self.bin_spacing)
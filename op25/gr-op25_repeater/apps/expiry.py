@@ -0,0 +1,87 @@
+
+# This file is part of OP25
+#
+# OP25 is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+#
+# OP25 is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with OP25; see the file COPYING. If not, write to the Free
+# Software Foundation, Inc., 51 Franklin Street, Boston, MA
+# 02110-1301, USA.
+
+# Deadline queue shared by the trunking modules.  Items (talkgroups, voice
+# frequency slots, patches, ...) register the time at which they become due
+# for expiry, and expired() returns only the keys whose deadline has passed,
+# so an expiry check costs a heap peek instead of a scan of the whole table.
+#
+# Re-registering a key replaces its deadline.  Superseded heap entries are not
+# removed; they are skipped when they reach the top of the heap, and the heap
+# is rebuilt once they outnumber the live entries.  Callers still re-check
+# their own expiry condition for each returned key, since the state behind a
+# key can change after its deadline was registered.
+
+import heapq
+import threading
+
+class expiry_queue(object):
+    def __init__(self):
+        self.deadlines = {}     # key -> current deadline
+        self.heap = []          # [deadline, seq, key]; seq keeps keys from being compared
+        self.seq = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.deadlines)
+
+    def __contains__(self, key):
+        return key in self.deadlines
+
+    def add(self, key, deadline):
+        with self.lock:
+            if self.deadlines.get(key) == deadline:
+                return
+            self.deadlines[key] = deadline
+            self.seq += 1
+            heapq.heappush(self.heap, (deadline, self.seq, key))
+            if len(self.heap) > 2 * len(self.deadlines) + 64:
+                self.compact()
+
+    def discard(self, key):
+        with self.lock:
+            self.deadlines.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.deadlines.clear()
+            self.heap = []
+
+    def next_deadline(self):
+        # earliest live deadline, or None if nothing is registered
+        with self.lock:
+            while self.heap and self.deadlines.get(self.heap[0][2]) != self.heap[0][0]:
+                heapq.heappop(self.heap)
+            return self.heap[0][0] if self.heap else None
+
+    def expired(self, curr_time):
+        # remove and return the keys whose deadline is at or before curr_time
+        keys = []
+        with self.lock:
+            heap = self.heap
+            while heap and heap[0][0] <= curr_time:
+                deadline, seq, key = heapq.heappop(heap)
+                if self.deadlines.get(key) == deadline:
+                    del self.deadlines[key]
+                    keys.append(key)
+        return keys
+
+    def compact(self):
+        # called with the lock held; drops superseded entries
+        self.heap = [e for e in self.heap if self.deadlines.get(e[2]) == e[0]]
+        heapq.heapify(self.heap)
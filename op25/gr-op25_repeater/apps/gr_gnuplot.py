@@ -22,6 +22,7 @@ import os
 import time
 import subprocess
 import json
+import base64
 
 from gnuradio import gr, eng_notation
 from gnuradio import blocks, audio
@@ -31,6 +32,8 @@ from gnuradio import gr
 
 import gnuradio.op25_repeater as op25_repeater
 
+from log_ts import log_ts
+
 _def_debug = 0
 _def_sps = 5
 _def_sps_mult = 2
@@ -45,6 +48,42 @@ FFT_BINS = 512    # number of fft bins
 FFT_FREQ = 0.05   # time interval between fft updates
 MIX_FREQ = 0.02   # time interval between mixer updates
 
+PLOT_RENDERS = ('gnuplot', 'browser')
+PLOT_FORMATS = ('json', 'packed')
+PLOT_TYPES = {'fft': 1, 'constellation': 2, 'symbol': 3, 'eye': 4, 'mixer': 5, 'fll': 6}  # as used by toggle_plot
+
+def gp_points(*cols):
+    # gnuplot inline data block, formatted in a single operation rather than per sample
+    fmt = '\t'.join(['%f'] * len(cols)) + '\n'
+    return (fmt * len(cols[0])) % tuple(np.column_stack(cols).ravel()) + 'e\n'
+
+def json_array(a, decimals):
+    # rounded python list; avoids float32 repr noise and keeps the json compact
+    return np.round(np.asarray(a, dtype=np.float64), decimals).tolist()
+
+def pack_array(a):
+    # uint16 codes spanning the range of the data, little endian, base64 encoded
+    # decoded value = offset + scale * code
+    a = np.asarray(a, dtype=np.float64)
+    lo = float(a.min()) if len(a) else 0.0
+    hi = float(a.max()) if len(a) else 0.0
+    scale = (hi - lo) / 65535.0
+    if scale <= 0:
+        scale = 1.0
+    codes = np.rint((a - lo) / scale).astype('<u2')
+    return {'offset': lo, 'scale': scale, 'data': base64.b64encode(codes.tobytes()).decode('ascii')}
+
+def pack_ramp(start, step, count):
+    # evenly spaced values need no sample data: value = offset + scale * index
+    return {'offset': float(start), 'scale': float(step), 'count': count}
+
+def minmax_decimate(x, y, width):
+    # reduce a trace to the min and max of each of width columns so that peaks survive
+    edges = (np.arange(width) * len(y)) // width
+    lo = np.minimum.reduceat(y, edges)
+    hi = np.maximum.reduceat(y, edges)
+    return np.repeat(x[edges], 2), np.column_stack((lo, hi)).ravel()
+
 class wrap_gp(object):
     def __init__(self, sps=_def_sps, plot_name="", chan = 0, out_q = None):
         self.sps = sps
@@ -52,11 +91,14 @@ class wrap_gp(object):
         self.relative_freq = 0.0
         self.offset_freq = 0.0
         self.width = None
-        self.ffts = ()
         self.freqs = ()
+        self.fft_bins = None
+        self.window = None
         self.avg_pwr = np.zeros(FFT_BINS)
+        self.pwr_db = None
         self.min_y = -100.0
-        self.buf = []
+        self.buf = None
+        self.buf_len = 0
         self.plot_count = 0
         self.last_plot = 0
         self.plot_interval = None
@@ -65,29 +107,27 @@ class wrap_gp(object):
         self.filename = None
         self.chan = chan
         self.out_q = out_q
+        self.render = 'gnuplot'
+        self.plot_format = 'json'
+        self.plot_width = 0
+        self.gp = None
         if plot_name == "":
             self.plot_name = ""
         else:
             self.plot_name = plot_name + " "
 
-        self.attach_gp()
-
     def attach_gp(self):
         args = ""
         exe  = GNUPLOT
         self.gp = subprocess.Popen(args, executable=exe, stdin=subprocess.PIPE)
 
-    def set_sps(self, sps):
-        self.sps = int(sps)
-
-    def kill(self):
+    def detach_gp(self):
+        if self.gp is None:
+            return
         try:
             self.gp.stdin.close()   # closing pipe should cause subprocess to exit
         except IOError:
             pass
-        if self.out_q is not None:
-            self.out_q.flush()
-        self.out_q = None
         sleep_count = 0
         while True:                     # wait politely, but only for so long
             self.gp.poll()
@@ -97,6 +137,16 @@ class wrap_gp(object):
             sleep_count += 1
             if (sleep_count % 5) == 0:
                 self.gp.kill()
+        self.gp = None
+
+    def set_sps(self, sps):
+        self.sps = int(sps)
+
+    def kill(self):
+        if self.out_q is not None:
+            self.out_q.flush()
+        self.out_q = None
+        self.detach_gp()
 
     def set_interval(self, v):
         self.plot_interval = v
@@ -104,89 +154,158 @@ class wrap_gp(object):
     def set_output_dir(self, v):
         self.output_dir = v
 
+    def set_render(self, v):
+        # 'gnuplot' renders via a gnuplot subprocess (x11 or png files)
+        # 'browser' only sends the plot data to the UI, which draws it locally
+        if v not in PLOT_RENDERS:
+            sys.stderr.write("%s unrecognized plot render type: %s\n" % (log_ts.get(), v))
+            return
+        self.render = v
+        if self.render != 'gnuplot':
+            self.detach_gp()
+
+    def set_plot_format(self, v):
+        # 'json' sends plain arrays to the UI, 'packed' sends base64 encoded uint16 arrays
+        if v not in PLOT_FORMATS:
+            sys.stderr.write("%s unrecognized plot format: %s\n" % (log_ts.get(), v))
+            return
+        self.plot_format = v
+
+    def set_plot_width(self, v):
+        # displayed width in pixels; longer line traces are min-max decimated to fit (0 disables)
+        self.plot_width = int(v)
+
+    def accumulate(self, buf, bufsz):
+        if self.buf is None or len(self.buf) != bufsz or self.buf.dtype != buf.dtype:
+            self.buf = np.zeros(bufsz, dtype=buf.dtype)
+            self.buf_len = 0
+        consumed = min(len(buf), bufsz - self.buf_len)
+        self.buf[self.buf_len:self.buf_len + consumed] = buf[:consumed]
+        self.buf_len += consumed
+        return consumed
+
+    def update_fft(self, mode):
+        n = len(self.buf)
+        if self.window is None or len(self.window) != n:
+            self.window = np.blackman(n) / (0.42 * n)
+            self.fft_bins = np.fft.fftshift(np.fft.fftfreq(n))
+        if len(self.avg_pwr) != n:
+            self.avg_pwr = np.zeros(n)
+        ffts = np.fft.fftshift(np.fft.fft(self.buf * self.window))
+        if self.center_freq and self.width:
+            self.freqs = ((self.fft_bins * self.width) + self.center_freq + self.offset_freq) / 1e6
+        elif self.width:
+            self.freqs = self.fft_bins * self.width
+        else:
+            self.freqs = self.fft_bins
+        avg = FFT_AVG if mode == 'fft' else MIX_AVG
+        self.avg_pwr *= (1.0 - avg)
+        self.avg_pwr += avg * np.abs(ffts)
+        if not self.avg_pwr.all(): # plot is broken, probably because source device was missing
+            return False
+        self.pwr_db = 20 * np.log10(self.avg_pwr)
+        self.min_y = ((1.0 - Y_AVG) * self.min_y) + (Y_AVG * self.pwr_db.min())
+        return True
+
     def plot(self, buf, bufsz, mode='eye'):
-        BUFSZ = bufsz
-        consumed = min(len(buf), BUFSZ-len(self.buf))
-        if len(self.buf) < BUFSZ:
-            self.buf = np.concatenate((self.buf, buf[:int(consumed)]))
-        if len(self.buf) < BUFSZ:
+        consumed = self.accumulate(buf, bufsz)
+        if self.buf_len < bufsz:
             return consumed
+        self.buf_len = 0
 
         self.plot_count += 1
         if mode == 'eye' and self.plot_count % 20 != 0:
-            self.buf = np.array([])
             return consumed
 
-        plot_data = { "json_type": "plot", "chan": self.chan, "mode": mode, "data": [] }
-        plots = []
-        s = ''
-        while(len(self.buf)):
-            if mode == 'eye':
-                if len(self.buf) < self.sps:
-                    break
-                for i in range(self.sps):
-                    s += '%f\n' % self.buf[i]
-                    plot_data['data'].append( (i, self.buf[i]) )
-                s += 'e\n'
-                self.buf=self.buf[self.sps:]
-                plots.append('"-" with lines')
-            elif mode == 'constellation':
-                for b in self.buf:
-                    s += '%f\t%f\n' % (b.real, b.imag)
-                    plot_data['data'].append( (b.real, b.imag) )
-                s += 'e\n'
-                self.buf = []
-                plots.append('"-" with points')
-            elif mode == 'symbol':
-                idx = 0
-                for b in self.buf:
-                    s += '%f\n' % (b)
-                    plot_data['data'].append( (idx, b) )
-                    idx += 1
-                s += 'e\n'
-                self.buf = []
-                plots.append('"-" with points')
-            elif mode == 'fft' or mode == 'mixer' or mode == 'fll':
-                sum_pwr = 0.0
-                self.ffts = np.fft.fft((self.buf * np.blackman(BUFSZ)), BUFSZ , 0) / (0.42 * BUFSZ)
-                self.ffts = np.fft.fftshift(self.ffts)
-                self.freqs = np.fft.fftfreq(len(self.ffts))
-                self.freqs = np.fft.fftshift(self.freqs)
-                tune_freq = (self.center_freq - self.relative_freq) / 1e6
-                if self.center_freq and self.width:
-                                    self.freqs = ((self.freqs * self.width) + self.center_freq + self.offset_freq) / 1e6
-                elif self.width:
-                                    self.freqs = (self.freqs * self.width)
-                for i in range(len(self.ffts)):
-                    if mode == 'fft':
-                        self.avg_pwr[i] = ((1.0 - FFT_AVG) * self.avg_pwr[i]) + (FFT_AVG * np.abs(self.ffts[i]))
-                    else:
-                        self.avg_pwr[i] = ((1.0 - MIX_AVG) * self.avg_pwr[i]) + (MIX_AVG * np.abs(self.ffts[i]))
-                    if self.avg_pwr[i] == 0: # guard against divide by zero
-                        break
-                    y_val = 20 * np.log10(self.avg_pwr[i])
-                    s += '%f\t%f\n' % (self.freqs[i], y_val)
-                    plot_data['data'].append( (self.freqs[i], y_val) )
-                    if ((mode == 'mixer') or (mode == 'fll')) and (self.avg_pwr[i] > 1e-5):
-                        if (self.freqs[i] - self.center_freq) < 0:
-                            sum_pwr -= self.avg_pwr[i]
-                        elif (self.freqs[i] - self.center_freq) > 0:
-                            sum_pwr += self.avg_pwr[i]
-                s += 'e\n'
-                self.buf = []
-                plots.append('"-" with lines')
-                if min(self.avg_pwr) == 0: # plot is broken, probably because source device was missing
-                    return consumed
-                min_y = 20 * np.log10(min(self.avg_pwr))
-                self.min_y = ((1.0 - Y_AVG) * self.min_y) + (Y_AVG * min_y) 
-        self.buf = []
-
         # FFT processing needs to be completed to maintain the weighted average buckets
         # regardless of whether we actually produce a new plot or not.
+        if mode == 'fft' or mode == 'mixer' or mode == 'fll':
+            if not self.update_fft(mode):
+                return consumed
+
         if self.plot_interval and self.last_plot + self.plot_interval > time.time():
             return consumed
         self.last_plot = time.time()
 
+        title, xrange, yrange = self.plot_layout(mode)
+        if self.render == 'gnuplot':
+            self.gnuplot_output(mode, title, xrange, yrange)
+
+        if self.out_q is not None and not self.out_q.full_p():      # if configured, send raw plot data to UI
+            plot_data = self.plot_data(mode, title, xrange, yrange)
+            msg = gr.message().make_from_string(json.dumps(plot_data), -4, self.chan, PLOT_TYPES[mode])
+            if not self.out_q.full_p():
+                self.out_q.insert_tail(msg)
+
+        return consumed
+
+    def plot_layout(self, mode):
+        if mode == 'constellation':
+            return "%sConstellation" % self.plot_name, (-1, 1), (-1, 1)
+        elif mode == 'eye':
+            return "%sDatascope" % self.plot_name, (0, self.sps - 1), (-4, 4)
+        elif mode == 'symbol':
+            return "%sSymbol" % self.plot_name, (0, len(self.buf) - 1), (-4, 4)
+        xrange = (float(self.freqs[0]), float(self.freqs[-1]))
+        yrange = (float((self.min_y // 20) * 20), 0)
+        if mode == 'mixer':
+            title = "%sRaw Mixer" % self.plot_name
+        elif mode == 'fll':
+            title = "%sTuned Mixer" % self.plot_name
+        elif self.center_freq:
+            title = "%sSpectrum: tuned to %f Mhz" % (self.plot_name, self.tune_freq())
+        else:
+            title = "%sSpectrum" % self.plot_name
+        return title, xrange, yrange
+
+    def tune_freq(self):
+        return (self.center_freq - self.relative_freq) / 1e6
+
+    def encode(self, a, decimals):
+        if self.plot_format == 'packed':
+            return pack_array(a)
+        return json_array(a, decimals)
+
+    def plot_data(self, mode, title, xrange, yrange):
+        plot_data = { "json_type": "plot", "chan": self.chan, "mode": mode, "title": title, "xrange": xrange, "yrange": yrange }
+        if mode == 'eye':
+            n = (len(self.buf) // self.sps) * self.sps
+            plot_data['stride'] = self.sps
+            plot_data['y'] = self.encode(self.buf[:n], 3)
+        elif mode == 'constellation':
+            plot_data['x'] = self.encode(self.buf.real, 3)
+            plot_data['y'] = self.encode(self.buf.imag, 3)
+        elif mode == 'symbol':
+            plot_data['y'] = self.encode(self.buf, 3)
+        else:
+            x, y = self.freqs, self.pwr_db
+            if self.plot_width and len(y) > 2 * self.plot_width:
+                x, y = minmax_decimate(x, y, self.plot_width)
+                plot_data['x'] = self.encode(x, 6)
+            elif self.plot_format == 'packed':
+                plot_data['x'] = pack_ramp(x[0], x[1] - x[0], len(x))
+            else:
+                plot_data['x'] = json_array(x, 6)
+            plot_data['y'] = self.encode(y, 1)
+            if mode == 'fft' and self.center_freq:
+                plot_data['marker'] = self.tune_freq()
+        return plot_data
+
+    def gnuplot_output(self, mode, title, xrange, yrange):
+        if mode == 'eye':
+            n = len(self.buf) // self.sps
+            s = ((('%f\n' * self.sps) + 'e\n') * n) % tuple(self.buf[:n * self.sps])
+            plots = ['"-" with lines'] * n
+        elif mode == 'constellation':
+            s = gp_points(self.buf.real, self.buf.imag)
+            plots = ['"-" with points']
+        elif mode == 'symbol':
+            s = gp_points(self.buf)
+            plots = ['"-" with points']
+        else:
+            s = gp_points(self.freqs, self.pwr_db)
+            plots = ['"-" with lines']
+
         filename = None
         if self.output_dir:
             if self.sequence >= 2:
@@ -208,51 +327,27 @@ class wrap_gp(object):
             h+= 'set size square\n'
             h+= 'set xrange [-1:1]\n'
             h+= 'set yrange [-1:1]\n'
-            h+= 'set title "%sConstellation"\n' % self.plot_name
-            plot_data['xrange'] = (-1,1)
-            plot_data['yrange'] = (-1,1)
-            plot_data['title'] = "%sConstellation" % self.plot_name
-        elif mode == 'eye':
-            h+= background
-            h+= 'set yrange [-4:4]\n'
-            h+= 'set title "%sDatascope"\n' % self.plot_name
-            plot_data['xrange'] = (0,len(plot_data['data']))
-            plot_data['yrange'] = (-4,4)
-            plot_data['title'] = "%sDatascope" % self.plot_name
-        elif mode == 'symbol':
+            h+= 'set title "%s"\n' % title
+        elif mode == 'eye' or mode == 'symbol':
             h+= background
             h+= 'set yrange [-4:4]\n'
-            h+= 'set title "%sSymbol"\n' % self.plot_name
-            plot_data['xrange'] = (0,len(plot_data['data']))
-            plot_data['yrange'] = (-4,4)
-            plot_data['title'] = "%sSymbol" % self.plot_name
-        elif mode == 'fft' or mode == 'mixer' or mode =='fll':
+            h+= 'set title "%s"\n' % title
+        else:
             h+= 'unset arrow; unset title\n'
-            h+= 'set xrange [%f:%f]\n' % (self.freqs[0], self.freqs[len(self.freqs)-1])
+            h+= 'set xrange [%f:%f]\n' % xrange
             h+= 'set xlabel "Frequency"\n'
             h+= 'set ylabel "Power(dB)"\n'
             h+= 'set grid\n'
-            h+= 'set yrange [%d:0]\n' % ((self.min_y // 20) * 20)
-            plot_data['xrange'] = (self.freqs[0], self.freqs[len(self.freqs)-1])
-            plot_data['yrange'] = (((self.min_y // 20) * 20), 0)
-            if mode == 'mixer':
-                h+= 'set title "%sRaw Mixer\n' % self.plot_name
-                plot_data['title'] = "%sRaw Mixer" % self.plot_name
-            elif mode == 'fll':
-                h+= 'set title "%sTuned Mixer"\n' % self.plot_name
-                plot_data['title'] = "%sTuned Mixer" % self.plot_name
-            else:               # fft
-                if self.center_freq:
-                    arrow_pos = (self.center_freq - self.relative_freq) / 1e6
-                    h+= 'set arrow from %f, graph 0 to %f, graph 1 nohead\n' % (arrow_pos, arrow_pos)
-                    h+= 'set title "%sSpectrum: tuned to %f Mhz"\n' % (self.plot_name, arrow_pos)
-                    plot_data['title'] = "%sSpectrum: tuned to %f Mhz" % (self.plot_name, arrow_pos)
-                else:
-                    h+= 'set title "%sSpectrum"\n' % self.plot_name
-                    plot_data['title'] = "%sSpectrum" % self.plot_name
+            h+= 'set yrange [%d:0]\n' % yrange[0]
+            if mode == 'fft' and self.center_freq:
+                arrow_pos = self.tune_freq()
+                h+= 'set arrow from %f, graph 0 to %f, graph 1 nohead\n' % (arrow_pos, arrow_pos)
+            h+= 'set title "%s"\n' % title
         dat = '%splot %s\n%s' % (h, ','.join(plots), s)
         if sys.version[0] != '2':
             dat = bytes(dat, 'utf8')
+        if self.gp is None:
+            self.attach_gp()
         self.gp.poll()
         if self.gp.returncode is None:  # make sure gnuplot is still running 
             try:
@@ -262,13 +357,6 @@ class wrap_gp(object):
         if filename:
             self.filename = filename
 
-        if self.out_q is not None and not self.out_q.full_p():      # if configured, send raw plot data to UI
-            msg = gr.message().make_from_string(json.dumps(plot_data), -4, 0, 0)
-            if not self.out_q.full_p():
-                self.out_q.insert_tail(msg)
-
-        return consumed
-
     def set_center_freq(self, f):
         self.center_freq = f
 
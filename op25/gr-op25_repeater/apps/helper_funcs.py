@@ -23,6 +23,7 @@
 import sys
 import json
 import ast
+import bisect
 from log_ts import log_ts
 
 #################
@@ -77,7 +78,7 @@ def get_key_dict(keys_file, _id = 0):      # used to read crypt keys files
     return keys_config
 
 def get_int_dict(s, _id = 0):      # used to read blacklist/whitelist files
-    d = {}
+    d = interval_set()
     try:
         with open(s,"r") as f:
             for v in f:
@@ -88,10 +89,11 @@ def get_int_dict(s, _id = 0):      # used to read blacklist/whitelist files
                     if (len(v) > 1) and (int(v[1]) > v0):  # second parameter if present is end of tgid range
                         v1 = int(v[1])
 
-                    for tg in range(v0, (v1 + 1)):
-                            if tg not in d:      # is this a new tg?
-                                    d[tg] = []   # if so, add to dict (key only, value null)
-                                    sys.stderr.write('%s [%s] added talkgroup %d from %s\n' % (log_ts.get(), _id, tg,s))
+                    d.add(v0, v1)
+                    if v1 > v0:
+                        sys.stderr.write('%s [%s] added talkgroups %d-%d from %s\n' % (log_ts.get(), _id, v0, v1, s))
+                    else:
+                        sys.stderr.write('%s [%s] added talkgroup %d from %s\n' % (log_ts.get(), _id, v0, s))
 
                 except (IndexError, ValueError) as ex:
                     continue
@@ -99,7 +101,125 @@ def get_int_dict(s, _id = 0):      # used to read blacklist/whitelist files
     except (IOError) as ex:
         sys.stderr.write("%s: %s\n" % (ex.strerror, s))
 
-    return dict.fromkeys(d)
+    return d
+
+class interval_set(object):    # used for blacklist/whitelist/skiplist
+    # Talkgroups held as sorted, non-overlapping [start, end] ranges, each with a value (an
+    # expiry time, or None if the range does not expire).  Supports the dict operations the
+    # trunking modules use on their lists, so a range read from a file is a single entry and
+    # a lookup is one bisect on the range starts.
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+        self.values = []
+        self.count = 0              # number of talkgroups covered
+        self.next_expiry = None     # earliest expiry time of any range
+
+    def _find(self, tg):
+        i = bisect.bisect_right(self.starts, tg) - 1
+        if i >= 0 and tg <= self.ends[i]:
+            return i
+        return -1
+
+    def _insert(self, i, start, end, value):
+        self.starts.insert(i, start)
+        self.ends.insert(i, end)
+        self.values.insert(i, value)
+        self.count += end - start + 1
+
+    def _delete(self, i):
+        self.count -= self.ends[i] - self.starts[i] + 1
+        del self.starts[i]
+        del self.ends[i]
+        del self.values[i]
+
+    def __contains__(self, tg):
+        return self._find(tg) >= 0
+
+    def __getitem__(self, tg):
+        i = self._find(tg)
+        if i < 0:
+            raise KeyError(tg)
+        return self.values[i]
+
+    def __setitem__(self, tg, value):
+        self.add(tg, tg, value)
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        for start, end in zip(self.starts, self.ends):
+            for tg in range(start, end + 1):
+                yield tg
+
+    def get(self, tg, default=None):
+        i = self._find(tg)
+        return self.values[i] if i >= 0 else default
+
+    def keys(self):
+        return list(self)
+
+    def ranges(self):
+        return list(zip(self.starts, self.ends, self.values))
+
+    def add(self, start, end, value=None):
+        # add start..end (inclusive), replacing any overlapping part of existing ranges
+        self.remove(start, end)
+        i = bisect.bisect_left(self.starts, start)
+        if i > 0 and self.ends[i-1] == start - 1 and self.values[i-1] == value:   # merge with neighbours of equal value
+            i -= 1
+            start = self.starts[i]
+            self._delete(i)
+        if i < len(self.starts) and self.starts[i] == end + 1 and self.values[i] == value:
+            end = self.ends[i]
+            self._delete(i)
+        self._insert(i, start, end, value)
+        if value is not None and (self.next_expiry is None or value < self.next_expiry):
+            self.next_expiry = value
+
+    def remove(self, start, end):
+        # remove start..end (inclusive), splitting ranges which extend beyond it
+        i = bisect.bisect_right(self.starts, end) - 1
+        while i >= 0 and self.ends[i] >= start:
+            s, e, v = self.starts[i], self.ends[i], self.values[i]
+            self._delete(i)
+            if e > end:
+                self._insert(i, end + 1, e, v)
+            if s < start:
+                self._insert(i, s, start - 1, v)
+            i -= 1
+
+    def pop(self, tg, *default):
+        i = self._find(tg)
+        if i < 0:
+            if default:
+                return default[0]
+            raise KeyError(tg)
+        value = self.values[i]
+        self.remove(tg, tg)
+        return value
+
+    def clear(self):
+        self.__init__()
+
+    def expire(self, curr_time):
+        # remove ranges whose expiry time is before curr_time and return them as (start, end)
+        if self.next_expiry is None or self.next_expiry >= curr_time:
+            return []
+        expired = []
+        self.next_expiry = None
+        i = 0
+        while i < len(self.starts):
+            value = self.values[i]
+            if value is not None and value < curr_time:
+                expired.append((self.starts[i], self.ends[i]))
+                self._delete(i)
+                continue
+            if value is not None and (self.next_expiry is None or value < self.next_expiry):
+                self.next_expiry = value
+            i += 1
+        return expired
 
 def from_dict(d, key, def_val):
     if key in d and d[key] != "":
@@ -107,6 +227,29 @@ def from_dict(d, key, def_val):
     else:
         return def_val
 
+def dict_delta(old, new, sections=()):   # used to build incremental ui updates
+    # Returns (changed, removed).  Keys named in sections are dicts compared one level
+    # deeper so that only their changed entries are reported; removed lists the string
+    # form (as used by json) of entries that have disappeared from those dicts.
+    changed = {}
+    removed = {}
+    for key in new:
+        if key in sections and isinstance(new[key], dict) and isinstance(old.get(key), dict):
+            old_sect = old[key]
+            new_sect = new[key]
+            sect_changed = {}
+            for k in new_sect:
+                if k not in old_sect or (old_sect[k] is not new_sect[k] and old_sect[k] != new_sect[k]):
+                    sect_changed[k] = new_sect[k]
+            sect_removed = [str(k) for k in old_sect if k not in new_sect]
+            if sect_changed:
+                changed[key] = sect_changed
+            if sect_removed:
+                removed[key] = sect_removed
+        elif key not in old or old[key] != new[key]:
+            changed[key] = new[key]
+    return changed, removed
+
 def crc16(dat,len):    # slow version
     poly = (1<<12) + (1<<5) + (1<<0)
     crc = 0
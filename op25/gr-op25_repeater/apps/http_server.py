@@ -25,48 +25,266 @@ import json
 import socket
 import traceback
 import threading
+import collections
+import zlib
+import hashlib
+from email.utils import formatdate, parsedate
+from calendar import timegm
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
 from gnuradio import gr
 from waitress.server import create_server
 
 import gnuradio.op25_repeater as op25_repeater
 
+from msgq_watcher import msgq_watcher
+
+FANOUT_BUFFER_LEN = 256     # number of recent json messages retained for stream clients
+MAX_STREAM_CLIENTS = 4      # concurrent event streams; further clients fall back to polling
+STREAM_KEEPALIVE = 15.0     # seconds between keepalive comments on an idle stream
+STREAM_MAX_TIME = 300.0     # streams are recycled periodically; EventSource reconnects and replays
+STREAM_RETRY = 2000         # client reconnect delay (ms)
+UPDATE_INTERVAL = 1.0       # rate at which 'update' requests are issued on behalf of stream clients
+STATIC_DIR = '../www/www-static'
+IMAGE_DIR = '../www/images'
+CONTENT_TYPES = { 'png': 'image/png', 'jpeg': 'image/jpeg', 'jpg': 'image/jpeg', 'gif': 'image/gif', 'css': 'text/css', 'js': 'application/javascript', 'html': 'text/html', 'ico' : 'image/x-icon'}
+IMG_TYPES = 'png jpg jpeg gif'.split()
+COMPRESS_TYPES = 'css js html'.split()
+COMPRESS_MIN_SIZE = 256     # files smaller than this are always sent uncompressed
+
 my_input_q = None
 my_output_q = None
 my_recv_q = None
+my_plots = {}               # latest plot message per (channel, plot type)
 my_port = None
+my_updates = None
+my_assets = None
+my_image_dir = IMAGE_DIR
 
 """
 fake http and ajax server module
 TODO: make less fake
 """
 
+class fanout_buffer(object):
+    """
+    Sequence numbered ring buffer of json messages shared by all stream clients.
+    Each client keeps its own cursor (the last sequence number it received), so a
+    client that reconnects with Last-Event-ID has any messages it missed replayed.
+    """
+    def __init__(self, maxlen=FANOUT_BUFFER_LEN):
+        self.cond = threading.Condition()
+        self.msgs = collections.deque(maxlen=maxlen)
+        self.seq = 0
+        self.clients = 0
+
+    def append(self, js):
+        with self.cond:
+            self.seq += 1
+            self.msgs.append((self.seq, js))
+            self.cond.notify_all()
+
+    def get_seq(self):
+        with self.cond:
+            return self.seq
+
+    # return (seq, js) messages newer than last_seq, waiting up to timeout for one to arrive
+    def wait_for(self, last_seq, timeout):
+        with self.cond:
+            if self.seq <= last_seq:
+                self.cond.wait(timeout)
+            if self.seq < last_seq:     # cursor from a previous server instance
+                last_seq = 0
+            return [m for m in self.msgs if m[0] > last_seq]
+
+    def add_client(self):
+        with self.cond:
+            if self.clients >= MAX_STREAM_CLIENTS:
+                return False
+            self.clients += 1
+            self.cond.notify_all()
+            return True
+
+    def remove_client(self):
+        with self.cond:
+            self.clients -= 1
+
+    def has_clients(self):
+        with self.cond:
+            return self.clients > 0
+
+    def wait_clients(self):
+        with self.cond:
+            while self.clients == 0:
+                self.cond.wait()
+
+class event_stream(object):
+    """
+    WSGI iterable producing a server-sent event stream for one client.  close() is
+    called by the server on completion or disconnect and releases the client slot.
+    """
+    def __init__(self, last_seq):
+        self.last_seq = last_seq
+        self.closed = False
+
+    def __iter__(self):
+        yield ('retry: %d\n\n' % STREAM_RETRY).encode()
+        end_time = time.time() + STREAM_MAX_TIME
+        while time.time() < end_time:
+            msgs = my_updates.wait_for(self.last_seq, STREAM_KEEPALIVE)
+            if not msgs:
+                yield ': keepalive\n\n'.encode()
+                continue
+            for seq, js in msgs:        # one chunk per event, so each is sent as soon as it is yielded
+                self.last_seq = seq
+                yield ('id: %d\ndata: %s\n\n' % (seq, js)).encode()
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            my_updates.remove_client()
+
+def stream_req(environ, start_response):
+    if not my_updates.add_client():
+        status = '503 Service Unavailable'
+        start_response(status, [('Content-type', 'text/plain'), ('Content-Length', str(len(status)))])
+        return [status.encode()]
+    try:
+        last_seq = int(environ.get('HTTP_LAST_EVENT_ID', my_updates.get_seq()))
+    except ValueError:
+        last_seq = my_updates.get_seq()
+    response_headers = [('Content-type', 'text/event-stream'),
+                        ('Cache-Control', 'no-cache'),
+                        ('X-Accel-Buffering', 'no')]
+    start_response('200 OK', response_headers)
+    return event_stream(last_seq)
+
+def stream_updater():
+    # one paced 'update' request serves every connected stream client; deltas can be
+    # requested because every stream client sees every message (missed ones are replayed)
+    while True:
+        my_updates.wait_clients()
+        msg = gr.message().make_from_string('update', -2, 1, 0)   # arg1=1: trunk_update deltas accepted
+        if not my_output_q.full_p():
+            my_output_q.insert_tail(msg)
+        time.sleep(UPDATE_INTERVAL)
+
+class asset_cache(object):
+    """
+    In-memory cache of static files.  Each entry holds the file contents along with
+    precomputed gzip (and brotli, if available) encodings, an ETag and Last-Modified
+    value.  Entries are validated against the file's mtime and size on every lookup,
+    so edited assets and freshly rendered plot images are picked up immediately.
+    """
+    def __init__(self):
+        self.mutex = threading.Lock()
+        self.assets = {}
+
+    def preload(self, dirname):
+        try:
+            filenames = os.listdir(dirname)
+        except OSError:
+            return
+        for filename in filenames:
+            if filename.split('.')[-1] in CONTENT_TYPES:
+                self.get('%s/%s' % (dirname, filename))
+
+    def get(self, pathname):
+        try:
+            st = os.stat(pathname)
+        except OSError:
+            return None
+        with self.mutex:
+            entry = self.assets.get(pathname)
+        if entry is not None and entry['mtime'] == st.st_mtime and entry['size'] == st.st_size:
+            return entry
+        try:
+            with open(pathname, 'rb') as f:
+                body = f.read()
+        except IOError:
+            return None
+        entry = self.make_entry(pathname, body, st)
+        with self.mutex:
+            self.assets[pathname] = entry
+        return entry
+
+    def make_entry(self, pathname, body, st):
+        suf = pathname.split('.')[-1]
+        entry = {'mtime': st.st_mtime,
+                 'size': st.st_size,
+                 'content_type': CONTENT_TYPES[suf],
+                 'etag': '"%s"' % hashlib.sha1(body).hexdigest()[:16],
+                 'last_modified': formatdate(int(st.st_mtime), usegmt=True),
+                 'bodies': {'identity': body}}
+        if suf in COMPRESS_TYPES and len(body) >= COMPRESS_MIN_SIZE:
+            gz = zlib.compressobj(9, zlib.DEFLATED, 31)     # wbits 31 = gzip container
+            entry['bodies']['gzip'] = gz.compress(body) + gz.flush()
+            if brotli is not None:
+                entry['bodies']['br'] = brotli.compress(body)
+        return entry
+
+def select_encoding(environ, entry):
+    accept = environ.get('HTTP_ACCEPT_ENCODING', '')
+    for encoding in ('br', 'gzip'):
+        if encoding in entry['bodies'] and encoding in accept:
+            return encoding
+    return 'identity'
+
+def not_modified(environ, entry):
+    inm = environ.get('HTTP_IF_NONE_MATCH')
+    if inm is not None:
+        return entry['etag'] in [t.strip() for t in inm.split(',')] or inm.strip() == '*'
+    ims = environ.get('HTTP_IF_MODIFIED_SINCE')
+    if ims is not None:
+        ims_t = parsedate(ims)
+        return ims_t is not None and int(entry['mtime']) <= timegm(ims_t)
+    return False
+
 def static_file(environ, start_response):
-    content_types = { 'png': 'image/png', 'jpeg': 'image/jpeg', 'jpg': 'image/jpeg', 'gif': 'image/gif', 'css': 'text/css', 'js': 'application/javascript', 'html': 'text/html', 'ico' : 'image/x-icon'}
-    img_types = 'png jpg jpeg gif'.split()
+    headers = []
     if environ['PATH_INFO'] == '/':
         filename = 'index.html'
     else:
         filename = re.sub(r'[^a-zA-Z0-9_.\-]', '', environ['PATH_INFO'])
     suf = filename.split('.')[-1]
-    pathname = '../www/www-static'
-    if suf in img_types:
-        pathname = '../www/images'
+    pathname = STATIC_DIR
+    if suf in IMG_TYPES:
+        pathname = my_image_dir
     pathname = '%s/%s' % (pathname, filename)
-    if suf not in list(content_types.keys()) or '..' in filename or not os.access(pathname, os.R_OK):
+    entry = None
+    if suf in CONTENT_TYPES and '..' not in filename:
+        entry = my_assets.get(pathname)
+    if entry is None:
         sys.stderr.write('404 %s\n' % pathname)
         status = '404 NOT FOUND'
         content_type = 'text/plain'
         output = status
     else:
-        output = open(pathname, 'rb').read()
-        content_type = content_types[suf]
-        status = '200 OK'
-    return status, content_type, output
+        content_type = entry['content_type']
+        headers = [('ETag', entry['etag']),
+                   ('Last-Modified', entry['last_modified']),
+                   ('Cache-Control', 'no-cache')]     # always revalidate; unchanged files cost a 304
+        if len(entry['bodies']) > 1:
+            headers.append(('Vary', 'Accept-Encoding'))
+        if not_modified(environ, entry):
+            status = '304 Not Modified'
+            output = b''
+        else:
+            encoding = select_encoding(environ, entry)
+            if encoding != 'identity':
+                headers.append(('Content-Encoding', encoding))
+            output = entry['bodies'][encoding]
+            status = '200 OK'
+    return status, content_type, output, headers
 
 def post_req(environ, start_response, postdata):
     global my_input_q, my_output_q, my_recv_q, my_port
     valid_req = False
+    streaming = environ.get('HTTP_X_OP25_STREAM', '') == '1'    # responses will arrive on the event stream
     try:
         data = json.loads(postdata)
         for d in data:
@@ -74,15 +292,21 @@ def post_req(environ, start_response, postdata):
             if not my_output_q.full_p():
                 my_output_q.insert_tail(msg)
         valid_req = True
-        time.sleep(0.2)
+        if not streaming:
+            time.sleep(0.2)
     except:
         sys.stderr.write('post_req: error processing input: %s\n%s\n' % (postdata, traceback.format_exc()))
 
     resp_msg = []
-    while not my_recv_q.empty_p():
+    while not streaming and not my_recv_q.empty_p():
         msg = my_recv_q.delete_head()
         if msg.type() == -4:
             resp_msg.append(json.loads(msg.to_string()))
+    if not streaming:
+        for key in list(my_plots.keys()):
+            msg = my_plots.pop(key, None)
+            if msg is not None:
+                resp_msg.append(json.loads(msg.to_string()))
     if not valid_req:
         resp_msg = []
     status = '200 OK'
@@ -91,8 +315,11 @@ def post_req(environ, start_response, postdata):
     return status, content_type, output
 
 def http_request(environ, start_response):
-    if environ['REQUEST_METHOD'] == 'GET':
-        status, content_type, output = static_file(environ, start_response)
+    extra_headers = []
+    if environ['REQUEST_METHOD'] == 'GET' and environ['PATH_INFO'] == '/stream':
+        return stream_req(environ, start_response)
+    elif environ['REQUEST_METHOD'] == 'GET':
+        status, content_type, output, extra_headers = static_file(environ, start_response)
     elif environ['REQUEST_METHOD'] == 'POST':
         postdata = environ['wsgi.input'].read()
         status, content_type, output = post_req(environ, start_response, postdata)
@@ -102,9 +329,10 @@ def http_request(environ, start_response):
         output = status
         sys.stderr.write('http_request: unexpected input %s\n' % environ['PATH_INFO'])
     
-    response_headers = [('Content-type', content_type),
-                        ('Content-Length', str(len(output)))]
-    start_response(status, response_headers)
+    response_headers = [('Content-type', content_type)]
+    if not status.startswith('304'):
+        response_headers.append(('Content-Length', str(len(output))))
+    start_response(status, response_headers + extra_headers)
 
     if sys.version[0] > '2':
         if type(output) is str:
@@ -123,6 +351,16 @@ def application(environ, start_response):
     return result
 
 def process_qmsg(msg):
+    if msg.type() == -4:
+        js = msg.to_string()
+        if type(js) is not str and isinstance(js, bytes):
+            js = js.decode()
+        my_updates.append(js)
+        if int(msg.arg2()) > 0:     # plot data is superseded by the next plot, so only the latest is held
+            my_plots[(int(msg.arg1()), int(msg.arg2()))] = msg
+            return
+        if int(msg.arg1()) == 1:    # trunk_update delta: only meaningful to stream clients, which see every message
+            return
     if my_recv_q.full_p():
         my_recv_q.delete_head_nowait()   # ignores result
     if my_recv_q.full_p():
@@ -131,8 +369,8 @@ def process_qmsg(msg):
         my_recv_q.insert_tail(msg)
 
 class http_server(object):
-    def __init__(self, input_q, output_q, endpoint, **kwds):
-        global my_input_q, my_output_q, my_recv_q, my_port
+    def __init__(self, input_q, output_q, endpoint, plot_dir=None, **kwds):
+        global my_input_q, my_output_q, my_recv_q, my_port, my_updates, my_assets, my_image_dir
         host, port = endpoint.split(':')
         if my_port is not None:
             raise AssertionError('this server is already active on port %s' % my_port)
@@ -141,33 +379,21 @@ class http_server(object):
         my_port = int(port)
 
         my_recv_q = gr.msg_queue(10)
-        self.q_watcher = queue_watcher(my_input_q, process_qmsg)
+        my_updates = fanout_buffer()
+        if plot_dir is not None:
+            my_image_dir = plot_dir.rstrip('/')
+        my_assets = asset_cache()
+        my_assets.preload(STATIC_DIR)
+        self.q_watcher = msgq_watcher(my_input_q, process_qmsg, name="http_input_q")
+        self.updater = threading.Thread(target=stream_updater)
+        self.updater.daemon = True
+        self.updater.start()
 
         try:
-            self.server = create_server(application, host=host, port=my_port, threads=6)
+            self.server = create_server(application, host=host, port=my_port, threads=6+MAX_STREAM_CLIENTS)
         except:
             sys.stderr.write('Failed to create http terminal server\n%s\n' % traceback.format_exc())
             sys.exit(1)
 
     def run(self):
         self.server.run()
-
-class queue_watcher(threading.Thread):
-    def __init__(self, msgq,  callback, **kwds):
-        threading.Thread.__init__ (self, **kwds)
-        self.setDaemon(1)
-        self.msgq = msgq
-        self.callback = callback
-        self.keep_running = True
-        self.start()
-
-    def run(self):
-        while(self.keep_running):
-            if not self.msgq.empty_p(): # check queue before trying to read a message to avoid deadlock at startup
-                msg = self.msgq.delete_head()
-                if msg is not None:
-                    self.callback(msg)
-                else:
-                    self.keep_running = False
-            else: # empty queue
-                time.sleep(0.01)
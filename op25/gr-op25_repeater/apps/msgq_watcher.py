@@ -0,0 +1,199 @@
+# Message queue watcher module
+#
+# This file is part of OP25
+#
+# OP25 is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+#
+# OP25 is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with OP25; see the file COPYING. If not, write to the Free
+# Software Foundation, Inc., 51 Franklin Street, Boston, MA
+# 02110-1301, USA.
+#
+# Event driven replacement for the various sleep-poll queue watchers.
+#
+# Each watcher owns a pump thread which blocks inside gr.msg_queue.delete_head()
+# (the gnuradio binding releases the GIL while waiting) and hands messages to a
+# python queue serviced by a dispatch thread which invokes the callback.  Once
+# running, no thread sleeps waiting for work, so a message is dispatched as soon
+# as it has been inserted by the frame assembler or UI, and idle watchers cost
+# no CPU.
+#
+# Until the first message arrives the pump polls empty_p() rather than blocking,
+# as the old watchers did to avoid deadlock at startup: a delete_head() issued
+# while the flowgraph is still being built and started can hold up start-up on
+# bindings that do not release the GIL.
+#
+# The python queue is bounded (WORK_Q_SIZE).  When the dispatcher falls behind,
+# the pump blocks, the gr.msg_queue fills and its own limit applies again: the
+# frame assemblers drop messages once full_p(), or in batch replay stall the
+# decoder until there is room.
+#
+# When a batch_callback is supplied, all messages already waiting (up to
+# max_batch) are drained and handed over in a single call, which lets consumers
+# such as the trunking modules amortize per-message bookkeeping.
+#
+# Per-queue statistics (depth, wait time, dispatch latency) are kept for every
+# watcher and can be retrieved with get_watcher_stats() or dump_watcher_stats().
+
+import sys
+import time
+import threading
+from log_ts import log_ts
+from gnuradio import gr
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue   # python2
+
+MAX_BATCH = 32          # Maximum number of messages handed to a batch callback
+WORK_Q_SIZE = 64        # Maximum number of messages held between pump and dispatcher
+STARTUP_POLL = 0.01     # Seconds between empty_p() checks until the first message
+
+_watchers = []
+_watchers_mutex = threading.Lock()
+
+class msgq_stats(object):
+    def __init__(self, name):
+        self.name = name
+        self.mutex = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.dispatched = 0
+        self.max_depth = 0
+        self.wait_time = 0.0        # cumulative time dispatcher spent idle waiting for messages
+        self.latency_sum = 0.0      # cumulative time between dequeue from msgq and callback start
+        self.latency_max = 0.0
+        self.callback_sum = 0.0     # cumulative time spent inside the callback
+        self.callback_max = 0.0
+
+    def update(self, depth, wait_time, latency, cb_time):
+        with self.mutex:
+            self.dispatched += 1
+            self.max_depth = max(self.max_depth, depth)
+            self.wait_time += wait_time
+            self.latency_sum += latency
+            self.latency_max = max(self.latency_max, latency)
+            self.callback_sum += cb_time
+            self.callback_max = max(self.callback_max, cb_time)
+
+    def to_dict(self, depth):
+        with self.mutex:
+            n = self.dispatched if self.dispatched > 0 else 1
+            return {'name': self.name,
+                    'depth': depth,
+                    'max_depth': self.max_depth,
+                    'dispatched': self.dispatched,
+                    'wait_time': self.wait_time,
+                    'latency_avg': self.latency_sum / n,
+                    'latency_max': self.latency_max,
+                    'callback_avg': self.callback_sum / n,
+                    'callback_max': self.callback_max}
+
+class msgq_watcher(threading.Thread):
+    def __init__(self, msgq, callback, name=None, batch_callback=None, max_batch=MAX_BATCH, **kwds):
+        threading.Thread.__init__ (self, **kwds)
+        self.daemon = True
+        self.msgq = msgq
+        self.callback = callback
+        self.batch_callback = batch_callback
+        self.max_batch = max_batch
+        self.keep_running = True
+        self.work_q = queue.Queue(maxsize=WORK_Q_SIZE)
+        self.stats = msgq_stats(name if name is not None else ("msgq%d" % len(_watchers)))
+        self.pump = threading.Thread(target=self.pump_msgq)
+        self.pump.daemon = True
+        with _watchers_mutex:
+            _watchers.append(self)
+        self.pump.start()
+        self.start()
+
+    def pump_msgq(self):
+        # blocking read of gr.msg_queue; None marks end of input
+        while self.keep_running and self.msgq.empty_p():   # avoid deadlock at startup
+            time.sleep(STARTUP_POLL)
+        while self.keep_running:
+            msg = self.msgq.delete_head()
+            if not self.keep_running:   # woken by kill()
+                break
+            item = (time.time(), msg)
+            while self.keep_running:
+                try:
+                    self.work_q.put(item, timeout=1.0)
+                    break
+                except queue.Full:
+                    continue
+            if msg is None:
+                break
+
+    def run(self):
+        try:
+            while self.keep_running:
+                t_wait = time.time()
+                ts, msg = self.work_q.get()
+                t_start = time.time()
+                if msg is None or not self.keep_running:
+                    self.keep_running = False
+                    break
+                if self.batch_callback is None:
+                    self.callback(msg)
+                    t_end = time.time()
+                    self.stats.update(self.get_depth(), t_start - t_wait, t_start - ts, t_end - t_start)
+                else:
+                    self.run_batch(ts, msg, t_wait, t_start)
+        except KeyboardInterrupt:
+            self.keep_running = False
+
+    def run_batch(self, ts, msg, t_wait, t_start):
+        items = [(ts, msg)]
+        while len(items) < self.max_batch:
+            try:
+                item = self.work_q.get_nowait()
+            except queue.Empty:
+                break
+            if item[1] is None:
+                self.keep_running = False
+                break
+            items.append(item)
+        self.batch_callback([m for (t, m) in items])
+        t_end = time.time()
+        cb_time = (t_end - t_start) / len(items)
+        depth = self.get_depth()
+        for (t, m) in items:
+            self.stats.update(depth, t_start - t_wait, t_start - t, cb_time)
+            t_wait = t_start    # only the first message of a batch waited
+
+    def get_depth(self):
+        return self.msgq.count() + self.work_q.qsize()
+
+    def get_stats(self):
+        return self.stats.to_dict(self.get_depth())
+
+    def kill(self):
+        self.keep_running = False
+        try:
+            self.work_q.put_nowait((time.time(), None))     # wake dispatcher; if full it wakes anyway
+        except queue.Full:
+            pass
+        if not self.msgq.full_p():
+            self.msgq.insert_tail(gr.message().make_from_string("", -1, 0, 0))    # wake pump from delete_head()
+        with _watchers_mutex:
+            if self in _watchers:
+                _watchers.remove(self)
+
+def get_watcher_stats():
+    with _watchers_mutex:
+        return [w.get_stats() for w in _watchers]
+
+def dump_watcher_stats():
+    for s in get_watcher_stats():
+        sys.stderr.write("%s msgq %s: depth=%d, max_depth=%d, dispatched=%d, wait=%.3fs, latency avg=%.6fs max=%.6fs, callback avg=%.6fs max=%.6fs\n" % (log_ts.get(), s['name'], s['depth'], s['max_depth'], s['dispatched'], s['wait_time'], s['latency_avg'], s['latency_max'], s['callback_avg'], s['callback_max']))
@@ -63,8 +63,13 @@ import p25_demodulator_dev as p25_demodulator
 import op25_nbfm
 import op25_iqsrc
 import op25_wavsrc
+from channelizer import channelizer_ccf
+from call_journal import call_journal
+from call_recorder import call_recorder
+from trunk_clock import system_clock, msg_clock
 from log_ts import log_ts
 from helper_funcs import *
+from msgq_watcher import msgq_watcher, dump_watcher_stats
 
 from gr_gnuplot import constellation_sink_c
 from gr_gnuplot import fft_sink_c
@@ -85,22 +90,27 @@ _def_capture_file = "capture.bin"
 #
 
 class device(object):
-    def __init__(self, config):
+    def __init__(self, config, batch = False):
         speeds = [250000, 1000000, 1024000, 1800000, 1920000, 2000000, 2048000, 2400000, 2560000]
 
         self.name = config['name']
         self.args = config['args']
         self.tunable = bool(from_dict(config, 'tunable', False))
+        self.use_channelizer = bool(from_dict(config, 'channelizer', False))   # share one channelizer between this device's channels
+        self.channelizer = None
+        self.start_time = float(from_dict(config, 'start_time', 0.0))    # capture start time of a file source (batch mode)
 
         sys.stderr.write('device: %s\n' % config)
         if config['args'] == 'iqsrc':
-            self.src = op25_iqsrc.op25_iqsrc_c(str(config['name']), config)
+            self.src = op25_iqsrc.op25_iqsrc_c(str(config['name']), config, throttle = not batch)
             self.ppm = float(from_dict(config, 'ppm', "0.0"))
             self.tunable = False
             if self.src.is_dsd():
                 self.frequency = self.src.get_center_freq()
                 self.sample_rate = self.src.get_sample_rate()
                 self.offset = 600000
+                if self.src.get_ts() > 0:
+                    self.start_time = float(self.src.get_ts())
             else:
                 self.frequency = int(from_dict(config, 'frequency', 800000000))
                 self.sample_rate = config['rate']
@@ -109,7 +119,7 @@ class device(object):
             self.usable_bw = float(from_dict(config, 'usable_bw_pct', 1.0))
 
         elif config['args'] == 'wavsrc':
-            self.src = op25_wavsrc.op25_wavsrc_f(str(config['name']), config)
+            self.src = op25_wavsrc.op25_wavsrc_f(str(config['name']), config, throttle = not batch)
             self.sample_rate = self.src.get_sample_rate()
             self.ppm = float(from_dict(config, 'ppm', "0.0"))
             self.frequency = int(from_dict(config, 'frequency', 800000000))
@@ -180,6 +190,7 @@ class channel(object):
         self.raw_sink = None
         self.raw_file = None
         self.throttle = None
+        self.sym_clock = False
         self.nbfm = None
         self.nbfm_mode = 0
         self.crypt_keys_file    = str(from_dict(config, "crypt_keys", ""))
@@ -188,10 +199,18 @@ class channel(object):
         self.chan_idle = False
         self.sinks = {}
         self.tdma_state = False
-        self.xor_cache = {}
         self.config = config
         self.symbol_rate = int(from_dict(config, 'symbol_rate', _def_symbol_rate))
         self.channel_rate = self.symbol_rate
+        self.chz_port = None
+        if dev.channelizer is not None and from_dict(config, 'raw_input', "") == "":
+            self.chz_port = dev.channelizer.add_channel()
+        if self.chz_port is not None:     # demod input is the channelizer bin rather than the whole device band
+            input_rate = dev.channelizer.output_rate
+            usable_bw = 1.0
+        else:
+            input_rate = dev.sample_rate
+            usable_bw = self.device.usable_bw
         if dev.args == 'wavsrc':
             self.demod = p25_demodulator.p25_demod_fb(
                              msgq_id = self.msgq_id,
@@ -207,12 +226,12 @@ class channel(object):
             self.demod = p25_demodulator.p25_demod_cb(
                              msgq_id = self.msgq_id,
                              debug = self.verbosity,
-                             input_rate = dev.sample_rate,
+                             input_rate = input_rate,
                              demod_type = 'fsk4',
                              filter_type = filter_type,
-                             usable_bw = self.device.usable_bw,
+                             usable_bw = usable_bw,
                              excess_bw = float(from_dict(config, 'excess_bw', 0.2)),
-                             relative_freq = ((dev.frequency + dev.offset + dev.fractional_corr) - self.frequency),
+                             relative_freq = 0,
                              offset = dev.offset,
                              if_rate = config['if_rate'],
                              symbol_rate = self.symbol_rate)
@@ -220,16 +239,21 @@ class channel(object):
             self.demod = p25_demodulator.p25_demod_cb(
                              msgq_id = self.msgq_id,
                              debug = self.verbosity,
-                             input_rate = dev.sample_rate,
+                             input_rate = input_rate,
                              demod_type = config['demod_type'],
                              filter_type = config['filter_type'],
-                             usable_bw = self.device.usable_bw,
+                             usable_bw = usable_bw,
                              excess_bw = float(from_dict(config, 'excess_bw', 0.2)),
-                             relative_freq = ((dev.frequency + dev.offset + dev.fractional_corr) - self.frequency),
+                             relative_freq = 0,
                              offset = dev.offset,
                              if_rate = config['if_rate'],
                              symbol_rate = self.symbol_rate)
-        self.decoder = op25_repeater.frame_assembler(str(config['destination']), verbosity, msgq_id, rx_q)
+
+        # Audio passes through the call recorder (if enabled) on its way to the destination
+        self.destination = str(config['destination'])
+        if tb.recorder is not None and msgq_id >= 0 and from_dict(config, 'record', True):
+            self.destination = tb.recorder.add_channel(msgq_id, self.destination) or self.destination
+        self.decoder = op25_repeater.frame_assembler(self.destination, verbosity, msgq_id, rx_q)
 
         # Load crypt keys if present
         if self.crypt_keys_file != "":
@@ -245,7 +269,7 @@ class channel(object):
         # sys.stderr.write("%s crypt behavior: %d\n" % (log_ts.get(), self.crypt_behavior))
         
         # Relative-tune the demodulator
-        if not self.demod.set_relative_frequency((dev.frequency + dev.offset + dev.fractional_corr) - self.frequency):
+        if not self.set_relative_frequency((dev.frequency + dev.offset + dev.fractional_corr) - self.frequency):
             sys.stderr.write("%s [%d] Unable to initialize demod to freq: %d, using device freq: %d\n" % (log_ts.get(), self.msgq_id, self.frequency, dev.frequency))
             self.frequency = dev.frequency
 
@@ -261,7 +285,7 @@ class channel(object):
             self.nbfm_mode = 1;
         
         if self.nbfm_mode > 0:
-            self.nbfm = op25_nbfm.op25_nbfm_c(str(config['destination']), verbosity, config, msgq_id, rx_q)
+            self.nbfm = op25_nbfm.op25_nbfm_c(self.destination, verbosity, config, msgq_id, rx_q)
             if self.demod.connect_nbfm(self.nbfm):
                 if self.nbfm_mode == 2:
                     self.nbfm.control(True)
@@ -288,6 +312,14 @@ class channel(object):
                 sys.stderr.write('unrecognized plot type %s\n' % plot)
                 return
 
+    def set_relative_frequency(self, freq):
+        if self.chz_port is None:
+            return self.demod.set_relative_frequency(freq)
+        residual = self.device.channelizer.set_channel_freq(self.chz_port, -freq)  # select bin, demod removes what is left
+        if residual is None:
+            return False
+        return self.demod.set_relative_frequency(-residual)
+
     def set_debug(self, dbglvl):
         self.verbosity = dbglvl
         if self.decoder is not None:
@@ -317,7 +349,11 @@ class channel(object):
             return
         if self.tb.terminal_type == "http":
             self.sinks[plot][0].gnuplot.set_interval(self.tb.http_plot_interval)
-            self.sinks[plot][0].gnuplot.set_output_dir(self.tb.http_plot_directory)
+            self.sinks[plot][0].gnuplot.set_render(self.tb.http_plot_render)
+            self.sinks[plot][0].gnuplot.set_plot_format(self.tb.http_plot_format)
+            self.sinks[plot][0].gnuplot.set_plot_width(self.tb.http_plot_width)
+            if self.tb.http_plot_render == "gnuplot":
+                self.sinks[plot][0].gnuplot.set_output_dir(self.tb.http_plot_directory)
         else:
             self.sinks[plot][0].gnuplot.set_interval(self.tb.curses_plot_interval)
 
@@ -398,12 +434,18 @@ class channel(object):
             sink.set_relative_freq(self.device.frequency - self.frequency)
             sink.set_width(self.device.sample_rate)
             self.tb.lock()
-            self.demod.connect_complex('src', sink)
+            if self.chz_port is not None:   # demod only sees its own bin; plot the whole device band
+                self.tb.connect(self.device.src, sink)
+            else:
+                self.demod.connect_complex('src', sink)
             self.tb.unlock()
         else:
             (sink, fn) = self.sinks.pop('fft')
             self.tb.lock()
-            self.demod.disconnect_complex(sink)
+            if self.chz_port is not None:
+                self.tb.disconnect(self.device.src, sink)
+            else:
+                self.demod.disconnect_complex(sink)
             self.tb.unlock()
             sink.kill()
 
@@ -447,17 +489,17 @@ class channel(object):
         old_freq = self.frequency
         self.frequency = freq
 
-        if not self.demod.set_relative_frequency(self.device.offset + self.device.frequency + self.device.fractional_corr - freq): # First attempt relative tune
+        if not self.set_relative_frequency(self.device.offset + self.device.frequency + self.device.fractional_corr - freq): # First attempt relative tune
             if self.device.tunable:                                                                  # then hard tune if allowed
                 self.device.frequency = self.frequency
                 if self.device.src is not None:
                     self.device.src.set_center_freq(self.frequency + self.device.offset)
                 self.device.fractional_corr = int((int(round(self.device.ppm)) - self.device.ppm) * (self.device.frequency/1e6))        # Calc frac ppm using new freq
-                self.demod.set_relative_frequency(self.device.offset + self.device.frequency + self.device.fractional_corr - freq)
+                self.set_relative_frequency(self.device.offset + self.device.frequency + self.device.fractional_corr - freq)
                 if self.verbosity >= 9:
                     sys.stderr.write("%s [%d] Hardware tune: dev_freq(%d), dev_off(%d), dev_frac(%d), tune_freq(%d)\n" % (log_ts.get(), self.msgq_id, self.device.frequency, self.device.offset, self.device.fractional_corr, (self.device.frequency - (self.device.offset + self.device.frequency + self.device.fractional_corr - freq))))
             else:                                                                                    # otherwise fail and reset to prev freq
-                self.demod.set_relative_frequency(self.device.offset + self.device.frequency + self.device.fractional_corr - old_freq)
+                self.set_relative_frequency(self.device.offset + self.device.frequency + self.device.fractional_corr - old_freq)
                 self.frequency = old_freq
                 if self.verbosity:
                     sys.stderr.write("%s [%d] Unable to tune %s to frequency %f\n" % (log_ts.get(), self.msgq_id, self.name, (freq/1e6)))
@@ -480,7 +522,7 @@ class channel(object):
             self.device.src.set_freq_corr(int(round(self.device.ppm)))
             self.device.src.set_center_freq(self.device.frequency + self.device.offset)
         self.device.fractional_corr = int((int(round(self.device.ppm)) - self.device.ppm) * (self.device.frequency/1e6))
-        self.demod.set_relative_frequency(self.device.offset + self.device.frequency + self.device.fractional_corr - self.frequency)
+        self.set_relative_frequency(self.device.offset + self.device.frequency + self.device.fractional_corr - self.frequency)
         self.demod.reset()          # reset gardner-costas tracking loop
 
     def configure_p25_tdma(self, params):
@@ -493,29 +535,30 @@ class channel(object):
             return
         self.tdma_state = set_tdma
         if set_tdma:
-            self.decoder.control(json.dumps({'tuner': self.msgq_id, 'cmd': 'set_xormask', 'xormask': self.xor_cache[self.get_hash(params)]}))
+            self.decoder.control(json.dumps({'tuner': self.msgq_id, 'cmd': 'set_xormask', 'xormask': self.get_xormask(params)}))
             rate = 6000
         else:
             rate = self.channel_rate
 
-        self.symbol_rate = rate
-        self.demod.set_omega(rate)
-        if 'eye' in self.sinks:
-            self.sinks['eye'][0].set_sps(self.config['if_rate'] / rate)
+        self.set_rate(rate)
 
-    def get_hash(self, params):
-        hash = '%x%x%x' % (params['nac'], params['sysid'], params['wacn'])
-        if hash not in self.xor_cache:
-            self.xor_cache[hash] = lfsr.p25p2_lfsr(params['nac'], params['sysid'], params['wacn']).xor_chars
-            if self.verbosity >= 5:
-                sys.stderr.write("%s [%d] Caching TDMA xor mask for NAC: 0x%x, SYSID: 0x%x, WACN: 0x%x\n" % (log_ts.get(), self.msgq_id, params['nac'], params['sysid'], params['wacn']))
-        return hash
+    def get_xormask(self, params):
+        if self.verbosity >= 5 and not lfsr.is_cached(params['nac'], params['sysid'], params['wacn']):
+            sys.stderr.write("%s [%d] Caching TDMA xor mask for NAC: 0x%x, SYSID: 0x%x, WACN: 0x%x\n" % (log_ts.get(), self.msgq_id, params['nac'], params['sysid'], params['wacn']))
+        return lfsr.get_xor_chars(params['nac'], params['sysid'], params['wacn'])
 
     def set_rate(self, rate):
         self.symbol_rate = rate
         self.demod.set_omega(rate)
         if 'eye' in self.sinks:
             self.sinks['eye'][0].set_sps(self.config['if_rate'] / rate)
+        if self.sym_clock:
+            self.decoder.control(json.dumps({'tuner': self.msgq_id, 'cmd': 'set_sym_rate', 'rate': rate}))
+
+    def set_sym_clock(self, start_time):
+        # batch mode: decoder message timestamps count symbols from the capture start time
+        self.sym_clock = True
+        self.decoder.control(json.dumps({'tuner': self.msgq_id, 'cmd': 'set_sym_clock', 'start': start_time, 'rate': self.symbol_rate}))
 
     def control(self, params):
         if 'cmd' in params:
@@ -524,7 +567,7 @@ class channel(object):
             if params['cmd'] == "set_slotid":
                 self.chan_idle = True if (params['slotid'] == 4) else False
             elif params['cmd'] == "set_xormask":
-                self.decoder.control(json.dumps({'tuner': self.msgq_id, 'cmd': 'set_xormask', 'xormask': self.xor_cache[self.get_hash(params)]}))
+                self.decoder.control(json.dumps({'tuner': self.msgq_id, 'cmd': 'set_xormask', 'xormask': self.get_xormask(params)}))
                 return
         self.decoder.control(json.dumps(params))
         self.demod.control(not self.chan_idle)
@@ -546,9 +589,10 @@ class rx_block (gr.top_block):
 
     # Initialize the receiver
     #
-    def __init__(self, verbosity, config):
+    def __init__(self, verbosity, config, batch = False):
         self.config = config
         self.verbosity = verbosity
+        self.batch = batch
         self.devices = []
         self.channels = []
         self.terminal = None
@@ -560,6 +604,8 @@ class rx_block (gr.top_block):
         self.metadata = None
         self.meta_streams = {}
         self.trunking = None
+        self.journal = None
+        self.recorder = None
         self.du_watcher = None
         self.rx_q = gr.msg_queue(100)
         self.ui_in_q = gr.msg_queue(100)
@@ -569,6 +615,8 @@ class rx_block (gr.top_block):
 
         gr.top_block.__init__(self)
         self.device_id_by_name = {}
+        if self.batch:
+            self.set_interactive(False) # batch decoding of file sources, not throttled
 
         if "audio" in config:
             self.configure_audio(config['audio'])
@@ -579,12 +627,21 @@ class rx_block (gr.top_block):
         if "trunking" in config:
             self.configure_trunking(config['trunking'])
 
+        if "recording" in config:
+            self.configure_recording(config['recording'])
+
         self.configure_devices(config['devices'])
         self.configure_channels(config['channels'])
 
         if self.trunking is not None: # post-initialization after channels and devices created
             self.trunk_rx.post_init()
 
+        if self.batch:
+            self.configure_batch()
+
+        if self.recorder is not None:
+            self.recorder.start()
+
         if "terminal" in config:
             self.configure_terminal(config['terminal'])
 
@@ -596,6 +653,8 @@ class rx_block (gr.top_block):
             dev.set_debug(dbglvl)
         if self.trunking is not None and self.trunk_rx is not None:
             self.trunk_rx.set_debug(dbglvl)
+        if self.recorder is not None:
+            self.recorder.set_debug(dbglvl)
         if self.metadata is not None:
             for stream in self.meta_streams:
                 self.meta_streams[stream][0].set_debug(dbglvl)
@@ -650,12 +709,18 @@ class rx_block (gr.top_block):
             sys.stderr.write("Error: unable to import terminal module: %s\n%s\n" % (config['module'], sys.exc_info()[1]))
             return
         term_type = str(from_dict(config,'terminal_type', "curses"))
-        self.terminal = terminal.op25_terminal(self.ui_in_q, self.ui_out_q, term_type)
+        if term_type.startswith('http:'):
+            self.terminal = terminal.op25_terminal(self.ui_in_q, self.ui_out_q, term_type, plot_dir=str(from_dict(config, 'http_plot_directory', "../www/images")))
+        else:
+            self.terminal = terminal.op25_terminal(self.ui_in_q, self.ui_out_q, term_type)
         self.terminal_type = self.terminal.get_terminal_type()
         self.terminal_config = config
         self.curses_plot_interval = float(from_dict(config, 'curses_plot_interval', 0.0))
         self.http_plot_interval = float(from_dict(config, 'http_plot_interval', 1.0))
         self.http_plot_directory = str(from_dict(config, 'http_plot_directory', "../www/images"))
+        self.http_plot_render = str(from_dict(config, 'http_plot_render', "browser"))
+        self.http_plot_format = str(from_dict(config, 'http_plot_format', "packed"))
+        self.http_plot_width = int(from_dict(config, 'http_plot_width', 0))
         self.ui_timeout = float(from_dict(config, 'terminal_timeout', 5.0))
 
     def configure_trunking(self, config):
@@ -663,6 +728,9 @@ class rx_block (gr.top_block):
             ("chans" in config and (config['chans'] == ""))):
             return
 
+        if from_dict(config, 'xormask_cache', "") != "":
+            lfsr.set_cache_file(str(config['xormask_cache']))
+
         tk_mod = config['module']
         if tk_mod.endswith('.py'):
             tk_mod = tk_mod[:-3]
@@ -673,10 +741,24 @@ class rx_block (gr.top_block):
             self.trunking = None
 
         if self.trunking is not None:
-            self.trunk_rx = self.trunking.rx_ctl(frequency_set = self.change_freq, nbfm_ctrl = self.nbfm_control, fa_ctrl = self.fa_control, debug = self.verbosity, chans = config['chans'])
-            self.du_watcher = du_queue_watcher(self.rx_q, self.trunk_rx.process_qmsg)
+            clock = msg_clock() if self.batch else system_clock()    # batch mode runs on capture time
+            self.trunk_rx = self.trunking.rx_ctl(frequency_set = self.change_freq, nbfm_ctrl = self.nbfm_control, fa_ctrl = self.fa_control, debug = self.verbosity, chans = config['chans'], clock = clock)
+            self.du_watcher = msgq_watcher(self.rx_q, self.trunk_rx.process_qmsg, name="rx_q", batch_callback=getattr(self.trunk_rx, 'process_qmsgs', None))
             sys.stderr.write("Enabled trunking module: %s\n" % config['module'])
 
+            if from_dict(config, 'journal', "") != "" and hasattr(self.trunk_rx, 'set_journal'):
+                self.journal = call_journal(config['journal'], debug = self.verbosity)
+                self.trunk_rx.set_journal(self.journal)
+                sys.stderr.write("Enabled call journal: %s\n" % self.journal.path)
+
+    def configure_recording(self, config):
+        if self.trunking is None or not hasattr(self.trunk_rx, 'set_recorder'):
+            sys.stderr.write("Call recording requires a trunking module - ignoring\n")
+            return
+        self.recorder = call_recorder(config, clock = self.trunk_rx.clock, debug = self.verbosity)
+        self.trunk_rx.set_recorder(self.recorder)
+        sys.stderr.write("Enabled call recording: %s (%s)\n" % (self.recorder.path, self.recorder.format))
+
     def configure_metadata(self, config):
         meta_mod = config['module']
         if meta_mod.endswith('.py'):
@@ -710,7 +792,7 @@ class rx_block (gr.top_block):
         self.devices = []
         for cfg in config:
             self.device_id_by_name[cfg['name']] = len(self.devices)
-            self.devices.append(device(cfg))
+            self.devices.append(device(cfg, batch = self.batch))
 
     def find_device(self, chan):
         if 'device' in chan and (chan['device'] != "") and (chan['device'] in self.device_id_by_name):
@@ -729,8 +811,30 @@ class rx_block (gr.top_block):
     def find_channel(self, msgq_id):
         return self.channels[msgq_id]
 
+    def configure_channelizers(self, config):
+        # a device's channelizer needs one output port per channel, so count them up front
+        chz_cfgs = {}
+        for cfg in config:
+            dev = self.find_device(cfg)
+            if dev is None or not dev.use_channelizer or dev.tunable or dev.args in ['wavsrc', 'symbols']:
+                continue
+            if from_dict(cfg, 'raw_input', "") != "":
+                continue
+            chz_cfgs.setdefault(dev.name, []).append(cfg)
+        for dev in self.devices:
+            cfgs = chz_cfgs.get(dev.name, [])
+            if len(cfgs) < 2:
+                continue
+            if_rate = max([int(cfg['if_rate']) for cfg in cfgs])
+            if not channelizer_ccf.usable(dev.sample_rate, if_rate):
+                sys.stderr.write("%s device %s: sample rate %d and if_rate %d unsuitable for channelizer, ignoring\n" % (log_ts.get(), dev.name, dev.sample_rate, if_rate))
+                continue
+            dev.channelizer = channelizer_ccf(dev.sample_rate, if_rate, len(cfgs), dev.usable_bw)
+            self.connect(dev.src, dev.channelizer)
+
     def configure_channels(self, config):
         self.channels = []
+        self.configure_channelizers(config)
         for cfg in config:
             dev = self.find_device(cfg)
             if (dev is None) and 'frequency' in cfg:
@@ -764,18 +868,31 @@ class rx_block (gr.top_block):
                 chan.raw_file = blocks.file_source(gr.sizeof_char, str(cfg['raw_input']), False)
                 if ("raw_seek" in cfg) and (cfg['raw_seek'] != 0):
                     chan.raw_file.seek(int(cfg['raw_seek']) * 4800, 0)
-                chan.throttle = blocks.throttle(gr.sizeof_char, chan.symbol_rate)
-                chan.throttle.set_max_noutput_items(int(chan.symbol_rate/50));
-                self.connect(chan.raw_file, chan.throttle)
-                self.connect(chan.throttle, chan.decoder)
+                if self.batch:
+                    self.connect(chan.raw_file, chan.decoder)
+                else:
+                    chan.throttle = blocks.throttle(gr.sizeof_char, chan.symbol_rate)
+                    chan.throttle.set_max_noutput_items(int(chan.symbol_rate/50));
+                    self.connect(chan.raw_file, chan.throttle)
+                    self.connect(chan.throttle, chan.decoder)
                 self.set_interactive(False) # this is non-interactive 'replay' session 
             else:
-                self.connect(dev.src, chan.demod, chan.decoder)
+                if chan.chz_port is not None:
+                    self.connect((dev.channelizer, chan.chz_port), chan.demod, chan.decoder)
+                else:
+                    self.connect(dev.src, chan.demod, chan.decoder)
                 if ("raw_output" in cfg) and (cfg['raw_output'] != ""):
                     sys.stderr.write("%s Saving raw symbols to file: %s\n" % (log_ts.get(), cfg['raw_output']))
                     chan.raw_sink = blocks.file_sink(gr.sizeof_char, str(cfg['raw_output']))
                     self.connect(chan.demod, chan.raw_sink)
 
+    def configure_batch(self):
+        # Timestamps come from the capture rather than the system clock, so that
+        # trunking expiry and hold decisions are unaffected by the decoding speed
+        start_time = time.time()
+        for chan in self.channels:
+            chan.set_sym_clock(chan.device.start_time if chan.device.start_time > 0 else start_time)
+
     def scan_channels(self):
         for chan in self.channels:
             sys.stderr.write('scan %s: error %d\n' % (chan.config['frequency'], chan.demod.get_freq_error()))
@@ -841,8 +958,12 @@ class rx_block (gr.top_block):
             self.ui_calllog_update()
             if self.trunking is None or self.trunk_rx is None:
                 return False
-            js = self.trunk_rx.to_json()        # extract data from trunking module
-            msg = gr.message().make_from_string(js, -4, 0, 0)
+            delta = int(msg.arg1()) == 1 and hasattr(self.trunk_rx, 'to_json_delta')
+            if delta:
+                js = self.trunk_rx.to_json_delta()  # incremental update requested (http event stream)
+            else:
+                js = self.trunk_rx.to_json()        # extract data from trunking module
+            msg = gr.message().make_from_string(js, -4, 1 if delta else 0, 0)  # arg1=1 marks a delta
             if not self.ui_in_q.full_p():
                 self.ui_in_q.insert_tail(msg)   # send info back to UI as long as queue not full
             self.ui_plot_update()
@@ -853,6 +974,11 @@ class rx_block (gr.top_block):
             plot_type = int(msg.arg1())
             msgq_id = int(msg.arg2())
             self.find_channel(msgq_id).toggle_plot(plot_type)
+        elif s == 'plot_width':                 # displayed plot width reported by the http UI
+            self.http_plot_width = int(msg.arg1())
+            for chan in self.channels:
+                for plot in chan.sinks:
+                    chan.set_plot_destination(plot)
         elif s == 'adj_tune':
             freq = msg.arg1()
             msgq_id = int(msg.arg2())
@@ -936,16 +1062,21 @@ class rx_block (gr.top_block):
             return
 
         filenames = []
+        plots = []
         for chan in self.channels:
             for sink in chan.sinks:
+                plots.append((chan.msgq_id, sink))
                 if chan.sinks[sink][0].gnuplot.filename is not None:
                     filenames.append(chan.sinks[sink][0].gnuplot.filename)
-        d = {'json_type': 'rx_update', 'files': filenames}
+        d = {'json_type': 'rx_update', 'files': filenames, 'plots': plots}
         msg = gr.message().make_from_string(json.dumps(d), -4, 0, 0)
         if not self.ui_in_q.full_p():
             self.ui_in_q.insert_tail(msg)
 
     def kill(self):
+        if self.verbosity >= 5:
+            dump_watcher_stats()
+
         for chan in self.channels:
             chan.kill()
 
@@ -960,40 +1091,17 @@ class rx_block (gr.top_block):
         if self.terminal is not None:
             self.terminal.end_terminal()
 
+        if self.journal is not None:
+            self.journal.stop()
+
+        if self.recorder is not None:
+            self.recorder.stop()
+
     def stop(self):
         sys.stderr.write("%s rx_block::stop() flowgraph stop called\n" % log_ts.get())
         self.kill()
         gr.top_block.stop(self)
 
-# data unit receive queue
-#
-class du_queue_watcher(threading.Thread):
-
-    def __init__(self, msgq,  callback, **kwds):
-        threading.Thread.__init__ (self, **kwds)
-        self.daemon = True
-        self.msgq = msgq
-        self.callback = callback
-        self.keep_running = True
-        self.start()
-
-    def run(self):
-        try:
-            while(self.keep_running):
-                if not self.msgq.empty_p(): # check queue before trying to read a message to avoid deadlock at startup
-                    msg = self.msgq.delete_head()
-                    if msg is not None:
-                        self.callback(msg)
-                    else:
-                        self.keep_running = False
-                else: # empty queue
-                    time.sleep(0.01)
-        except KeyboardInterrupt:
-            self.keep_running = False
-
-    def kill(self):
-        self.keep_running = False
-
 class rx_main(object):
     def __init__(self):
         def byteify(input):    # thx so
@@ -1017,6 +1125,7 @@ class rx_main(object):
         parser.add_option("-v", "--verbosity", type="int", default=0, help="message debug level")
         parser.add_option("-p", "--pause", action="store_true", default=False, help="block on startup")
         parser.add_option("-d", "--dev-mode", action="store_true", default=False, help="enable developer mode")
+        parser.add_option("-b", "--batch", action="store_true", default=False, help="decode file sources as fast as possible, then exit")
         (options, args) = parser.parse_args()
 
         #if options.dev_mode:
@@ -1043,8 +1152,13 @@ class rx_main(object):
                 config = json.loads(open(options.config_file).read())
             else:
                 config = json.loads(open(options.config_file, encoding="utf-8-sig").read())
-        self.tb = rx_block(options.verbosity, config = byteify(config))
-        self.q_watcher = du_queue_watcher(self.tb.ui_out_q, self.process_qmsg)
+        if options.batch:
+            for dev in config['devices']:
+                if dev['args'] not in ['iqsrc', 'wavsrc', 'symbols']:
+                    sys.stderr.write("Batch mode requires file sources; device '%s' is '%s'\n" % (dev['name'], dev['args']))
+                    exit(1)
+        self.tb = rx_block(options.verbosity, config = byteify(config), batch = options.batch)
+        self.q_watcher = msgq_watcher(self.tb.ui_out_q, self.process_qmsg, name="ui_out_q")
         sys.stderr.write('python version detected: %s\n' % sys.version)
 
     def process_qmsg(self, msg):
@@ -1063,6 +1177,7 @@ class rx_main(object):
                        self.tb.ui_out_q.insert_tail(msg)
             else:
                 self.tb.wait() # curiously wait() matures when a flowgraph gets locked
+                self.tb.kill() # flush the call journal and recordings
             sys.stderr.write('Flowgraph complete. Exiting\n')
         except (KeyboardInterrupt):
             self.tb.stop()
@@ -38,7 +38,7 @@ def from_dict(d, key, def_val):
         return def_val
 
 class op25_iqsrc_c(gr.hier_block2):
-    def __init__(self, name, config):
+    def __init__(self, name, config, throttle = True):
 
         gr.hier_block2.__init__(self, "op25_iqsrc_c",
                                 gr.io_signature(0, 0, 0),                    # Input signature
@@ -67,15 +67,18 @@ class op25_iqsrc_c(gr.hier_block2):
             self.freq = self.iqsrc.get_dsd_freq()
             self.ts = self.iqsrc.get_dsd_ts()
 
-        # Create the throttle to set playback rate
-        self.throttle = blocks.throttle(gr.sizeof_gr_complex, self.rate)
-
-        # Connect src and throttle
-        self.connect(self.iqsrc, self.throttle, self)            
+        # Create the throttle to set playback rate (omitted when decoding as fast as possible)
+        if throttle:
+            self.throttle = blocks.throttle(gr.sizeof_gr_complex, self.rate)
+            self.connect(self.iqsrc, self.throttle, self)            
+        else:
+            self.throttle = None
+            self.connect(self.iqsrc, self)
 
     def set_sample_rate(self, iq_rate):
         self.rate = iq_rate
-        self.throttle.set_sample_rate(self.rate)
+        if self.throttle is not None:
+            self.throttle.set_sample_rate(self.rate)
 
     def get_sample_rate(self):
         return self.rate
@@ -38,7 +38,7 @@ def from_dict(d, key, def_val):
         return def_val
 
 class op25_wavsrc_f(gr.hier_block2):
-    def __init__(self, name, config):
+    def __init__(self, name, config, throttle = True):
 
         gr.hier_block2.__init__(self, "op25_wavsrc_f",
                                 gr.io_signature(0, 0, 0),               # Input signature
@@ -61,15 +61,18 @@ class op25_wavsrc_f(gr.hier_block2):
 
         sys.stderr.write("%s [%s] Enabling WAV file source: rate=%d, bit=%d, channels=%d\n" % (log_ts.get(), name, self.rate, self.size, self.chans))
 
-        # Create the throttle to set playback rate
-        self.throttle = blocks.throttle(gr.sizeof_float, self.rate)
+        # Create the throttle to set playback rate (omitted when decoding as fast as possible)
+        self.throttle = blocks.throttle(gr.sizeof_float, self.rate) if throttle else None
 
         # Gain
         self.gain = blocks.multiply_const_ff(self.wav_gain)
         self.agc = op25_repeater.rmsagc_ff(alpha=0.001, k=1.0)
 
         # Connect src and throttle
-        self.connect(self.wavsrc, self.throttle, self.agc, self.gain, self)            
+        if self.throttle is not None:
+            self.connect(self.wavsrc, self.throttle, self.agc, self.gain, self)            
+        else:
+            self.connect(self.wavsrc, self.agc, self.gain, self)
 
     def get_sample_rate(self):
         return self.rate;
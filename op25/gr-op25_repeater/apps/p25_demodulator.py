@@ -38,6 +38,7 @@ import gnuradio.op25 as op25
 import gnuradio.op25_repeater as op25_repeater
 import rms_agc
 from math import pi, isnan, isinf
+import tap_cache
 
 sys.path.append('tx')
 import op25_c4fm_mod
@@ -63,6 +64,12 @@ TWO_PI = 2.0 * pi
 #                           demodulator
 # /////////////////////////////////////////////////////////////////////////////
 
+def bpf_taps(input_rate, decim, freq):
+    # first stage band pass centered on -freq; shared by every channel with the same input_rate and decim
+    if1 = input_rate / decim
+    return tap_cache.shared_taps.get((input_rate, decim, freq),
+               lambda: filter.firdes.complex_band_pass(1.0, input_rate, -freq - if1/2, -freq + if1/2, if1/2, window.WIN_HAMMING))
+
 def get_decim(speed):
     s = int(speed)
     if_freqs = [24000, 25000, 32000]
@@ -346,7 +353,6 @@ class p25_demod_cb(p25_demod_base):
         self.complex_sink = {}
         self.if1 = 0
         self.if2 = 0
-        self.t_cache = {}
         if filter_type == 'rrc':
             self.set_baseband_gain(0.61)
         elif filter_type == 'widepulse':
@@ -359,8 +365,7 @@ class p25_demod_cb(p25_demod_base):
             self.if1 = input_rate / self.decim
             self.if2 = self.if1 / self.decim2
             sys.stderr.write( 'Using two-stage decimator for speed=%d, decim=%d/%d if1=%d if2=%d\n' % (input_rate, self.decim, self.decim2, self.if1, self.if2))
-            bpf_coeffs = filter.firdes.complex_band_pass(1.0, input_rate, -self.if1/2, self.if1/2, self.if1/2, window.WIN_HAMMING)
-            self.t_cache[0] = bpf_coeffs
+            bpf_coeffs = bpf_taps(input_rate, self.decim, 0)
             fa = 6250
             fb = self.if2 / 2
             if filter_type == 'nxdn' and self.symbol_rate == 2400:	# nxdn48 6.25 KHz
@@ -466,9 +471,7 @@ class p25_demod_cb(p25_demod_base):
             return True
         self.lo_freq = freq
         if self.if1:
-            if freq not in list(self.t_cache.keys()):
-                self.t_cache[freq] = filter.firdes.complex_band_pass(1.0, self.input_rate, -freq - self.if1/2, -freq + self.if1/2, self.if1/2, window.WIN_HAMMING)
-            self.bpf.set_taps(self.t_cache[freq])
+            self.bpf.set_taps(bpf_taps(self.input_rate, self.decim, freq))
             bfo_f = self.decim * -freq / float(self.input_rate)
             bfo_f -= int(bfo_f)
             if bfo_f < -0.5:
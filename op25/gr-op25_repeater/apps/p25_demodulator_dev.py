@@ -39,6 +39,7 @@ import gnuradio.op25 as op25
 import gnuradio.op25_repeater as op25_repeater
 import rms_agc
 from math import pi, isnan, isinf
+import tap_cache
 from log_ts import log_ts
 
 sys.path.append('tx')
@@ -380,7 +381,8 @@ class p25_demod_cb(p25_demod_base):
         resampled_rate = float(input_rate) / float(decimation)
         fdma_cutoff = fdma_cutoff if ((resampled_rate//2) >= fdma_cutoff) else (resampled_rate//2)          # sanity-check cutoffs to ensure they are less than the nyquist frequency
         tdma_cutoff = tdma_cutoff if ((resampled_rate//2) >= tdma_cutoff) else (resampled_rate//2)
-        freq_xlat_coeffs = filter.firdes.low_pass(1.0, input_rate, resampled_rate/2, resampled_rate/2)      # taps can be very long for wideband SDR hardware so maximize transition width
+        freq_xlat_coeffs = tap_cache.shared_taps.get((input_rate, decimation, None),                        # taps can be very long for wideband SDR hardware so maximize transition width;
+                               lambda: filter.firdes.low_pass(1.0, input_rate, resampled_rate/2, resampled_rate/2)) # designed once and shared by all channels on the device
         self.if_coeffs_fdma = filter.firdes.low_pass(1.0, resampled_rate, fdma_cutoff, trans_width, window.WIN_HAMMING)
         self.if_coeffs_tdma = filter.firdes.low_pass(1.0, resampled_rate, tdma_cutoff, trans_width, window.WIN_HAMMING)
         self.freq_xlat = filter.freq_xlating_fir_filter_ccf(decimation, freq_xlat_coeffs, 0, input_rate)    # freq_xlat extracts the approximate channel, sampled at or near the if_rate
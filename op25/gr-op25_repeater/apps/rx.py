@@ -96,6 +96,7 @@ from terminal import op25_terminal
 from sockaudio  import audio_thread
 from log_ts import log_ts
 from helper_funcs import *
+from msgq_watcher import msgq_watcher, dump_watcher_stats
 
 #speeds = [300, 600, 900, 1200, 1440, 1800, 1920, 2400, 2880, 3200, 3600, 3840, 4000, 4800, 6000, 6400, 7200, 8000, 9600, 14400, 19200]
 speeds = [4800, 6000]
@@ -295,7 +296,6 @@ class p25_rx_block (gr.top_block):
             udp_port = self.options.wireshark_port
 
         self.tdma_state = False
-        self.xor_cache = {}
 
         self.fft_state  = False
         self.c4fm_state = False
@@ -377,7 +377,7 @@ class p25_rx_block (gr.top_block):
 
         self.trunk_rx = trunking.rx_ctl(frequency_set = self.change_freq, fa_ctrl = self.control, debug = self.options.verbosity, conf_file = self.options.trunk_conf_file, logfile_workers=logfile_workers, meta_update = self.meta_update, crypt_behavior = self.options.crypt_behavior)
 
-        self.du_watcher = du_queue_watcher(self.rx_q, self.trunk_rx.process_qmsg)
+        self.du_watcher = msgq_watcher(self.rx_q, self.trunk_rx.process_qmsg, name="rx_q")
 
         # Dowload encryption keys if provided
         if self.options.crypt_keys is not None:
@@ -433,10 +433,7 @@ class p25_rx_block (gr.top_block):
             return    # already in desired state
         self.tdma_state = set_tdma
         if set_tdma:
-            hash = '%x%x%x' % (params['nac'], params['sysid'], params['wacn'])
-            if hash not in self.xor_cache:
-                self.xor_cache[hash] = lfsr.p25p2_lfsr(params['nac'], params['sysid'], params['wacn']).xor_chars
-            self.decoder.control({'tuner': 0, 'cmd': 'set_xormask', 'xormask': self.xor_cache[hash]})
+            self.decoder.control({'tuner': 0, 'cmd': 'set_xormask', 'xormask': lfsr.get_xor_chars(params['nac'], params['sysid'], params['wacn'])})
             rate = 6000
         else:
             rate = self.symbol_rate
@@ -987,35 +984,12 @@ class p25_rx_block (gr.top_block):
 
 ############################################################################
 
-# data unit receive queue
-#
-class du_queue_watcher(threading.Thread):
-
-    def __init__(self, msgq,  callback, **kwds):
-        threading.Thread.__init__ (self, **kwds)
-        self.daemon = True
-        self.msgq = msgq
-        self.callback = callback
-        self.keep_running = True
-        self.start()
-
-    def run(self):
-        while(self.keep_running):
-            if not self.msgq.empty_p(): # check queue before trying to read a message to avoid deadlock at startup
-                msg = self.msgq.delete_head()
-                if msg is not None:
-                    self.callback(msg)
-                else:
-                    self.keep_running = False
-            else: # empty queue
-                time.sleep(0.01)            
-
 class rx_main(object):
     def __init__(self):
         self.keep_running = True
         self.cli_options()
         self.tb = p25_rx_block(self.options)
-        self.q_watcher = du_queue_watcher(self.tb.output_q, self.process_qmsg)
+        self.q_watcher = msgq_watcher(self.tb.output_q, self.process_qmsg, name="output_q")
         sys.stderr.write('python version detected: %s\n' % sys.version)
 
     def process_qmsg(self, msg):
@@ -1038,6 +1012,8 @@ class rx_main(object):
         except:
             sys.stderr.write('main: exception occurred\n')
             sys.stderr.write('main: exception:\n%s\n' % traceback.format_exc())
+        if self.options.verbosity >= 5:
+            dump_watcher_stats()
         if self.tb.terminal:
             self.tb.terminal.end_terminal()
         if self.tb.meta_server:
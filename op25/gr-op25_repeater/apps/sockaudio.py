@@ -37,6 +37,11 @@ PCM_RATE = 8000             # audio sample rate (Hz)
 PCM_BUFFER_SIZE = 4000      # size of ALSA buffer in frames
 
 MAX_SUPERFRAME_SIZE = 320   # maximum size of incoming UDP audio buffer
+MAX_RECV_BATCH = 16         # maximum number of UDP buffers drained from each socket per wakeup
+FLUSH_WINDOW = 0.05         # seconds audio is held waiting for more frames before it is written
+FLUSH_FRAMES = 4            # audio frames held before they are written without waiting for the window
+GAIN_SHIFT = 12             # fixed point scaling of audio gain
+MAX_GAIN_Q = 0xffff         # largest fixed point gain that cannot overflow int32 when applied to S16 samples
 
 # Debug
 LOG_AUDIO_XRUNS = True      # log audio underruns to stderr
@@ -108,6 +113,12 @@ SND_PCM_ACCESS_LAST = SND_PCM_ACCESS_RW_NONINTERLEAVED
 PA_STREAM_PLAYBACK = 1
 PA_SAMPLE_S16LE = 3
 
+# Return a ctypes pointer and length for pcm data supplied either as bytes or as a numpy array
+def pcm_pointer(pcm_data):
+    if isinstance(pcm_data, np.ndarray):
+        return pcm_data.ctypes.data_as(c_void_p), pcm_data.nbytes
+    return cast(c_char_p(pcm_data), c_void_p), len(pcm_data)
+
 # Python CTypes wrapper to Alsa libasound2
 class alsasound(object):
     def __init__(self):
@@ -196,26 +207,25 @@ class alsasound(object):
         return ret
 
     def write(self, pcm_data):
-        datalen = len(pcm_data)
+        c_data, datalen = pcm_pointer(pcm_data)
         n_frames = c_ulong(datalen // self.framesize)
-        c_data = c_char_p(pcm_data)
         ret = 0
 
         if (self.c_pcm.value == None):
             sys.stderr.write("PCM device is closed\n")
             return -1
 
-        ret = self.libasound.snd_pcm_writei(self.c_pcm, cast(c_data, POINTER(c_void_p)), n_frames)
+        ret = self.libasound.snd_pcm_writei(self.c_pcm, c_data, n_frames)
         if (ret < 0):
             if (ret == -errno.EPIPE): # underrun
                 if (LOG_AUDIO_XRUNS):
                     sys.stderr.write("%s PCM underrun\n" % log_ts.get())
                 ret = self.libasound.snd_pcm_recover(self.c_pcm, ret, 1)
                 if (ret >= 0):
-                    ret = self.libasound.snd_pcm_writei(self.c_pcm, cast(c_data, POINTER(c_void_p)), n_frames)
+                    ret = self.libasound.snd_pcm_writei(self.c_pcm, c_data, n_frames)
                 else:
                     ret = self.libasound.snd_pcm_prepare(self.c_pcm)
-                    ret = self.libasound.snd_pcm_writei(self.c_pcm, cast(c_data, POINTER(c_void_p)), n_frames)
+                    ret = self.libasound.snd_pcm_writei(self.c_pcm, c_data, n_frames)
             elif (ret == -errno.ESTRPIPE): # suspended
                 while True:
                     ret = self.libasound.snd_pcm_resume(self.c_pcm)
@@ -312,7 +322,8 @@ class pa_sound(object):
         return 0
 
     def write(self, pcm_data):
-        self.libpa.pa_simple_write(c_void_p(self.out), pcm_data, len(pcm_data), byref(self.error))
+        c_data, datalen = pcm_pointer(pcm_data)
+        self.libpa.pa_simple_write(c_void_p(self.out), c_data, datalen, byref(self.error))
         return self.error
 
     def drain(self):
@@ -411,98 +422,137 @@ class socket_audio(object):
         else:
             self.keep_running = False
 
+        self.setup_buffers()
         self.setup_sockets(udp_host, udp_port)
 
     def run(self):
         rc = 0
         while self.keep_running and (rc >= 0):
-            readable, writable, exceptional = select.select( [self.sock_a, self.sock_b], [], [self.sock_a, self.sock_b], 5.0)
-            in_a = None
-            in_b = None
-            data_a = bytearray()
-            data_b = bytearray()
-            flag_a = -1
-            flag_b = -1
+            timeout = 5.0 if self.pcm_len == 0 else max(0.0, self.flush_at - time.time())
+            readable, writable, exceptional = select.select( [self.sock_a, self.sock_b], [], [self.sock_a, self.sock_b], timeout)
 
             # Check for select() polling timeout and pcm self-check
             if (not readable) and (not writable) and (not exceptional):
+                if self.pcm_len > 0:    # flush window expired with no further audio
+                    rc = self.flush_pcm()
+                    continue
                 rc = self.pcm.check()
                 if isinstance(rc, ctypes.c_int):
                     rc = rc.value
                 continue
 
-            # Data received on the udp port is 320 bytes for an audio frame or 2 bytes for a flag
-            if self.sock_a in readable:
-                in_a = self.sock_a.recvfrom(MAX_SUPERFRAME_SIZE)
-
-            if self.sock_b in readable:
-                in_b = self.sock_b.recvfrom(MAX_SUPERFRAME_SIZE)
-
-            if in_a is not None:
-                len_a = len(in_a[0])
-                if len_a == 2:
-                    flag_a = np.frombuffer(in_a[0], dtype=np.int16)[0]
-                elif len_a > 0:
-                    data_a = in_a[0]
-
-            if in_b is not None:
-                len_b = len(in_b[0])
-                if len_b == 2:
-                    flag_b = np.frombuffer(in_b[0], dtype=np.int16)[0]
-                elif len_b > 0:
-                    data_b = in_b[0]
-
-            if (flag_a == 0) or (flag_b == 0):
-                rc = self.pcm.drain()
-                if isinstance(rc, ctypes.c_int):
-                    rc = rc.value
-                continue
-
-            if (((flag_a == 1) and (flag_b == 1)) or
-                ((flag_a == 1) and (in_b is None)) or 
-                ((flag_b == 1) and (in_a is None))):
-                rc = self.pcm.drop()
-                if isinstance(rc, ctypes.c_int):
-                    rc = rc.value
-                continue
+            # Drain everything already queued on each readable socket
+            n_a = self.recv_frames(0, self.sock_a) if self.sock_a in readable else 0
+            n_b = self.recv_frames(1, self.sock_b) if self.sock_b in readable else 0
+
+            # Data received on the udp port is 320 bytes for an audio frame or 2 bytes for a flag.
+            # Frames from the two sockets are paired up in arrival order and audio is accumulated
+            # in the pcm buffer, which is flushed with a single write before any drain/drop action.
+            # Otherwise audio is held across wakeups until FLUSH_FRAMES frames are waiting or
+            # FLUSH_WINDOW has passed since the oldest of them arrived; the alsa start threshold
+            # (3/4 of PCM_BUFFER_SIZE) leaves ample margin for the hold.
+            for idx in range(max(n_a, n_b)):
+                if rc < 0:
+                    break
+                in_a = idx < n_a
+                in_b = idx < n_b
+                len_a = self.rx_lens[0][idx] if in_a else 0
+                len_b = self.rx_lens[1][idx] if in_b else 0
+                flag_a = self.rx_samples[0][idx][0] if len_a == 2 else -1
+                flag_b = self.rx_samples[1][idx][0] if len_b == 2 else -1
+
+                if (flag_a == 0) or (flag_b == 0):
+                    rc = self.flush_pcm()
+                    if rc >= 0:
+                        rc = self.pcm.drain()
+                        if isinstance(rc, ctypes.c_int):
+                            rc = rc.value
+                    continue
+
+                if (((flag_a == 1) and (flag_b == 1)) or
+                    ((flag_a == 1) and (not in_b)) or
+                    ((flag_b == 1) and (not in_a))):
+                    rc = self.flush_pcm()
+                    if rc >= 0:
+                        rc = self.pcm.drop()
+                        if isinstance(rc, ctypes.c_int):
+                            rc = rc.value
+                    continue
+
+                n_samp_a = (len_a // 2) if len_a != 2 else 0
+                n_samp_b = (len_b // 2) if len_b != 2 else 0
+                if not self.two_channels:
+                    self.append_pcm(self.rx_samples[0][idx][:n_samp_a], self.rx_samples[0][idx][:n_samp_a])
+                else:
+                    self.append_pcm(self.rx_samples[0][idx][:n_samp_a], self.rx_samples[1][idx][:n_samp_b])
 
-            if not self.two_channels:
-                data_a = self.scale(data_a)
-                rc = self.pcm.write(self.interleave(data_a, data_a))
-                if isinstance(rc, ctypes.c_int):
-                    rc = rc.value
-            else:
-                data_a = self.scale(data_a)
-                data_b = self.scale(data_b)
-                rc = self.pcm.write(self.interleave(data_a, data_b))
-                if isinstance(rc, ctypes.c_int):
-                    rc = rc.value
+            if rc >= 0 and (self.pcm_len >= self.flush_len or time.time() >= self.flush_at):
+                rc = self.flush_pcm()
 
+        if rc >= 0:
+            self.flush_pcm()
         self.close_sockets()
         self.close_pcm()
         return
 
-    def scale(self, data):  # crude amplitude scaler (volume) for S16_LE samples
-        arr = np.array(np.frombuffer(data, dtype=np.int16), dtype=np.float32)
-        result = np.zeros(len(arr), dtype=np.int16)
-        if sys.version[0] == '2':
-            arr = np.clip(arr*self.audio_gain, -32767, 32766, out=result)
-        else:
-            arr = np.clip(arr*self.audio_gain, -32767, 32766, out=result, casting='unsafe')
-        return result.tobytes('C')
-
-    def interleave(self, data_a, data_b):
-        arr_a = np.frombuffer(data_a, dtype=np.int16)
-        arr_b = np.frombuffer(data_b, dtype=np.int16)
-        d_len = max(len(arr_a), len(arr_b))
-        result = np.zeros(d_len*2, dtype=np.int16)
-        if len(arr_a):
-            # copy arr_a to result[0,2,4, ...]
-            result[ range(0, len(arr_a)*2, 2) ] = arr_a
-        if len(arr_b):
-            # copy arr_b to result[1,3,5, ...]
-            result[ range(1, len(arr_b)*2, 2) ] = arr_b
-        return result.tobytes('C')
+    def setup_buffers(self):
+        # All buffers are allocated once; the per-frame path only creates numpy views into them
+        frame_samples = MAX_SUPERFRAME_SIZE // 2
+        self.rx_bufs = [bytearray(MAX_SUPERFRAME_SIZE * MAX_RECV_BATCH) for i in range(2)]
+        self.rx_slots = [[memoryview(buf)[n * MAX_SUPERFRAME_SIZE:(n + 1) * MAX_SUPERFRAME_SIZE] for n in range(MAX_RECV_BATCH)] for buf in self.rx_bufs]
+        self.rx_samples = [np.frombuffer(buf, dtype=np.int16).reshape(MAX_RECV_BATCH, frame_samples) for buf in self.rx_bufs]
+        self.rx_lens = [[0] * MAX_RECV_BATCH for i in range(2)]
+        self.gain_buf = np.zeros(frame_samples, dtype=np.int32)
+        self.pcm_buf = np.zeros((MAX_RECV_BATCH + FLUSH_FRAMES) * frame_samples * 2, dtype=np.int16)
+        self.pcm_len = 0    # number of stereo frames currently held in pcm_buf
+        self.flush_len = FLUSH_FRAMES * frame_samples
+        self.flush_at = 0.0 # time by which held audio must be written
+        self.gain_q = min(max(int(round(self.audio_gain * (1 << GAIN_SHIFT))), 0), MAX_GAIN_Q)
+
+    def recv_frames(self, sock_idx, sock):   # non-blocking drain of queued datagrams, returns count
+        n_frames = 0
+        while n_frames < MAX_RECV_BATCH:
+            try:
+                self.rx_lens[sock_idx][n_frames] = sock.recv_into(self.rx_slots[sock_idx][n_frames], MAX_SUPERFRAME_SIZE)
+            except socket.error as e:
+                if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    break
+                raise
+            n_frames += 1
+        return n_frames
+
+    def scale(self, samples, dest):  # crude amplitude scaler (volume) for S16_LE samples, written in place to dest
+        n_samples = len(samples)
+        if n_samples == 0:
+            return
+        tmp = self.gain_buf[:n_samples]
+        np.copyto(tmp, samples)
+        np.multiply(tmp, self.gain_q, out=tmp)
+        np.right_shift(tmp, GAIN_SHIFT, out=tmp)
+        np.clip(tmp, -32767, 32766, out=tmp)
+        np.copyto(dest, tmp, casting='unsafe')
+
+    def append_pcm(self, samples_a, samples_b):  # scale and interleave one frame from each channel into pcm_buf
+        d_len = max(len(samples_a), len(samples_b))
+        if d_len == 0:
+            return
+        if self.pcm_len == 0:
+            self.flush_at = time.time() + FLUSH_WINDOW
+        frames = self.pcm_buf[self.pcm_len * 2:(self.pcm_len + d_len) * 2]
+        if len(samples_a) < d_len or len(samples_b) < d_len:
+            frames.fill(0)
+        self.scale(samples_a, frames[0:len(samples_a) * 2:2])
+        self.scale(samples_b, frames[1:len(samples_b) * 2:2])
+        self.pcm_len += d_len
+
+    def flush_pcm(self):    # write any accumulated audio to the pcm device with a single call
+        if self.pcm_len == 0:
+            return 0
+        rc = self.pcm.write(self.pcm_buf[:self.pcm_len * 2])
+        self.pcm_len = 0
+        if isinstance(rc, ctypes.c_int):
+            rc = rc.value
+        return rc
 
     def stop(self):
         self.keep_running = False
@@ -0,0 +1,120 @@
+# Talkgroup and radio id tag database
+#
+# This file is part of OP25
+#
+# OP25 is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+#
+# OP25 is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with OP25; see the file COPYING. If not, write to the Free
+# Software Foundation, Inc., 51 Franklin Street, Boston, MA
+# 02110-1301, USA.
+#
+# Compiles tab separated tags files (id, tag[, prio]) into an SQLite index.
+#
+# The source file is only parsed when its size or modification time differs
+# from what was recorded at the last sync, and then only rows which were added,
+# changed or removed are written.  Trunking modules look tags up on demand when
+# an id is first seen instead of loading every row into memory at startup.
+#
+# Each tags file gets its own table, named after the table type and a hash of
+# the file's path, so systems sharing one database only share rows when they
+# use the same tags file.
+
+import sys
+import os
+import csv
+import sqlite3
+import hashlib
+import threading
+from helper_funcs import utf_ascii, decomment
+from log_ts import log_ts
+
+def read_tags_rows(tags_file, default_prio=None):
+    # returns {id: (tag, prio)} parsed from a tags file
+    rows = {}
+    with open(tags_file, 'r') as csvfile:
+        sreader = csv.reader(decomment(csvfile), delimiter='\t', quotechar='"', quoting=csv.QUOTE_ALL)
+        for row in sreader:
+            if len(row) < 2:
+                continue
+            try:
+                if ord(row[0][0]) == 0xfeff:
+                    row[0] = row[0][1:] # remove UTF8_BOM (Python2 version)
+                if ord(row[0][0]) == 0xef and ord(row[0][1]) == 0xbb and ord(row[0][2]) == 0xbf:
+                    row[0] = row[0][3:] # remove UTF8_BOM (Python3 version)
+                key = int(row[0])
+                tag = utf_ascii(row[1])
+            except (IndexError, ValueError) as ex:
+                sys.stderr.write("read_tags_rows: exception %s\n" % ex)
+                continue
+            prio = default_prio
+            if default_prio is not None and len(row) >= 3:
+                try:
+                    prio = int(row[2])
+                except ValueError as ex:
+                    pass
+            rows[key] = (tag, prio)
+    return rows
+
+class tag_db(object):
+    def __init__(self, db_file, table, tags_file, default_prio=None, name=""):
+        self.db_file = db_file
+        path = os.path.abspath(tags_file)
+        self.table = '%s_%s' % (table, hashlib.sha1(path.encode('utf-8')).hexdigest()[:16])
+        self.tags_file = tags_file
+        self.default_prio = default_prio
+        self.name = name
+        self.mutex = threading.Lock()
+        self.conn = sqlite3.connect(db_file, check_same_thread=False)
+        with self.conn:
+            self.conn.execute('CREATE TABLE IF NOT EXISTS %s (id INTEGER PRIMARY KEY, tag TEXT, prio INTEGER)' % self.table)
+            self.conn.execute('CREATE TABLE IF NOT EXISTS sources (tbl TEXT PRIMARY KEY, path TEXT, size INTEGER, mtime REAL)')
+
+    def sync(self):
+        # bring the index up to date with the tags file; returns the set of ids which changed
+        try:
+            st = os.stat(self.tags_file)
+        except OSError as ex:
+            sys.stderr.write("%s [%s] tag_db: %s: %s\n" % (log_ts.get(), self.name, ex.strerror, self.tags_file))
+            return set()
+        source = (os.path.abspath(self.tags_file), st.st_size, st.st_mtime)
+        with self.mutex:
+            cur = self.conn.execute('SELECT path, size, mtime FROM sources WHERE tbl=?', (self.table,)).fetchone()
+            if cur is not None and tuple(cur) == source:
+                return set()
+            try:
+                rows = read_tags_rows(self.tags_file, self.default_prio)
+            except IOError as ex:
+                sys.stderr.write("%s [%s] tag_db: %s: %s\n" % (log_ts.get(), self.name, ex.strerror, self.tags_file))
+                return set()
+            old = {}
+            for (key, tag, prio) in self.conn.execute('SELECT id, tag, prio FROM %s' % self.table):
+                old[key] = (tag, prio)
+            changed = [(key, rows[key][0], rows[key][1]) for key in rows if old.get(key) != rows[key]]
+            removed = [(key,) for key in old if key not in rows]
+            with self.conn:
+                self.conn.executemany('INSERT OR REPLACE INTO %s (id, tag, prio) VALUES (?, ?, ?)' % self.table, changed)
+                self.conn.executemany('DELETE FROM %s WHERE id=?' % self.table, removed)
+                self.conn.execute('INSERT OR REPLACE INTO sources (tbl, path, size, mtime) VALUES (?, ?, ?, ?)', (self.table,) + source)
+        sys.stderr.write("%s [%s] tag_db: %s: %d rows, %d changed, %d removed\n" % (log_ts.get(), self.name, self.tags_file, len(rows), len(changed), len(removed)))
+        return set([c[0] for c in changed] + [r[0] for r in removed])
+
+    def get(self, key):
+        # returns (tag, prio) or None if the id has no entry
+        with self.mutex:
+            row = self.conn.execute('SELECT tag, prio FROM %s WHERE id=?' % self.table, (key,)).fetchone()
+        if row is None:
+            return None
+        return (row[0], row[1])
+
+    def close(self):
+        with self.mutex:
+            self.conn.close()
@@ -0,0 +1,76 @@
+
+# This file is part of OP25
+#
+# OP25 is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+#
+# OP25 is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with OP25; see the file COPYING. If not, write to the Free
+# Software Foundation, Inc., 51 Franklin Street, Boston, MA
+# 02110-1301, USA.
+
+# Process-wide cache of filter taps designed at the device sample rate.
+#
+# Designing a filter at several Msps takes long enough to delay a voice grant
+# retune, and every channel on the same device needs the same taps for the
+# same offset.  Taps are kept once per process, keyed by the caller (normally
+# (input_rate, decim, offset)), and the least recently used entries are
+# dropped once the cache is full.
+
+import threading
+from collections import OrderedDict
+
+TAP_CACHE_SIZE = 256    # maximum number of tap sets retained
+
+class tap_cache(object):
+    def __init__(self, max_entries = TAP_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def full(self):
+        return len(self.entries) >= self.max_entries
+
+    def get(self, key, design):
+        # return the taps for key, calling design() to create them on a miss
+        with self.lock:
+            taps = self.entries.get(key)
+            if taps is not None:
+                self.hits += 1
+                del self.entries[key]           # move to the most recently used end
+                self.entries[key] = taps
+                return taps
+            self.misses += 1
+        taps = design()                         # designed without the lock held
+        with self.lock:
+            self.entries[key] = taps
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return taps
+
+    def set_max_entries(self, max_entries):
+        with self.lock:
+            self.max_entries = max_entries
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+shared_taps = tap_cache()
@@ -19,7 +19,7 @@
 # 02110-1301, USA.
 
 import numpy as np
-from bit_utils import *
+from fast_bit_utils import *
 
 def extract_duid(b):
     duid0 = b[10]   # duid 3,2
@@ -30,9 +30,11 @@ def extract_duid(b):
     va = mk_array(v, 8)
     return mk_str(va)
 
+duid_gen = np.array([row.split() for row in '1 0 0 0 1 1 0 1; 0 1 0 0 1 0 1 1; 0 0 1 0 1 1 1 0; 0 0 0 1 0 1 1 1'.split(';')], dtype=np.int64)
+
 def mk_duid_lookup():
     duid_map = {}
-    g = np.array(np.mat('1 0 0 0 1 1 0 1; 0 1 0 0 1 0 1 1; 0 0 1 0 1 1 1 0; 0 0 0 1 0 1 1 1'))
+    g = duid_gen
     for i in range(16):
         codeword = mk_str(np.dot(mk_array(i, 4), g))
         duid_map[codeword] = i
@@ -49,10 +51,39 @@ class p25p2_duid(object):
         self.duid_str[15] = "facch w/o"
 
         self.duid_map = mk_duid_lookup()
+        self.codewords = np.array(sorted([int(c, 2) for c in self.duid_map]), dtype=np.int64)
+        self.values = np.array([self.duid_map[mk_str(mk_array(c, 8))] for c in self.codewords], dtype=np.int64)
+        self.codebits = np.array([mk_array(c, 8) for c in self.codewords], dtype=np.float64) * 2 - 1
+        self.duid_table, self.duid_dist = self.mk_duid_table()
+
+    def mk_duid_table(self):
+        # minimum distance decoding of every 8 bit duid/parity word.  A word decodes to
+        # its nearest codeword if that is unique and within (dmin-1)/2 bits, else -1
+        words = np.arange(256)
+        d = np.array([[bin(w ^ c).count('1') for c in self.codewords] for w in words])
+        dmin = min([bin(a ^ b).count('1') for a in self.codewords for b in self.codewords if a != b])
+        rank = np.sort(d, axis=1)
+        best = d.argmin(axis=1)
+        ok = (rank[:, 0] < rank[:, 1]) & (rank[:, 0] <= (dmin - 1) // 2)
+        return np.where(ok, self.values[best], -1), rank[:, 0]
 
     def decode_duid(self, burst):
-        try:
-            b = self.duid_str[self.duid_map[extract_duid(burst)]]
-        except: # FIXME: find closest matching codeword
-            b = 'unknown' + extract_duid(burst)
-        return b
+        v = self.duid_table[int(extract_duid(burst), 2)]
+        if v in self.duid_str:
+            return self.duid_str[v]
+        return 'unknown' + extract_duid(burst)
+
+    def decode_duid_array(self, bursts):
+        # bursts is an (n, 180) array of dibits; returns the duid of each, -1 if unknown
+        bursts = np.asarray(bursts)
+        v = (bursts[:, 10] << 6) + (bursts[:, 47] << 4) + (bursts[:, 132] << 2) + bursts[:, 169]
+        return self.duid_table[v & 0xff]
+
+    def decode_duid_soft(self, soft):
+        # soft is an (n, 180, 2) array of per dibit soft bits (see isch.soft_bits).  The
+        # codeword with the highest correlation wins unless the two best are tied
+        soft = np.asarray(soft, dtype=np.float64)
+        s = soft[:, [10, 47, 132, 169], :].reshape(len(soft), 8)
+        metric = np.dot(s, self.codebits.T)
+        rank = np.sort(metric, axis=1)
+        return np.where(rank[:, -1] > rank[:, -2], self.values[metric.argmax(axis=1)], -1)
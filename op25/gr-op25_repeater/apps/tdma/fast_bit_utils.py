@@ -0,0 +1,84 @@
+
+# This file is part of OP25
+#
+# OP25 is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+#
+# OP25 is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with OP25; see the file COPYING. If not, write to the Free
+# Software Foundation, Inc., 51 Franklin Street, Boston, MA
+# 02110-1301, USA.
+
+# Drop-in replacement for bit_utils with the same functions and results.
+# numpy arrays are handled with array operations and bit strings are built
+# with integer/string conversions.  Lists shorter than SHORT_LIST (the vf
+# codewords, for instance) keep the original bit_utils loop, which is quicker
+# than the conversions at that size.  bits_to_dibits, check_l and fixup gain
+# nothing on the short inputs they see and are the bit_utils versions unchanged.
+# bit_utils remains the reference; test_fast_bit_utils.py checks that the two
+# agree and util/bench_bit_utils.py prints timings for both.
+
+import binascii
+import numpy as np
+from bit_utils import bits_to_dibits, check_l, fixup
+
+_rev8 = [int('{0:08b}'.format(i)[::-1], 2) for i in range(256)]
+_dibit_bits = ((0, 0), (0, 1), (1, 0), (1, 1))
+
+SHORT_LIST = 64     # below this the plain loop beats the conversions
+
+def rev_int(n,l):
+    # reverse the low l bits of n a byte at a time, then drop the excess
+    j = 0
+    for i in range((l + 7) >> 3):
+        j = (j << 8) | _rev8[(n >> (i * 8)) & 0xff]
+    return (j >> (((l + 7) & ~7) - l)) & ((1 << l) - 1)
+
+def dibits_to_bits(dibits):
+    if isinstance(dibits, np.ndarray):
+        return np.stack(((dibits >> 1) & 1, dibits & 1), axis=-1).ravel().tolist()
+    b = []
+    for d in dibits:
+        b.extend(_dibit_bits[d & 3])
+    return b
+
+def mk_array(n, l):
+    if l <= 0:
+        return np.array([])
+    v = binascii.unhexlify('%0*x' % (((l + 7) >> 3) * 2, n & ((1 << l) - 1)))
+    return np.unpackbits(np.frombuffer(v, dtype=np.uint8))[-l:].astype(np.int_)
+
+def mk_int(a):
+    if len(a) < SHORT_LIST and not isinstance(a, np.ndarray):
+        res = 0
+        for x in a:
+            res = res * 2 + (x & 1)
+        return res
+    if len(a) == 0:
+        return 0
+    return int(mk_str(a), 2)
+
+def mk_str(a):
+    if isinstance(a, np.ndarray):
+        return ((a & 1).astype(np.uint8) + 48).tobytes().decode('ascii')
+    return ''.join(['01'[x & 1] for x in a])
+
+def find_sym(pattern, symbols):
+    # same search range as bit_utils.find_sym, which stops one short of the end
+    p = np.asarray(pattern)
+    s = np.asarray(symbols)
+    n = len(s) - len(p)
+    if n <= 0:
+        return -1
+    match = np.ones(n, dtype=bool)
+    for k in range(len(p)):
+        match &= s[k : k + n] == p[k]
+    hits = np.nonzero(match)[0]
+    return int(hits[0]) if len(hits) else -1
@@ -19,7 +19,7 @@
 # 02110-1301, USA.
 
 import numpy as np
-from bit_utils import *
+from fast_bit_utils import *
 
 def mk_isch(v):
     v1 = v & 3
@@ -33,28 +33,93 @@ def mk_isch(v):
     v5 = v & 3
     return v4, v3, v2, v1
 
+isch_sync = 0x575d57f7ff
+
+isch_gen = np.array([row.split() for row in '1 0 0 0 1 0 0 0 0 0 0 1 0 1 1 0 1 1 0 0 1 1 1 0 0 0 1 1 0 1 1 0 1 1 0 1 0 1 1 1; 0 0 1 0 0 0 0 0 0 0 0 1 1 1 0 1 1 1 1 1 1 1 0 1 0 1 0 0 1 1 1 1 0 1 1 0 0 1 0 0; 0 0 0 1 0 0 0 0 0 0 0 0 1 1 1 1 0 1 0 0 1 0 1 1 0 0 0 1 0 1 1 1 0 1 0 1 1 0 0 0; 0 0 0 0 1 1 0 0 0 0 0 0 0 0 0 0 1 1 0 1 1 1 1 0 1 1 0 1 0 0 0 1 1 0 0 0 1 1 1 0; 0 0 0 0 0 0 1 0 0 0 0 0 1 0 0 0 0 0 0 0 0 1 1 1 1 1 1 1 0 1 1 1 1 1 1 1 1 1 1 1; 0 0 0 0 1 0 0 1 0 0 0 0 0 1 0 0 1 0 0 0 1 1 0 1 1 0 0 1 1 0 1 1 0 1 1 1 0 0 1 0; 0 0 0 0 0 0 0 0 1 0 0 1 1 1 0 1 1 0 1 0 0 0 1 1 1 0 1 0 0 0 0 1 0 1 1 1 0 0 0 1; 0 0 0 0 0 0 0 0 0 1 0 1 1 0 0 0 1 1 0 0 1 0 1 1 1 0 1 0 1 0 1 0 0 1 0 0 1 1 1 0; 0 0 0 0 0 0 0 0 0 0 1 1 0 1 0 0 0 0 1 1 1 1 0 1 1 0 0 0 0 1 0 1 1 0 0 1 0 1 1 1'.split(';')], dtype=np.int64)
+
+popcount8 = np.array([bin(i).count('1') for i in range(256)], dtype=np.int64)
+
+def popcount64(a):
+    # number of set bits in each element of an array of 64 bit ints
+    a = np.ascontiguousarray(a, dtype=np.uint64)
+    return popcount8[a.view(np.uint8)].reshape(a.shape + (8,)).sum(axis=-1)
+
+def soft_bits(levels):
+    # converts received symbol levels (nominally +3, +1, -1, -3 for dibits 1, 0, 2, 3)
+    # to soft bits in msb first order, positive for a 1 bit and larger when more reliable
+    y = np.asarray(levels, dtype=np.float64)
+    soft = np.empty(y.shape[:-1] + (y.shape[-1] * 2,))
+    soft[..., 0::2] = -y
+    soft[..., 1::2] = np.abs(y) - 2
+    return soft
+
+def slice_levels(levels):
+    # hard decision dibits from symbol levels
+    y = np.asarray(levels)
+    return ((y < 0).astype(np.uint8) << 1) | (np.abs(y) > 2).astype(np.uint8)
+
+def dibits_to_int(syms):
+    # packs the trailing axis of an array of dibits into ints, first dibit msb
+    syms = np.asarray(syms, dtype=np.uint64)
+    return np.dot(syms & 3, np.uint64(4) ** np.arange(syms.shape[-1] - 1, -1, -1, dtype=np.uint64))
+
 class p25p2_isch(object):
     def __init__(self):
         self.isch_map = self.mk_isch_lookup()
+        # sync is included as a codeword so that it is also recognized with bit errors
+        table = dict(self.isch_map)
+        table[isch_sync] = -2
+        self.codewords = np.array(sorted(table), dtype=np.uint64)
+        self.values = np.array([table[c] for c in sorted(table)], dtype=np.int64)
+        d = popcount64(self.codewords[:, None] ^ self.codewords[None, :])
+        self.min_distance = d[d > 0].min()
+        self.max_errors = (self.min_distance - 1) // 2
+        # soft decisions can correct beyond max_errors, but a limit is still needed
+        # so that noise is not accepted as a codeword
+        self.max_soft_errors = self.max_errors + 2
+        self.codebits = np.array([mk_array(int(c), 40) for c in self.codewords], dtype=np.float64) * 2 - 1
 
     def mk_isch_lookup(self):
         isch_map = {}
-        g = np.array(np.mat('1 0 0 0 1 0 0 0 0 0 0 1 0 1 1 0 1 1 0 0 1 1 1 0 0 0 1 1 0 1 1 0 1 1 0 1 0 1 1 1; 0 0 1 0 0 0 0 0 0 0 0 1 1 1 0 1 1 1 1 1 1 1 0 1 0 1 0 0 1 1 1 1 0 1 1 0 0 1 0 0; 0 0 0 1 0 0 0 0 0 0 0 0 1 1 1 1 0 1 0 0 1 0 1 1 0 0 0 1 0 1 1 1 0 1 0 1 1 0 0 0; 0 0 0 0 1 1 0 0 0 0 0 0 0 0 0 0 1 1 0 1 1 1 1 0 1 1 0 1 0 0 0 1 1 0 0 0 1 1 1 0; 0 0 0 0 0 0 1 0 0 0 0 0 1 0 0 0 0 0 0 0 0 1 1 1 1 1 1 1 0 1 1 1 1 1 1 1 1 1 1 1; 0 0 0 0 1 0 0 1 0 0 0 0 0 1 0 0 1 0 0 0 1 1 0 1 1 0 0 1 1 0 1 1 0 1 1 1 0 0 1 0; 0 0 0 0 0 0 0 0 1 0 0 1 1 1 0 1 1 0 1 0 0 0 1 1 1 0 1 0 0 0 0 1 0 1 1 1 0 0 0 1; 0 0 0 0 0 0 0 0 0 1 0 1 1 0 0 0 1 1 0 0 1 0 1 1 1 0 1 0 1 0 1 0 0 1 0 0 1 1 1 0; 0 0 0 0 0 0 0 0 0 0 1 1 0 1 0 0 0 0 1 1 1 1 0 1 1 0 0 0 0 1 0 1 1 0 0 1 0 1 1 1'))
+        g = isch_gen
         c0 = 0x184229d461
         for i in range(0, 2**7):
             codeword = mk_int(np.dot(mk_array(i, 9), g)) ^ c0
-            isch_map['%x' % codeword] = i
+            isch_map[codeword] = i
         return isch_map
 
     def decode_isch(self, syms):
-        sync0 = 0x575d57f7ff
-        v = mk_int(dibits_to_bits(syms))
-        vp = '%x' % v
-        isch = 'unknown'
-        if v == sync0:
-            return -2, -2, -2, -2
-        if vp in self.isch_map:
-            chn,loc,fr,cnt = mk_isch(self.isch_map[vp])
-            return chn, loc, fr, cnt
-        # FIXME: if bit error(s), locate closest matching codeword
-        return -1, -1, -1, -1
+        chn, loc, fr, cnt = self.decode_isch_array(dibits_to_int([syms]))
+        return int(chn[0]), int(loc[0]), int(fr[0]), int(cnt[0])
+
+    def decode_isch_array(self, words):
+        # decodes an array of 40 bit isch words to the nearest codeword within max_errors.
+        # returns arrays of chn, loc, fr, cnt; all -2 for sync and -1 if not decodable
+        words = np.asarray(words, dtype=np.uint64)
+        idx = np.minimum(np.searchsorted(self.codewords, words), len(self.codewords) - 1)
+        exact = self.codewords[idx] == words
+        v = np.where(exact, self.values[idx], -1)
+        miss = np.nonzero(~exact)[0]
+        if len(miss):
+            d = popcount64(words[miss, None] ^ self.codewords[None, :])
+            best = d.argmin(axis=1)
+            ok = d[np.arange(len(miss)), best] <= self.max_errors
+            v[miss[ok]] = self.values[best[ok]]
+        return self.split_values(v)
+
+    def decode_isch_soft(self, soft):
+        # decodes an (n, 40) array of soft bits (see soft_bits).  Candidates are ranked by
+        # correlation with the soft bits, so that unreliable bits count for less than
+        # reliable ones; the best is accepted if within max_soft_errors hard bit errors
+        soft = np.asarray(soft, dtype=np.float64)
+        best = np.dot(soft, self.codebits.T).argmax(axis=1)
+        words = dibits_to_int((soft[:, 0::2] > 0) * 2 + (soft[:, 1::2] > 0))
+        ok = popcount64(words ^ self.codewords[best]) <= self.max_soft_errors
+        return self.split_values(np.where(ok, self.values[best], -1))
+
+    def split_values(self, v):
+        chn, loc, fr, cnt = mk_isch(v)
+        bad = v < 0
+        for a in (chn, loc, fr, cnt):
+            a[bad] = v[bad]
+        return chn, loc, fr, cnt
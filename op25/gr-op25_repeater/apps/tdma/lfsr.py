@@ -18,18 +18,134 @@
 # Software Foundation, Inc., 51 Franklin Street, Boston, MA
 # 02110-1301, USA.
 
+import os
+import sys
+import json
+import threading
 import numpy as np
-from bit_utils import *
+from fast_bit_utils import *
+
+# The scrambling sequence is a linear function over GF(2) of the 44 bit
+# WACN/SYSID/NAC word: the word is multiplied by _seed_matrix to load the
+# register, and each cycle of the register is itself linear.  Instead of
+# clocking the register 4320 times per mask, the 4320x44 generator matrix
+# is derived once at import (by repeated squaring of the transition matrix)
+# and each mask is then a single matrix-vector product.
+
+_XOR_BITS = 4320
+
+_seed_matrix = np.array([row.split() for row in '1 0 0 0 1 0 0 0 0 1 0 0 0 0 0 1 0 0 0 0 1 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 0 0 0 0 0 0; 0 1 0 0 0 1 0 0 0 0 1 0 0 0 0 0 1 0 0 0 0 1 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 0 0 0 0 0; 0 0 1 0 0 0 1 0 0 0 0 1 0 0 0 0 0 1 0 0 0 0 1 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 0 0 0 0; 0 0 0 1 0 0 0 1 0 0 0 0 1 0 0 0 0 0 1 0 0 0 0 1 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 0 0 0; 0 0 0 0 1 0 0 0 1 0 0 0 0 1 0 0 0 0 0 1 0 0 0 0 1 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 0 0; 0 0 0 0 0 1 0 0 0 1 0 0 0 0 1 0 0 0 0 0 1 0 0 0 0 1 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 0; 0 0 0 0 0 0 1 0 0 0 1 0 0 0 0 1 0 0 0 0 0 1 0 0 0 0 1 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0; 0 0 0 0 0 0 0 1 0 0 0 1 0 0 0 0 1 0 0 0 0 0 1 0 0 0 0 1 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0; 0 0 0 0 0 0 0 0 1 0 0 0 1 0 0 0 0 1 0 0 0 0 0 1 0 0 0 0 1 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0; 0 0 0 0 0 0 0 0 0 1 0 0 0 1 0 0 0 0 1 0 0 0 0 0 1 0 0 0 0 1 0 0 0 0 0 0 0 0 0 0 0 0 0 1; 0 0 0 0 0 0 0 0 0 0 1 0 0 0 1 0 0 0 0 1 0 0 0 0 0 1 0 0 0 0 1 0 0 0 0 0 0 0 0 0 0 0 0 0; 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 1 0 0 0 0 1 0 0 0 0 0 1 0 0 0 0 1 0 0 0 0 0 0 0 0 0 0 0 0; 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 1 0 0 0 0 1 0 0 0 0 0 1 0 0 0 0 1 0 0 0 0 0 0 0 0 0 0 0; 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 1 0 0 0 0 1 0 0 0 0 0 1 0 0 0 0 1 0 0 0 0 0 0 0 0 0 0; 0 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 1 0 0 0 0 1 0 0 0 0 0 1 0 0 0 0 1 0 0 0 0 0 0 0 0 0; 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 1 0 0 0 0 1 0 0 0 0 0 1 0 0 0 0 1 0 0 0 0 0 0 0 0; 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 1 0 0 0 0 1 0 0 0 0 0 1 0 0 0 0 1 0 0 0 0 0 0 0; 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 1 0 0 0 0 1 0 0 0 0 0 1 0 0 0 0 1 0 0 0 0 0 0; 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 1 0 0 0 0 1 0 0 0 0 0 1 0 0 0 0 1 0 0 0 0 0; 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 1 0 0 0 0 1 0 0 0 0 0 1 0 0 0 0 1 0 0 0 0; 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 1 0 0 0 0 1 0 0 0 0 0 1 0 0 0 0 1 0 0 0; 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 1 0 0 0 0 1 0 0 0 0 0 1 0 0 0 0 1 0 0; 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 1 0 0 0 0 1 0 0 0 0 0 1 0 0 0 0 1 0; 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 1 0 0 0 0 1 0 0 0 0 0 1 0 0 0 0 1; 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 1 0 0 0 0 1 0 0 0 0 0 1 0 0 0 0; 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 1 0 0 0 0 1 0 0 0 0 0 1 0 0 0; 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 1 0 0 0 0 1 0 0 0 0 0 1 0 0; 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 1 0 0 0 0 1 0 0 0 0 0 1 0; 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 1 0 0 0 0 1 0 0 0 0 0 1; 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 1 0 0 0 0 1 0 0 0 0 0; 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 1 0 0 0 0 1 0 0 0 0; 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 1 0 0 0 0 1 0 0 0; 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 1 0 0 0 0 1 0 0; 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 1 0 0 0 0 1 0; 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 1 0 0 0 0 1; 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 1 0 0 0 0; 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 1 0 0 0; 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 1 0 0; 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 1 0; 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 1; 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0; 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0; 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0; 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 1'.split(';')], dtype=np.float64)
+
+def _gf2_dot(a, b):
+	# float product so that numpy can use blas, the sums are small so exact
+	return np.dot(a, b).astype(np.int64) & 1
+
+def _mk_gen_matrix():
+	# column k of the transition matrix is the register after one cycle of
+	# a register holding only bit k (bits numbered from the lsb)
+	bits = np.arange(44)
+	T = np.zeros((44, 44), dtype=np.float64)
+	for k in range(44):
+		T[:, k] = (p25p2_lfsr.cyc_reg(1 << k) >> bits) & 1
+
+	# register load: register bit 43-c = sum(word bit 43-r * M[r,c])
+	S = _seed_matrix.T[::-1, ::-1]
+
+	# output i is register bit 43 after i cycles, i.e. row 43 of T^i.  Rows
+	# are produced by doubling: given rows 0..n-1 and P = T^n, rows n..2n-1
+	# are rows 0..n-1 times P
+	G = np.zeros((1, 44), dtype=np.float64)
+	G[0, 43] = 1
+	P = T
+	while len(G) < _XOR_BITS:
+		G = np.vstack((G, _gf2_dot(G[:_XOR_BITS - len(G)], P)))
+		P = _gf2_dot(P, P)
+	return _gf2_dot(G, S).astype(np.int32)
+
+def mk_xor_array(nac, sysid, wacn):
+	# returns the 4320 scrambling bits as a numpy array
+	word = 16777216*wacn + 4096*sysid + nac
+	w = np.array([(word >> k) & 1 for k in range(44)], dtype=np.int32)
+	return np.dot(_gen_matrix, w) & 1
+
+def mk_xor_syms(nac, sysid, wacn):
+	# returns the 2160 scrambling dibits as a numpy array
+	bits = mk_xor_array(nac, sysid, wacn)
+	return (bits[0::2] << 1) | bits[1::2]
+
+# Process-wide mask cache shared by every channel and trunking module,
+# optionally persisted to a json file so that masks for known systems are
+# available without any computation after a restart.  The file is rewritten
+# on a background thread, so a retune to a new system never waits on disk.
+
+_cache_lock = threading.Lock()
+_save_lock = threading.Lock()  # serializes writers of the cache file
+_cache = {}
+_cache_file = None
+_save_pending = False
+
+def _cache_key(nac, sysid, wacn):
+	return '%x:%x:%x' % (nac, sysid, wacn)
+
+def set_cache_file(filename):
+	# load masks persisted by a previous run; new masks are written back to filename
+	global _cache_file
+	with _cache_lock:
+		_cache_file = filename
+		if not filename or not os.path.isfile(filename):
+			return
+		try:
+			with open(filename, 'r') as f:
+				saved = json.load(f)
+		except (IOError, ValueError) as ex:
+			sys.stderr.write("lfsr: unable to load xor mask cache %s: %s\n" % (filename, ex))
+			return
+		for key in saved:
+			syms = saved[key]
+			if len(syms) != _XOR_BITS // 2 or syms.strip('0123') != '':
+				continue
+			_cache[str(key)] = ''.join([chr(int(c)) for c in syms])
+
+def _save_cache():
+	# writer thread: saves a snapshot of the cache; masks added after the
+	# snapshot is taken start another writer, which waits for this one
+	global _save_pending
+	with _save_lock:
+		with _cache_lock:
+			_save_pending = False
+			filename = _cache_file
+			saved = dict(_cache)
+		tmp = filename + '.tmp'
+		try:
+			with open(tmp, 'w') as f:
+				json.dump(dict([(key, ''.join([str(ord(c)) for c in saved[key]])) for key in saved]), f)
+			os.rename(tmp, filename)
+		except (IOError, OSError) as ex:
+			sys.stderr.write("lfsr: unable to save xor mask cache %s: %s\n" % (filename, ex))
+
+def is_cached(nac, sysid, wacn):
+	return _cache_key(nac, sysid, wacn) in _cache
+
+def get_xor_chars(nac, sysid, wacn):
+	# returns the mask as a string of dibit chars, as expected by the decoder set_xormask
+	global _save_pending
+	key = _cache_key(nac, sysid, wacn)
+	with _cache_lock:
+		if key not in _cache:
+			_cache[key] = ''.join([chr(c) for c in mk_xor_syms(nac, sysid, wacn).tolist()])
+			if _cache_file and not _save_pending:
+				_save_pending = True
+				threading.Thread(target=_save_cache, name="lfsr_cache").start()
+		return _cache[key]
 
 class p25p2_lfsr(object):
 	def __init__(self,nac,sysid,wacn):
-		xorbits = self.mk_xor_bits(nac,sysid,wacn)
-		self.xorsyms = [0] * (len(xorbits)//2)
-		for i in range(len(self.xorsyms)):
-			self.xorsyms[i] = (xorbits[i*2] << 1) + xorbits[i*2+1]
+		syms = mk_xor_syms(nac,sysid,wacn)
+		self.xorsyms = syms.tolist()
 		self.xor_chars = ''.join([chr(c) for c in self.xorsyms])
 
-	def asm_reg(self,s1,s2,s3,s4,s5,s6):
+	@staticmethod
+	def asm_reg(s1,s2,s3,s4,s5,s6):
 		s1 = s1 & 0xf
 		s2 = s2 & 0x1f
 		s3 = s3 & 0x3f
@@ -38,7 +154,8 @@ class p25p2_lfsr(object):
 		s6 = s6 & 0x3ff
 		return (s1<<40)+(s2<<35)+(s3<<29)+(s4<<24)+(s5<<10)+s6
 
-	def disasm_reg(self,r):
+	@staticmethod
+	def disasm_reg(r):
 		s1 = (r>>40) & 0xf
 		s2 = (r>>35) & 0x1f
 		s3 = (r>>29) & 0x3f
@@ -47,8 +164,9 @@ class p25p2_lfsr(object):
 		s6 =  r      & 0x3ff
 		return s1,s2,s3,s4,s5,s6
 
-	def cyc_reg(self, reg):
-		s1,s2,s3,s4,s5,s6 = self.disasm_reg(reg)
+	@staticmethod
+	def cyc_reg(reg):
+		s1,s2,s3,s4,s5,s6 = p25p2_lfsr.disasm_reg(reg)
 		cy1 = (s1 >> 3) & 1
 		cy2 = (s2 >> 4) & 1
 		cy3 = (s3 >> 5) & 1
@@ -72,32 +190,17 @@ class p25p2_lfsr(object):
 		s4 = s4 | (x4 & 1)
 		s5 = s5 | (x5 & 1)
 		s6 = s6 | (cy1 & 1)
-		return self.asm_reg(s1,s2,s3,s4,s5,s6)
+		return p25p2_lfsr.asm_reg(s1,s2,s3,s4,s5,s6)
 
 	def mk_xor_bits(self, nac,sysid,wacn):
-		reg = np.int64(mk_array(16777216*wacn + 4096*sysid + nac, 44))
-
-		M = np.array(np.mat('1 0 0 0 1 0 0 0 0 1 0 0 0 0 0 1 0 0 0 0 1 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 0 0 0 0 0 0; 0 1 0 0 0 1 0 0 0 0 1 0 0 0 0 0 1 0 0 0 0 1 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 0 0 0 0 0; 0 0 1 0 0 0 1 0 0 0 0 1 0 0 0 0 0 1 0 0 0 0 1 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 0 0 0 0; 0 0 0 1 0 0 0 1 0 0 0 0 1 0 0 0 0 0 1 0 0 0 0 1 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 0 0 0; 0 0 0 0 1 0 0 0 1 0 0 0 0 1 0 0 0 0 0 1 0 0 0 0 1 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 0 0; 0 0 0 0 0 1 0 0 0 1 0 0 0 0 1 0 0 0 0 0 1 0 0 0 0 1 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 0; 0 0 0 0 0 0 1 0 0 0 1 0 0 0 0 1 0 0 0 0 0 1 0 0 0 0 1 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0; 0 0 0 0 0 0 0 1 0 0 0 1 0 0 0 0 1 0 0 0 0 0 1 0 0 0 0 1 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0; 0 0 0 0 0 0 0 0 1 0 0 0 1 0 0 0 0 1 0 0 0 0 0 1 0 0 0 0 1 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0; 0 0 0 0 0 0 0 0 0 1 0 0 0 1 0 0 0 0 1 0 0 0 0 0 1 0 0 0 0 1 0 0 0 0 0 0 0 0 0 0 0 0 0 1; 0 0 0 0 0 0 0 0 0 0 1 0 0 0 1 0 0 0 0 1 0 0 0 0 0 1 0 0 0 0 1 0 0 0 0 0 0 0 0 0 0 0 0 0; 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 1 0 0 0 0 1 0 0 0 0 0 1 0 0 0 0 1 0 0 0 0 0 0 0 0 0 0 0 0; 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 1 0 0 0 0 1 0 0 0 0 0 1 0 0 0 0 1 0 0 0 0 0 0 0 0 0 0 0; 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 1 0 0 0 0 1 0 0 0 0 0 1 0 0 0 0 1 0 0 0 0 0 0 0 0 0 0; 0 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 1 0 0 0 0 1 0 0 0 0 0 1 0 0 0 0 1 0 0 0 0 0 0 0 0 0; 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 1 0 0 0 0 1 0 0 0 0 0 1 0 0 0 0 1 0 0 0 0 0 0 0 0; 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 1 0 0 0 0 1 0 0 0 0 0 1 0 0 0 0 1 0 0 0 0 0 0 0; 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 1 0 0 0 0 1 0 0 0 0 0 1 0 0 0 0 1 0 0 0 0 0 0; 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 1 0 0 0 0 1 0 0 0 0 0 1 0 0 0 0 1 0 0 0 0 0; 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 1 0 0 0 0 1 0 0 0 0 0 1 0 0 0 0 1 0 0 0 0; 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 1 0 0 0 0 1 0 0 0 0 0 1 0 0 0 0 1 0 0 0; 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 1 0 0 0 0 1 0 0 0 0 0 1 0 0 0 0 1 0 0; 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 1 0 0 0 0 1 0 0 0 0 0 1 0 0 0 0 1 0; 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 1 0 0 0 0 1 0 0 0 0 0 1 0 0 0 0 1; 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 1 0 0 0 0 1 0 0 0 0 0 1 0 0 0 0; 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 1 0 0 0 0 1 0 0 0 0 0 1 0 0 0; 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 1 0 0 0 0 1 0 0 0 0 0 1 0 0; 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 1 0 0 0 0 1 0 0 0 0 0 1 0; 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 1 0 0 0 0 1 0 0 0 0 0 1; 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 1 0 0 0 0 1 0 0 0 0 0; 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 1 0 0 0 0 1 0 0 0 0; 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 1 0 0 0 0 1 0 0 0; 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 1 0 0 0 0 1 0 0; 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 1 0 0 0 0 1 0; 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 1 0 0 0 0 1; 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 1 0 0 0 0; 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 1 0 0 0; 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 1 0 0; 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 1 0; 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0 1; 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0 0; 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0 0; 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 1 0; 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 1'))
-		reg = mk_int(np.dot(reg,M))
-
-		s = []
-		for i in range(4320):
-			s.append((reg >> 43) & 1)
-			reg = self.cyc_reg(reg)
+		return mk_xor_array(nac,sysid,wacn).tolist()
 
-		return s
+_gen_matrix = _mk_gen_matrix()
 
 if __name__ == '__main__':
-	import sys
-
-	xor_cache = {}
 	params = {}
 	params['nac'] = 0x293
 	params['sysid'] = 0x18
 	params['wacn'] = 0x1
 
-	hash = '%x%x%x' % (params['nac'], params['sysid'], params['wacn'])
-	if hash not in xor_cache:
-		xor_cache[hash] = p25p2_lfsr(params['nac'], params['sysid'], params['wacn']).xor_chars
-
-	sys.stdout.write(xor_cache[hash])
+	sys.stdout.write(get_xor_chars(params['nac'], params['sysid'], params['wacn']))
@@ -1,3 +1,4 @@
+import numpy as np
 
 gly23127DecTbl = [
     0, 1, 1, 2, 1, 2, 2, 3, 1, 2, 2, 3, 2, 3, 3, 147459, 
@@ -135,7 +136,7 @@ def gly23127GetSyn (pattern) :
     while(pattern & 0xFFFFF800) != 0 :
         while (aux & pattern) == 0:
           aux = aux >> 1
-        pattern = pattern ^ (aux / 0x800 * 0xC75) #generator is C75
+        pattern = pattern ^ (aux // 0x800 * 0xC75) #generator is C75
 
     return pattern
 
@@ -152,3 +153,21 @@ def gly24128Dec (n) :
     correction = gly23127DecTbl[gly23127GetSyn(CW)]
     CW = (CW ^ correction) >> 11
     return CW, correction
+
+# Array versions of the above for batch decoding.  The syndrome is linear in
+# the codeword, so it is formed as the xor of the syndromes of each set bit.
+
+gly23127SynBits = [gly23127GetSyn(1 << i) for i in range(23)]
+gly23127DecArr = np.array(gly23127DecTbl, dtype=np.int64)
+
+def gly23127DecArray (CW) :
+    CW = np.asarray(CW, dtype=np.int64)
+    syn = np.zeros_like(CW)
+    for i in range(23):
+        syn ^= ((CW >> i) & 1) * gly23127SynBits[i]
+    correction = gly23127DecArr[syn]
+    CW = (CW ^ correction) >> 11
+    return CW, correction
+
+def gly24128DecArray (n) :
+    return gly23127DecArray(np.asarray(n, dtype=np.int64) >> 1)
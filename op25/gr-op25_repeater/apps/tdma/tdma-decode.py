@@ -27,20 +27,69 @@ After FEC decoding, print the resulting "B" vectors (49 bits per CW).
 Optionally, dump the timeslot info (type, position, type of content)
 
 The input file must contain the demodulated symbols, one per character
-using the low-order two bits of each byte
+using the low-order two bits of each byte, or with -f the received symbol
+levels as float32.  ISCH and DUID are decoded to the nearest codeword, using
+soft decisions for float input, so that lock is held through bit errors.
+The file is memory mapped and decoded CHUNK_SUPERFRAMES at a time with numpy,
+so recordings of any length can be processed in bounded memory.
 """
 
 import sys
 import numpy as np
 from optparse import OptionParser
 
-from bit_utils import *
+from fast_bit_utils import *
 import isch
 import duid
 import lfsr
-from vf import process_v
+from vf import decode_vcw_array
 
 SUPERFRAME_LEN = 2160
+SLOT_LEN = 180
+BURST_OFFSET = 10           # bursts start this many symbols after the isch
+MAX_ERRORS = 6              # successive undecodable isch before giving up
+CHUNK_SUPERFRAMES = 1000    # superframes decoded per numpy pass
+VCW_OFFSETS = np.array([11, 48, 96, 133])
+VCW_LEN = 36
+
+DUID_4V = 0
+DUID_2V = 6
+
+def to_dibits(syms):
+    # float input holds symbol levels, byte input holds dibits
+    if syms.dtype == np.uint8:
+        return syms & 3
+    return isch.slice_levels(syms)
+
+def decode_isch(my_isch, syms):
+    if syms.dtype == np.uint8:
+        return my_isch.decode_isch_array(isch.dibits_to_int(syms & 3))
+    return my_isch.decode_isch_soft(isch.soft_bits(syms))
+
+def decode_duid(my_duid, bursts):
+    if bursts.dtype == np.uint8:
+        return my_duid.decode_duid_array(bursts & 3)
+    return my_duid.decode_duid_soft(isch.soft_bits(bursts).reshape(bursts.shape + (2,)))
+
+def find_sync(symbols, pattern, block=1<<20):
+    # returns the first position at which symbols matches pattern, or -1
+    pattern = np.asarray(pattern, dtype=np.uint8)
+    plen = len(pattern)
+    for start in range(0, len(symbols) - plen, block):
+        blk = to_dibits(np.asarray(symbols[start : start + block + plen]))
+        n = len(blk) - plen
+        match = np.ones(n, dtype=bool)
+        for k in range(plen):
+            match &= blk[k : k + n] == pattern[k]
+        hits = np.nonzero(match)[0]
+        if len(hits):
+            return start + int(hits[0])
+    return -1
+
+def burst_type(my_duid, burst, d):
+    if d in my_duid.duid_str:
+        return my_duid.duid_str[d]
+    return 'unknown' + duid.extract_duid(burst)
 
 def main():
     parser = OptionParser()
@@ -49,69 +98,84 @@ def main():
     parser.add_option("-n", "--nac", type="int", default=0, help="NAC")
     parser.add_option("-s", "--sysid", type="int", default=0, help="sysid")
     parser.add_option("-w", "--wacn", type="int", default=0, help="WACN")
+    parser.add_option("-f", "--float-input", action="store_true", default=False, help="input file holds float32 symbol levels, decoded with soft decisions")
     (options, args) = parser.parse_args()
-    if len(args) != 0:
+    if len(args) != 0 or options.input_file is None:
         parser.print_help()
         sys.exit(1)
-    file = options.input_file
 
     my_isch = isch.p25p2_isch()
     my_duid = duid.p25p2_duid()
-    my_lfsr = lfsr.p25p2_lfsr(options.nac, options.sysid, options.wacn)
-
-    d = open(file).read()
-
-    symbols = []
-    for c in d:
-        symbols.append(ord(c))
-
-    sync0= bits_to_dibits(mk_array(0x575d57f7ff,40))
-    sync_start = find_sym(sync0, symbols)
-    assert sync_start > 0   # unable to locate any sync sequence
-    superframe = -1
-    for i in range(sync_start, sync_start + (180*32), 180):
-        chn, loc, fr, cnt = my_isch.decode_isch ( symbols [ i : i + 20 ])
-        if chn == 0 and loc == 0:
-            superframe = i
-            break
-    assert superframe > 0   # unable to locate start of superframe
+    xorsyms = lfsr.mk_xor_syms(options.nac, options.sysid, options.wacn).reshape(12, SLOT_LEN)
+
+    symbols = np.memmap(options.input_file, dtype=np.float32 if options.float_input else np.uint8, mode='r')
 
+    sync0 = bits_to_dibits(mk_array(isch.isch_sync, 40))
+    sync_start = find_sync(symbols, sync0)
+    if sync_start < 0:
+        sys.stderr.write("unable to locate any sync sequence\n")
+        sys.exit(1)
+    starts = np.arange(sync_start, min(sync_start + (SLOT_LEN*32), len(symbols) - 20), SLOT_LEN)
+    chn, loc, fr, cnt = decode_isch(my_isch, np.asarray(symbols)[starts[:, None] + np.arange(20)])
+    found = np.nonzero((chn == 0) & (loc == 0))[0]
+    if len(found) == 0:
+        sys.stderr.write("unable to locate start of superframe\n")
+        sys.exit(1)
+    superframe = int(starts[found[0]])
+
+    n_superframes = (len(symbols) - superframe - BURST_OFFSET) // SUPERFRAME_LEN
+    vcw_pos = VCW_OFFSETS[:, None] + np.arange(VCW_LEN)
     errors = 0
-    for i in range(superframe,len(symbols)-SUPERFRAME_LEN,SUPERFRAME_LEN):
-        syms1 = symbols[i + 10: i + SUPERFRAME_LEN + 10]
-        syms2 = np.array(syms1) ^ my_lfsr.xorsyms
-        for j in range(12):
-            if options.verbose:
-                print('%s superframe %d timeslot %d %s' % ('=' * 20, i, j, '=' * 20))
-            chn, loc, fr, cnt = my_isch.decode_isch ( symbols [ i + (j*180) : i + (j*180) + 20 ])
-            if chn == -1:
-                if options.verbose:
-                    print('unknown isch codeword at %d' % (i + (j*180)))
-                errors += 1
-            elif chn == -2:
-                if options.verbose:
-                    print('sync isch codeword found at %d' % (i + (j*180)))
-                errors = 0
-            else:
-                if options.verbose:
-                    print("channel %d loc %d fr %d count %d" % (chn, loc, fr, cnt))
-                errors = 0
-
-            burst = syms1 [ (j*180) : (j*180) + 180 ]
-            burst_d= syms2 [ (j*180) : (j*180) + 180 ]
-            btype = my_duid.decode_duid(burst)
-            if options.verbose:
-                print('burst at %d type %s' % (i + (j*180), btype))
-            if btype == '2v' or btype == '4v':
-                process_v(burst_d, btype)
-            elif not btype.startswith('unknown'):
-                maybe_sync = burst[79:79+21]
-                if btype.endswith(' w'):    # scrambled
-                    burst = burst_d
-                # process_oemi(burst, btype)
-        if errors > 6:
+    for first in range(0, n_superframes, CHUNK_SUPERFRAMES):
+        k = min(CHUNK_SUPERFRAMES, n_superframes - first)
+        base = superframe + first * SUPERFRAME_LEN
+        raw = np.asarray(symbols[base : base + k * SUPERFRAME_LEN + BURST_OFFSET])
+        blk = to_dibits(raw)
+
+        # isch at the start of each slot; consecutive errors carry across chunks
+        chn, loc, fr, cnt = decode_isch(my_isch, raw[:k * SUPERFRAME_LEN].reshape(k * 12, SLOT_LEN)[:, :20])
+        pos = np.arange(k * 12)
+        last_good = np.maximum.accumulate(np.where(chn != -1, pos, -1 - errors))
+        run = pos - last_good
+        stop = np.nonzero(run[11::12] > MAX_ERRORS)[0]
+        if len(stop):
+            k = int(stop[0]) + 1
+        errors = int(run[k * 12 - 1])
+
+        bursts = blk[BURST_OFFSET : BURST_OFFSET + k * SUPERFRAME_LEN].reshape(k, 12, SLOT_LEN)
+        duids = decode_duid(my_duid, raw[BURST_OFFSET : BURST_OFFSET + k * SUPERFRAME_LEN].reshape(k * 12, SLOT_LEN)).reshape(k, 12)
+        descrambled = bursts ^ xorsyms
+
+        # voice codewords in order: 2v bursts carry two, 4v bursts four
+        vcw_mask = (duids == DUID_4V)[:, :, None] | ((duids == DUID_2V)[:, :, None] & (np.arange(4) < 2))
+        vcws = descrambled[:, :, vcw_pos][vcw_mask]
+        bits = np.stack(((vcws >> 1) & 1, vcws & 1), axis=-1).reshape(len(vcws), VCW_LEN * 2)
+        b = decode_vcw_array(bits).tolist()
+
+        if not options.verbose:
+            if len(b):
+                sys.stdout.write('\n'.join(['\t'.join(['%d' % x for x in row]) for row in b]) + '\n')
+        else:
+            nvcw = vcw_mask.sum(axis=2).ravel()
+            vcw_next = 0
+            for n in range(k):
+                i = base + n * SUPERFRAME_LEN
+                for j in range(12):
+                    s = n * 12 + j
+                    print('%s superframe %d timeslot %d %s' % ('=' * 20, i, j, '=' * 20))
+                    if chn[s] == -1:
+                        print('unknown isch codeword at %d' % (i + (j*SLOT_LEN)))
+                    elif chn[s] == -2:
+                        print('sync isch codeword found at %d' % (i + (j*SLOT_LEN)))
+                    else:
+                        print("channel %d loc %d fr %d count %d" % (chn[s], loc[s], fr[s], cnt[s]))
+                    print('burst at %d type %s' % (i + (j*SLOT_LEN), burst_type(my_duid, bursts[n, j].tolist(), duids[n, j])))
+                    for row in b[vcw_next : vcw_next + nvcw[s]]:
+                        print('\t'.join(['%d' % x for x in row]))
+                    vcw_next += nvcw[s]
+        if len(stop):
             if options.verbose:
-                print("too many successive errors, exiting at i=%d" % (i))
+                print("too many successive errors, exiting at i=%d" % (base + (k - 1) * SUPERFRAME_LEN))
             break
 
 if __name__ == "__main__":
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+#
+# This file is part of OP25
+#
+# OP25 is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+#
+# OP25 is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with OP25; see the file COPYING. If not, write to the Free
+# Software Foundation, Inc., 51 Franklin Street, Boston, MA
+# 02110-1301, USA.
+
+# Parity checks for fast_bit_utils against the reference bit_utils.
+#
+# Every function is run through both modules on random and edge case inputs
+# (bit lengths 1..64, lists and numpy arrays, either side of SHORT_LIST) and
+# the results must match in value and, for arrays, in kind.  Run with
+# pytest, or directly.
+
+import os
+import sys
+import random
+import unittest
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import bit_utils as ref
+import fast_bit_utils as fast
+
+COUNT = 500         # random cases per function
+
+def same(a, b):
+    if isinstance(a, np.ndarray) or isinstance(b, np.ndarray):
+        return np.asarray(a).dtype.kind == np.asarray(b).dtype.kind and np.array_equal(a, b)
+    return a == b
+
+class test_fast_bit_utils(unittest.TestCase):
+
+    def setUp(self):
+        self.rng = random.Random(1)
+
+    def bits(self, l):
+        return [self.rng.randint(0, 1) for i in range(l)]
+
+    def check(self, name, *args):
+        a = getattr(ref, name)(*args)
+        b = getattr(fast, name)(*args)
+        self.assertTrue(same(a, b), "%s%r: %r != %r" % (name, args, a, b))
+
+    def test_rev_int(self):
+        for i in range(COUNT):
+            l = self.rng.randint(1, 64)
+            self.check('rev_int', self.rng.getrandbits(l + self.rng.randint(0, 8)), l)
+        self.check('rev_int', 0x575d57f7ff, 40)
+
+    def test_mk_array(self):
+        for i in range(COUNT):
+            l = self.rng.randint(1, 64)
+            self.check('mk_array', self.rng.getrandbits(l + self.rng.randint(0, 8)), l)
+
+    def test_mk_int(self):
+        for i in range(COUNT):
+            bits = self.bits(self.rng.randint(1, 2 * fast.SHORT_LIST))
+            self.check('mk_int', bits)
+            self.check('mk_int', np.array(bits[:63]))      # the reference overflows int64 beyond 63 bits
+        self.check('mk_int', [])
+        self.check('mk_int', np.array([], dtype=np.int64))
+
+    def test_mk_str(self):
+        for i in range(COUNT):
+            bits = self.bits(self.rng.randint(1, 64))
+            self.check('mk_str', bits)
+            self.check('mk_str', np.array(bits))
+        self.check('mk_str', [])
+
+    def test_bits_to_dibits(self):
+        for i in range(COUNT):
+            bits = self.bits(self.rng.randint(1, 64))
+            self.check('bits_to_dibits', bits)
+            self.check('bits_to_dibits', np.array(bits))
+        self.check('bits_to_dibits', [])
+        self.check('bits_to_dibits', [1, 0, 1])
+
+    def test_dibits_to_bits(self):
+        for i in range(COUNT):
+            dibits = [self.rng.randint(0, 3) for j in range(self.rng.randint(0, 40))]
+            self.check('dibits_to_bits', dibits)
+            self.check('dibits_to_bits', np.array(dibits, dtype=np.int64))
+
+    def test_check_l(self):
+        for i in range(COUNT):
+            l = self.rng.randint(1, 64)
+            self.check('check_l', self.bits(l), self.bits(l))
+
+    def test_fixup(self):
+        for i in range(COUNT):
+            self.check('fixup', [self.rng.choice([1, 3]) for j in range(self.rng.randint(1, 64))])
+
+    def test_find_sym(self):
+        for i in range(COUNT):
+            syms = [self.rng.randint(0, 3) for j in range(self.rng.randint(0, 200))]
+            pattern = [self.rng.randint(0, 3) for j in range(self.rng.randint(1, 4))]
+            if len(syms) > 20 and self.rng.randint(0, 1):
+                pattern = syms[-len(pattern) - self.rng.randint(0, 2):][:len(pattern)]
+            self.check('find_sym', pattern, syms)
+        self.check('find_sym', [1, 2], [1])
+
+if __name__ == '__main__':
+    unittest.main()
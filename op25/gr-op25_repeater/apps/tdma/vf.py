@@ -21,31 +21,20 @@
 import sys
 import numpy as np
 
-from bit_utils import *
-from rs import gly23127Dec, gly24128Dec
+from fast_bit_utils import *
+from rs import gly23127Dec, gly24128Dec, gly23127DecArray, gly24128DecArray
 
-def process_vcw(vf):
-    c0, c1, c2, c3 = extract_vcw(vf)
-    c0 = mk_int(c0)
-    c0 = rev_int(c0, 24)
-    c1 = mk_int(c1)
-    c1 = rev_int(c1, 23)
-    c2 = mk_int(c2)
-    c2 = rev_int(c2, 11)
-    c3 = mk_int(c3)
-    c3 = rev_int(c3, 14)
-    u0, correction0 = gly24128Dec(c0)
+def pn_mask(u0):
     pr = [0] * 24
     m1 = [0] * 23
     pr[0] = 16 * u0
     for n in range(1,24):
         pr[n] = (173*pr[n-1] + 13849) - 65536 * int((173*pr[n-1]+13849)/65536)
         m1[n-1] = int(pr[n] / 32768) & 1
-    m1 = mk_int(m1)
-    
-    u1, correction1 = gly23127Dec(c1 ^ m1)
-    u2 = c2
-    u3 = c3
+    return mk_int(m1)
+
+def vcw_b(u0, u1, u2, u3):
+    # works on ints or on numpy arrays of codewords
     b = [0] * 9
     b[0] = ((u0 >> 5) & 0x78) + ((u3 >> 9) & 0x7)
     b[1] = ((u0 >> 3) & 0x1e) + ((u3 >> 13) & 0x1)
@@ -56,6 +45,25 @@ def process_vcw(vf):
     b[6] = ((u2 >> 3) & 0x0e) + ((u3 >> 3) & 0x1)
     b[7] = ( u2       & 0x0e) + ((u3 >> 2) & 0x1)
     b[8] = ((u2 << 2) & 0x04) + ( u3       & 0x3)
+    return b
+
+def process_vcw(vf):
+    c0, c1, c2, c3 = extract_vcw(vf)
+    c0 = mk_int(c0)
+    c0 = rev_int(c0, 24)
+    c1 = mk_int(c1)
+    c1 = rev_int(c1, 23)
+    c2 = mk_int(c2)
+    c2 = rev_int(c2, 11)
+    c3 = mk_int(c3)
+    c3 = rev_int(c3, 14)
+    u0, correction0 = gly24128Dec(c0)
+    m1 = pn_mask(u0)
+    
+    u1, correction1 = gly23127Dec(c1 ^ m1)
+    u2 = c2
+    u3 = c3
+    b = vcw_b(u0, u1, u2, u3)
     s = "\t".join(['%s' % x for x in b])
     print("%s" % s)
 
@@ -151,3 +159,19 @@ def extract_vcw(vf):
     c3[0] = vf[71]
 
     return c0, c1, c2, c3
+
+# Batch decoding of voice codewords.  The bit positions of c0..c3 within a
+# codeword are taken from extract_vcw, and the PN mask is tabulated for all
+# 4096 values of u0.
+
+vcw_idx = [np.array(c) for c in extract_vcw(list(range(72)))]
+vcw_wts = [1 << np.arange(len(c), dtype=np.int64) for c in vcw_idx]
+pn_masks = np.array([pn_mask(u0) for u0 in range(4096)], dtype=np.int64)
+
+def decode_vcw_array(vf):
+    # vf is an (n, 72) array of codeword bits; returns an (n, 9) array of b vectors
+    vf = np.asarray(vf, dtype=np.int64)
+    c0, c1, c2, c3 = [np.dot(vf[:, idx], wts) for idx, wts in zip(vcw_idx, vcw_wts)]
+    u0, correction0 = gly24128DecArray(c0)
+    u1, correction1 = gly23127DecArray(c1 ^ pn_masks[u0])
+    return np.column_stack(vcw_b(u0, u1, c2, c3))
@@ -57,27 +57,9 @@ from gnuradio import gr
 
 import gnuradio.op25_repeater as op25_repeater
 
-KEEPALIVE_TIME = 3.0   # no data received in (seconds)
-
-class q_watcher(threading.Thread):
-    def __init__(self, msgq,  callback, **kwds):
-        threading.Thread.__init__ (self, **kwds)
-        self.setDaemon(1)
-        self.msgq = msgq
-        self.callback = callback
-        self.keep_running = True
-        self.start()
+from msgq_watcher import msgq_watcher
 
-    def run(self):
-        while(self.keep_running):
-            if not self.msgq.empty_p():
-                msg = self.msgq.delete_head()
-                if msg is not None:
-                    self.callback(msg)
-                else:
-                    self.keep_running = False
-            else:
-                time.sleep(0.1)
+KEEPALIVE_TIME = 3.0   # no data received in (seconds)
 
 class curses_terminal(threading.Thread):
     def __init__(self, input_q,  output_q, sock=None, **kwds):
@@ -557,7 +539,7 @@ class curses_terminal(threading.Thread):
         self.send_command('quit', 0)
 
 class http_terminal(threading.Thread):
-    def __init__(self, input_q,  output_q, endpoint, **kwds):
+    def __init__(self, input_q,  output_q, endpoint, plot_dir=None, **kwds):
         from http_server import http_server
 
         threading.Thread.__init__ (self, **kwds)
@@ -566,7 +548,7 @@ class http_terminal(threading.Thread):
         self.output_q = output_q
         self.endpoint = endpoint
         self.keep_running = True
-        self.server = http_server(self.input_q, self.output_q, self.endpoint)
+        self.server = http_server(self.input_q, self.output_q, self.endpoint, plot_dir)
         self.start()
 
     def get_terminal_type(self):
@@ -591,7 +573,7 @@ class udp_terminal(threading.Thread):
         self.keepalive_until = 0
 
         self.setup_socket(port)
-        self.q_handler = q_watcher(self.input_q, self.process_qmsg)
+        self.q_handler = msgq_watcher(self.input_q, self.process_qmsg, name="udp_input_q")
         self.start()
 
     def get_terminal_type(self):
@@ -625,14 +607,14 @@ class udp_terminal(threading.Thread):
             self.remote_port = addr[1]
             self.keepalive_until = time.time() + KEEPALIVE_TIME
 
-def op25_terminal(input_q,  output_q, terminal_type):
+def op25_terminal(input_q,  output_q, terminal_type, plot_dir=None):
         if terminal_type == 'curses':
             return curses_terminal(input_q, output_q)
         elif terminal_type[0].isdigit():
             port = int(terminal_type)
             return udp_terminal(input_q, output_q, port)
         elif terminal_type.startswith('http:'):
-            return http_terminal(input_q, output_q, terminal_type.replace('http:', ''))
+            return http_terminal(input_q, output_q, terminal_type.replace('http:', ''), plot_dir)
         else:
             sys.stderr.write('warning: unsupported terminal type: %s\n' % terminal_type)
             return None
@@ -28,9 +28,13 @@ import json
 import codecs
 import ast
 import threading
+import heapq
 from collections import deque
 from helper_funcs import *
 from log_ts import log_ts
+from tag_db import tag_db
+from expiry import expiry_queue
+from trunk_clock import system_clock
 from gnuradio import gr
 import gnuradio.op25_repeater as op25_repeater
 
@@ -47,13 +51,16 @@ EXPIRY_TIMER = 0.2       # Number of seconds between checks for tgid/freq expiry
 PATCH_EXPIRY_TIME = 20.0 # Number of seconds until patch expiry
 CLEANUP_TIMER = 0.5      # Number of seconds between cleanup intervals
 CALL_LOG_MAX_LEN = 10    # Maximum number of call_log entries to retain
+UI_DELTA_SECTIONS = ('frequencies', 'frequency_data', 'patch_data', 'adjacent_data', 'band_plan')  # trunk_update dicts sent as per-entry deltas
 
 #################
 # Helper functions
 
-def meta_update(meta_q, tgid = None, tag = None, rid = None, rtag = None, msgq_id = 0, ts = time.time(), debug = 0):
+def meta_update(meta_q, tgid = None, tag = None, rid = None, rtag = None, msgq_id = 0, ts = None, debug = 0):
     if meta_q is None:
         return
+    if ts is None:
+        ts = time.time()
     d = {'json_type': 'meta_update'}
     d['tgid'] = tgid
     d['tag'] = tag
@@ -68,7 +75,7 @@ def meta_update(meta_q, tgid = None, tag = None, rid = None, rtag = None, msgq_i
         if debug > 10:
             sys.stderr.write("%s [%d] meta_update: dropped[%d] msg: %s\n" % (log_ts.get(), msgq_id, meta_q.count(), json.dumps(d)))
 
-def add_default_tgid(tgs, tgid):
+def add_default_tgid(tgs, tgid, tags_db=None):
     if tgs is None:
         return
     if tgid not in tgs:
@@ -85,8 +92,11 @@ def add_default_tgid(tgs, tgid):
         tgs[tgid]['algid'] = -1
         tgs[tgid]['keyid'] = -1
         tgs[tgid]['receiver'] = None
+        entry = tags_db.get(tgid) if tags_db is not None else None
+        if entry is not None:           # fault in tag and priority from the tags database
+            tgs[tgid]['tag'], tgs[tgid]['prio'] = entry
 
-def add_default_rid(srcids, rid):
+def add_default_rid(srcids, rid, tags_db=None):
     if srcids is None:
         return
     if rid not in srcids:
@@ -95,6 +105,9 @@ def add_default_rid(srcids, rid):
         srcids[rid]['tag'] = ""
         srcids[rid]['time'] = 0
         srcids[rid]['tgs'] = {}
+        entry = tags_db.get(rid) if tags_db is not None else None
+        if entry is not None:           # fault in tag from the tags database
+            srcids[rid]['tag'] = entry[0]
 
 def get_slot(slot):
     if slot is not None:
@@ -108,10 +121,81 @@ def get_tgid(tgid):
     else:
         return ""
 
+#################
+# TSBK/MBT field extractors
+#
+# Each table lists (shift, mask) pairs for the fields of one message format.
+# TSBK field positions are written relative to the full 96 bit tsbk (including
+# crc) to match the specifications, and adjusted once here because the frame
+# assembler delivers tsbks without the crc.  MBT tables apply directly to the
+# header and data words as passed to decode_mbt_data().
+
+def tsbk_fields(*fields):
+    return tuple((shift - 16, mask) for shift, mask in fields)
+
+def extract_fields(val, fields):
+    return [(val >> shift) & mask for shift, mask in fields]
+
+TSBK_MOT_GRG_CMD           = tsbk_fields((64, 0xffff), (48, 0xffff), (32, 0xffff), (16, 0xffff))
+TSBK_GRP_V_CH_GRANT        = tsbk_fields((72, 0xff), (56, 0xffff), (40, 0xffff), (16, 0xffffff))
+TSBK_MOT_GRG_CH_GRANT      = tsbk_fields((56, 0xffff), (40, 0xffff), (16, 0xffffff))
+TSBK_GRP_V_CH_GRANT_UP     = tsbk_fields((64, 0xffff), (48, 0xffff), (32, 0xffff), (16, 0xffff))
+TSBK_GRP_V_CH_GRANT_UP_EXP = tsbk_fields((72, 0xff), (48, 0xffff), (32, 0xffff), (16, 0xffff))
+TSBK_SNDCP_DATA_CH         = tsbk_fields((48, 0xffff), (32, 0xffff))
+TSBK_GRP_AFF_RSP           = tsbk_fields((79, 0x1), (72, 0x3), (56, 0xffff), (40, 0xffff), (16, 0xffffff))
+TSBK_SCCB                  = tsbk_fields((72, 0xff), (64, 0xff), (48, 0xffff), (24, 0xffff))
+TSBK_U_REG_RSP             = tsbk_fields((76, 0x3), (64, 0xfff), (40, 0xffffff), (16, 0xffffff))
+TSBK_U_DE_REG_ACK          = tsbk_fields((52, 0xfffff), (40, 0xfff), (16, 0xffffff))
+TSBK_GRG_EXENC_CMD         = tsbk_fields((79, 0x1), (78, 0x1), (77, 0x1), (72, 0x1f), (56, 0xffff), (40, 0xffff), (16, 0xffffff))
+TSBK_IDEN_UP_VU            = tsbk_fields((76, 0xf), (72, 0xf), (58, 0x3fff), (48, 0x3ff), (16, 0xffffffff))
+TSBK_IDEN_UP_TDMA          = tsbk_fields((76, 0xf), (72, 0xf), (58, 0x3fff), (48, 0x3ff), (16, 0xffffffff))
+TSBK_IDEN_UP               = tsbk_fields((76, 0xf), (67, 0x1ff), (58, 0x1ff), (48, 0x3ff), (16, 0xffffffff))
+TSBK_RFSS_STS_BCST         = tsbk_fields((56, 0xfff), (48, 0xff), (40, 0xff), (24, 0xffff))
+TSBK_NET_STS_BCST          = tsbk_fields((52, 0xfffff), (40, 0xfff), (24, 0xffff))
+TSBK_ADJ_STS_BCST          = tsbk_fields((48, 0xff), (40, 0xff), (24, 0xffff))
+
+MBT_GRP_V_CH_GRANT         = ((64, 0xffff), (48, 0xffff), (32, 0xffff))
+MBT_GRG_CN_GRANT_EXP       = ((80, 0xffff), (64, 0xffff), (48, 0xffff))
+MBT_GRP_AFF_RSP            = ((176, 0xfff), (160, 0xffff), (144, 0xffff), (128, 0xffff), (127, 0x1), (120, 0x3))
+MBT_HDR_SYID_RFID_STID     = ((48, 0xfff), (24, 0xff), (16, 0xff))
+MBT_ADJ_STS_BCST           = ((80, 0xffff), (64, 0xffff))
+MBT_NET_STS_BCST           = ((76, 0xfffff), (56, 0xffff), (40, 0xffff))
+MBT_RFSS_STS_BCST          = ((88, 0xff), (80, 0xff), (64, 0xffff), (48, 0xffff))
+
+SLOTS_PER_CARRIER = (1,1,1,2,4,2,2,2,2,2,2,2,2,2,2,2) # values above 5 are reserved and not valid
+
+# opcode -> p25_system handler method name
+TSBK_HANDLERS = {0x00: 'tsbk_grp_v_ch_grant',
+                 0x01: 'tsbk_mot_grg_del_cmd',
+                 0x02: 'tsbk_grp_v_ch_grant_up',
+                 0x03: 'tsbk_grp_v_ch_grant_up_exp',
+                 0x0b: 'tsbk_mot_bsi_grant',
+                 0x16: 'tsbk_sndcp_data_ch',
+                 0x28: 'tsbk_grp_aff_rsp',
+                 0x29: 'tsbk_sccb_exp',
+                 0x2c: 'tsbk_u_reg_rsp',
+                 0x2f: 'tsbk_u_de_reg_ack',
+                 0x30: 'tsbk_grg_exenc_cmd',
+                 0x33: 'tsbk_iden_up_tdma',
+                 0x34: 'tsbk_iden_up_vu',
+                 0x39: 'tsbk_sccb',
+                 0x3a: 'tsbk_rfss_sts_bcst',
+                 0x3b: 'tsbk_net_sts_bcst',
+                 0x3c: 'tsbk_adj_sts_bcst',
+                 0x3d: 'tsbk_iden_up'}
+
+MBT_HANDLERS  = {0x00: 'mbt_grp_v_ch_grant',
+                 0x02: 'mbt_grg_cn_grant_exp',
+                 0x28: 'mbt_grp_aff_rsp',
+                 0x3a: 'mbt_rfss_sts_bcst',
+                 0x3b: 'mbt_net_sts_bcst',
+                 0x3c: 'mbt_adj_sts_bcst'}
+
 #################
 # Main trunking class
 class rx_ctl(object):
-    def __init__(self, debug=0, frequency_set=None, nbfm_ctrl=None, fa_ctrl=None, chans={}):
+    def __init__(self, debug=0, frequency_set=None, nbfm_ctrl=None, fa_ctrl=None, chans={}, clock=None):
+        self.clock = clock if clock is not None else system_clock()    # time source for all trunking decisions
         self.frequency_set = frequency_set
         self.nbfm_ctrl = nbfm_ctrl
         self.fa_ctrl = fa_ctrl
@@ -119,9 +203,13 @@ class rx_ctl(object):
         self.receivers = {}
         self.systems = {}
         self.chans = chans
-        self.cleanup_timer = time.time()
+        self.cleanup_timer = self.clock.time()
         self.call_log = deque(maxlen=CALL_LOG_MAX_LEN)
         self.call_log_mutex = threading.Lock()
+        self.journal = None         # optional call_journal fed with grants, calls, srcaddrs and patches
+        self.recorder = None        # optional call_recorder told of call starts and ends
+        self.ui_state = {}
+        self.ui_version = 0
 
         for chan in self.chans:
             sysname = chan['sysname']
@@ -173,34 +261,64 @@ class rx_ctl(object):
 
     # process_qmsg is the main message dispatch handler connecting the 'radios' to python
     def process_qmsg(self, msg):
-        curr_time = time.time()
-        m_proto = ctypes.c_int16(msg.type() >> 16).value    # upper 16 bits of msg.type() is signed protocol
-        if m_proto != 0: # P25 m_proto=0
-            return
+        self.process_qmsgs([msg])
+
+    # process_qmsgs handles a batch of messages drained from the receive queue.  Consecutive
+    # signaling messages for the same system are decoded together and voice receiver
+    # assignments are re-evaluated once per batch rather than once per message.
+    def process_qmsgs(self, msgs):
+        for msg in msgs:
+            self.clock.update(msg)
+        curr_time = self.clock.time()
+        updated_systems = []
+        sig_msgs = []
+        sig_sysname = None
+        for msg in msgs:
+            m_proto = ctypes.c_int16(msg.type() >> 16).value    # upper 16 bits of msg.type() is signed protocol
+            if m_proto != 0: # P25 m_proto=0
+                continue
 
-        m_type = ctypes.c_int16(msg.type() & 0xffff).value  # lower 16 bits is p25 duid
-        m_rxid = int(msg.arg1()) >> 1                       # receiver's msgq_id
-        m_ts = float(msg.arg2())                            # receive timestamp from frame_assembler
+            m_type = ctypes.c_int16(msg.type() & 0xffff).value  # lower 16 bits is p25 duid
+            m_rxid = int(msg.arg1()) >> 1                       # receiver's msgq_id
 
-        updated = 0
-        if m_rxid in self.receivers and self.receivers[m_rxid]['rx_rcvr'] is not None:
-            if m_type in [7, 12, 18, 19]:                                                   # send signaling messages to p25_system object
-                updated += self.systems[self.receivers[m_rxid]['sysname']]['system'].process_qmsg(msg, curr_time)
-            else:
-                updated += self.receivers[m_rxid]['rx_rcvr'].process_qmsg(msg, curr_time)   # send in-call messaging to p25_receiver objects
+            if m_rxid not in self.receivers or self.receivers[m_rxid]['rx_rcvr'] is None:
+                continue
+
+            sysname = self.receivers[m_rxid]['sysname']
+            if m_type in [7, 12, 18, 19]:                       # send signaling messages to p25_system object
+                if sig_msgs and sysname != sig_sysname:
+                    if self.systems[sig_sysname]['system'].process_qmsgs(sig_msgs, curr_time) > 0 and sig_sysname not in updated_systems:
+                        updated_systems.append(sig_sysname)
+                    sig_msgs = []
+                sig_msgs.append(msg)
+                sig_sysname = sysname
+                continue
+
+            if sig_msgs:                                        # preserve ordering with respect to in-call messages
+                if self.systems[sig_sysname]['system'].process_qmsgs(sig_msgs, curr_time) > 0 and sig_sysname not in updated_systems:
+                    updated_systems.append(sig_sysname)
+                sig_msgs = []
 
-            if updated > 0:
-                # Check for voice receiver assignments
-                for rx in self.systems[self.receivers[m_rxid]['sysname']]['receivers']:
+            if self.receivers[m_rxid]['rx_rcvr'].process_qmsg(msg, curr_time) > 0 and sysname not in updated_systems:  # send in-call messaging to p25_receiver objects
+                updated_systems.append(sysname)
+
+        if sig_msgs:
+            if self.systems[sig_sysname]['system'].process_qmsgs(sig_msgs, curr_time) > 0 and sig_sysname not in updated_systems:
+                updated_systems.append(sig_sysname)
+
+        if updated_systems:
+            # Check for voice receiver assignments
+            for sysname in updated_systems:
+                for rx in self.systems[sysname]['receivers']:
                     rx.scan_for_talkgroups(curr_time)
 
-                # Check for control channel reassignment
-                self.check_cc_assignments()
+            # Check for control channel reassignment
+            self.check_cc_assignments()
 
         if curr_time > (self.cleanup_timer + CLEANUP_TIMER):
             for rcvr in self.receivers:
                 if self.receivers[rcvr]['rx_rcvr'] is not None:
-                    self.receivers[rcvr]['rx_rcvr'].check_expired_hold(time.time())
+                    self.receivers[rcvr]['rx_rcvr'].check_expired_hold(curr_time)
             self.cleanup_timer = curr_time
 
     # Check for control channel assignments to idle receivers
@@ -225,21 +343,57 @@ class rx_ctl(object):
 
     # ui_command handles all requests from user interface
     def ui_command(self, cmd, data, msgq_id):
-        curr_time = time.time()
+        curr_time = self.clock.time()
         if msgq_id in self.receivers and self.receivers[msgq_id]['rx_rcvr'] is not None:
             self.receivers[msgq_id]['rx_rcvr'].ui_command(cmd = cmd, data = data, curr_time = curr_time)    # Dispatch message to the intended receiver
+            if cmd == 'reload':     # tags belong to the system, so they are reloaded once rather than per receiver
+                self.systems[self.receivers[msgq_id]['sysname']]['system'].reload_tags()
         # Check for control channel reassignment
         self.check_cc_assignments()
 
     def to_json(self):
+        self.update_ui_state()
         d = {'json_type': 'trunk_update'}
-        syid = 0;
-        for system in self.systems:
-            d[syid] = json.loads(self.systems[system]['system'].to_json())
-            syid += 1
+        d.update(self.ui_state)
         d['nac'] = 0
+        d['version'] = self.ui_version
+        return json.dumps(d)
+
+    # to_json_delta sends only what has changed since the previous trunk_update (full or delta).
+    # Clients apply it on top of the state with version == 'base', or ask for a full update
+    # if they have missed one.
+    def to_json_delta(self):
+        base = self.ui_version
+        prev_state = self.update_ui_state()
+        d = {'json_type': 'trunk_update', 'delta': True, 'nac': 0}
+        removed = {}
+        for syid in self.ui_state:
+            if syid not in prev_state:
+                d[syid] = self.ui_state[syid]
+                continue
+            sys_changed, sys_removed = dict_delta(prev_state[syid], self.ui_state[syid], UI_DELTA_SECTIONS)
+            if sys_changed:
+                d[syid] = sys_changed
+            if sys_removed:
+                removed[syid] = sys_removed
+        if len(d) == 3 and not removed:     # nothing changed, version stays the same
+            self.ui_version = base
+        d['removed'] = removed
+        d['base'] = base
+        d['version'] = self.ui_version
         return json.dumps(d)
 
+    def update_ui_state(self):  # returns previous state
+        prev_state = self.ui_state
+        self.ui_state = {}
+        syid = 0
+        for system in self.systems:
+            sys_d = self.systems[system]['system'].to_dict()
+            self.ui_state[syid] = {k: (dict(v) if k in UI_DELTA_SECTIONS else v) for k, v in sys_d.items()}  # sections may be live dicts
+            syid += 1
+        self.ui_version += 1
+        return prev_state
+
     def dump_tgids(self):
         for system in self.systems:
             self.systems[system]['system'].dump_tgids()
@@ -268,6 +422,16 @@ class rx_ctl(object):
             if self.receivers[rcvr]['rx_rcvr'] is not None:
                 self.receivers[rcvr]['rx_rcvr'].set_debug(dbglvl)
 
+    def set_journal(self, journal):
+        self.journal = journal
+
+    def set_recorder(self, recorder):
+        self.recorder = recorder
+
+    def call_end(self, rcvr, reason):
+        if self.recorder is not None:
+            self.recorder.call_end(rcvr, self.clock.time(), reason)
+
     def get_call_log(self):
         d = {'json_type': 'call_log'}
         with self.call_log_mutex:
@@ -276,8 +440,13 @@ class rx_ctl(object):
         return json.dumps(d)
 
     def log_call(self, sysid, rcvr, freq, slot, prio, tgid, tgtag, rid, rtag):
+        curr_time = self.clock.time()
+        if self.journal is not None:
+            self.journal.put('call', curr_time, sysid, rcvr, freq, slot, prio, tgid, tgtag, rid, rtag)
+        if self.recorder is not None:
+            self.recorder.call_start(rcvr, curr_time, sysid, freq, slot, tgid, tgtag, rid, rtag)
         with self.call_log_mutex:
-            self.call_log.append({ "time":    time.time(),
+            self.call_log.append({ "time":    curr_time,
                                    "sysid":   sysid,
                                    "rcvr":    rcvr,
                                    "rcvrtag": from_dict(self.receivers[rcvr]['config'], 'name', ""),
@@ -296,15 +465,27 @@ class p25_system(object):
         self.config = config
         self.debug = debug
         self.rx_ctl = rx_ctl
+        self.clock = rx_ctl.clock if rx_ctl is not None else system_clock()
         self.freq_table = {}
         self.voice_frequencies = {}
+        self.voice_tgids = {}       # reverse index of voice_frequencies: tgid -> {freq: set(slots)}
+        self.freq_expiry = expiry_queue()   # (freq, slot) -> ts + FREQ_EXPIRY_TIME
         self.talkgroups = {}
         self.talkgroups_mutex = threading.Lock()
+        self.active_tgids = []      # heap of [prio, active_since, tgid] for talkgroups with recent grants
+        self.active_since = {}      # tgid -> active_since for talkgroups present in active_tgids
         self.sourceids = {}
         self.sourceid_history = rid_history(self.sourceids, 10)
         self.patches = {}
         self.patches_mutex = threading.Lock()
-        self.blacklist = {}
+        self.patches_version = 0    # bumped whenever patch membership changes
+        self.patch_expiry = expiry_queue()  # sg -> ts + PATCH_EXPIRY_TIME
+        self.tags_version = 0       # bumped whenever talkgroup or radio id tags are (re)loaded
+        self.tgid_db = None         # tags databases, when configured tags are looked up on first use
+        self.rid_db = None
+        self.ui_freq_cache = {}     # freq -> (display inputs, frequencies string, frequency_data dict)
+        self.ui_patch_cache = (None, {})
+        self.blacklist = interval_set()
         self.whitelist = None
         self.crypt_behavior = 1
         self.crypt_keys = {}
@@ -334,16 +515,27 @@ class p25_system(object):
         self.last_expiry_check = 0.0
         self.stats = {}
         self.stats['tsbk_count'] = 0
+        self.tsbk_handlers = {op: getattr(self, TSBK_HANDLERS[op]) for op in TSBK_HANDLERS}
+        self.mbt_handlers = {op: getattr(self, MBT_HANDLERS[op]) for op in MBT_HANDLERS}
 
         sys.stderr.write("%s [%s] Initializing P25 system\n" % (log_ts.get(), self.sysname))
 
+        tags_db = from_dict(self.config, 'tags_db', "")
         if 'tgid_tags_file' in self.config and self.config['tgid_tags_file'] != "":
             sys.stderr.write("%s [%s] reading system tgid_tags_file: %s\n" % (log_ts.get(), self.sysname, self.config['tgid_tags_file']))
-            self.read_tags_file(self.config['tgid_tags_file'])
+            if tags_db != "":
+                self.tgid_db = tag_db(tags_db, 'tgid_tags', self.config['tgid_tags_file'], TGID_DEFAULT_PRIO, self.sysname)
+                self.tgid_db.sync()
+            else:
+                self.read_tags_file(self.config['tgid_tags_file'])
 
         if 'rid_tags_file' in self.config and self.config['rid_tags_file'] != "":
             sys.stderr.write("%s [%s] reading system rid_tags_file: %s\n" % (log_ts.get(), self.sysname, self.config['rid_tags_file']))
-            self.read_rids_file(self.config['rid_tags_file'])
+            if tags_db != "":
+                self.rid_db = tag_db(tags_db, 'rid_tags', self.config['rid_tags_file'], None, self.sysname)
+                self.rid_db.sync()
+            else:
+                self.read_rids_file(self.config['rid_tags_file'])
 
         if 'blacklist' in self.config and self.config['blacklist'] != "":
             sys.stderr.write("%s [%s] reading system blacklist file: %s\n" % (log_ts.get(), self.sysname, self.config['blacklist']))
@@ -459,6 +651,7 @@ class p25_system(object):
                         sys.stderr.write("%s [%s] setting tgid(%d), prio(%d), tag(%s)\n" % (log_ts.get(), self.sysname, tgid, prio, tag))
         except (IOError) as ex:
             sys.stderr.write("read_tags_file: exception %s\n" % ex)
+        self.tags_version += 1
 
     def read_rids_file(self, tags_file):
         import csv
@@ -487,6 +680,28 @@ class p25_system(object):
                         sys.stderr.write("%s [%s] setting rid(%d), tag(%s)\n" % (log_ts.get(), self.sysname, rid, tag))
         except (IOError) as ex:
             sys.stderr.write("read_rid_file: exception %s\n" % ex)
+        self.tags_version += 1
+
+    def reload_tags(self):
+        # apply changes in the tags files to the talkgroups and radio ids already in use
+        changes = 0
+        if self.tgid_db is not None:
+            changed = self.tgid_db.sync()
+            changes += len(changed)
+            with self.talkgroups_mutex:
+                for tgid in changed:
+                    if tgid in self.talkgroups:
+                        entry = self.tgid_db.get(tgid)
+                        self.talkgroups[tgid]['tag'], self.talkgroups[tgid]['prio'] = entry if entry is not None else ("", TGID_DEFAULT_PRIO)
+        if self.rid_db is not None:
+            changed = self.rid_db.sync()
+            changes += len(changed)
+            for rid in changed:
+                if rid in self.sourceids:
+                    entry = self.rid_db.get(rid)
+                    self.sourceids[rid]['tag'] = entry[0] if entry is not None else ""
+        if changes > 0:
+            self.tags_version += 1
 
     def get_cc(self, msgq_id):
         if msgq_id is None:
@@ -551,6 +766,34 @@ class p25_system(object):
         return True
 
     def process_qmsg(self, msg, curr_time):
+        updated = self.decode_signaling(msg, curr_time)
+        updated += self.expire_patches()
+        return updated
+
+    def process_qmsgs(self, msgs, curr_time):
+        # batch form of process_qmsg; runs of tsbks from the same receiver are decoded in one call
+        updated = 0
+        tsbks = []
+        tsbk_rxid = None
+        for msg in msgs:
+            m_rxid = int(msg.arg1()) >> 1
+            m_type = ctypes.c_int16(msg.type() & 0xffff).value
+            if tsbks and (m_type != 7 or m_rxid != tsbk_rxid):
+                updated += self.decode_tsbk_batch(tsbk_rxid, tsbks)
+                tsbks = []
+            if m_type == 7:
+                s = msg.to_string()
+                self.set_nac(get_ordinals(s[:2]))
+                tsbks.append(get_ordinals(s[2:]))
+                tsbk_rxid = m_rxid
+            else:
+                updated += self.decode_signaling(msg, curr_time)
+        if tsbks:
+            updated += self.decode_tsbk_batch(tsbk_rxid, tsbks)
+        updated += self.expire_patches()
+        return updated
+
+    def decode_signaling(self, msg, curr_time):
         s = msg.to_string()
         m_rxid = int(msg.arg1()) >> 1                       # receiver's msgq_id
         m_type = ctypes.c_int16(msg.type() & 0xffff).value  # lower 16 bits is p25 duid
@@ -583,395 +826,348 @@ class p25_system(object):
         elif m_type == 19:                                  # FDMA LCW
             updated += self.decode_fdma_lcw(m_rxid, s, curr_time)
 
-        updated += self.expire_patches()
         return updated
 
     def decode_mbt_data(self, m_rxid, opcode, src, header, mbt_data):
         self.cc_timeouts = 0
-        self.last_tsbk = time.time()
+        self.last_tsbk = self.clock.time()
         self.stats['tsbk_count'] += 1
-        updated = 0
-        if opcode == 0x0:  # grp voice channel grant
-            opts = (header >> 8)    & 0xff
-            ch1  = (mbt_data >> 64) & 0xffff
-            ch2  = (mbt_data >> 48) & 0xffff
-            ga   = (mbt_data >> 32) & 0xffff
-            f = self.channel_id_to_frequency(ch1)
-            self.update_voice_frequency(f, tgid=ga, tdma_slot=self.get_tdma_slot(ch1), srcaddr=src, svcopts=opts)
-            if f:
-                updated += 1
-            if self.debug >= 10:
-                sys.stderr.write('%s [%d] mbt(0x00) grp_v_ch__grant: opts: 0x%02x ch1: %x ch2: %x ga: %d\n' %(log_ts.get(), m_rxid, opts, ch1, ch2, ga))
-        elif opcode == 0x02: # grp regroup voice channel grant
-            mfrid  = (mbt_data >> 168) & 0xff
-            if mfrid == 0x90:    # MOT_GRG_CN_GRANT_EXP
-                ch1  = (mbt_data >> 80) & 0xffff
-                ch2  = (mbt_data >> 64) & 0xffff
-                sg   = (mbt_data >> 48) & 0xffff
-                f = self.channel_id_to_frequency(ch1)
-                self.update_voice_frequency(f, tgid=sg, tdma_slot=self.get_tdma_slot(ch1), srcaddr=src)
-                if f:
-                    updated += 1
-                if self.debug >= 10:
-                    sys.stderr.write('%s [%d] mbt(0x02) mfid90_grg_cn_grant_exp: ch1: %x ch2: %x sg: %d\n' % (log_ts.get(), m_rxid, ch1, ch2, ga))
-        elif opcode == 0x28:  # grp_aff_rsp
-            ta    = src
-            mfrid = (header >> 56) & 0xff
-            wacn  = ((header << 4) & 0xffff0) + ((mbt_data >> 188) & 0xf) 
-            syid  = (mbt_data >> 176) & 0xfff
-            gid   = (mbt_data >> 160) & 0xffff
-            aga   = (mbt_data >> 144) & 0xffff
-            ga    = (mbt_data >> 128) & 0xffff
-            lg    = (mbt_data >> 127) & 0x1
-            gav   = (mbt_data >> 120) & 0x3
-            if self.debug >= 10:
-                sys.stderr.write('%s [%d] mbt(0x28) grp_aff_rsp: mfrid: 0x%x wacn: 0x%x syid: 0x%x lg: %d gav: %d aga: %d ga: %d ta: %d\n\n' %(log_ts.get(), m_rxid, mfrid, wacn, syid, lg, gav, aga, ga, ta))
-        elif opcode == 0x3c:  # adjacent status
-            syid = (header >> 48) & 0xfff
-            rfid = (header >> 24) & 0xff
-            stid = (header >> 16) & 0xff
-            ch1  = (mbt_data >> 80) & 0xffff
-            ch2  = (mbt_data >> 64) & 0xffff
-            f1 = self.channel_id_to_frequency(ch1)
-            f2 = self.channel_id_to_frequency(ch2)
-            if f1 and f2:
-                self.adjacent[f1] = 'rfid: %d stid:%d uplink:%f' % (rfid, stid, f2 / 1000000.0)
-                self.adjacent_data[f1] = {'rfid': rfid, 'stid':stid, 'uplink': f2, 'table': None}
-            if self.debug >= 10:
-                sys.stderr.write('%s [%d] mbt(0x3c) adj_sts_bcst: syid: %x rfid: %x stid: %x ch1: %x ch2: %x f1: %s f2: %s\n' % (log_ts.get(), m_rxid, syid, rfid, stid, ch1, ch2, self.channel_id_to_string(ch1), self.channel_id_to_string(ch2)))
-        elif opcode == 0x3b:  # network status
-            syid = (header >> 48) & 0xfff
-            wacn = (mbt_data >> 76) & 0xfffff
-            ch1  = (mbt_data >> 56) & 0xffff
-            ch2  = (mbt_data >> 40) & 0xffff
-            f1 = self.channel_id_to_frequency(ch1)
-            f2 = self.channel_id_to_frequency(ch2)
-            if f1 and f2:
-                self.ns_syid = syid
-                self.ns_wacn = wacn
-                self.ns_chan = f1
-                self.ns_valid = True
-            if self.debug >= 10:
-                sys.stderr.write('%s [%d] mbt(0x3b) net_sts_bcst: sys: %x wacn: %x ch1: %s ch2: %s\n' %(log_ts.get(), m_rxid, syid, wacn, self.channel_id_to_string(ch1), self.channel_id_to_string(ch2)))
-        elif opcode == 0x3a:  # rfss status
-            syid = (header >> 48) & 0xfff
-            rfid = (mbt_data >> 88) & 0xff
-            stid = (mbt_data >> 80) & 0xff
-            ch1  = (mbt_data >> 64) & 0xffff
-            ch2  = (mbt_data >> 48) & 0xffff
-            f1 = self.channel_id_to_frequency(ch1)
-            f2 = self.channel_id_to_frequency(ch2)
-            if f1 and f2:
-                self.rfss_syid = syid
-                self.rfss_rfid = rfid
-                self.rfss_stid = stid
-                self.rfss_chan = f1
-                self.rfss_txchan = f2
-                add_unique_freq(self.cc_list, f1)
-            if self.debug >= 10:
-                sys.stderr.write('%s [%d] mbt(0x3a) rfss_sts_bcst: sys: %x rfid: %x stid: %x ch1: %s ch2: %s\n' %(log_ts.get(), m_rxid, syid, rfid, stid, self.channel_id_to_string(ch1), self.channel_id_to_string(ch2)))
-        else:
+        handler = self.mbt_handlers.get(opcode)
+        if handler is None:
             if self.debug >= 10:
                 sys.stderr.write('%s [%d] mbt(0x%02x) unhandled: %x\n' %(log_ts.get(), m_rxid, opcode, mbt_data))
-        return updated
+            return 0
+        return handler(m_rxid, src, header, mbt_data)
+
+    def mbt_grp_v_ch_grant(self, m_rxid, src, header, mbt_data):         # mbt(0x00)
+        opts = (header >> 8) & 0xff
+        ch1, ch2, ga = extract_fields(mbt_data, MBT_GRP_V_CH_GRANT)
+        f = self.channel_id_to_frequency(ch1)
+        self.update_voice_frequency(f, tgid=ga, tdma_slot=self.get_tdma_slot(ch1), srcaddr=src, svcopts=opts)
+        if self.debug >= 10:
+            sys.stderr.write('%s [%d] mbt(0x00) grp_v_ch__grant: opts: 0x%02x ch1: %x ch2: %x ga: %d\n' %(log_ts.get(), m_rxid, opts, ch1, ch2, ga))
+        return 1 if f else 0
+
+    def mbt_grg_cn_grant_exp(self, m_rxid, src, header, mbt_data):       # mbt(0x02)
+        if ((mbt_data >> 168) & 0xff) != 0x90:  # MOT_GRG_CN_GRANT_EXP
+            return 0
+        ch1, ch2, sg = extract_fields(mbt_data, MBT_GRG_CN_GRANT_EXP)
+        f = self.channel_id_to_frequency(ch1)
+        self.update_voice_frequency(f, tgid=sg, tdma_slot=self.get_tdma_slot(ch1), srcaddr=src)
+        if self.debug >= 10:
+            sys.stderr.write('%s [%d] mbt(0x02) mfid90_grg_cn_grant_exp: ch1: %x ch2: %x sg: %d\n' % (log_ts.get(), m_rxid, ch1, ch2, sg))
+        return 1 if f else 0
+
+    def mbt_grp_aff_rsp(self, m_rxid, src, header, mbt_data):            # mbt(0x28)
+        if self.debug >= 10:
+            mfrid = (header >> 56) & 0xff
+            wacn  = ((header << 4) & 0xffff0) + ((mbt_data >> 188) & 0xf)
+            syid, gid, aga, ga, lg, gav = extract_fields(mbt_data, MBT_GRP_AFF_RSP)
+            sys.stderr.write('%s [%d] mbt(0x28) grp_aff_rsp: mfrid: 0x%x wacn: 0x%x syid: 0x%x lg: %d gav: %d aga: %d ga: %d ta: %d\n\n' %(log_ts.get(), m_rxid, mfrid, wacn, syid, lg, gav, aga, ga, src))
+        return 0
+
+    def mbt_adj_sts_bcst(self, m_rxid, src, header, mbt_data):           # mbt(0x3c)
+        syid, rfid, stid = extract_fields(header, MBT_HDR_SYID_RFID_STID)
+        ch1, ch2 = extract_fields(mbt_data, MBT_ADJ_STS_BCST)
+        f1 = self.channel_id_to_frequency(ch1)
+        f2 = self.channel_id_to_frequency(ch2)
+        if f1 and f2:
+            self.adjacent[f1] = 'rfid: %d stid:%d uplink:%f' % (rfid, stid, f2 / 1000000.0)
+            self.adjacent_data[f1] = {'rfid': rfid, 'stid':stid, 'uplink': f2, 'table': None}
+        if self.debug >= 10:
+            sys.stderr.write('%s [%d] mbt(0x3c) adj_sts_bcst: syid: %x rfid: %x stid: %x ch1: %x ch2: %x f1: %s f2: %s\n' % (log_ts.get(), m_rxid, syid, rfid, stid, ch1, ch2, self.channel_id_to_string(ch1), self.channel_id_to_string(ch2)))
+        return 0
+
+    def mbt_net_sts_bcst(self, m_rxid, src, header, mbt_data):           # mbt(0x3b)
+        syid = (header >> 48) & 0xfff
+        wacn, ch1, ch2 = extract_fields(mbt_data, MBT_NET_STS_BCST)
+        f1 = self.channel_id_to_frequency(ch1)
+        f2 = self.channel_id_to_frequency(ch2)
+        if f1 and f2:
+            self.ns_syid = syid
+            self.ns_wacn = wacn
+            self.ns_chan = f1
+            self.ns_valid = True
+        if self.debug >= 10:
+            sys.stderr.write('%s [%d] mbt(0x3b) net_sts_bcst: sys: %x wacn: %x ch1: %s ch2: %s\n' %(log_ts.get(), m_rxid, syid, wacn, self.channel_id_to_string(ch1), self.channel_id_to_string(ch2)))
+        return 0
+
+    def mbt_rfss_sts_bcst(self, m_rxid, src, header, mbt_data):          # mbt(0x3a)
+        syid = (header >> 48) & 0xfff
+        rfid, stid, ch1, ch2 = extract_fields(mbt_data, MBT_RFSS_STS_BCST)
+        f1 = self.channel_id_to_frequency(ch1)
+        f2 = self.channel_id_to_frequency(ch2)
+        if f1 and f2:
+            self.rfss_syid = syid
+            self.rfss_rfid = rfid
+            self.rfss_stid = stid
+            self.rfss_chan = f1
+            self.rfss_txchan = f2
+            add_unique_freq(self.cc_list, f1)
+        if self.debug >= 10:
+            sys.stderr.write('%s [%d] mbt(0x3a) rfss_sts_bcst: sys: %x rfid: %x stid: %x ch1: %s ch2: %s\n' %(log_ts.get(), m_rxid, syid, rfid, stid, self.channel_id_to_string(ch1), self.channel_id_to_string(ch2)))
+        return 0
 
     def decode_tsbk(self, m_rxid, tsbk):
         self.cc_timeouts = 0
-        self.last_tsbk = time.time()
+        self.last_tsbk = self.clock.time()
         self.stats['tsbk_count'] += 1
-        updated = 0
-        tsbk = tsbk << 16    # for missing crc
-        opcode = (tsbk >> 88) & 0x3f
-        if opcode == 0x00:   # group voice chan grant
-            mfrid  = (tsbk >> 80) & 0xff
-            if mfrid == 0x90:    # MOT_GRG_ADD_CMD
-                sg   = (tsbk >> 64) & 0xffff
-                ga1  = (tsbk >> 48) & 0xffff
-                ga2  = (tsbk >> 32) & 0xffff
-                ga3  = (tsbk >> 16) & 0xffff
-                if self.debug >= 10:
-                    sys.stderr.write('%s [%d] tsbk(0x00) mfid90_grg_add_cmd: sg: %d ga1: %d ga2: %d ga3: %d\n' % (log_ts.get(), m_rxid, sg, ga1, ga2, ga3))
-                self.add_patch(sg, [ga1, ga2, ga3])
-            else:
-                opts = (tsbk >> 72) & 0xff
-                ch   = (tsbk >> 56) & 0xffff
-                ga   = (tsbk >> 40) & 0xffff
-                sa   = (tsbk >> 16) & 0xffffff
-                f = self.channel_id_to_frequency(ch)
-                self.update_voice_frequency(f, tgid=ga, tdma_slot=self.get_tdma_slot(ch), srcaddr=sa, svcopts=opts)
-                if f:
-                    updated += 1
-                if self.debug >= 10:
-                    sys.stderr.write('%s [%d] tsbk(0x00) grp_v_ch_grant: opts: 0x%02x freq: %s ga: %d sa: %d\n' % (log_ts.get(), m_rxid, opts, self.channel_id_to_string(ch), ga, sa))
-        elif opcode == 0x01:   # reserved
-            mfrid  = (tsbk >> 80) & 0xff
-            if mfrid == 0x90: #MOT_GRG_DEL_CMD
-                sg   = (tsbk >> 64) & 0xffff
-                ga1  = (tsbk >> 48) & 0xffff
-                ga2  = (tsbk >> 32) & 0xffff
-                ga3  = (tsbk >> 16) & 0xffff
-                if self.debug >= 10:
-                    sys.stderr.write('%s [%d] tsbk(0x01) mfid90_grg_del_cmd: sg: %d ga1: %d ga2: %d ga3: %d\n' % (log_ts.get(), m_rxid, sg, ga1, ga2, ga3))
-                self.del_patch(sg, [ga1, ga2, ga3])
-        elif opcode == 0x02:   # group voice chan grant update
-            mfrid  = (tsbk >> 80) & 0xff
-            if mfrid == 0x90:
-                ch  = (tsbk >> 56) & 0xffff
-                sg  = (tsbk >> 40) & 0xffff
-                sa  = (tsbk >> 16) & 0xffffff
-                f = self.channel_id_to_frequency(ch)
-                self.update_voice_frequency(f, tgid=sg, tdma_slot=self.get_tdma_slot(ch), srcaddr=sa)
-                if f:
-                    updated += 1
-                if self.debug >= 10:
-                    sys.stderr.write('%s [%d] tsbk(0x02) mfid90_grg_ch_grant: freq: %s sg: %d sa: %d\n' % (log_ts.get(), m_rxid, self.channel_id_to_string(ch), sg, sa))
-            else:
-                ch1  = (tsbk >> 64) & 0xffff
-                ga1  = (tsbk >> 48) & 0xffff
-                ch2  = (tsbk >> 32) & 0xffff
-                ga2  = (tsbk >> 16) & 0xffff
-                f1 = self.channel_id_to_frequency(ch1)
-                f2 = self.channel_id_to_frequency(ch2)
-                self.update_voice_frequency(f1, tgid=ga1, tdma_slot=self.get_tdma_slot(ch1))
-                if f1 != f2:
-                    self.update_voice_frequency(f2, tgid=ga2, tdma_slot=self.get_tdma_slot(ch2))
-                if f1:
-                    updated += 1
-                if f2:
-                    updated += 1
-                if self.debug >= 10:
-                    sys.stderr.write('%s [%d] tsbk(0x02) grp_v_ch_grant_up: ch1: %s ga1: %d ch2: %s ga2: %d\n' %(log_ts.get(), m_rxid, self.channel_id_to_string(ch1), ga1, self.channel_id_to_string(ch2), ga2))
-        elif opcode == 0x03:   # group voice chan grant update exp : TIA.102-AABC-B-2005 page 56
-            mfrid  = (tsbk >> 80) & 0xff
-            if mfrid == 0x90: #MOT_GRG_CN_GRANT_UPDT
-                ch1  = (tsbk >> 64) & 0xffff
-                sg1  = (tsbk >> 48) & 0xffff
-                ch2  = (tsbk >> 32) & 0xffff
-                sg2  = (tsbk >> 16) & 0xffff
-                f1 = self.channel_id_to_frequency(ch1)
-                f2 = self.channel_id_to_frequency(ch2)
-                self.update_voice_frequency(f1, tgid=sg1, tdma_slot=self.get_tdma_slot(ch1))
-                if f1 != f2:
-                    self.update_voice_frequency(f2, tgid=sg2, tdma_slot=self.get_tdma_slot(ch2))
-                if f1:
-                    updated += 1
-                if f2:
-                    updated += 1
-                if self.debug >= 10:
-                    sys.stderr.write('%s [%d] tsbk(0x03) mfid90_grg_ch_grant_up: freq1: %s sg1: %d freq2: %s sg2:%d\n' % (log_ts.get(), m_rxid, self.channel_id_to_string(ch1), sg1, self.channel_id_to_string(ch2), sg2))
-            elif mfrid == 0:
-                opts = (tsbk >> 72) & 0xff
-                ch1  = (tsbk >> 48) & 0xffff
-                ch2   = (tsbk >> 32) & 0xffff
-                ga  = (tsbk >> 16) & 0xffff
-                f = self.channel_id_to_frequency(ch1)
-                self.update_voice_frequency(f, tgid=ga, tdma_slot=self.get_tdma_slot(ch1), svcopts=opts)
-                if f:
-                    updated += 1
-                if self.debug >= 10:
-                    sys.stderr.write('%s [%d] tsbk(0x03) grp_v_ch_grant_up_exp: opts: 0x%02x freq-t: %s freq-r: %s ga: %d\n' % (log_ts.get(), m_rxid, opts, self.channel_id_to_string(ch1), self.channel_id_to_string(ch2), ga))
-        elif opcode == 0x0b:
-            mfrid  = (tsbk >> 80) & 0xff
-            if mfrid == 0x90: # MFID90 MOT_BSI_GRANT
-                bsi = ""
-                i = 74
-                while (i >= 32):
-                    bsi_char = (tsbk >> i) & 0x3f
-                    if bsi_char != 0x00:
-                        bsi += chr(bsi_char + 43)
-                    i -= 6
-                ch  = (tsbk >> 16) & 0xffff
-                if bsi != "": # Save bsi only if non-null
-                    self.callsign = bsi
-                    if self.debug >= 10:
-                        sys.stderr.write('%s [%d] tsbk(0x0b) mot_bsi_grant: bsi: %s ch: %x(%s)\n' % (log_ts.get(), m_rxid, bsi, ch, self.channel_id_to_string(ch)))
-        elif opcode == 0x16:   # sndcp data ch
-            ch1  = (tsbk >> 48) & 0xffff
-            ch2  = (tsbk >> 32) & 0xffff
+        opcode = (tsbk >> 72) & 0x3f    # tsbk arrives without crc; field positions in tables are pre-adjusted
+        handler = self.tsbk_handlers.get(opcode)
+        if handler is None:
             if self.debug >= 10:
-                sys.stderr.write('%s [%d] tsbk(0x16) sndcp_data_ch: ch1: %x ch2: %x\n' % (log_ts.get(), m_rxid, ch1, ch2))
-        elif opcode == 0x28:   # grp_aff_rsp
-            mfrid  = (tsbk >> 80) & 0xff
-            lg     = (tsbk >> 79) & 0x01
-            gav    = (tsbk >> 72) & 0x03
-            aga    = (tsbk >> 56) & 0xffff
-            ga     = (tsbk >> 40) & 0xffff
-            ta     = (tsbk >> 16) & 0xffffff
-            if self.debug >= 10:
-                sys.stderr.write('%s [%d] tsbk(0x28) grp_aff_rsp: mfid: 0x%x gav: %d aga: %d ga: %d ta: %d\n' % (log_ts.get(), m_rxid, mfrid, gav, aga, ga, ta))
-        elif opcode == 0x29:   # secondary cc explicit form
-            mfrid = (tsbk >> 80) & 0xff
-            rfid  = (tsbk >> 72) & 0xff
-            stid  = (tsbk >> 64) & 0xff
-            ch1   = (tsbk >> 48) & 0xffff
-            ch2   = (tsbk >> 24) & 0xffff
-            f1 = self.channel_id_to_frequency(ch1)
-            if f1:
-                self.secondary[ f1 ] = 1
-                sorted_freqs = collections.OrderedDict(sorted(self.secondary.items()))
-                self.secondary = sorted_freqs
-                add_unique_freq(self.cc_list, f1)
-            if self.debug >= 10:
-                sys.stderr.write('%s [%d] tsbk(0x29) sccb_exp: rfid: %x stid: %d ch1: %x(%s) ch2: %x(%s)\n' %(log_ts.get(), m_rxid, rfid, stid, ch1, self.channel_id_to_string(ch1), ch2, self.channel_id_to_string(ch2)))
-        elif opcode == 0x2c:   # u_reg_rsp
-            mfrid  = (tsbk >> 80) & 0xff
-            rv     = (tsbk >> 76) & 0x3
-            syid   = (tsbk >> 64) & 0xfff
-            sid    = (tsbk >> 40) & 0xffffff
-            sa     = (tsbk >> 16) & 0xffffff
-            if self.debug >= 10:
-                sys.stderr.write('%s [%d] tsbk(0x2c) u_reg_rsp: mfid: 0x%x rv: %d syid: 0x%x sid: %d sa: %d\n' % (log_ts.get(), m_rxid, mfrid, rv, syid, sid, sa))
-        elif opcode == 0x2f:   # u_de_reg_ack
-            mfrid  = (tsbk >> 80) & 0xff
-            wacn   = (tsbk >> 52) & 0xfffff
-            syid   = (tsbk >> 40) & 0xfff
-            sid    = (tsbk >> 16) & 0xffffff
-            if self.debug >= 10:
-                sys.stderr.write('%s [%d] tsbk(0x2f) u_de_reg_ack: mfid: 0x%x wacn: 0x%x syid: 0x%x sid: %d\n' % (log_ts.get(), m_rxid, mfrid, wacn, syid, sid))
-        elif opcode == 0x30:
-            mfrid  = (tsbk >> 80) & 0xff
-            if mfrid == 0xA4:  # GRG_EXENC_CMD
-                grg_t   = (tsbk >> 79) & 0x1
-                grg_g   = (tsbk >> 78) & 0x1
-                grg_a   = (tsbk >> 77) & 0x1
-                grg_ssn = (tsbk >> 72) & 0x1f # TODO: SSN should be stored and checked
-                sg      = (tsbk >> 56) & 0xffff
-                keyid   = (tsbk >> 40) & 0xffff
-                rta     = (tsbk >> 16) & 0xffffff
-                if self.debug >= 10:
-                    sys.stderr.write('%s [%d] tsbk(0x30) grg_exenc_cmd: grg_t: %d grg_g: %d, grg_a: %d, grg_ssn: %d, sg: %d, keyid: %d, rta: %d\n' % (log_ts.get(), m_rxid, grg_t, grg_g, grg_a, grg_ssn, sg, keyid, rta))
-                if grg_a == 1: # Activate
-                    if grg_g == 1: # Group request
-                        algid = (rta >> 16) & 0xff
-                        ga    =  rta        & 0xffff
-                        self.add_patch(sg, [ga])
-                    else:          # Unit request (currently unhandled)
-                        pass
-                else:          # Deactivate
-                    if grg_g == 1: # Group request
-                        algid = (rta >> 16) & 0xff
-                        ga    =  rta        & 0xffff
-                        self.del_patch(sg, [sg])
-                    else:          # Unit request (currently unhandled)
-                        pass
-        elif opcode == 0x34:   # iden_up vhf uhf
-            iden = (tsbk >> 76) & 0xf
-            bwvu = (tsbk >> 72) & 0xf
-            toff0 = (tsbk >> 58) & 0x3fff
-            spac = (tsbk >> 48) & 0x3ff
-            freq = (tsbk >> 16) & 0xffffffff
-            toff_sign = (toff0 >> 13) & 1
-            toff = toff0 & 0x1fff
-            if toff_sign == 0:
-                toff = 0 - toff
-            txt = ["mob Tx-", "mob Tx+"]
-            self.freq_table[iden] = {}
-            self.freq_table[iden]['offset'] = toff * spac * 125
-            self.freq_table[iden]['step'] = spac * 125
-            self.freq_table[iden]['frequency'] = freq * 5
+                sys.stderr.write('%s [%d] tsbk(0x%02x) unhandled: 0x%024x\n' % (log_ts.get(), m_rxid, opcode, tsbk << 16))
+            return 0
+        return handler(m_rxid, (tsbk >> 64) & 0xff, tsbk)
+
+    def decode_tsbk_batch(self, m_rxid, tsbks):
+        # decode a list of tsbks received on the same receiver; bookkeeping is done once per batch
+        if not tsbks:
+            return 0
+        self.cc_timeouts = 0
+        self.last_tsbk = self.clock.time()
+        self.stats['tsbk_count'] += len(tsbks)
+        updated = 0
+        handlers = self.tsbk_handlers
+        for tsbk in tsbks:
+            opcode = (tsbk >> 72) & 0x3f
+            handler = handlers.get(opcode)
+            if handler is not None:
+                updated += handler(m_rxid, (tsbk >> 64) & 0xff, tsbk)
+            elif self.debug >= 10:
+                sys.stderr.write('%s [%d] tsbk(0x%02x) unhandled: 0x%024x\n' % (log_ts.get(), m_rxid, opcode, tsbk << 16))
+        return updated
+
+    def tsbk_grp_v_ch_grant(self, m_rxid, mfrid, tsbk):                  # tsbk(0x00)
+        if mfrid == 0x90:    # MOT_GRG_ADD_CMD
+            sg, ga1, ga2, ga3 = extract_fields(tsbk, TSBK_MOT_GRG_CMD)
             if self.debug >= 10:
-                sys.stderr.write('%s [%d] tsbk(0x34) iden_up_vu: id: %d toff: %f spac: %f freq: %f [%s]\n' % (log_ts.get(), m_rxid, iden, toff * spac * 0.125 * 1e-3, spac * 0.125, freq * 0.000005, txt[toff_sign]))
-        elif opcode == 0x33:   # iden_up_tdma
-            mfrid  = (tsbk >> 80) & 0xff
-            if mfrid == 0:
-                iden = (tsbk >> 76) & 0xf
-                channel_type = (tsbk >> 72) & 0xf
-                toff0 = (tsbk >> 58) & 0x3fff
-                spac = (tsbk >> 48) & 0x3ff
-                toff_sign = (toff0 >> 13) & 1
-                toff = toff0 & 0x1fff
-                if toff_sign == 0:
-                    toff = 0 - toff
-                f1   = (tsbk >> 16) & 0xffffffff
-                slots_per_carrier = [1,1,1,2,4,2,2,2,2,2,2,2,2,2,2,2] # values above 5 are reserved and not valid
-                self.freq_table[iden] = {}
-                self.freq_table[iden]['offset'] = toff * spac * 125
-                self.freq_table[iden]['step'] = spac * 125
-                self.freq_table[iden]['frequency'] = f1 * 5
-                self.freq_table[iden]['tdma'] = slots_per_carrier[channel_type]
-                if self.debug >= 10:
-                    sys.stderr.write('%s [%d] tsbk(0x33) iden_up_tdma: id: %d freq: %f toff: %f spac: %f slots/carrier: %d\n' % (log_ts.get(), m_rxid, iden, self.freq_table[iden]['frequency']/1e6, self.freq_table[iden]['offset']/1e6, self.freq_table[iden]['step']/1e3, self.freq_table[iden]['tdma']))
-        elif opcode == 0x3d:   # iden_up
-            iden = (tsbk >> 76) & 0xf
-            bw   = (tsbk >> 67) & 0x1ff
-            toff0 = (tsbk >> 58) & 0x1ff
-            spac = (tsbk >> 48) & 0x3ff
-            freq = (tsbk >> 16) & 0xffffffff
-            toff_sign = (toff0 >> 8) & 1
-            toff = toff0 & 0xff
-            if toff_sign == 0:
-                toff = 0 - toff
-            txt = ["mob xmit < recv", "mob xmit > recv"]
-            self.freq_table[iden] = {}
-            self.freq_table[iden]['offset'] = toff * 250000
-            self.freq_table[iden]['step'] = spac * 125
-            self.freq_table[iden]['frequency'] = freq * 5
+                sys.stderr.write('%s [%d] tsbk(0x00) mfid90_grg_add_cmd: sg: %d ga1: %d ga2: %d ga3: %d\n' % (log_ts.get(), m_rxid, sg, ga1, ga2, ga3))
+            self.add_patch(sg, [ga1, ga2, ga3])
+            return 0
+        opts, ch, ga, sa = extract_fields(tsbk, TSBK_GRP_V_CH_GRANT)
+        f = self.channel_id_to_frequency(ch)
+        self.update_voice_frequency(f, tgid=ga, tdma_slot=self.get_tdma_slot(ch), srcaddr=sa, svcopts=opts)
+        if self.debug >= 10:
+            sys.stderr.write('%s [%d] tsbk(0x00) grp_v_ch_grant: opts: 0x%02x freq: %s ga: %d sa: %d\n' % (log_ts.get(), m_rxid, opts, self.channel_id_to_string(ch), ga, sa))
+        return 1 if f else 0
+
+    def tsbk_mot_grg_del_cmd(self, m_rxid, mfrid, tsbk):                 # tsbk(0x01)
+        if mfrid == 0x90:    # MOT_GRG_DEL_CMD
+            sg, ga1, ga2, ga3 = extract_fields(tsbk, TSBK_MOT_GRG_CMD)
             if self.debug >= 10:
-                sys.stderr.write('%s [%d] tsbk(0x3d) iden_up id: %d toff: %f spac: %f freq: %f\n' % (log_ts.get(), m_rxid, iden, toff * 0.25, spac * 0.125, freq * 0.000005))
-        elif opcode == 0x3a:   # rfss status
-            syid = (tsbk >> 56) & 0xfff
-            rfid = (tsbk >> 48) & 0xff
-            stid = (tsbk >> 40) & 0xff
-            chan = (tsbk >> 24) & 0xffff
-            f1 = self.channel_id_to_frequency(chan)
-            if f1:
-                self.rfss_syid = syid
-                self.rfss_rfid = rfid
-                self.rfss_stid = stid
-                self.rfss_chan = f1
-                self.rfss_txchan = f1 + self.freq_table[chan >> 12]['offset']
-                add_unique_freq(self.cc_list, f1)
+                sys.stderr.write('%s [%d] tsbk(0x01) mfid90_grg_del_cmd: sg: %d ga1: %d ga2: %d ga3: %d\n' % (log_ts.get(), m_rxid, sg, ga1, ga2, ga3))
+            self.del_patch(sg, [ga1, ga2, ga3])
+        return 0
+
+    def tsbk_grp_v_ch_grant_up(self, m_rxid, mfrid, tsbk):               # tsbk(0x02)
+        if mfrid == 0x90:
+            ch, sg, sa = extract_fields(tsbk, TSBK_MOT_GRG_CH_GRANT)
+            f = self.channel_id_to_frequency(ch)
+            self.update_voice_frequency(f, tgid=sg, tdma_slot=self.get_tdma_slot(ch), srcaddr=sa)
             if self.debug >= 10:
-                sys.stderr.write('%s [%d] tsbk(0x3a) rfss_sts_bcst: syid: %x rfid: %x stid: %d ch1: %x(%s)\n' %(log_ts.get(), m_rxid, syid, rfid, stid, chan, self.channel_id_to_string(chan)))
-        elif opcode == 0x39:   # secondary cc
-            mfrid = (tsbk >> 80) & 0xff
-            rfid  = (tsbk >> 72) & 0xff
-            stid  = (tsbk >> 64) & 0xff
-            ch1   = (tsbk >> 48) & 0xffff
-            ch2   = (tsbk >> 24) & 0xffff
+                sys.stderr.write('%s [%d] tsbk(0x02) mfid90_grg_ch_grant: freq: %s sg: %d sa: %d\n' % (log_ts.get(), m_rxid, self.channel_id_to_string(ch), sg, sa))
+            return 1 if f else 0
+        ch1, ga1, ch2, ga2 = extract_fields(tsbk, TSBK_GRP_V_CH_GRANT_UP)
+        f1 = self.channel_id_to_frequency(ch1)
+        f2 = self.channel_id_to_frequency(ch2)
+        self.update_voice_frequency(f1, tgid=ga1, tdma_slot=self.get_tdma_slot(ch1))
+        if f1 != f2:
+            self.update_voice_frequency(f2, tgid=ga2, tdma_slot=self.get_tdma_slot(ch2))
+        if self.debug >= 10:
+            sys.stderr.write('%s [%d] tsbk(0x02) grp_v_ch_grant_up: ch1: %s ga1: %d ch2: %s ga2: %d\n' %(log_ts.get(), m_rxid, self.channel_id_to_string(ch1), ga1, self.channel_id_to_string(ch2), ga2))
+        return (1 if f1 else 0) + (1 if f2 else 0)
+
+    def tsbk_grp_v_ch_grant_up_exp(self, m_rxid, mfrid, tsbk):           # tsbk(0x03) TIA.102-AABC-B-2005 page 56
+        if mfrid == 0x90:    # MOT_GRG_CN_GRANT_UPDT
+            ch1, sg1, ch2, sg2 = extract_fields(tsbk, TSBK_GRP_V_CH_GRANT_UP)
             f1 = self.channel_id_to_frequency(ch1)
             f2 = self.channel_id_to_frequency(ch2)
-            if f1 and f2:
-                self.secondary[ f1 ] = 1
-                self.secondary[ f2 ] = 1
-                sorted_freqs = collections.OrderedDict(sorted(self.secondary.items()))
-                self.secondary = sorted_freqs
-                add_unique_freq(self.cc_list, f1)
-                add_unique_freq(self.cc_list, f2)
-            if self.debug >= 10:
-                sys.stderr.write('%s [%d] tsbk(0x39) sccb: rfid: %x stid: %d ch1: %x(%s) ch2: %x(%s)\n' %(log_ts.get(), m_rxid, rfid, stid, ch1, self.channel_id_to_string(ch1), ch2, self.channel_id_to_string(ch2)))
-        elif opcode == 0x3b:   # network status
-            wacn = (tsbk >> 52) & 0xfffff
-            syid = (tsbk >> 40) & 0xfff
-            ch1  = (tsbk >> 24) & 0xffff
-            f1 = self.channel_id_to_frequency(ch1)
-            if f1:
-                self.ns_syid = syid
-                self.ns_wacn = wacn
-                self.ns_chan = f1
-                self.ns_valid = True
+            self.update_voice_frequency(f1, tgid=sg1, tdma_slot=self.get_tdma_slot(ch1))
+            if f1 != f2:
+                self.update_voice_frequency(f2, tgid=sg2, tdma_slot=self.get_tdma_slot(ch2))
             if self.debug >= 10:
-                sys.stderr.write('%s [%d] tsbk(0x3b) net_sts_bcst: wacn: %x syid: %x ch1: %x(%s)\n' %(log_ts.get(), m_rxid, wacn, syid, ch1, self.channel_id_to_string(ch1)))
-        elif opcode == 0x3c:   # adjacent status
-            rfid = (tsbk >> 48) & 0xff
-            stid = (tsbk >> 40) & 0xff
-            ch1  = (tsbk >> 24) & 0xffff
-            table = (ch1 >> 12) & 0xf
-            f1 = self.channel_id_to_frequency(ch1)
-            if f1 and table in self.freq_table:
-                self.adjacent[f1] = 'rfid: %d stid:%d uplink:%f tbl:%d' % (rfid, stid, (f1 + self.freq_table[table]['offset']) / 1000000.0, table)
-                self.adjacent_data[f1] = {'rfid': rfid, 'stid':stid, 'uplink': f1 + self.freq_table[table]['offset'], 'table': table}
+                sys.stderr.write('%s [%d] tsbk(0x03) mfid90_grg_ch_grant_up: freq1: %s sg1: %d freq2: %s sg2:%d\n' % (log_ts.get(), m_rxid, self.channel_id_to_string(ch1), sg1, self.channel_id_to_string(ch2), sg2))
+            return (1 if f1 else 0) + (1 if f2 else 0)
+        elif mfrid == 0:
+            opts, ch1, ch2, ga = extract_fields(tsbk, TSBK_GRP_V_CH_GRANT_UP_EXP)
+            f = self.channel_id_to_frequency(ch1)
+            self.update_voice_frequency(f, tgid=ga, tdma_slot=self.get_tdma_slot(ch1), svcopts=opts)
             if self.debug >= 10:
-                sys.stderr.write('%s [%d] tsbk(0x3c) adj_sts_bcst: rfid: %x stid: %d ch1: %x(%s)\n' %(log_ts.get(), m_rxid, rfid, stid, ch1, self.channel_id_to_string(ch1)))
-                if table in self.freq_table:
-                    sys.stderr.write('%s [%d] tsbk(0x3c) adj_sts_bcst: base freq: %s step: %s\n' % (log_ts.get(), m_rxid, self.freq_table[table]['frequency'] , self.freq_table[table]['step'] ))
-        else:
+                sys.stderr.write('%s [%d] tsbk(0x03) grp_v_ch_grant_up_exp: opts: 0x%02x freq-t: %s freq-r: %s ga: %d\n' % (log_ts.get(), m_rxid, opts, self.channel_id_to_string(ch1), self.channel_id_to_string(ch2), ga))
+            return 1 if f else 0
+        return 0
+
+    def tsbk_mot_bsi_grant(self, m_rxid, mfrid, tsbk):                   # tsbk(0x0b)
+        if mfrid != 0x90:    # MFID90 MOT_BSI_GRANT
+            return 0
+        bsi = ""
+        i = 58
+        while (i >= 16):
+            bsi_char = (tsbk >> i) & 0x3f
+            if bsi_char != 0x00:
+                bsi += chr(bsi_char + 43)
+            i -= 6
+        if bsi != "": # Save bsi only if non-null
+            self.callsign = bsi
             if self.debug >= 10:
-                sys.stderr.write('%s [%d] tsbk(0x%02x) unhandled: 0x%024x\n' % (log_ts.get(), m_rxid, opcode, tsbk))
-        return updated
+                ch = tsbk & 0xffff
+                sys.stderr.write('%s [%d] tsbk(0x0b) mot_bsi_grant: bsi: %s ch: %x(%s)\n' % (log_ts.get(), m_rxid, bsi, ch, self.channel_id_to_string(ch)))
+        return 0
+
+    def tsbk_sndcp_data_ch(self, m_rxid, mfrid, tsbk):                   # tsbk(0x16)
+        if self.debug >= 10:
+            ch1, ch2 = extract_fields(tsbk, TSBK_SNDCP_DATA_CH)
+            sys.stderr.write('%s [%d] tsbk(0x16) sndcp_data_ch: ch1: %x ch2: %x\n' % (log_ts.get(), m_rxid, ch1, ch2))
+        return 0
+
+    def tsbk_grp_aff_rsp(self, m_rxid, mfrid, tsbk):                     # tsbk(0x28)
+        if self.debug >= 10:
+            lg, gav, aga, ga, ta = extract_fields(tsbk, TSBK_GRP_AFF_RSP)
+            sys.stderr.write('%s [%d] tsbk(0x28) grp_aff_rsp: mfid: 0x%x gav: %d aga: %d ga: %d ta: %d\n' % (log_ts.get(), m_rxid, mfrid, gav, aga, ga, ta))
+        return 0
+
+    def tsbk_sccb_exp(self, m_rxid, mfrid, tsbk):                        # tsbk(0x29) secondary cc explicit form
+        rfid, stid, ch1, ch2 = extract_fields(tsbk, TSBK_SCCB)
+        f1 = self.channel_id_to_frequency(ch1)
+        if f1:
+            self.add_secondary(f1)
+        if self.debug >= 10:
+            sys.stderr.write('%s [%d] tsbk(0x29) sccb_exp: rfid: %x stid: %d ch1: %x(%s) ch2: %x(%s)\n' %(log_ts.get(), m_rxid, rfid, stid, ch1, self.channel_id_to_string(ch1), ch2, self.channel_id_to_string(ch2)))
+        return 0
+
+    def tsbk_u_reg_rsp(self, m_rxid, mfrid, tsbk):                       # tsbk(0x2c)
+        if self.debug >= 10:
+            rv, syid, sid, sa = extract_fields(tsbk, TSBK_U_REG_RSP)
+            sys.stderr.write('%s [%d] tsbk(0x2c) u_reg_rsp: mfid: 0x%x rv: %d syid: 0x%x sid: %d sa: %d\n' % (log_ts.get(), m_rxid, mfrid, rv, syid, sid, sa))
+        return 0
+
+    def tsbk_u_de_reg_ack(self, m_rxid, mfrid, tsbk):                    # tsbk(0x2f)
+        if self.debug >= 10:
+            wacn, syid, sid = extract_fields(tsbk, TSBK_U_DE_REG_ACK)
+            sys.stderr.write('%s [%d] tsbk(0x2f) u_de_reg_ack: mfid: 0x%x wacn: 0x%x syid: 0x%x sid: %d\n' % (log_ts.get(), m_rxid, mfrid, wacn, syid, sid))
+        return 0
+
+    def tsbk_grg_exenc_cmd(self, m_rxid, mfrid, tsbk):                   # tsbk(0x30)
+        if mfrid != 0xA4:    # GRG_EXENC_CMD
+            return 0
+        grg_t, grg_g, grg_a, grg_ssn, sg, keyid, rta = extract_fields(tsbk, TSBK_GRG_EXENC_CMD) # TODO: SSN should be stored and checked
+        if self.debug >= 10:
+            sys.stderr.write('%s [%d] tsbk(0x30) grg_exenc_cmd: grg_t: %d grg_g: %d, grg_a: %d, grg_ssn: %d, sg: %d, keyid: %d, rta: %d\n' % (log_ts.get(), m_rxid, grg_t, grg_g, grg_a, grg_ssn, sg, keyid, rta))
+        if grg_g == 1:       # Group request (unit requests currently unhandled)
+            algid = (rta >> 16) & 0xff
+            ga    =  rta        & 0xffff
+            if grg_a == 1:   # Activate
+                self.add_patch(sg, [ga])
+            else:            # Deactivate
+                self.del_patch(sg, [sg])
+        return 0
+
+    def tsbk_iden_up_vu(self, m_rxid, mfrid, tsbk):                      # tsbk(0x34) iden_up vhf uhf
+        iden, bwvu, toff0, spac, freq = extract_fields(tsbk, TSBK_IDEN_UP_VU)
+        toff_sign = (toff0 >> 13) & 1
+        toff = toff0 & 0x1fff
+        if toff_sign == 0:
+            toff = 0 - toff
+        self.freq_table[iden] = {}
+        self.freq_table[iden]['offset'] = toff * spac * 125
+        self.freq_table[iden]['step'] = spac * 125
+        self.freq_table[iden]['frequency'] = freq * 5
+        if self.debug >= 10:
+            txt = ["mob Tx-", "mob Tx+"]
+            sys.stderr.write('%s [%d] tsbk(0x34) iden_up_vu: id: %d toff: %f spac: %f freq: %f [%s]\n' % (log_ts.get(), m_rxid, iden, toff * spac * 0.125 * 1e-3, spac * 0.125, freq * 0.000005, txt[toff_sign]))
+        return 0
+
+    def tsbk_iden_up_tdma(self, m_rxid, mfrid, tsbk):                    # tsbk(0x33)
+        if mfrid != 0:
+            return 0
+        iden, channel_type, toff0, spac, f1 = extract_fields(tsbk, TSBK_IDEN_UP_TDMA)
+        toff_sign = (toff0 >> 13) & 1
+        toff = toff0 & 0x1fff
+        if toff_sign == 0:
+            toff = 0 - toff
+        self.freq_table[iden] = {}
+        self.freq_table[iden]['offset'] = toff * spac * 125
+        self.freq_table[iden]['step'] = spac * 125
+        self.freq_table[iden]['frequency'] = f1 * 5
+        self.freq_table[iden]['tdma'] = SLOTS_PER_CARRIER[channel_type]
+        if self.debug >= 10:
+            sys.stderr.write('%s [%d] tsbk(0x33) iden_up_tdma: id: %d freq: %f toff: %f spac: %f slots/carrier: %d\n' % (log_ts.get(), m_rxid, iden, self.freq_table[iden]['frequency']/1e6, self.freq_table[iden]['offset']/1e6, self.freq_table[iden]['step']/1e3, self.freq_table[iden]['tdma']))
+        return 0
+
+    def tsbk_iden_up(self, m_rxid, mfrid, tsbk):                         # tsbk(0x3d)
+        iden, bw, toff0, spac, freq = extract_fields(tsbk, TSBK_IDEN_UP)
+        toff_sign = (toff0 >> 8) & 1
+        toff = toff0 & 0xff
+        if toff_sign == 0:
+            toff = 0 - toff
+        self.freq_table[iden] = {}
+        self.freq_table[iden]['offset'] = toff * 250000
+        self.freq_table[iden]['step'] = spac * 125
+        self.freq_table[iden]['frequency'] = freq * 5
+        if self.debug >= 10:
+            sys.stderr.write('%s [%d] tsbk(0x3d) iden_up id: %d toff: %f spac: %f freq: %f\n' % (log_ts.get(), m_rxid, iden, toff * 0.25, spac * 0.125, freq * 0.000005))
+        return 0
+
+    def tsbk_rfss_sts_bcst(self, m_rxid, mfrid, tsbk):                   # tsbk(0x3a)
+        syid, rfid, stid, chan = extract_fields(tsbk, TSBK_RFSS_STS_BCST)
+        f1 = self.channel_id_to_frequency(chan)
+        if f1:
+            self.rfss_syid = syid
+            self.rfss_rfid = rfid
+            self.rfss_stid = stid
+            self.rfss_chan = f1
+            self.rfss_txchan = f1 + self.freq_table[chan >> 12]['offset']
+            add_unique_freq(self.cc_list, f1)
+        if self.debug >= 10:
+            sys.stderr.write('%s [%d] tsbk(0x3a) rfss_sts_bcst: syid: %x rfid: %x stid: %d ch1: %x(%s)\n' %(log_ts.get(), m_rxid, syid, rfid, stid, chan, self.channel_id_to_string(chan)))
+        return 0
+
+    def tsbk_sccb(self, m_rxid, mfrid, tsbk):                            # tsbk(0x39) secondary cc
+        rfid, stid, ch1, ch2 = extract_fields(tsbk, TSBK_SCCB)
+        f1 = self.channel_id_to_frequency(ch1)
+        f2 = self.channel_id_to_frequency(ch2)
+        if f1 and f2:
+            self.add_secondary(f1)
+            self.add_secondary(f2)
+        if self.debug >= 10:
+            sys.stderr.write('%s [%d] tsbk(0x39) sccb: rfid: %x stid: %d ch1: %x(%s) ch2: %x(%s)\n' %(log_ts.get(), m_rxid, rfid, stid, ch1, self.channel_id_to_string(ch1), ch2, self.channel_id_to_string(ch2)))
+        return 0
+
+    def tsbk_net_sts_bcst(self, m_rxid, mfrid, tsbk):                    # tsbk(0x3b)
+        wacn, syid, ch1 = extract_fields(tsbk, TSBK_NET_STS_BCST)
+        f1 = self.channel_id_to_frequency(ch1)
+        if f1:
+            self.ns_syid = syid
+            self.ns_wacn = wacn
+            self.ns_chan = f1
+            self.ns_valid = True
+        if self.debug >= 10:
+            sys.stderr.write('%s [%d] tsbk(0x3b) net_sts_bcst: wacn: %x syid: %x ch1: %x(%s)\n' %(log_ts.get(), m_rxid, wacn, syid, ch1, self.channel_id_to_string(ch1)))
+        return 0
+
+    def tsbk_adj_sts_bcst(self, m_rxid, mfrid, tsbk):                    # tsbk(0x3c)
+        rfid, stid, ch1 = extract_fields(tsbk, TSBK_ADJ_STS_BCST)
+        table = (ch1 >> 12) & 0xf
+        f1 = self.channel_id_to_frequency(ch1)
+        if f1 and table in self.freq_table:
+            self.adjacent[f1] = 'rfid: %d stid:%d uplink:%f tbl:%d' % (rfid, stid, (f1 + self.freq_table[table]['offset']) / 1000000.0, table)
+            self.adjacent_data[f1] = {'rfid': rfid, 'stid':stid, 'uplink': f1 + self.freq_table[table]['offset'], 'table': table}
+        if self.debug >= 10:
+            sys.stderr.write('%s [%d] tsbk(0x3c) adj_sts_bcst: rfid: %x stid: %d ch1: %x(%s)\n' %(log_ts.get(), m_rxid, rfid, stid, ch1, self.channel_id_to_string(ch1)))
+            if table in self.freq_table:
+                sys.stderr.write('%s [%d] tsbk(0x3c) adj_sts_bcst: base freq: %s step: %s\n' % (log_ts.get(), m_rxid, self.freq_table[table]['frequency'] , self.freq_table[table]['step'] ))
+        return 0
+
+    def add_secondary(self, freq):
+        if freq in self.secondary:
+            return
+        self.secondary[freq] = 1
+        self.secondary = collections.OrderedDict(sorted(self.secondary.items()))
+        add_unique_freq(self.cc_list, freq)
 
     def decode_tdma_ptt(self, m_rxid, msg, curr_time):
-        self.last_tsbk = time.time()
+        self.last_tsbk = self.clock.time()
         self.stats['tsbk_count'] += 1
         mi    = get_ordinals(msg[0:9])
         algid = get_ordinals(msg[9:10])
@@ -983,7 +1179,7 @@ class p25_system(object):
         return self.update_talkgroup_srcaddr(curr_time, ga, sa)
 
     def decode_tdma_endptt(self, m_rxid, msg, curr_time):
-        self.last_tsbk = time.time()
+        self.last_tsbk = self.clock.time()
         self.stats['tsbk_count'] += 1
         mi    = get_ordinals(msg[0:9])
         sa    = get_ordinals(msg[12:15])
@@ -995,7 +1191,7 @@ class p25_system(object):
     def decode_tdma_msg(self, m_rxid, msg, curr_time):
         updated = 0
         self.cc_timeouts = 0
-        self.last_tsbk = time.time()
+        self.last_tsbk = self.clock.time()
         self.stats['tsbk_count'] += 1
         mfid = 0
         op = get_ordinals(msg[:1])
@@ -1241,10 +1437,7 @@ class p25_system(object):
             if self.debug >= 10:
                 sys.stderr.write('%s [%d] tdma(0xe9) sccb: rfid: %x stid: %x freq-t: %s freq-r: %s\n' % (log_ts.get(), m_rxid, rfid, stid, self.channel_id_to_string(ch_t), self.channel_id_to_string(ch_r)))
             if f:
-                self.secondary[ f ] = 1
-                sorted_freqs = collections.OrderedDict(sorted(self.secondary.items()))
-                self.secondary = sorted_freqs
-                add_unique_freq(self.cc_list, f)
+                self.add_secondary(f)
         elif op == 0xf3: # Identifier Update for TDMA Extended
             iden    = (get_ordinals(msg[2:3]) >> 4) & 0xf
             ch_type =  get_ordinals(msg[2:3]) & 0xf
@@ -1254,14 +1447,13 @@ class p25_system(object):
             base_f  =  get_ordinals(msg[6:10])
             wacn_id = (get_ordinals(msg[10:13]) >> 4) & 0xfffff
             sys_id  =  get_ordinals(msg[13:14]) & 0xfff
-            slots_per_carrier = [1,1,1,2,4,2,2,2,2,2,2,2,2,2,2,2] # values above 5 are reserved and not valid
             self.freq_table[iden] = {}
             self.freq_table[iden]['offset'] = tx_off * ch_spac * 125
             self.freq_table[iden]['step'] = ch_spac * 125
             self.freq_table[iden]['frequency'] = base_f * 5
-            self.freq_table[iden]['tdma'] = slots_per_carrier[ch_type]
+            self.freq_table[iden]['tdma'] = SLOTS_PER_CARRIER[ch_type]
             if self.debug >= 10:
-                sys.stderr.write('%s [%d] tdma(0xf3) iden_up_tdma: id: %d base_f: %f offset: %f spacing: %d slots/carrier %d\n' % (log_ts.get(), m_rxid, iden, base_f/1e6, tx_off/1e6, ch_spac/1e3, slots_per_carrier[ch_type]))
+                sys.stderr.write('%s [%d] tdma(0xf3) iden_up_tdma: id: %d base_f: %f offset: %f spacing: %d slots/carrier %d\n' % (log_ts.get(), m_rxid, iden, base_f/1e6, tx_off/1e6, ch_spac/1e3, SLOTS_PER_CARRIER[ch_type]))
         elif op == 0xfa: # RFSS Status Broadcast Explicit
             syid = get_ordinals(msg[2:4]) & 0xfff
             rfid = get_ordinals(msg[4:5])
@@ -1330,7 +1522,7 @@ class p25_system(object):
 
     def decode_fdma_lcw(self, m_rxid, msg, curr_time):
         updated = 0
-        self.last_tsbk = time.time()
+        self.last_tsbk = self.clock.time()
         self.stats['tsbk_count'] += 1
         pb_sf_lco = get_ordinals(msg[0:1])
 
@@ -1399,16 +1591,30 @@ class p25_system(object):
         return updated
 
     def find_voice_freq(self, tgid=None):
-        if tgid is None:
+        if tgid is None or tgid not in self.voice_tgids:
             return (None, None)
-        for freq in self.voice_frequencies:
-            if self.voice_frequencies[freq]['tgid'][0] == tgid and self.voice_frequencies[freq]['tgid'][1] == tgid:
-                return (freq, None)
-            elif self.voice_frequencies[freq]['tgid'][0] == tgid:
-                return (freq, 0)
-            elif self.voice_frequencies[freq]['tgid'][1] == tgid:
-                return (freq, 1)
-        return (None, None)
+        freqs = self.voice_tgids[tgid]
+        freq = min(freqs) if len(freqs) > 1 else next(iter(freqs))
+        if len(freqs[freq]) > 1:
+            return (freq, None)
+        return (freq, next(iter(freqs[freq])))
+
+    def set_voice_tgid(self, frequency, slot, tgid):
+        # update a voice frequency slot while keeping the tgid reverse index in step
+        vf_tgids = self.voice_frequencies[frequency]['tgid']
+        prev_tgid = vf_tgids[slot]
+        if prev_tgid == tgid:
+            return
+        if prev_tgid is not None:
+            freqs = self.voice_tgids[prev_tgid]
+            freqs[frequency].discard(slot)
+            if not freqs[frequency]:
+                del freqs[frequency]
+                if not freqs:
+                    del self.voice_tgids[prev_tgid]
+        if tgid is not None:
+            self.voice_tgids.setdefault(tgid, {}).setdefault(frequency, set()).add(slot)
+        vf_tgids[slot] = tgid
 
     def update_voice_frequency(self, frequency, tgid=None, tdma_slot=None, srcaddr=None, svcopts=None):
         if not frequency:    # e.g., channel identifier not yet known
@@ -1417,8 +1623,6 @@ class p25_system(object):
         self.update_talkgroups(frequency, tgid, tdma_slot, srcaddr, svcopts)
         if frequency not in self.voice_frequencies:
             self.voice_frequencies[frequency] = {'counter':0}
-            sorted_freqs = collections.OrderedDict(sorted(self.voice_frequencies.items()))
-            self.voice_frequencies = sorted_freqs
             if self.debug >= 5:
                 sys.stderr.write('%s [%s] new freq=%f\n' % (log_ts.get(), self.sysname, frequency/1000000.0))
         if 'tgid' not in self.voice_frequencies[frequency]:
@@ -1428,35 +1632,43 @@ class p25_system(object):
             if self.debug >= 5:
                 sys.stderr.write("%s [%s] VF change: tgid: %s, prev_freq: %f, prev_slot: %s, new_freq: %f, new_slot: %s\n" % (log_ts.get(), self.sysname, tgid, prev_freq/1000000.0, prev_slot, frequency/1000000.0, tdma_slot))
             if prev_slot is None:
-                self.voice_frequencies[prev_freq]['tgid'] = [None, None]
+                self.set_voice_tgid(prev_freq, 0, None)
+                self.set_voice_tgid(prev_freq, 1, None)
             else:
-                self.voice_frequencies[prev_freq]['tgid'][prev_slot] = None
-        curr_time = time.time()
+                self.set_voice_tgid(prev_freq, prev_slot, None)
+        curr_time = self.clock.time()
+        if self.rx_ctl.journal is not None:
+            self.rx_ctl.journal.put('grant', curr_time, self.ns_syid, frequency, tdma_slot, tgid, srcaddr, svcopts)
         self.voice_frequencies[frequency]['time'] = curr_time
         self.voice_frequencies[frequency]['counter'] += 1
         if tdma_slot is None:   # FDMA mark both slots with same info
             if self.debug >= 10:
                 sys.stderr.write("%s [%s] VF ts ph1: tgid: %s, freq: %f\n" % (log_ts.get(), self.sysname, tgid, frequency/1000000.0))
             for slot in [0, 1]:
-                self.voice_frequencies[frequency]['tgid'][slot] = tgid
+                self.set_voice_tgid(frequency, slot, tgid)
                 self.voice_frequencies[frequency]['ts'][slot] = curr_time
+                self.freq_expiry.add((frequency, slot), curr_time + FREQ_EXPIRY_TIME)
         else:                   # TDMA mark just slot in use
             if self.debug >= 10:
                 sys.stderr.write("%s [%s] VF ts ph2: tgid: %s, freq: %f, slot: %s\n" % (log_ts.get(), self.sysname, tgid, frequency/1000000.0, tdma_slot))
-            self.voice_frequencies[frequency]['tgid'][tdma_slot] = tgid
+            self.set_voice_tgid(frequency, tdma_slot, tgid)
             self.voice_frequencies[frequency]['ts'][tdma_slot] = curr_time
+            self.freq_expiry.add((frequency, tdma_slot), curr_time + FREQ_EXPIRY_TIME)
 
     def expire_voice_frequencies(self, curr_time):
         if curr_time < self.last_expiry_check + EXPIRY_TIMER:
             return
         self.last_expiry_check = curr_time
-        for frequency in self.voice_frequencies:
-            for slot in [0, 1]:
-                tgid = self.voice_frequencies[frequency]['tgid'][slot]
-                if tgid is not None and self.talkgroups[tgid]['receiver'] is None and curr_time >= self.voice_frequencies[frequency]['ts'][slot] + FREQ_EXPIRY_TIME:
-                    if self.debug >= 10:
-                        sys.stderr.write("%s [%s] VF expire: tgid: %s, freq: %f, slot: %s, ts: %s\n" % (log_ts.get(), self.sysname, tgid, frequency/1000000.0, slot, log_ts.get(self.voice_frequencies[frequency]['ts'][slot])))
-                    self.voice_frequencies[frequency]['tgid'][slot] = None
+        for frequency, slot in self.freq_expiry.expired(curr_time):
+            tgid = self.voice_frequencies[frequency]['tgid'][slot]
+            if tgid is None:
+                continue
+            if self.talkgroups[tgid]['receiver'] is not None:   # still being followed; check again next time around
+                self.freq_expiry.add((frequency, slot), curr_time + EXPIRY_TIMER)
+                continue
+            if self.debug >= 10:
+                sys.stderr.write("%s [%s] VF expire: tgid: %s, freq: %f, slot: %s, ts: %s\n" % (log_ts.get(), self.sysname, tgid, frequency/1000000.0, slot, log_ts.get(self.voice_frequencies[frequency]['ts'][slot])))
+            self.set_voice_tgid(frequency, slot, None)
 
     def update_talkgroups(self, frequency, tgid, tdma_slot, srcaddr, svcopts):
         self.update_talkgroup(frequency, tgid, tdma_slot, srcaddr, svcopts)
@@ -1478,15 +1690,18 @@ class p25_system(object):
                     sys.stderr.write('%s [%s] set tgid=%s, srcaddr=%s, svcopts=0x%x\n' % (log_ts.get(), self.sysname, tgid, srcaddr, svcopts))
         
             if tgid not in self.talkgroups:
-                add_default_tgid(self.talkgroups, tgid)
+                add_default_tgid(self.talkgroups, tgid, self.tgid_db)
                 if self.debug >= 5:
                     sys.stderr.write('%s [%s] new tgid=%s %s prio %d\n' % (log_ts.get(), self.sysname, tgid, self.talkgroups[tgid]['tag'], self.talkgroups[tgid]['prio']))
 
             if self.talkgroups[tgid]['receiver'] is not None and srcaddr is not None and srcaddr > 0 and srcaddr < 0xffffff and self.talkgroups[tgid]['srcaddr'] != srcaddr:
                 ui_log_update = True
 
-            self.talkgroups[tgid]['time'] = time.time()
+            self.talkgroups[tgid]['time'] = self.clock.time()
             self.talkgroups[tgid]['counter'] += 1
+            if tgid not in self.active_since:  # newly active talkgroup joins the priority heap
+                self.active_since[tgid] = self.talkgroups[tgid]['time']
+                heapq.heappush(self.active_tgids, [self.talkgroups[tgid]['prio'], self.active_since[tgid], tgid])
             self.talkgroups[tgid]['frequency'] = frequency
             self.talkgroups[tgid]['tdma_slot'] = tdma_slot
             if svcopts is not None:
@@ -1522,7 +1737,7 @@ class p25_system(object):
             if svcopts is not None:
                 self.talkgroups[tgid]['svcopts'] = svcopts
             self.talkgroups[tgid]['srcaddr'] = srcaddr
-            add_default_rid(self.sourceids, srcaddr)
+            add_default_rid(self.sourceids, srcaddr, self.rid_db)
             self.sourceids[srcaddr]['counter'] += 1
             self.sourceids[srcaddr]['time'] = curr_time
             if tgid not in self.sourceids[srcaddr]['tgs']:
@@ -1530,6 +1745,8 @@ class p25_system(object):
             else:
                 self.sourceids[srcaddr]['tgs'][tgid] += 1;
             self.sourceid_history.record(srcaddr, tgid, curr_time)
+        if self.rx_ctl.journal is not None:
+            self.rx_ctl.journal.put('srcaddr', curr_time, self.ns_syid, tgid, srcaddr, svcopts)
 
         if ui_log_update:   # log update to UI outside of the mutex protection
             self.rx_ctl.log_call(self.ns_syid,
@@ -1544,43 +1761,28 @@ class p25_system(object):
 
         return 1
 
-    def expire_talkgroups(self, curr_time):
-        if curr_time < self.last_expiry_check + EXPIRY_TIMER:
-            return
-
-        self.last_expiry_check = curr_time
-        tg_expire_list = []
-        # done in two steps so the critical sections can be decoupled
-        # step 1 - build an expiry list with the talkgroups_mutex locked
-        with self.talkgroups_mutex:
-            for tgid in self.talkgroups:
-                if (self.talkgroups[tgid]['receiver'] is not None) and (curr_time >= self.talkgroups[tgid]['time'] + TGID_EXPIRY_TIME):
-                    tg_expire_list.append(tgid)
-
-        # step 2 - expire the individual talkgroups with the talkgroups_mutex unlocked
-        for tgid in tg_expire_list:
-            if self.talkgroups[tgid]['receiver'] is not None:   # re-validate receiver still assigned to this tgid and was not released by a different thread
-                if self.debug > 1:
-                    sys.stderr.write("%s [%s] expiring tg(%d), freq(%f), slot(%s)\n" % (log_ts.get(), self.sysname, tgid, (self.talkgroups[tgid]['frequency']/1e6), get_slot(self.talkgroups[tgid]['tdma_slot'])))
-                self.talkgroups[tgid]['receiver'].expire_talkgroup(reason="expiry")
-
     def add_patch(self, sg, ga_list):
         with self.patches_mutex:
             if sg not in self.patches:
                 self.patches[sg] = {}
                 self.patches[sg]['ga'] = set()
-                self.patches[sg]['ts'] = time.time()
+                self.patches[sg]['ts'] = self.clock.time()
 
             for ga in ga_list:
                 if (ga != sg):
-                    self.patches[sg]['ts'] = time.time() # update timestamp
+                    self.patches[sg]['ts'] = self.clock.time() # update timestamp
+                    self.patch_expiry.add(sg, self.patches[sg]['ts'] + PATCH_EXPIRY_TIME)
                     if ga not in self.patches[sg]['ga']:
                         self.patches[sg]['ga'].add(ga)
+                        self.patches_version += 1
+                        if self.rx_ctl.journal is not None:
+                            self.rx_ctl.journal.put('patch', self.patches[sg]['ts'], self.ns_syid, sg, ga)
                         if self.debug >= 5:
                             sys.stderr.write("%s [%s] add_patch: tgid(%d) is patched to sg(%d)\n" % (log_ts.get(), self.sysname, ga, sg))
 
             if len(self.patches[sg]['ga']) == 0:
                 del self.patches[sg]
+                self.patches_version += 1
 
     def del_patch(self, sg, ga_list):
         if sg not in self.patches:
@@ -1590,31 +1792,53 @@ class p25_system(object):
             for ga in ga_list:
                 if ga in self.patches[sg]['ga']:
                     self.patches[sg]['ga'].discard(ga)
+                    self.patches_version += 1
                     if self.debug >= 5:
                         sys.stderr.write("%s [%s] del_patch: tgid(%d) is unpatched from sg(%d)\n" % (log_ts.get(), self.sysname, ga, sg))
 
             if (sg in ga_list) or (len(self.patches[sg]['ga']) == 0):
                 del self.patches[sg]
+                self.patches_version += 1
                 if self.debug >= 5:
                     sys.stderr.write("%s del_patch: deleting patch sg(%d)\n" % (log_ts.get(), sg))
 
     def expire_patches(self):
         updated = 0
         with self.patches_mutex:
-            time_now = time.time()
-            for sg in list(self.patches):
-                if time_now > (self.patches[sg]['ts'] + PATCH_EXPIRY_TIME):
+            time_now = self.clock.time()
+            for sg in self.patch_expiry.expired(time_now):
+                if sg not in self.patches:    # already deleted
+                    continue
+                if time_now <= (self.patches[sg]['ts'] + PATCH_EXPIRY_TIME):
+                    self.patch_expiry.add(sg, self.patches[sg]['ts'] + PATCH_EXPIRY_TIME)
+                else:
                     updated += 1
                     del self.patches[sg]
+                    self.patches_version += 1
                     if self.debug >= 5:
                         sys.stderr.write("%s [%s] expire_patches: expiring patch sg(%d)\n" % (log_ts.get(), self.sysname, sg))
         return updated
 
     def get_rid_tag(self, srcaddr):
-        if srcaddr is None or srcaddr not in self.sourceids:
+        if srcaddr is None:
             return ""
-        else:
+        elif srcaddr in self.sourceids:
             return self.sourceids[srcaddr]['tag']
+        elif self.rid_db is not None:
+            entry = self.rid_db.get(srcaddr)
+            return entry[0] if entry is not None else ""
+        else:
+            return ""
+
+    def get_tgid_tag(self, tgid):
+        # tag for display; talkgroups which have not been seen yet are looked up without being added
+        if tgid in self.talkgroups:
+            return self.talkgroups[tgid]['tag']
+        elif self.tgid_db is not None:
+            entry = self.tgid_db.get(tgid)
+            return entry[0] if entry is not None else None
+        else:
+            return None
 
     def dump_tgids(self):
         sys.stderr.write("%s [%s] Known talkgroup ids: {\n" % (log_ts.get(), self.sysname))
@@ -1635,6 +1859,9 @@ class p25_system(object):
         sys.stderr.write("}\n") 
 
     def to_json(self):  # ugly but required for compatibility with P25 trunking and terminal modules
+        return json.dumps(self.to_dict())
+
+    def to_dict(self):
         wacn_system_id_str = "%05X.%03X" % (self.ns_wacn, self.ns_syid) if self.ns_syid is not None else "---------"
         rfss_site_id_str   = "%d.%d" % (self.rfss_rfid, self.rfss_stid) if (self.rfss_rfid is not None and self.rfss_stid is not None) else "--"
 
@@ -1663,13 +1890,14 @@ class p25_system(object):
         d['patch_data']     = {}
         d['last_tsbk']      = self.last_tsbk
 
-        t = time.time()
+        t = self.clock.time()
 
         # Get all current frequencies we know about (CC, alternate CC, VC)
         self.expire_voice_frequencies(t)
-        all_freqs = list(self.voice_frequencies.keys()) + list(self.secondary.keys())
+        all_freqs = sorted(self.voice_frequencies.keys()) + list(self.secondary.keys())
         if self.rfss_chan != None:
             all_freqs += [int(self.rfss_chan)]
+        freq_cache = {}
 
         for f in all_freqs:
             # Type-specific parameters
@@ -1704,6 +1932,17 @@ class p25_system(object):
             else:
                 time_ago_str = "%4.1fd" % (time_ago / 60.0 / 60.0 / 24.0)
 
+            # Formatted entries are reused until something they display has changed
+            vf_tgids = self.voice_frequencies[f]['tgid'] if tgids else []
+            ui_srcaddrs = tuple([self.talkgroups[tgid]['srcaddr'] if tgid in self.talkgroups else None for tgid in vf_tgids])
+            ui_key = (chan_type, time_ago_str, count, tuple(tgids), ui_srcaddrs, self.tags_version)
+            cached = self.ui_freq_cache.get(f)
+            if cached is not None and cached[0] == ui_key:
+                freq_cache[f] = cached
+                d['frequencies'][f] = cached[1]
+                d['frequency_data'][f] = cached[2]
+                continue
+
             # Format here to show in theses console viewer
             time_ago_ncurses_str = time_ago_str + " ago" if time_ago_str != "Never" and time_ago_str != "  Now" else time_ago_str + "    "
 
@@ -1726,7 +1965,7 @@ class p25_system(object):
             for tgid in tgids:
                 try:
                     tgid_int = int(tgid)
-                    tag = self.talkgroups.get(tgid_int, {}).get('tag', None)
+                    tag = self.get_tgid_tag(tgid_int)
                     srcaddr = self.talkgroups[tgid_int]['srcaddr']
                     srctag = self.get_rid_tag(self.talkgroups[tgid_int]['srcaddr'])
                 except (ValueError, TypeError) as e:
@@ -1741,17 +1980,25 @@ class p25_system(object):
 
             # The easy part: send pure JSON and let the display layer handle formatting
             d['frequency_data'][f] = {'type': chan_type, 'tgids': tgids, 'last_activity': time_ago_str, 'counter': count, 'tags': tags, 'srcaddrs': srcaddrs, 'srctags': srctags}
+            freq_cache[f] = (ui_key, d['frequencies'][f], d['frequency_data'][f])
+        self.ui_freq_cache = freq_cache
 
         # Patches
         self.expire_patches()
-        for sg in sorted(self.patches.keys()):
-            d['patch_data'][sg] = {}
-            for ga in sorted(self.patches[sg]['ga']):
-                sg_dec = "%5d" % (sg)
-                ga_dec = "%5d" % (ga)
-                sg_tag = self.talkgroups.get(sg, {}).get('tag', None)
-                ga_tag = self.talkgroups.get(ga, {}).get('tag', None)
-                d['patch_data'][sg][ga] = {'sg': sg_dec, 'sgtag': sg_tag, 'ga': ga_dec, 'gatag': ga_tag}
+        patch_key = (self.patches_version, self.tags_version, len(self.talkgroups))   # tags shown depend on known talkgroups
+        if self.ui_patch_cache[0] == patch_key:
+            d['patch_data'] = self.ui_patch_cache[1]
+        else:
+            with self.patches_mutex:
+                for sg in sorted(self.patches.keys()):
+                    d['patch_data'][sg] = {}
+                    for ga in sorted(self.patches[sg]['ga']):
+                        sg_dec = "%5d" % (sg)
+                        ga_dec = "%5d" % (ga)
+                        sg_tag = self.get_tgid_tag(sg)
+                        ga_tag = self.get_tgid_tag(ga)
+                        d['patch_data'][sg][ga] = {'sg': sg_dec, 'sgtag': sg_tag, 'ga': ga_dec, 'gatag': ga_tag}
+                self.ui_patch_cache = (patch_key, d['patch_data'])
 
         # Adjacent sites
         d['adjacent_data'] = self.adjacent_data
@@ -1759,7 +2006,7 @@ class p25_system(object):
         # Band Plan (from iden_up)
         d['band_plan'] = self.freq_table
 
-        return json.dumps(d)
+        return d
 
 #################
 # Radio Id history class
@@ -1771,9 +2018,11 @@ class rid_history(object):
         while len(self.rid_history) < self.rid_history.maxlen:
             self.rid_history.appendleft({"rid":None, "tgid":None, "ts":0.0})
 
-    def record(self, rid, tgid, ts = time.time()):
+    def record(self, rid, tgid, ts = None):
         if rid is None:
             return
+        if ts is None:
+            ts = time.time()
 
         if (self.rid_history[0]['rid'] == rid) and (self.rid_history[0]['tgid'] == tgid):
             self.rid_history[0]['ts'] = ts
@@ -1802,13 +2051,14 @@ class p25_receiver(object):
         self.frequency_set = frequency_set
         self.fa_ctrl = fa_ctrl
         self.system = system
+        self.clock = system.clock
         self.meta_q = meta_q
         self.meta_stream = from_dict(self.config, 'meta_stream_name', "")
         self.tuned_frequency = freq
         self.tuner_idle = False
         self.talkgroups = self.system.get_talkgroups()
-        self.skiplist = {}
-        self.blacklist = {}
+        self.skiplist = interval_set()
+        self.blacklist = interval_set()
         self.whitelist = None
         self.crypt_behavior = self.system.get_crypt_behavior()
         self.current_nac = 0
@@ -1841,7 +2091,7 @@ class p25_receiver(object):
 
         self.load_bl_wl()
         self.tgid_hold_time = float(from_dict(self.system.config, 'tgid_hold_time', TGID_HOLD_TIME))
-        meta_update(self.meta_q, msgq_id=self.msgq_id, debug=self.debug)
+        meta_update(self.meta_q, msgq_id=self.msgq_id, ts=self.clock.time(), debug=self.debug)
         nac, wacn, sysid, valid = self.system.get_tdma_params() # check for xormask preload
         if valid and self.fa_ctrl is not None:
             self.fa_ctrl({'tuner': self.msgq_id, 'cmd': 'set_xormask', 'nac': nac, 'wacn': wacn, 'sysid': sysid})
@@ -1901,7 +2151,7 @@ class p25_receiver(object):
         if freq is None or int(freq) == 0:
             return
 
-        self.tune_ts = time.time()                                                          # save timestamp at start of tuning
+        self.tune_ts = self.clock.time()                                                       # save timestamp at start of tuning
 
         if self.tuner_idle:
             if self.fa_ctrl is not None:
@@ -1940,7 +2190,7 @@ class p25_receiver(object):
         self.current_slot = slot
         if not self.hold_mode:
             self.hold_tgid = None
-            self.hold_until = time.time()
+            self.hold_until = self.clock.time()
         with self.system.talkgroups_mutex:
             self.talkgroups[tgid]['receiver'] = self
 
@@ -1960,7 +2210,7 @@ class p25_receiver(object):
             elif data > 0:
                 self.add_blacklist(int(data))
         elif cmd == 'reload':
-            self.blacklist = {}
+            self.blacklist = interval_set()
             self.whitelist = None
             self.load_bl_wl()
 
@@ -2024,7 +2274,7 @@ class p25_receiver(object):
         elif m_type == -4: # P25 sync established
             if self.tune_ts is not None:
                 if self.debug > 1:
-                    sys.stderr.write('%s [%d] sync established, tuning time %f seconds\n' % (log_ts.get(), self.msgq_id, (time.time() - self.tune_ts)))
+                    sys.stderr.write('%s [%d] sync established, tuning time %f seconds\n' % (log_ts.get(), self.msgq_id, (self.clock.time() - self.tune_ts)))
                 self.tune_ts = None
 
             if self.current_tgid is None:
@@ -2099,7 +2349,7 @@ class p25_receiver(object):
             self.expire_talkgroup(reason = "skiplisted")
             self.hold_mode = False
             self.hold_tgid = None
-            self.hold_until = time.time()
+            self.hold_until = self.clock.time()
 
     def add_blacklist(self, tgid, end_time=None):
         if not tgid or (tgid <= 0) or (tgid > 65534):
@@ -2133,7 +2383,7 @@ class p25_receiver(object):
             if self.debug > 1:
                 sys.stderr.write("%s [%d] de-blacklisting: tgid(%d)\n" % (log_ts.get(), self.msgq_id, tgid))
         if self.whitelist is None:
-            self.whitelist = {}
+            self.whitelist = interval_set()
         if tgid in self.whitelist:
             return
         self.whitelist[tgid] = None
@@ -2143,25 +2393,17 @@ class p25_receiver(object):
             self.expire_talkgroup(reason = "not whitelisted")
             self.hold_mode = False
             self.hold_tgid = None
-            self.hold_until = time.time()
+            self.hold_until = self.clock.time()
 
     def blacklist_update(self, start_time):
-        expired_tgs = [tg for tg in list(self.blacklist.keys())
-                            if self.blacklist[tg] is not None
-                            and self.blacklist[tg] < start_time]
-        for tg in expired_tgs:
-            self.blacklist.pop(tg)
+        for start, end in self.blacklist.expire(start_time):
             if self.debug > 1:
-                sys.stderr.write("%s [%d] removing expired blacklist: tg(%d)\n" % (log_ts.get(), self.msgq_id, tg));
+                sys.stderr.write("%s [%d] removing expired blacklist: tg(%s)\n" % (log_ts.get(), self.msgq_id, start if start == end else "%d-%d" % (start, end)))
 
     def skiplist_update(self, start_time):
-        expired_tgs = [tg for tg in list(self.skiplist.keys())
-                            if self.skiplist[tg] is not None
-                            and self.skiplist[tg] < start_time]
-        for tg in expired_tgs:
-            self.skiplist.pop(tg)
+        for start, end in self.skiplist.expire(start_time):
             if self.debug > 1:
-                sys.stderr.write("%s [%d] removing expired skiplist: tg(%d)\n" % (log_ts.get(), self.msgq_id, tg));
+                sys.stderr.write("%s [%d] removing expired skiplist: tg(%s)\n" % (log_ts.get(), self.msgq_id, start if start == end else "%d-%d" % (start, end)))
 
     def find_talkgroup(self, start_time, tgid=None, hold=False):
         tgt_tgid = None
@@ -2172,30 +2414,51 @@ class p25_receiver(object):
             if (tgid is not None) and (tgid in self.talkgroups) and ((self.talkgroups[tgid]['receiver'] is None) or (self.talkgroups[tgid]['receiver'] == self)):
                 tgt_tgid = tgid
 
-            for active_tgid in self.talkgroups:
-                if hold:
-                    break
-                if self.talkgroups[active_tgid]['time'] < start_time:
-                    continue
-                if active_tgid in self.skiplist:
-                    continue
-                if active_tgid in self.blacklist and (not self.whitelist or active_tgid not in self.whitelist):
-                    continue
-                if self.whitelist and active_tgid not in self.whitelist:
-                    continue
-                if (self.crypt_behavior > 1) and ((self.talkgroups[active_tgid]['svcopts'] & 0x40) == 0x40):
-                    continue
-                if tgt_tgid is None:
-                    if self.talkgroups[active_tgid]['receiver'] is None:
-                        tgt_tgid = active_tgid
-                        continue
-                elif (self.talkgroups[active_tgid]['prio'] < self.talkgroups[tgt_tgid]['prio']) and (self.talkgroups[active_tgid]['receiver'] is None):
+            if not hold:
+                active_tgid = self.find_active_talkgroup(start_time)
+                if active_tgid is not None and (tgt_tgid is None or self.talkgroups[active_tgid]['prio'] < self.talkgroups[tgt_tgid]['prio']):
                     tgt_tgid = active_tgid
-                   
+
             if tgt_tgid is not None and self.talkgroups[tgt_tgid]['time'] >= start_time:
                 return self.talkgroups[tgt_tgid]['frequency'], tgt_tgid, self.talkgroups[tgt_tgid]['tdma_slot'], self.talkgroups[tgt_tgid]['srcaddr']
         return None, None, None, None
 
+    # Walk the system's active talkgroup heap in (prio, active_since) order and return the first
+    # unassigned talkgroup this receiver is permitted to follow.  Talkgroups that have gone quiet
+    # are dropped from the heap, entries skipped by this receiver are pushed back afterwards.
+    # Must be called with system.talkgroups_mutex held.
+    def find_active_talkgroup(self, start_time):
+        heap = self.system.active_tgids
+        skipped = []
+        found = None
+        while heap:
+            entry = heapq.heappop(heap)
+            prio, since, active_tgid = entry
+            tg = self.talkgroups[active_tgid]
+            if tg['time'] < start_time:                 # no longer active
+                del self.system.active_since[active_tgid]
+                continue
+            if prio != tg['prio']:                      # priority changed since entry was queued
+                entry[0] = tg['prio']
+                heapq.heappush(heap, entry)
+                continue
+            skipped.append(entry)
+            if tg['receiver'] is not None:
+                continue
+            if active_tgid in self.skiplist:
+                continue
+            if active_tgid in self.blacklist and (not self.whitelist or active_tgid not in self.whitelist):
+                continue
+            if self.whitelist and active_tgid not in self.whitelist:
+                continue
+            if (self.crypt_behavior > 1) and ((tg['svcopts'] & 0x40) == 0x40):
+                continue
+            found = active_tgid
+            break
+        for entry in skipped:
+            heapq.heappush(heap, entry)
+        return found
+
     def scan_for_talkgroups(self, curr_time):
         self.check_expired_hold(curr_time)
         hold_active = True if self.hold_tgid is not None and self.hold_mode is True else False  # manual holds are not pre-emptable
@@ -2220,7 +2483,7 @@ class p25_receiver(object):
             self.tune_voice(freq, tgid, slot)
             self.log_call(freq, slot, self.talkgroups[tgid]['prio'], tgid, self.talkgroups[tgid]['srcaddr'])
 
-        meta_update(self.meta_q, tgid=tgid, tag=self.talkgroups[tgid]['tag'], rid=self.talkgroups[tgid]['srcaddr'], rtag=self.system.get_rid_tag(self.talkgroups[tgid]['srcaddr']), msgq_id=self.msgq_id, debug=self.debug)
+        meta_update(self.meta_q, tgid=tgid, tag=self.talkgroups[tgid]['tag'], rid=self.talkgroups[tgid]['srcaddr'], rtag=self.system.get_rid_tag(self.talkgroups[tgid]['srcaddr']), msgq_id=self.msgq_id, ts=self.clock.time(), debug=self.debug)
 
     def check_expired_hold(self, curr_time):
         if self.debug > 10:
@@ -2231,7 +2494,7 @@ class p25_receiver(object):
                 sys.stderr.write("%s [%d] expire hold: tg(%d)\n" % (log_ts.get(), self.msgq_id, self.hold_tgid))
             self.hold_tgid = None
             self.hold_mode = False
-            meta_update(self.meta_q, msgq_id=self.msgq_id, debug=self.debug)
+            meta_update(self.meta_q, msgq_id=self.msgq_id, ts=self.clock.time(), debug=self.debug)
 
     def expire_talkgroup(self, tgid=None, update_meta = True, reason="unk", auto_hold = True):
         if self.current_tgid is None:
@@ -2249,10 +2512,10 @@ class p25_receiver(object):
             # Commanded tgid hold inactive
             if auto_hold:
                 self.hold_tgid = self.current_tgid
-                self.hold_until = time.time() + self.tgid_hold_time
+                self.hold_until = self.clock.time() + self.tgid_hold_time
             else:
                 self.hold_tgid = None
-                self.hold_until = time.time()
+                self.hold_until = self.clock.time()
         else:
             # Commanded tgid hold active
             pass
@@ -2260,14 +2523,15 @@ class p25_receiver(object):
         self.current_tgid = None
         self.current_slot = None
         self.fa_ctrl({"tuner": self.msgq_id, "cmd": "call_end"})    # Drop any persistent ESS data held in the receiver
+        self.system.rx_ctl.call_end(self.msgq_id, reason)
 
         if reason == "preempt":                             # Do not retune or update metadata if in middle of tuning to a different tgid
             return
 
         if self.hold_tgid is not None:
-            meta_update(self.meta_q, tgid=self.hold_tgid, tag=self.talkgroups[self.hold_tgid]['tag'], msgq_id=self.msgq_id, debug=self.debug)
+            meta_update(self.meta_q, tgid=self.hold_tgid, tag=self.talkgroups[self.hold_tgid]['tag'], msgq_id=self.msgq_id, ts=self.clock.time(), debug=self.debug)
         else:
-            meta_update(self.meta_q, msgq_id=self.msgq_id, debug=self.debug)
+            meta_update(self.meta_q, msgq_id=self.msgq_id, ts=self.clock.time(), debug=self.debug)
 
         self.idle_rx()                                      # Make receiver available
 
@@ -2279,7 +2543,7 @@ class p25_receiver(object):
                     sys.stderr.write("%s [%d] hold tg(%d) not in whitelist\n" % (log_ts.get(), self.msgq_id, tgid))
                 return
             with self.system.talkgroups_mutex:
-                add_default_tgid(self.talkgroups, tgid)
+                add_default_tgid(self.talkgroups, tgid, self.system.tgid_db)
             self.hold_tgid = tgid
             self.hold_until = curr_time + 86400 * 10000
             self.hold_mode = True
@@ -2307,9 +2571,9 @@ class p25_receiver(object):
 
         if update_meta:
             if self.hold_tgid is not None and self.current_tgid != self.hold_tgid:
-                meta_update(self.meta_q, tgid=self.hold_tgid, tag=self.talkgroups[self.hold_tgid]['tag'], msgq_id=self.msgq_id, debug=self.debug)
+                meta_update(self.meta_q, tgid=self.hold_tgid, tag=self.talkgroups[self.hold_tgid]['tag'], msgq_id=self.msgq_id, ts=self.clock.time(), debug=self.debug)
             elif self.hold_tgid is None:
-                meta_update(self.meta_q, msgq_id=self.msgq_id, debug=self.debug)
+                meta_update(self.meta_q, msgq_id=self.msgq_id, ts=self.clock.time(), debug=self.debug)
 
     def get_status(self):
         with self.system.talkgroups_mutex:
@@ -28,6 +28,9 @@ import json
 import threading
 from helper_funcs import *
 from log_ts import log_ts
+from tag_db import tag_db
+from expiry import expiry_queue
+from trunk_clock import system_clock
 from collections import deque
 from gnuradio import gr
 import gnuradio.op25_repeater as op25_repeater
@@ -44,6 +47,7 @@ M_SMARTNET_END_PTT      = 15
 OSW_QUEUE_SIZE          = 5 + 1 # Some messages can be 3 OSWs long, plus up to two IDLEs can be inserted in between
                                 # useful messages. Additionally, keep one slot for a QUEUE RESET message.
 OSW_QUEUE_RESET_CMD     = 0xffe # OSW command representing QUEUE RESET took place; not a valid cmd so it won't conflict
+OSW_CHAN_COUNT          = 0x400 # Number of channel numbers an OSW cmd can carry (10 bits)
 
 # SmartNet trunking constants
 CC_TIMEOUT_RETRIES      = 3     # Number of control channel framing timeouts before hunting
@@ -61,20 +65,21 @@ CALL_LOG_MAX_LEN        = 10    # Maximum number of call_log entries to retain
 #################
 # Helper functions
 
-def meta_update(meta_q, tgid = None, tag = None):
+def meta_update(meta_q, tgid = None, tag = None, ts = None):
     if meta_q is None:
         return
     d = {'json_type': 'meta_update'}
     d['tgid'] = tgid
     d['tag'] = tag
-    msg = gr.message().make_from_string(json.dumps(d), -2, time.time(), 0)
+    msg = gr.message().make_from_string(json.dumps(d), -2, ts if ts is not None else time.time(), 0)
     if not meta_q.full_p():
         meta_q.insert_tail(msg)
 
 #################
 # Main trunking class
 class rx_ctl(object):
-    def __init__(self, debug=0, frequency_set=None, nbfm_ctrl=None, fa_ctrl=None, chans={}):
+    def __init__(self, debug=0, frequency_set=None, nbfm_ctrl=None, fa_ctrl=None, chans={}, clock=None):
+        self.clock = clock if clock is not None else system_clock()    # time source for all trunking decisions
         self.frequency_set = frequency_set
         self.nbfm_ctrl = nbfm_ctrl
         self.fa_ctrl = fa_ctrl
@@ -84,6 +89,8 @@ class rx_ctl(object):
         self.chans = chans
         self.call_log = deque(maxlen=CALL_LOG_MAX_LEN)
         self.call_log_mutex = threading.Lock()
+        self.journal = None         # optional call_journal fed with grants, calls and patches
+        self.recorder = None        # optional call_recorder told of call starts and ends
 
         for chan in self.chans:
             sysname = chan['sysname']
@@ -146,7 +153,8 @@ class rx_ctl(object):
 
     # process_qmsg is the main message dispatch handler connecting the 'radios' to python
     def process_qmsg(self, msg):
-        curr_time = time.time()
+        self.clock.update(msg)
+        curr_time = self.clock.time()
         m_rxid = int(msg.arg1()) >> 1
         if (m_rxid in self.receivers and
             self.receivers[m_rxid]['rx_sys'] is not None and
@@ -156,9 +164,11 @@ class rx_ctl(object):
 
     # ui_command handles all requests from user interface
     def ui_command(self, cmd, data, msgq_id):
-        curr_time = time.time()
+        curr_time = self.clock.time()
         if msgq_id in self.receivers and self.receivers[msgq_id]['rx_sys'] is not None:
             self.receivers[msgq_id]['rx_sys'].ui_command(cmd = cmd, data = data, curr_time = curr_time)    # Dispatch message to the intended receiver
+            if cmd == 'reload':     # tags belong to the system, so they are reloaded once rather than per receiver
+                self.systems[self.receivers[msgq_id]['sysname']]['control'].reload_tags()
 
     def to_json(self):
         d = {'json_type': 'trunk_update'}
@@ -185,6 +195,16 @@ class rx_ctl(object):
         d['channels'] = rcvr_ids
         return json.dumps(d)
 
+    def set_journal(self, journal):
+        self.journal = journal
+
+    def set_recorder(self, recorder):
+        self.recorder = recorder
+
+    def call_end(self, rcvr, reason):
+        if self.recorder is not None:
+            self.recorder.call_end(rcvr, self.clock.time(), reason)
+
     def get_call_log(self):
         d = {'json_type': 'call_log'}
         with self.call_log_mutex:
@@ -193,8 +213,13 @@ class rx_ctl(object):
         return json.dumps(d)
 
     def log_call(self, sysid, rcvr, freq, prio, tgid, tgtag, rid, rtag = ""):
+        curr_time = self.clock.time()
+        if self.journal is not None:
+            self.journal.put('call', curr_time, sysid, rcvr, freq, None, prio, tgid, tgtag, rid, rtag)
+        if self.recorder is not None:
+            self.recorder.call_start(rcvr, curr_time, sysid, freq, None, tgid, tgtag, rid, rtag)
         with self.call_log_mutex:
-            self.call_log.append({ "time":  time.time(),
+            self.call_log.append({ "time":  curr_time,
                                    "sysid": sysid,
                                    "rcvr":  rcvr,
                                    "rcvrtag": from_dict(self.receivers[rcvr]['config'], 'name', ""),
@@ -212,20 +237,31 @@ class osw_receiver(object):
     def __init__(self, debug, frequency_set, config, rx_ctl = None):
         self.debug = debug
         self.rx_ctl = rx_ctl
+        self.clock = rx_ctl.clock if rx_ctl is not None else system_clock()
         self.msgq_id = -1
         self.config = config
         self.frequency_set = frequency_set
         self.osw_q = deque(maxlen=OSW_QUEUE_SIZE)
+        self.obt_system = False
+        self.rx_chans = [False] * OSW_CHAN_COUNT    # chan -> is_chan(chan); filled in by build_chan_tables()
+        self.tx_chans = [False] * OSW_CHAN_COUNT    # chan -> is_chan(chan, is_tx=True)
+        self.rx_freqs = [0.0] * OSW_CHAN_COUNT      # chan -> get_freq(chan), or 0.0 if not a valid chan
+        self.tx_freqs = [0.0] * OSW_CHAN_COUNT      # chan -> get_freq(chan, is_tx=True), or 0.0 if not a valid chan
         self.voice_frequencies = {}
         self.talkgroups = {}
         self.talkgroups_mutex = threading.Lock()
+        self.tgid_db = None         # tags database, when configured tags are looked up on first use
         self.patches = {}
         self.patches_mutex = threading.Lock()
-        self.skiplist = {}
-        self.blacklist = {}
+        self.skiplist = interval_set()
+        self.blacklist = interval_set()
         self.whitelist = None
         self.alternate_cc_freqs = {}
         self.adjacent_sites = {}
+        self.tgid_expiry = expiry_queue()       # tgid -> time + TGID_EXPIRY_TIME
+        self.patch_expiry = expiry_queue()      # (tgid, sub_tgid) -> time + PATCH_EXPIRY_TIME
+        self.alt_cc_expiry = expiry_queue()     # freq -> time + ALT_CC_EXPIRY_TIME
+        self.adj_site_expiry = expiry_queue()   # site -> time + ADJ_SITE_EXPIRY_TIME
         self.cc_list = []
         self.cc_index = -1
         self.cc_retries = 0
@@ -273,9 +309,15 @@ class osw_receiver(object):
         if self.debug >= 1:
             sys.stderr.write("%s [%d] Initializing Smartnet system\n" % (log_ts.get(), self.msgq_id))
 
+        self.build_chan_tables()
+
         if 'tgid_tags_file' in self.config and self.config['tgid_tags_file'] != "":
             sys.stderr.write("%s [%d] reading system tgid_tags_file: %s\n" % (log_ts.get(), self.msgq_id, self.config['tgid_tags_file']))
-            self.read_tags_file(self.config['tgid_tags_file'])
+            if from_dict(self.config, 'tags_db', "") != "":
+                self.tgid_db = tag_db(self.config['tags_db'], 'tgid_tags', self.config['tgid_tags_file'], TGID_DEFAULT_PRIO, self.sysname)
+                self.tgid_db.sync()
+            else:
+                self.read_tags_file(self.config['tgid_tags_file'])
 
         if 'blacklist' in self.config and self.config['blacklist'] != "":
             sys.stderr.write("%s [%d] reading system blacklist file: %s\n" % (log_ts.get(), self.msgq_id, self.config['blacklist']))
@@ -330,6 +372,17 @@ class osw_receiver(object):
         except IOError as ex:
             sys.stderr.write("%s [%d] Error: %s: %s\n" % (log_ts.get(), self.msgq_id, ex.strerror, tags_file))
 
+    def reload_tags(self):
+        # apply changes in the tags file to the talkgroups already in use
+        if self.tgid_db is None:
+            return
+        changed = self.tgid_db.sync()
+        with self.talkgroups_mutex:
+            for tgid in changed:
+                if tgid in self.talkgroups:
+                    entry = self.tgid_db.get(tgid)
+                    self.talkgroups[tgid]['tag'], self.talkgroups[tgid]['prio'] = entry if entry is not None else ("", TGID_DEFAULT_PRIO)
+
     def tune_next_cc(self):
         self.cc_retries = 0
         self.cc_index += 1
@@ -426,8 +479,17 @@ class osw_receiver(object):
 
     # Is the current config for an OBT system
     def is_obt_system(self):
+        return self.obt_system
+
+    # Precompute validity and rx/tx frequency of every channel number for the configured bandplan, so that enqueue()
+    # does table lookups rather than parsing the bandplan for every OSW. Must be called again if the bandplan changes.
+    def build_chan_tables(self):
         band, _, _, _, _ = self.get_bandplan_details()
-        return band == "OBT"
+        self.obt_system = (band == "OBT")
+        self.rx_chans = [self.is_chan(chan) for chan in range(OSW_CHAN_COUNT)]
+        self.tx_chans = [self.is_chan(chan, is_tx=True) for chan in range(OSW_CHAN_COUNT)]
+        self.rx_freqs = [self.get_freq(chan) if self.rx_chans[chan] else 0.0 for chan in range(OSW_CHAN_COUNT)]
+        self.tx_freqs = [self.get_freq(chan, is_tx=True) if self.tx_chans[chan] else 0.0 for chan in range(OSW_CHAN_COUNT)]
 
     # Attempt to auto-compute transmit offsets based on typical USA/Canada band plans
     def get_expected_obt_tx_freq(self, rx_freq):
@@ -782,15 +844,16 @@ class osw_receiver(object):
     def enqueue(self, addr, grp, cmd, ts):
         grp_str = self.get_group_str(grp)
 
-        is_rx_chan = self.is_chan(cmd)
-        is_tx_chan = self.is_chan(cmd, is_tx=True)
-
-        rx_freq = 0.0
-        tx_freq = 0.0
-        if is_rx_chan:
-            rx_freq = self.get_freq(cmd)
-        if is_tx_chan:
-            tx_freq = self.get_freq(cmd, is_tx=True)
+        if cmd < OSW_CHAN_COUNT:
+            is_rx_chan = self.rx_chans[cmd]
+            is_tx_chan = self.tx_chans[cmd]
+            rx_freq = self.rx_freqs[cmd]
+            tx_freq = self.tx_freqs[cmd]
+        else:
+            is_rx_chan = False
+            is_tx_chan = False
+            rx_freq = 0.0
+            tx_freq = 0.0
 
         if self.debug >= 13:
             if is_rx_chan and is_tx_chan:
@@ -1769,6 +1832,8 @@ class osw_receiver(object):
             return False
 
         frequency = int(float_freq * 1e6) # use integer not float as dictionary keys
+        if self.rx_ctl.journal is not None:
+            self.rx_ctl.journal.put('grant', ts, self.rx_sys_id, frequency, None, tgid, srcaddr, None)
 
         rc = self.update_talkgroups(ts, frequency, tgid, srcaddr, mode)
 
@@ -1826,7 +1891,8 @@ class osw_receiver(object):
                 if self.debug >= 5:
                     sys.stderr.write('%s [%d] ignorning stale OSW for tgid=%s, time_diff=%f\n' % (log_ts.get(), self.msgq_id, base_tgid, (ts - self.talkgroups[base_tgid]['release_time'])))
                 return False
-            self.talkgroups[base_tgid]['time'] = time.time()
+            self.talkgroups[base_tgid]['time'] = self.clock.time()
+            self.tgid_expiry.add(base_tgid, self.talkgroups[base_tgid]['time'] + TGID_EXPIRY_TIME)
             self.talkgroups[base_tgid]['release_time'] = 0
             self.talkgroups[base_tgid]['frequency'] = frequency
             self.talkgroups[base_tgid]['status'] = tgid_stat
@@ -1848,6 +1914,9 @@ class osw_receiver(object):
             self.talkgroups[tgid]['mode'] = -1
             self.talkgroups[tgid]['receiver'] = None
             self.talkgroups[tgid]['status'] = 0
+            entry = self.tgid_db.get(tgid) if self.tgid_db is not None else None
+            if entry is not None:       # fault in tag and priority from the tags database
+                self.talkgroups[tgid]['tag'], self.talkgroups[tgid]['prio'] = entry
 
     def expire_talkgroups(self, curr_time):
         rc = False
@@ -1855,9 +1924,10 @@ class osw_receiver(object):
         tg_expire_list = []
         # done in two steps so the critical sections can be decoupled
         # step 1 - build an expiry list with the talkgroups_mutex locked
+        # (talkgroups without a receiver are dropped from the queue; tune_voice re-registers them)
         with self.talkgroups_mutex:
-            for tgid in self.talkgroups:
-                if (self.talkgroups[tgid]['receiver'] is not None) and (curr_time >= self.talkgroups[tgid]['time'] + TGID_EXPIRY_TIME):
+            for tgid in self.tgid_expiry.expired(curr_time):
+                if self.talkgroups[tgid]['receiver'] is not None:
                     tg_expire_list.append(tgid)
 
         # step 2 - expire the individual talkgroups with the talkgroups_mutex unlocked
@@ -1877,6 +1947,9 @@ class osw_receiver(object):
             if sub_tgid != tgid:
                 is_update = sub_tgid in self.patches[tgid]
                 self.patches[tgid][sub_tgid] = {'time': ts, 'mode': mode}
+                self.patch_expiry.add((tgid, sub_tgid), ts + PATCH_EXPIRY_TIME)
+                if not is_update and self.rx_ctl.journal is not None:
+                    self.rx_ctl.journal.put('patch', ts, self.rx_sys_id, tgid, sub_tgid)
                 if self.debug >= 5:
                     action_str = "updated" if is_update else "added"
                     sys.stderr.write("%s [%d] add_patch: %s patch to tgid(%d) from sub_tgid(%d)\n" % (log_ts.get(), self.msgq_id, action_str, tgid, sub_tgid))
@@ -1897,13 +1970,16 @@ class osw_receiver(object):
     def expire_patches(self, curr_time):
         deleted = 0
         with self.patches_mutex:
-            for tgid in list(self.patches.keys()):
-                for sub_tgid in list(self.patches[tgid].keys()):
-                    if curr_time > (self.patches[tgid][sub_tgid]['time'] + PATCH_EXPIRY_TIME):
-                        deleted += 1
-                        del self.patches[tgid][sub_tgid]
-                        if self.debug >= 5:
-                            sys.stderr.write("%s [%d] expire_patches: expired patch to tgid(%d) from sub_tgid(%d)\n" % (log_ts.get(), self.msgq_id, tgid, sub_tgid))
+            for tgid, sub_tgid in self.patch_expiry.expired(curr_time):
+                if tgid not in self.patches or sub_tgid not in self.patches[tgid]:    # already deleted
+                    continue
+                if curr_time <= (self.patches[tgid][sub_tgid]['time'] + PATCH_EXPIRY_TIME):
+                    self.patch_expiry.add((tgid, sub_tgid), self.patches[tgid][sub_tgid]['time'] + PATCH_EXPIRY_TIME)
+                    continue
+                deleted += 1
+                del self.patches[tgid][sub_tgid]
+                if self.debug >= 5:
+                    sys.stderr.write("%s [%d] expire_patches: expired patch to tgid(%d) from sub_tgid(%d)\n" % (log_ts.get(), self.msgq_id, tgid, sub_tgid))
                 if len(list(self.patches[tgid].keys())) == 0:
                     del self.patches[tgid]
                     if self.debug >= 5:
@@ -1915,14 +1991,19 @@ class osw_receiver(object):
         cc_freq_key = int(cc_rx_freq * 1e6)
         is_update = cc_freq_key in self.alternate_cc_freqs
         self.alternate_cc_freqs[cc_freq_key] = {'time': ts, 'cc_rx_freq': cc_rx_freq, 'cc_tx_freq': cc_tx_freq}
+        self.alt_cc_expiry.add(cc_freq_key, ts + ALT_CC_EXPIRY_TIME)
         if self.debug >= 5:
             action_str = "updated" if is_update else "added"
             sys.stderr.write("%s [%d] add_alternate_cc_freq: %s alternate cc_freq(%f)\n" % (log_ts.get(), self.msgq_id, action_str, cc_rx_freq))
         return True
 
     def expire_alternate_cc_freqs(self, curr_time):
-        for freq in list(self.alternate_cc_freqs.keys()):
-            if curr_time > self.alternate_cc_freqs[freq]['time'] + ALT_CC_EXPIRY_TIME:
+        for freq in self.alt_cc_expiry.expired(curr_time):
+            if freq not in self.alternate_cc_freqs:
+                continue
+            if curr_time <= self.alternate_cc_freqs[freq]['time'] + ALT_CC_EXPIRY_TIME:
+                self.alt_cc_expiry.add(freq, self.alternate_cc_freqs[freq]['time'] + ALT_CC_EXPIRY_TIME)
+            else:
                 del self.alternate_cc_freqs[freq]
                 if self.debug >= 5:
                     sys.stderr.write("%s [%d] expire_alternate_cc_freqs: expired cc_freq(%f)\n" % (log_ts.get(), self.msgq_id, freq / 1e6))
@@ -1931,14 +2012,19 @@ class osw_receiver(object):
     def add_adjacent_site(self, ts, site, cc_rx_freq, cc_tx_freq):
         is_update = site in self.adjacent_sites
         self.adjacent_sites[site] = {'time': ts, 'cc_rx_freq': cc_rx_freq, 'cc_tx_freq': cc_tx_freq}
+        self.adj_site_expiry.add(site, ts + ADJ_SITE_EXPIRY_TIME)
         if self.debug >= 5:
             action_str = "updated" if is_update else "added"
             sys.stderr.write("%s [%d] add_adjacent_site: %s adjacent site(%d)\n" % (log_ts.get(), self.msgq_id, action_str, site))
         return True
 
     def expire_adjacent_sites(self, curr_time):
-        for site in list(self.adjacent_sites.keys()):
-            if curr_time > self.adjacent_sites[site]['time'] + ADJ_SITE_EXPIRY_TIME:
+        for site in self.adj_site_expiry.expired(curr_time):
+            if site not in self.adjacent_sites:
+                continue
+            if curr_time <= self.adjacent_sites[site]['time'] + ADJ_SITE_EXPIRY_TIME:
+                self.adj_site_expiry.add(site, self.adjacent_sites[site]['time'] + ADJ_SITE_EXPIRY_TIME)
+            else:
                 del self.adjacent_sites[site]
                 if self.debug >= 5:
                     sys.stderr.write("%s [%d] expire_adjacent_sites: expired site(%d)\n" % (log_ts.get(), self.msgq_id, site))
@@ -1971,7 +2057,7 @@ class osw_receiver(object):
         d['adjacent_data']  = {}
         d['last_tsbk']      = self.last_osw
 
-        t = time.time()
+        t = self.clock.time()
 
         # Get all current frequencies we know about (CC, alternate CC, VC)
         all_freqs = list(self.voice_frequencies.keys()) + list(self.alternate_cc_freqs.keys())
@@ -2073,6 +2159,7 @@ class voice_receiver(object):
         self.nbfm_ctrl = nbfm_ctrl
         self.fa_ctrl = fa_ctrl
         self.control = control
+        self.clock = control.clock if control is not None else system_clock()
         self.config = config
         self.meta_q = meta_q
         self.talkgroups = None
@@ -2082,8 +2169,8 @@ class voice_receiver(object):
         self.hold_until = 0.0
         self.hold_mode = False
         self.tgid_hold_time = TGID_HOLD_TIME
-        self.blacklist = {}
-        self.skiplist = {}
+        self.blacklist = interval_set()
+        self.skiplist = interval_set()
         self.whitelist = None
         self.vc_retries = 0
 
@@ -2102,7 +2189,7 @@ class voice_receiver(object):
             self.talkgroups = self.control.get_talkgroups()
         self.load_bl_wl()
         self.tgid_hold_time = float(from_dict(self.control.config, 'tgid_hold_time', TGID_HOLD_TIME))
-        meta_update(self.meta_q)
+        meta_update(self.meta_q, ts=self.clock.time())
 
     def load_bl_wl(self):
         self.skiplist = self.control.get_skiplist()
@@ -2132,7 +2219,7 @@ class voice_receiver(object):
             elif data > 0:
                 self.add_blacklist(data)
         elif cmd == 'reload':
-            self.blacklist = {}
+            self.blacklist = interval_set()
             self.whitelist = None
             self.load_bl_wl()
 
@@ -2172,7 +2259,7 @@ class voice_receiver(object):
             self.expire_talkgroup(reason = "skiplisted")
             self.hold_mode = False
             self.hold_tgid = None
-            self.hold_until = time.time()
+            self.hold_until = self.clock.time()
 
     def add_blacklist(self, tgid, end_time=None):
         if not tgid or (tgid <= 0) or (tgid > 65534):
@@ -2196,7 +2283,7 @@ class voice_receiver(object):
             self.expire_talkgroup(reason = "blacklisted")
             self.hold_mode = False
             self.hold_tgid = None
-            self.hold_until = time.time()
+            self.hold_until = self.clock.time()
 
     def add_whitelist(self, tgid):
         if not tgid or (tgid <= 0) or (tgid > 65534):
@@ -2208,7 +2295,7 @@ class voice_receiver(object):
             if self.debug > 1:
                 sys.stderr.write("%s [%d] de-blacklisting tgid(%d)\n" % (log_ts.get(), self.msgq_id, tgid))
         if self.whitelist is None:
-            self.whitelist = {}
+            self.whitelist = interval_set()
         if tgid in self.whitelist:
             return
         self.whitelist[tgid] = None
@@ -2218,23 +2305,15 @@ class voice_receiver(object):
             self.expire_talkgroup(reason = "not whitelisted")
             self.hold_mode = False
             self.hold_tgid = None
-            self.hold_until = time.time()
+            self.hold_until = self.clock.time()
 
     def blacklist_update(self, start_time):
-        expired_tgs = [tg for tg in list(self.blacklist.keys())
-                            if self.blacklist[tg] is not None
-                            and self.blacklist[tg] < start_time]
-        for tg in expired_tgs:
-            self.blacklist.pop(tg)
+        self.blacklist.expire(start_time)
 
     def skiplist_update(self, start_time):
-        expired_tgs = [tg for tg in list(self.skiplist.keys())
-                            if self.skiplist[tg] is not None
-                            and self.skiplist[tg] < start_time]
-        for tg in expired_tgs:
-            self.skiplist.pop(tg)
+        for start, end in self.skiplist.expire(start_time):
             if self.debug > 1:
-                sys.stderr.write("%s [%d] removing expired skiplist: tg(%d)\n" % (log_ts.get(), self.msgq_id, tg));
+                sys.stderr.write("%s [%d] removing expired skiplist: tg(%s)\n" % (log_ts.get(), self.msgq_id, start if start == end else "%d-%d" % (start, end)))
 
     def find_talkgroup(self, start_time, tgid=None, hold=False):
         tgt_tgid = None
@@ -2287,7 +2366,7 @@ class voice_receiver(object):
             self.tune_voice(freq, tgid)
             self.log_call(freq, self.talkgroups[tgid]['prio'], tgid, self.talkgroups[tgid]['srcaddr'])
 
-        meta_update(self.meta_q, tgid, self.talkgroups[tgid]['tag'])
+        meta_update(self.meta_q, tgid, self.talkgroups[tgid]['tag'], ts=self.clock.time())
 
     def hold_talkgroup(self, tgid, curr_time):
         if tgid > 0:
@@ -2332,11 +2411,12 @@ class voice_receiver(object):
         self.current_tgid = tgid
         with self.control.talkgroups_mutex:
             self.talkgroups[tgid]['receiver'] = self
+            self.control.tgid_expiry.add(tgid, self.talkgroups[tgid]['time'] + TGID_EXPIRY_TIME)
         self.fa_ctrl({'tuner': self.msgq_id, 'cmd': 'set_slotid', 'slotid': 0}) # always enable digital p25cai
         self.nbfm_ctrl(self.msgq_id, (self.talkgroups[tgid]['mode'] != 1) )     # enable nbfm unless mode is digital
 
     def expire_talkgroup(self, tgid=None, update_meta = True, reason="unk", auto_hold = True):
-        expire_time = time.time()
+        expire_time = self.clock.time()
         self.nbfm_ctrl(self.msgq_id, False)                                     # disable nbfm
         self.fa_ctrl({'tuner': self.msgq_id, 'cmd': 'set_slotid', 'slotid': 4}) # disable p25cai
         if self.current_tgid is None:
@@ -2352,9 +2432,10 @@ class voice_receiver(object):
             self.hold_tgid = self.current_tgid
             self.hold_until = expire_time + TGID_HOLD_TIME
         self.current_tgid = None
+        self.control.rx_ctl.call_end(self.msgq_id, reason)
 
         if update_meta:
-            meta_update(self.meta_q)
+            meta_update(self.meta_q, ts=self.clock.time())
 
     def get_status(self):
         with self.control.talkgroups_mutex:
@@ -27,6 +27,7 @@ import json
 import traceback
 from helper_funcs import *
 from log_ts import log_ts
+from trunk_clock import system_clock
 
 CC_HUNT_TIMEOUTS = 3   # number of sync timeouts to wait until control channel hunt
 VC_SRCH_TIME     = 3.0 # seconds to wait from VC tuning until hunt
@@ -49,7 +50,7 @@ class dmr_chan:
         self.debug = dbglvl
 
 class dmr_receiver:
-    def __init__(self, msgq_id, frequency_set=None, fa_ctrl=None, chans={}, debug=0):
+    def __init__(self, msgq_id, frequency_set=None, fa_ctrl=None, chans={}, debug=0, clock=None):
         class _states(object):
             IDLE = 0
             CC   = 1
@@ -63,6 +64,7 @@ class dmr_receiver:
         self.fa_ctrl = fa_ctrl
         self.msgq_id = msgq_id
         self.debug = debug
+        self.clock = clock if clock is not None else system_clock()
         self.cc_timeouts = 0
         self.chans = chans
         self.chan_list = list(self.chans.keys())
@@ -113,9 +115,9 @@ class dmr_receiver:
                                         'chan': chan,
                                         'state': self.states.SRCH,
                                         'type': self.current_type,
-                                        'time': time.time()})
+                                        'time': self.clock.time()})
                     self.active_tgids[grp_addr] = lcn_sl
-                self.chans[lcn].slot[slot].grant_time = time.time()
+                self.chans[lcn].slot[slot].grant_time = self.clock.time()
                 self.chans[lcn].slot[slot].grp_addr = grp_addr
                 self.chans[lcn].slot[slot].src_addr = src_addr
             elif self.debug >=9:
@@ -140,7 +142,7 @@ class dmr_receiver:
         tune_params = {'tuner': self.msgq_id,
                        'freq': self.chans[self.chan_list[next_ch]].frequency,
                        'chan': next_ch,
-                       'time': time.time()}
+                       'time': self.clock.time()}
 
         if msgq_id is not None:
             tune_params['tuner'] = msgq_id
@@ -181,7 +183,7 @@ class dmr_receiver:
                 self.cc_timeouts = 0
 
         # If voice channel not identified, begin LCN search
-        if (self.msgq_id > 0) and (self.current_state == self.states.SRCH) and (self.tune_time + VC_SRCH_TIME < time.time()):
+        if (self.msgq_id > 0) and (self.current_state == self.states.SRCH) and (self.tune_time + VC_SRCH_TIME < self.clock.time()):
             self.tune_next_chan()
 
         # log received message
@@ -370,7 +372,8 @@ class dmr_receiver:
 
 
 class rx_ctl(object):
-    def __init__(self, debug=0, frequency_set=None, nbfm_ctrl=None, fa_ctrl=None, chans={}):
+    def __init__(self, debug=0, frequency_set=None, nbfm_ctrl=None, fa_ctrl=None, chans={}, clock=None):
+        self.clock = clock if clock is not None else system_clock()    # time source for all trunking decisions
         self.frequency_set = frequency_set
         self.fa_ctrl = fa_ctrl
         self.debug = debug
@@ -399,7 +402,7 @@ class rx_ctl(object):
             self.receivers[rx_id].post_init()
 
     def add_receiver(self, msgq_id, config, meta_q = None, freq = 0):
-        self.receivers[msgq_id] = dmr_receiver(msgq_id, self.frequency_set, self.fa_ctrl, self.chans, self.debug)
+        self.receivers[msgq_id] = dmr_receiver(msgq_id, self.frequency_set, self.fa_ctrl, self.chans, self.debug, self.clock)
 
     def process_qmsg(self, msg):
         m_proto = ctypes.c_int16(msg.type() >> 16).value    # upper 16 bits of msg.type() is signed protocol
@@ -407,6 +410,7 @@ class rx_ctl(object):
         if (m_proto != 1) and (m_type != -1): # DMR m_proto=1 except for timeout when m_proto=0
             return
 
+        self.clock.update(msg)
         self.check_expired_grants()
 
         m_rxid = int(msg.arg1()) >> 1
@@ -414,7 +418,7 @@ class rx_ctl(object):
             self.receivers[m_rxid].process_qmsg(msg)
 
     def check_expired_grants(self):
-        cur_time = time.time()
+        cur_time = self.clock.time()
         for tgid in list(self.receivers[0].active_tgids):
             act_lcn = self.receivers[0].active_tgids[tgid] >> 1
             act_slot = self.receivers[0].active_tgids[tgid] & 1
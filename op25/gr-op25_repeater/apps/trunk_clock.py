@@ -0,0 +1,51 @@
+
+# This file is part of OP25
+#
+# OP25 is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+#
+# OP25 is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with OP25; see the file COPYING. If not, write to the Free
+# Software Foundation, Inc., 51 Franklin Street, Boston, MA
+# 02110-1301, USA.
+
+# Clocks for the trunking modules.
+#
+# The trunking modules read the current time for grant, hold and expiry
+# decisions from the clock passed to rx_ctl.__init__, and pass every received
+# message to the clock's update() before handling it.
+#
+#   system_clock - the system time; used for live reception
+#   msg_clock    - the latest frame assembler timestamp (msg.arg2()) seen; used
+#                  for replay, so that a capture gives the same decisions
+#                  however fast it is decoded.  Messages created in python
+#                  (e.g. call terminations) with a zero timestamp, and
+#                  timestamps earlier than the current time, leave it unchanged.
+
+import time
+
+class system_clock(object):
+    def time(self):
+        return time.time()
+
+    def update(self, msg):
+        pass
+
+class msg_clock(object):
+    def __init__(self, start = 0.0):
+        self.now = float(start)
+
+    def time(self):
+        return self.now
+
+    def update(self, msg):
+        m_ts = float(msg.arg2())
+        if m_ts > self.now:
+            self.now = m_ts
@@ -28,7 +28,9 @@ import ast
 sys.path.append('tdma')
 import lfsr
 from helper_funcs import *
+import helper_funcs
 from log_ts import log_ts
+from trunk_clock import system_clock
 from gnuradio import gr
 import gnuradio.op25_repeater as op25_repeater
 
@@ -59,13 +61,14 @@ class trunked_system (object):
         self.ns_wacn = -1
         self.ns_chan = 0
         self.voice_frequencies = {}
-        self.skiplist = {}
-        self.blacklist = {}
+        self.skiplist = interval_set()
+        self.blacklist = interval_set()
         self.whitelist = None
         self.tgid_map = {}
         self.offset = 0
         self.sysname = 0
         self.rxctl = rxctl
+        self.clock = rxctl.clock if rxctl is not None else system_clock()
 
         self.trunk_cc = 0
         self.last_trunk_cc = 0
@@ -88,7 +91,7 @@ class trunked_system (object):
             self.cc_list   = config['cclist']
             self.center_frequency = config['center_frequency']
             self.modulation = config['modulation']
-            self.hunt_cc(time.time())
+            self.hunt_cc(self.clock.time())
 
     def set_debug(self, dbglvl):
         self.debug = dbglvl
@@ -134,7 +137,7 @@ class trunked_system (object):
         d['frequency_data'] = {}
         d['last_tsbk'] = self.last_tsbk
         d['tsbks'] = self.stats['tsbks']
-        t = time.time()
+        t = self.clock.time()
         self.expire_voice_frequencies(t, curr_tgid)
         for f in list(self.voice_frequencies.keys()):
             vc0 = get_tgid(self.voice_frequencies[f]['tgid'][0])
@@ -156,7 +159,7 @@ class trunked_system (object):
         s.append('secondary control channel(s): %s' % ','.join(['%f' % (float(k) / 1000000.0) for k in list(self.secondary.keys())]))
         s.append('stats: tsbks %d crc %d' % (self.stats['tsbks'], self.stats['crc']))
         s.append('')
-        t = time.time()
+        t = self.clock.time()
         for f in self.voice_frequencies:
             vc0 = get_tgid(self.voice_frequencies[f]['tgid'][0])
             vc1 = get_tgid(self.voice_frequencies[f]['tgid'][1])
@@ -230,7 +233,7 @@ class trunked_system (object):
             self.talkgroups[tgid] = {'counter':0}
             if self.debug >= 5:
                 sys.stderr.write('%s new tgid=%s %s prio %d\n' % (log_ts.get(), tgid, self.get_tag(tgid), self.get_prio(tgid)))
-        self.talkgroups[tgid]['time'] = time.time()
+        self.talkgroups[tgid]['time'] = self.clock.time()
         self.talkgroups[tgid]['frequency'] = frequency
         self.talkgroups[tgid]['tdma_slot'] = tdma_slot
         self.talkgroups[tgid]['srcaddr'] = srcaddr
@@ -281,7 +284,7 @@ class trunked_system (object):
                 self.voice_frequencies[prev_freq]['tgid'] = [None, None]
             else:
                 self.voice_frequencies[prev_freq]['tgid'][prev_slot] = None
-        curr_time = time.time()
+        curr_time = self.clock.time()
         self.voice_frequencies[frequency]['time'] = curr_time
         self.voice_frequencies[frequency]['counter'] += 1
         if tdma_slot is None:   # FDMA mark both slots with same info
@@ -308,32 +311,24 @@ class trunked_system (object):
                        (not self.whitelist and tgid not in self.blacklist)))]
 
     def blacklist_update(self, start_time):
-        expired_tgs = [tg for tg in list(self.blacklist.keys())
-                            if self.blacklist[tg] is not None
-                            and self.blacklist[tg] < start_time]
-        for tg in expired_tgs:
+        for start, end in self.blacklist.expire(start_time):
             if self.debug > 1:
-                sys.stderr.write("%s removing expired blacklist: tg(%d)\n" % (log_ts.get(), tg))
-            self.blacklist.pop(tg)
+                sys.stderr.write("%s removing expired blacklist: tg(%s)\n" % (log_ts.get(), start if start == end else "%d-%d" % (start, end)))
 
     def skiplist_update(self, start_time):
-        expired_tgs = [tg for tg in list(self.skiplist.keys())
-                            if self.skiplist[tg] is not None
-                            and self.skiplist[tg] < start_time]
-        for tg in expired_tgs:
-            self.skiplist.pop(tg)
+        for start, end in self.skiplist.expire(start_time):
             if self.debug > 1:
-                sys.stderr.write("%s removing expired skiplist: tg(%d)\n" % (log_ts.get(), tg));
+                sys.stderr.write("%s removing expired skiplist: tg(%s)\n" % (log_ts.get(), start if start == end else "%d-%d" % (start, end)))
 
     def add_patch(self, sg, ga_list):
         if sg not in self.patches:
             self.patches[sg] = {}
             self.patches[sg]['ga'] = set()
-            self.patches[sg]['ts'] = time.time()
+            self.patches[sg]['ts'] = self.clock.time()
 
         for ga in ga_list:
             if (ga != sg):
-                self.patches[sg]['ts'] = time.time() # update timestamp
+                self.patches[sg]['ts'] = self.clock.time() # update timestamp
                 if ga not in self.patches[sg]['ga']:
                     self.patches[sg]['ga'].add(ga)
                     if self.debug >= 5:
@@ -358,7 +353,7 @@ class trunked_system (object):
                 sys.stderr.write("%s del_patch: deleting patch sg(%d)\n" % (log_ts.get(), sg))
 
     def expire_patches(self):
-        time_now = time.time()
+        time_now = self.clock.time()
         for sg in list(self.patches):
             if time_now > (self.patches[sg]['ts'] + self.PATCH_EXPIRY_TIME):
                 del self.patches[sg]
@@ -437,7 +432,7 @@ class trunked_system (object):
             if self.debug > 1:
                 sys.stderr.write("%s de-blacklisting tgid(%d)\n" % (log_ts.get(), tgid))
         if not self.whitelist:
-            self.whitelist = {}
+            self.whitelist = interval_set()
         if tgid in self.whitelist:
             return
         self.whitelist[tgid] = None
@@ -446,7 +441,7 @@ class trunked_system (object):
 
     def decode_mbt_data(self, opcode, src, header, mbt_data):
         self.cc_timeouts = 0
-        self.last_tsbk = time.time()
+        self.last_tsbk = self.clock.time()
         updated = 0
         if opcode == 0x0:  # grp voice channel grant
             opts = (header >> 8)    & 0xff
@@ -533,7 +528,7 @@ class trunked_system (object):
 
     def decode_tsbk(self, tsbk):
         self.cc_timeouts = 0
-        self.last_tsbk = time.time()
+        self.last_tsbk = self.clock.time()
         self.stats['tsbks'] += 1
         updated = 0
         tsbk = tsbk << 16    # for missing crc
@@ -812,7 +807,7 @@ class trunked_system (object):
 
     def decode_tdma_ptt(self, msg, curr_time):
         updated = 0
-        self.last_tsbk = time.time()
+        self.last_tsbk = self.clock.time()
         self.stats['tsbks'] += 1
         mi    = get_ordinals(msg[0:9])
         algid = get_ordinals(msg[9:10])
@@ -827,7 +822,7 @@ class trunked_system (object):
         return updated
 
     def decode_tdma_endptt(self, msg, curr_time):
-        self.last_tsbk = time.time()
+        self.last_tsbk = self.clock.time()
         self.stats['tsbks'] += 1
         mi    = get_ordinals(msg[0:9])
         sa    = get_ordinals(msg[12:15])
@@ -839,7 +834,7 @@ class trunked_system (object):
     def decode_tdma_msg(self, msg, curr_time):
         updated = 0
         self.cc_timeouts = 0
-        self.last_tsbk = time.time()
+        self.last_tsbk = self.clock.time()
         self.stats['tsbks'] += 1
         mfid = 0
         op = get_ordinals(msg[:1])
@@ -1128,7 +1123,7 @@ class trunked_system (object):
 
     def decode_fdma_lcw(self, msg, curr_time):
         updated = 0
-        self.last_tsbk = time.time()
+        self.last_tsbk = self.clock.time()
         self.stats['tsbks'] += 1
         pb_sf_lco = get_ordinals(msg[0:1])
 
@@ -1203,31 +1198,17 @@ def get_int_dict(s):
     # path begins with a digit.
 
     if s[0].isdigit():
-        return dict.fromkeys([int(d) for d in s.split(',')])
-
-    # create dict by reading from file
-    d = {}                     # this is the dict
-    with open(s,"r") as f:
-        for v in f:
-            v = v.split("\t",1) # split on tab
-            try:
-                v0 = int(v[0])                         # first parameter is tgid or start of tgid range
-                v1 = v0
-                if (len(v) > 1) and (int(v[1]) > v0):  # second parameter if present is end of tgid range
-                    v1 = int(v[1])
-
-                for tg in range(v0, (v1 + 1)):
-                        if tg not in d:      # is this a new tg?
-                                d[tg] = []   # if so, add to dict (key only, value null)
-                                sys.stderr.write('%s added talkgroup %d from %s\n' % (log_ts.get(),tg,s))
-
-            except (IndexError, ValueError) as ex:
-                continue
-    f.close()
-    return dict.fromkeys(d)
+        d = interval_set()
+        for tg in s.split(','):
+            d.add(int(tg), int(tg))
+        return d
+
+    # otherwise read ranges from file
+    return helper_funcs.get_int_dict(s)
 
 class rx_ctl (object):
-    def __init__(self, debug=0, frequency_set=None, conf_file=None, logfile_workers=None, meta_update=None, crypt_behavior=0, nbfm_ctrl=None, fa_ctrl=None, chans={}):
+    def __init__(self, debug=0, frequency_set=None, conf_file=None, logfile_workers=None, meta_update=None, crypt_behavior=0, nbfm_ctrl=None, fa_ctrl=None, chans={}, clock=None):
+        self.clock = clock if clock is not None else system_clock()    # time source for all trunking decisions
         class _states(object):
             ACQ = 0
             CC = 1
@@ -1246,7 +1227,7 @@ class rx_ctl (object):
         self.meta_q = None
         self.debug = debug
         self.tgid_hold = None
-        self.tgid_hold_until = time.time()
+        self.tgid_hold_until = self.clock.time()
         self.hold_mode = False
         self.TGID_HOLD_TIME = 2.0    # TODO: make more configurable
         self.TGID_SKIP_TIME = 4.0    # TODO: make more configurable
@@ -1258,14 +1239,13 @@ class rx_ctl (object):
         self.current_encrypted = 0
         self.current_slot = None
         self.TSYS_HOLD_TIME = 3.0    # TODO: make more configurable
-        self.wait_until = time.time()
+        self.wait_until = self.clock.time()
         self.configs = {}
         self.config = None           # multi_rx.py channel config
         self.chans = chans
         self.nacs = []
         self.logfile_workers = logfile_workers
         self.working_frequencies = {}
-        self.xor_cache = {}
         self.last_garbage_collect = 0
         self.last_tune_time = 0.0;
         self.last_tune_freq = 0;
@@ -1292,7 +1272,7 @@ class rx_ctl (object):
         self.config = config
         self.receivers[msgq_id] = msgq_id
         self.last_tune_freq = freq
-        self.last_tune_time = time.time()
+        self.last_tune_time = self.clock.time()
         if meta_q is not None:
             self.meta_q = meta_q
             self.meta_update = self.update_meta
@@ -1304,7 +1284,7 @@ class rx_ctl (object):
         d['tgid'] = tgid
         d['tag'] = tag
         d['rid'] = rid
-        msg = gr.message().make_from_string(json.dumps(d), -2, time.time(), 0)
+        msg = gr.message().make_from_string(json.dumps(d), -2, self.clock.time(), 0)
         if not self.meta_q.full_p():
             self.meta_q.insert_tail(msg)
 
@@ -1343,7 +1323,7 @@ class rx_ctl (object):
             if self.debug > 10:
                 sys.stderr.write("%s set_frequency(%s)\n" % (log_ts.get(), frequency))
             if frequency != self.last_tune_freq:
-                self.last_tune_time = time.time()
+                self.last_tune_time = self.clock.time()
                 self.last_tune_freq = frequency
             self.frequency_set(params)
             self.current_slot = params['tdma']
@@ -1362,7 +1342,7 @@ class rx_ctl (object):
 
     def add_trunked_system(self, nac):
         assert nac not in self.trunked_systems    # duplicate nac not allowed
-        blacklist = {}
+        blacklist = interval_set()
         whitelist = None
         tgid_map = {}
         cfg = None
@@ -1409,7 +1389,7 @@ class rx_ctl (object):
             configs[nac]['sysname'] = section
         self.setup_config(configs)
 
-    def add_default_config(self, nac, cclist=[], offset=0, whitelist=None, blacklist={}, tgid_map={}, sysname=None, center_frequency=None, modulation='cqpsk'):
+    def add_default_config(self, nac, cclist=[], offset=0, whitelist=None, blacklist=None, tgid_map={}, sysname=None, center_frequency=None, modulation='cqpsk'):
         if nac in list(self.configs.keys()):
             return
         if nac not in list(self.trunked_systems.keys()):
@@ -1429,6 +1409,8 @@ class rx_ctl (object):
             
         if not sysname:
             sysname = 'NAC 0x%x' % nac
+        if blacklist is None:
+            blacklist = interval_set()
         if not cclist:
             cclist = [tsys.rfss_chan]
             cclist.extend(list(tsys.secondary.keys()))
@@ -1441,7 +1423,7 @@ class rx_ctl (object):
 
     def setup_config(self, configs):
         for nac in configs:
-            self.configs[nac] = {'cclist':[], 'offset':0, 'whitelist':None, 'blacklist':{}, 'tgid_map':{}, 'sysname': configs[nac]['sysname'], 'center_frequency': None}
+            self.configs[nac] = {'cclist':[], 'offset':0, 'whitelist':None, 'blacklist':interval_set(), 'tgid_map':{}, 'sysname': configs[nac]['sysname'], 'center_frequency': None}
             if len(configs[nac]['control_channel_list']) > 0:
                 for f in configs[nac]['control_channel_list'].split(','):
                     self.configs[nac]['cclist'].append(get_frequency(f))
@@ -1547,7 +1529,7 @@ class rx_ctl (object):
         return s
 
     def ui_command(self, cmd, data, msgq_id):
-        curr_time = time.time()
+        curr_time = self.clock.time()
         if self.debug > 10:
             sys.stderr.write('ui_command: command: %s, data: %d\n' % (cmd, int(data)))
         self.update_state(cmd, curr_time, int(data))
@@ -1566,7 +1548,9 @@ class rx_ctl (object):
             return
 
         updated = 0
-        curr_time = time.time()
+        if m_type != -2:
+            self.clock.update(msg)
+        curr_time = self.clock.time()
 
         if m_type == -2:    # Request from gui
             cmd = msg.to_string()
@@ -1785,9 +1769,7 @@ class rx_ctl (object):
                 index = tdma_slot
                 symbol_rate = 6000
                 xorhash = '%x%x%x' % (self.current_nac, tsys.ns_syid, tsys.ns_wacn)
-                if xorhash not in self.xor_cache:
-                    self.xor_cache[xorhash] = lfsr.p25p2_lfsr(self.current_nac, tsys.ns_syid, tsys.ns_wacn).xor_chars
-                decoder.set_xormask(self.xor_cache[xorhash], xorhash, index=index)
+                decoder.set_xormask(lfsr.get_xor_chars(self.current_nac, tsys.ns_syid, tsys.ns_wacn), xorhash, index=index)
             demod.set_omega(symbol_rate)
             decoder.set_output(filename, index=index)
 
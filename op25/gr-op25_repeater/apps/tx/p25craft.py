@@ -46,13 +46,14 @@
 # the Free Software Foundation, Inc., 51 Franklin Street,
 # Boston, MA 02110-1301, USA.
 
-import sys, struct
+import sys, struct, binascii
+import numpy as np
 
 quiet = False
 outfile = ""
 flip = 0x000
 quiet = True
-outfile = open('p25.out', 'w')
+outfile = 'p25.out'     # opened on first write, see get_outfile()
 
 
 #####################
@@ -63,6 +64,16 @@ def text_out(text):
     if not quiet:
         sys.stdout.write(text)
 
+# Binary output file, or None if binary output is disabled.  A file name is
+# opened (and truncated) the first time something is written to it.
+def get_outfile():
+    global outfile
+    if not outfile:
+        return None
+    if isinstance(outfile, str):
+        outfile = open(outfile, 'wb')
+    return outfile
+
 # Print a list of dibits.
 def print_dibits(data):
     assert len(data) % 2 == 0
@@ -94,12 +105,13 @@ def print_spec(data):
     text_out("\n")
 
     # also produce binary output if requested
-    if outfile:
+    f = get_outfile()
+    if f:
         for i in range(0, len(data), 4):
             byte = 0
             for j in range(4):
                 byte |= data[i+j] << (6 - j*2)
-            outfile.write(struct.pack('B1', (byte ^ flip & 0xff)))
+            f.write(struct.pack('B', (byte ^ flip & 0xff)))
 
 # Split an integer into list of bytes.
 def split_bytes(data, len):
@@ -1091,7 +1103,7 @@ def construct_tsdu(nac, ss, blocks, mfid, opcode, arg):
 
     duid  = 0x7
 
-    numss = (56 + (blocks * 98) + 34) / 35
+    numss = (56 + (blocks * 98) + 34) // 35
     ssyms = (ss,) * numss
 
     text_out("\tDUID  = %01x\n" % duid)
@@ -1137,7 +1149,7 @@ def construct_tsdu3(nac, ss, blocks, mfid, opcodes, args):
 
     duid  = 0x7
 
-    numss = (56 + (blocks * 98) + 34) / 35
+    numss = (56 + (blocks * 98) + 34) // 35
     ssyms = (ss,) * numss
 
     text_out("\tDUID  = %01x\n" % duid)
@@ -1181,7 +1193,7 @@ def construct_cpdu(nac, ss, data, length, an, io, sapid,
 
     # account for length of packet CRC appended to data
     length += 4
-    blocks = (length + 15) / 16
+    blocks = (length + 15) // 16
     assert blocks <= 127
 
     # account for padding to end of next full block
@@ -1197,7 +1209,7 @@ def construct_cpdu(nac, ss, data, length, an, io, sapid,
     data <<= (4 * 8)
     data |= packet_crc
 
-    numss = (56 + ((blocks + 1) * 98) + 34) / 35
+    numss = (56 + ((blocks + 1) * 98) + 34) // 35
     ssyms = (ss,) * numss
 
     text_out("\tDUID = %01x\n" % duid)
@@ -1271,7 +1283,7 @@ def construct_rpdu(nac, ss, data, length, io, rclass, rtype,
     if (length > 0):
         # account for length of packet CRC appended to data
         length += 4
-        blocks = (length + 11) / 12
+        blocks = (length + 11) // 12
 
         packet_crc = crc_32(data, (length - 4) * 8)
         data <<= (4 * 8)
@@ -1279,7 +1291,7 @@ def construct_rpdu(nac, ss, data, length, io, rclass, rtype,
     else:
         blocks = 0
 
-    numss = (56 + ((blocks + 1) * 98) + 34) / 35
+    numss = (56 + ((blocks + 1) * 98) + 34) // 35
     ssyms = (ss,) * numss
 
     text_out("\tDUID = %01x\n" % duid)
@@ -1331,7 +1343,7 @@ def construct_updu(nac, ss, data, length, io, sapid, mfid, llid, dho):
 
     # account for length of packet CRC appended to data
     length += 4
-    blocks = (length + 11) / 12
+    blocks = (length + 11) // 12
     assert blocks <= 127
 
     # account for padding to end of next full block
@@ -1345,7 +1357,7 @@ def construct_updu(nac, ss, data, length, io, sapid, mfid, llid, dho):
     data <<= (4 * 8)
     data |= packet_crc
 
-    numss = (56 + ((blocks + 1) * 98) + 34) / 35
+    numss = (56 + ((blocks + 1) * 98) + 34) // 35
     ssyms = (ss,) * numss
 
     text_out("\tDUID = %01x\n" % duid)
@@ -1397,7 +1409,7 @@ def construct_ambt(nac, ss, data, length, io, sapid, mfid, llid, opcode, dbtm):
 
     # account for length of packet CRC appended to data
     length += 4
-    blocks = (length + 11) / 12
+    blocks = (length + 11) // 12
     assert blocks <= 3
 
     # make sure the data fill the blocks
@@ -1408,7 +1420,7 @@ def construct_ambt(nac, ss, data, length, io, sapid, mfid, llid, opcode, dbtm):
     data <<= (4 * 8)
     data |= packet_crc
 
-    numss = (56 + ((blocks + 1) * 98) + 34) / 35
+    numss = (56 + ((blocks + 1) * 98) + 34) // 35
     ssyms = (ss,) * numss
 
     text_out("\tDUID = %01x\n" % duid)
@@ -1697,14 +1709,14 @@ def make_fakecc_tsdu(params):
         int(12.5 / 0.125),
         (25 * 4),
         int(12.5 / 0.125),
-        902012500/5)
+        902012500//5)
     opcodes.append(op)
     args.append(arg)
     op, arg = format_network_status_broadcast(
         0,
         params['wacn'],
         params['system_id'],
-        (params['cc_freq'] - 902012500) / 12500,
+        (params['cc_freq'] - 902012500) // 12500,
         0x70)
     opcodes.append(op)
     args.append(arg)
@@ -1713,7 +1725,7 @@ def make_fakecc_tsdu(params):
         params['system_id'],
         params['subsystem_id'],
         params['site_id'],
-        (params['cc_freq'] - 902012500) / 12500,
+        (params['cc_freq'] - 902012500) // 12500,
         0x70)
     opcodes.append(op)
     args.append(arg)
@@ -1723,10 +1735,190 @@ def make_fakecc_tsdu(params):
     mfid = 0
     construct_tsdu3(nac, ss, blocks, mfid, opcodes, args)
     ga = 666
-    ch = (params['vc_freq'] - 902012500) / 12500
+    ch = (params['vc_freq'] - 902012500) // 12500
     opcode, args = format_group_voice_channel_grant_update(ch, ga, ch, ga)
     construct_tsdu (nac, ss, blocks, mfid, opcode, args)
 
+####################
+# batch construction #
+####################
+
+# The functions in this section build many packets at once and return them as
+# a numpy array of dibits, one row per packet, with status symbols inserted.
+# Nothing is printed.  Every code used here (BCH, Reed-Solomon plus Golay or
+# Hamming, cyclic, CRC) is linear over GF(2), so each one reduces to a
+# generator matrix (plus a constant for the inverted CRC).  The matrices are
+# made by running the scalar encoders above on unit vectors, which keeps the
+# two paths in step; the 1/2 rate trellis is a table lookup on
+# (previous, current) dibit pairs.  Wide words (IMBE, LC, ES) are passed as
+# python ints, narrower fields may also be numpy arrays.  A scalar argument
+# applies to every packet.
+
+_frame_sync = 0x5575f5ff77ff
+_codes = {}
+
+# arguments are a function mapping a k bit integer to an n bit integer, k and n
+# returns (k,n) generator matrix and (n,) constant as arrays of bits
+def _linear_code(encode, k, n):
+    c = _bits([encode(0)], n)[0]
+    g = _bits([encode(1 << (k - 1 - i)) for i in range(k)], n) ^ c
+    return g, c
+
+def _code(name):
+    if name not in _codes:
+        k, n, encode = {
+            'nid':  (16,  64, bch_64_16_23_encode),
+            'tsbk': (80,  96, lambda x: (x << 16) | crc_ccitt(x)),
+            'hdu':  (120, 648, lambda x: header_golay(rs_36_20_17_encode(x))),
+            'lc':   (72,  240, lambda x: ldu_hamming(rs_24_12_13_encode(x))),
+            'es':   (96,  240, lambda x: ldu_hamming(rs_24_16_9_encode(x))),
+            'lsd1': (32,  32, ldu1_cyclic),
+            'lsd2': (32,  32, ldu2_cyclic),
+        }[name]
+        _codes[name] = _linear_code(encode, k, n)
+    return _codes[name]
+
+def _encode(name, bits):
+    g, c = _code(name)
+    return (np.dot(bits.astype(np.float32), g).astype(np.int64) & 1).astype(np.uint8) ^ c
+
+# argument is a sequence (or scalar) of integers, and the width in bits
+# returns array of bits, msb first, one row per integer
+def _bits(values, width):
+    # python ints are kept as objects, numpy would silently round those
+    # beyond 63 bits to float
+    if isinstance(values, np.ndarray):
+        v = np.atleast_1d(values)
+    else:
+        v = np.atleast_1d(np.array(values, dtype=object))
+    if v.dtype != object and width <= 64:
+        shifts = np.arange(width - 1, -1, -1, dtype=np.uint64)
+        return ((v.astype(np.uint64)[:, None] >> shifts) & 1).astype(np.uint8)
+    nbytes = (width + 7) >> 3
+    data = b''.join([binascii.unhexlify('%0*x' % (nbytes * 2, int(x))) for x in v])
+    bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8).reshape(len(v), nbytes), axis=1)
+    return bits[:, nbytes * 8 - width:]
+
+# argument is array of bits, one row per packet
+# returns array of dibits
+def _dibits(bits):
+    return (bits[:, 0::2] << 1) | bits[:, 1::2]
+
+def _rows(values, n):
+    return np.broadcast_to(np.atleast_1d(np.asarray(values)), (n,))
+
+_trellis_1_2 = np.array((
+    ((0, 2), (3, 0), (0, 1), (3, 3)),
+    ((3, 2), (0, 0), (3, 1), (0, 3)),
+    ((2, 1), (1, 3), (2, 2), (1, 0)),
+    ((1, 1), (2, 3), (1, 2), (2, 0))), dtype=np.uint8)
+_interleave = np.array(data_interleave(list(range(98))))
+
+# batch version of data_interleave(trellis_1_2_encode(dibits))
+# argument is array of 48 dibit rows
+# returns array of 98 dibit rows
+def trellis_1_2_batch(dibits):
+    cur = np.zeros((len(dibits), 49), dtype=np.uint8)
+    cur[:, :48] = dibits
+    prev = np.zeros_like(cur)
+    prev[:, 1:] = cur[:, :-1]
+    return _trellis_1_2[prev, cur].reshape(len(dibits), 98)[:, _interleave]
+
+# positions of data and status symbols, as laid out by insert_status
+# returns array of data indices, with -1 for status symbols and -2 for padding
+def _status_layout(ndata, numss):
+    syms = insert_status(list(range(1, ndata + 1)), (-1,) * numss)
+    return np.array([x - 1 if x > 0 else (-1 if x < 0 else -2) for x in syms])
+
+# arguments are arrays of dibit rows and status symbols
+# returns array of dibit rows
+def _insert_status_batch(data, ss, numss):
+    layout = _status_layout(data.shape[1], numss)
+    frames = np.zeros((len(data), len(layout)), dtype=np.uint8)
+    frames[:, layout >= 0] = data[:, layout[layout >= 0]]
+    frames[:, layout == -1] = _rows(ss, len(data))[:, None]
+    return frames
+
+# batch version of start_packet()
+def start_packet_batch(nac, duid, n):
+    nac = _rows(nac, n).astype(np.uint64)
+    nid = _encode('nid', _bits((nac << np.uint64(4)) | np.uint64(duid), 16))
+    fs = np.broadcast_to(_dibits(_bits(_frame_sync, 48)), (n, 24))
+    return np.hstack((fs, _dibits(nid)))
+
+# TSDUs of blocks TSBKs each.  opcodes and args hold blocks entries per TSDU,
+# one TSDU after another (as construct_tsdu3 takes them for a single TSDU).
+# arguments are arrays or integers
+# returns array of dibit rows
+def tsdu_batch(nac, ss, blocks, mfid, opcodes, args):
+    assert 1 <= blocks <= 3
+    args = np.atleast_1d(np.asarray(args, dtype=np.uint64))
+    m = len(args)
+    assert m % blocks == 0
+    n = m // blocks
+    lb = np.zeros(m, dtype=np.uint64)
+    lb[blocks - 1::blocks] = 1
+    tsbk = np.hstack((_bits((lb << np.uint64(15)) | (_rows(opcodes, m).astype(np.uint64) << np.uint64(8)) | _rows(mfid, m).astype(np.uint64), 16),
+                      _bits(args, 64)))
+    tsbk = trellis_1_2_batch(_dibits(_encode('tsbk', tsbk))).reshape(n, blocks * 98)
+    numss = (56 + (blocks * 98) + 34) // 35
+    return _insert_status_batch(np.hstack((start_packet_batch(nac, 0x7, n), tsbk)), ss, numss)
+
+# batch version of construct_hdu()
+def hdu_batch(nac, ss, mi, mfid, algid, kid, tgid):
+    mi = _bits(mi, 72)
+    n = len(mi)
+    hdr = np.hstack((mi, _bits(_rows(mfid, n), 8), _bits(_rows(algid, n), 8),
+                     _bits(_rows(kid, n), 16), _bits(_rows(tgid, n), 16)))
+    data = np.hstack((start_packet_batch(nac, 0x0, n), _dibits(_encode('hdu', hdr))))
+    return _insert_status_batch(data, ss, 11)
+
+# assemble an LDU from its nine IMBE frames, the 240 bits of LC or ES and the
+# 32 bits of LSD.  flips gives the IMBE frames sent with the sync bit flipped.
+def _ldu_batch(nac, duid, ss, imbe, lcw, lsd, flips):
+    n = len(lcw)
+    imbe = np.broadcast_to(_dibits(_bits(imbe, 144)), (n, 72))
+    imbe_flipped = imbe.copy()
+    imbe_flipped[:, -1] ^= 2
+    lcw = _dibits(lcw)
+    parts = [start_packet_batch(nac, duid, n)]
+    for i in range(9):
+        parts.append(imbe_flipped if i in flips else imbe)
+        if 1 <= i <= 6:
+            parts.append(lcw[:, (i - 1) * 20 : i * 20])
+        elif i == 7:
+            parts.append(_dibits(lsd))
+    return _insert_status_batch(np.hstack(parts), ss, 24)
+
+# batch version of construct_ldu1(), taking link control words as made by
+# construct_lc()
+def ldu1_batch(nac, ss, imbe, lsd, lc):
+    lc = _bits(lc, 72)
+    lsd = _encode('lsd1', _bits(_rows(lsd, len(lc)), 32))
+    return _ldu_batch(nac, 0x5, ss, imbe, _encode('lc', lc), lsd, (1, 3, 5, 7))
+
+# batch version of construct_ldu2(), taking encryption sync words as made by
+# construct_es()
+def ldu2_batch(nac, ss, imbe, lsd, es):
+    es = _bits(es, 96)
+    lsd = _encode('lsd2', _bits(_rows(lsd, len(es)), 32))
+    return _ldu_batch(nac, 0xa, ss, imbe, _encode('es', es), lsd, (0, 2, 4, 6, 8))
+
+# Write dibit rows to a file.  Packed output matches what print_spec() writes
+# (four dibits per byte, honoring flip); unpacked output is one dibit per byte
+# as read by a GNU Radio file_source of chars (e.g. dv_tx.py --test).
+def write_frames(frames, f, packed=True):
+    d = np.asarray(frames, dtype=np.uint8).reshape(-1)
+    if packed:
+        assert len(d) % 4 == 0
+        d = ((d[0::4] << 6) | (d[1::4] << 4) | (d[2::4] << 2) | d[3::4]) ^ np.uint8(flip & 0xff)
+    f.write(d.tobytes())
+
+# GNU Radio source of one dibit per char, suitable for p25_mod_bf
+def frame_source(frames, repeat=False):
+    from gnuradio import blocks
+    return blocks.vector_source_b(np.asarray(frames, dtype=np.uint8).reshape(-1).tolist(), repeat)
+
 ########
 # main #
 ########
@@ -1794,6 +1986,8 @@ if __name__ == "__main__":
         help="Low Speed Data low word for LDU2 (Default: use --lsd)")
     parser.add_option("--ntsbk", type="int", default=1,
         help="Number of TSBKs per TSDU (Default: 1)") 
+    parser.add_option("--count", type="int", default=1,
+        help="Number of TSDUs to construct, more than one uses the batch encoder without text output (Default: 1)")
     parser.add_option("--data", type="int", default=0,
         help="Packet data (Default: 0x0000000000000000)")
     parser.add_option("--length", type="int", default=0,
@@ -1858,10 +2052,10 @@ if __name__ == "__main__":
     assert options.src     <= 0xffffff
     assert options.dst     <= 0xffffff
     assert options.lsd     <= 0xffffffff
-    assert options.lsd1    <= 0xffff
-    assert options.lsd2    <= 0xffff
+    assert options.lsd1 is None or options.lsd1 <= 0xffff
+    assert options.lsd2 is None or options.lsd2 <= 0xffff
     assert options.pri     <= 0x7
-    assert options.svcopt  <= 0xff
+    assert options.svcopt is None or options.svcopt <= 0xff
     assert options.ntsbk   >= 1
     assert options.ntsbk   <= 3
     assert options.sapid   <= 0x3f
@@ -1879,10 +2073,10 @@ if __name__ == "__main__":
 
     if options.output_file:
         if options.output_file == '-':
-            outfile = sys.stdout
+            outfile = getattr(sys.stdout, 'buffer', sys.stdout)
             quiet = True
         else:
-            outfile = open(options.output_file, 'w')
+            outfile = open(options.output_file, 'wb')
 
     # set up inversion of frequency deviations
     if options.flip:
@@ -1910,7 +2104,7 @@ if __name__ == "__main__":
     # Auto-detect the length in bytes of --data.  The --length option overrides
     # this, which is useful when you want leading zeros.
     if (options.data > 0) and (options.length == 0):
-        options.length = (options.data.bit_length() + 7) / 8
+        options.length = (options.data.bit_length() + 7) // 8
 
     # make sure we have IMBE data if we need it
     if options.ldu1 or options.ldu2 or options.superframes:
@@ -1945,14 +2139,28 @@ if __name__ == "__main__":
         if not options.late:
             construct_hdu(options.nac, options.ss, options.mi, options.mfid,
                     options.algid, options.kid, options.tgid)
-        for i in range(options.superframes):
-            construct_ldu1(options.nac, options.ss, options.imbe,
-                    options.lsd, options.lco, options.mfid,
-                    options.svcopt, 0, options.tgid,
-                    options.dst, options.src)
-            construct_ldu2(options.nac, options.ss, options.imbe,
-                    options.lsd, options.mi, options.algid,
-                    options.kid)
+        if quiet:
+            # no text output wanted, so build the LDUs in batches
+            lc = construct_lc(options.lco, options.mfid, options.svcopt, 0,
+                    options.tgid, options.dst, options.src)
+            es = construct_es(options.mi, options.algid, options.kid)
+            for i in range(0, options.superframes, 1000):
+                n = min(1000, options.superframes - i)
+                ldu1 = ldu1_batch(options.nac, options.ss, options.imbe,
+                        options.lsd, [lc] * n)
+                ldu2 = ldu2_batch(options.nac, options.ss, options.imbe,
+                        options.lsd, [es] * n)
+                if get_outfile():
+                    write_frames(np.hstack((ldu1, ldu2)), get_outfile())
+        else:
+            for i in range(options.superframes):
+                construct_ldu1(options.nac, options.ss, options.imbe,
+                        options.lsd, options.lco, options.mfid,
+                        options.svcopt, 0, options.tgid,
+                        options.dst, options.src)
+                construct_ldu2(options.nac, options.ss, options.imbe,
+                        options.lsd, options.mi, options.algid,
+                        options.kid)
         construct_stdu(options.nac, options.ss)
     else:
         if options.hdu:
@@ -1974,6 +2182,14 @@ if __name__ == "__main__":
             construct_xtdu(options.nac, options.ss, options.lco,
                     options.mfid, options.svcopt, 0,
                     options.tgid, options.dst, options.src)
+        elif options.tsdu and options.count > 1:
+            for i in range(0, options.count, 10000):
+                n = min(10000, options.count - i)
+                frames = tsdu_batch(options.nac, options.ss, options.ntsbk,
+                        options.mfid, options.opcode,
+                        [options.arg] * (n * options.ntsbk))
+                if get_outfile():
+                    write_frames(frames, get_outfile())
         elif options.tsdu:
             construct_tsdu(options.nac, options.ss, options.ntsbk,
                     options.mfid, options.opcode, options.arg)
@@ -2015,5 +2231,5 @@ if __name__ == "__main__":
     for i in range(sq_k):
         construct_stdu(options.nac, 3)
 
-    if outfile:
+    if outfile and not isinstance(outfile, str):
         outfile.close()
@@ -0,0 +1,107 @@
+#!/bin/sh
+# This file is part of OP25 and part of GNU Radio
+# 
+# OP25 is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+# 
+# OP25 is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with OP25; see the file COPYING. If not, write to the Free
+# Software Foundation, Inc., 51 Franklin Street, Boston, MA
+# 02110-1301, USA.
+
+"true" '''\'
+DEFAULT_PYTHON2=/usr/bin/python
+DEFAULT_PYTHON3=/usr/bin/python3
+if [ -f op25_python ]; then
+    OP25_PYTHON=$(cat op25_python)
+else
+    OP25_PYTHON="/usr/bin/python"
+fi
+
+if [ -x $OP25_PYTHON ]; then
+    echo Using Python $OP25_PYTHON >&2
+    exec $OP25_PYTHON "$0" "$@"
+elif [ -x $DEFAULT_PYTHON2 ]; then
+    echo Using Python $DEFAULT_PYTHON2 >&2
+    exec $DEFAULT_PYTHON2 "$0" "$@"
+elif [ -x $DEFAULT_PYTHON3 ]; then
+    echo Using Python $DEFAULT_PYTHON3 >&2
+    exec $DEFAULT_PYTHON3 "$0" "$@"
+else
+    echo Unable to find Python >&2
+fi
+exit 127
+'''
+
+#
+# Benchmark for tdma/fast_bit_utils.py
+#
+# Prints a table of per call times for fast_bit_utils and the reference
+# implementation in tdma/bit_utils.py, using the input sizes seen in the isch,
+# duid, vf and lfsr decoders.  The parity checks between the two are in
+# tdma/test_fast_bit_utils.py.
+#
+
+import os
+import sys
+import time
+import random
+import numpy as np
+from optparse import OptionParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tdma'))
+
+import bit_utils as ref
+import fast_bit_utils as fast
+
+def timeit(f, args, repeat):
+    t0 = time.time()
+    for i in range(repeat):
+        f(*args)
+    return (time.time() - t0) / repeat
+
+def bench(repeat):
+    rng = random.Random(1)
+    bits40 = [rng.randint(0, 1) for i in range(40)]
+    bits72 = [rng.randint(0, 1) for i in range(72)]
+    syms = [rng.randint(0, 3) for i in range(2160 * 4)]
+    sync = syms[-30:-10]
+    benches = [
+        ('rev_int 24', 'rev_int', (0xabcdef, 24), 1),
+        ('mk_array 44', 'mk_array', (0x123456789ab, 44), 1),
+        ('mk_int 23', 'mk_int', (bits40[:23],), 1),
+        ('mk_int 40', 'mk_int', (bits40,), 1),
+        ('mk_int 44 np', 'mk_int', (ref.mk_array(0x123456789ab, 44),), 1),
+        ('mk_str 8', 'mk_str', (bits40[:8],), 1),
+        ('bits_to_dibits 40', 'bits_to_dibits', (bits40,), 1),
+        ('dibits_to_bits 36', 'dibits_to_bits', (syms[:36],), 1),
+        ('check_l 72', 'check_l', (bits72, bits72[::-1]), 1),
+        ('fixup 72', 'fixup', (bits72,), 1),
+        ('mk_array 4320', 'mk_array', (rng.getrandbits(4320), 4320), 100),
+        ('mk_int 4320', 'mk_int', (syms[:4320],), 100),
+        ('dibits_to_bits 2160 np', 'dibits_to_bits', (np.array(syms[:2160]),), 100),
+        ('find_sym 8640', 'find_sym', (sync, syms), 100),
+    ]
+    sys.stdout.write("%-20s %12s %12s %9s\n" % ("function", "bit_utils", "fast", "speedup"))
+    for (label, name, args, divisor) in benches:
+        n = max(1, repeat // divisor)
+        t_ref = timeit(getattr(ref, name), args, n)
+        t_fast = timeit(getattr(fast, name), args, n)
+        sys.stdout.write("%-20s %10.2fus %10.2fus %8.1fx\n" % (label, 1e6 * t_ref, 1e6 * t_fast, t_ref / t_fast))
+
+def main():
+    parser = OptionParser()
+    parser.add_option("-r", "--repeat", type="int", default=10000, help="calls per timing")
+    (options, args) = parser.parse_args()
+
+    bench(options.repeat)
+
+if __name__ == "__main__":
+    main()
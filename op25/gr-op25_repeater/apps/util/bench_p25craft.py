@@ -0,0 +1,173 @@
+#!/bin/sh
+# This file is part of OP25 and part of GNU Radio
+# 
+# OP25 is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+# 
+# OP25 is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with OP25; see the file COPYING. If not, write to the Free
+# Software Foundation, Inc., 51 Franklin Street, Boston, MA
+# 02110-1301, USA.
+
+"true" '''\'
+DEFAULT_PYTHON2=/usr/bin/python
+DEFAULT_PYTHON3=/usr/bin/python3
+if [ -f op25_python ]; then
+    OP25_PYTHON=$(cat op25_python)
+else
+    OP25_PYTHON="/usr/bin/python"
+fi
+
+if [ -x $OP25_PYTHON ]; then
+    echo Using Python $OP25_PYTHON >&2
+    exec $OP25_PYTHON "$0" "$@"
+elif [ -x $DEFAULT_PYTHON2 ]; then
+    echo Using Python $DEFAULT_PYTHON2 >&2
+    exec $DEFAULT_PYTHON2 "$0" "$@"
+elif [ -x $DEFAULT_PYTHON3 ]; then
+    echo Using Python $DEFAULT_PYTHON3 >&2
+    exec $DEFAULT_PYTHON3 "$0" "$@"
+else
+    echo Unable to find Python >&2
+fi
+exit 127
+'''
+
+#
+# Parity checks and benchmark for the batch encoders in tx/p25craft.py
+#
+# Random TSDU, HDU, LDU1 and LDU2 packets are built one at a time with the
+# construct_* functions and in a single call with the *_batch functions, and
+# the binary output of the two is compared.  Any mismatch is reported and the
+# script exits with status 1.  Unless --check-only is given, the packet rates
+# of both paths are then printed.
+#
+
+import os
+import sys
+import io
+import time
+import random
+import numpy as np
+from optparse import OptionParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tx'))
+import p25craft as pc
+
+pc.quiet = True
+
+def scalar_out(f, *args):
+    pc.outfile = io.BytesIO()
+    f(*args)
+    return pc.outfile.getvalue()
+
+def batch_out(frames):
+    f = io.BytesIO()
+    pc.write_frames(frames, f)
+    return f.getvalue()
+
+def split_out(data, n):
+    size = len(data) // n
+    return [data[i * size : (i + 1) * size] for i in range(n)]
+
+def random_packets(rng, count):
+    p = {}
+    p['nac'] = [rng.getrandbits(12) for i in range(count)]
+    p['ss'] = [rng.randint(0, 3) for i in range(count)]
+    p['mfid'] = [rng.getrandbits(8) for i in range(count)]
+    p['blocks'] = rng.randint(1, 3)
+    p['opcodes'] = [rng.getrandbits(6) for i in range(count * p['blocks'])]
+    p['args'] = [rng.getrandbits(64) for i in range(count * p['blocks'])]
+    p['mi'] = [rng.getrandbits(72) for i in range(count)]
+    p['algid'] = [rng.getrandbits(8) for i in range(count)]
+    p['kid'] = [rng.getrandbits(16) for i in range(count)]
+    p['tgid'] = [rng.getrandbits(16) for i in range(count)]
+    p['lco'] = [rng.choice((0, 3)) for i in range(count)]
+    p['src'] = [rng.getrandbits(24) for i in range(count)]
+    p['dst'] = [rng.getrandbits(24) for i in range(count)]
+    p['imbe'] = rng.getrandbits(144)
+    p['lsd'] = [rng.getrandbits(32) for i in range(count)]
+    return p
+
+def scalar_packets(p, kind):
+    out = []
+    b = p['blocks']
+    for i in range(len(p['nac'])):
+        if kind == 'tsdu':
+            out.append(scalar_out(pc.construct_tsdu3, p['nac'][i], p['ss'][i], b, p['mfid'][i], p['opcodes'][i * b : (i + 1) * b], p['args'][i * b : (i + 1) * b]))
+        elif kind == 'hdu':
+            out.append(scalar_out(pc.construct_hdu, p['nac'][i], p['ss'][i], p['mi'][i], p['mfid'][i], p['algid'][i], p['kid'][i], p['tgid'][i]))
+        elif kind == 'ldu1':
+            out.append(scalar_out(pc.construct_ldu1, p['nac'][i], p['ss'][i], p['imbe'], p['lsd'][i], p['lco'][i], p['mfid'][i], 0x40, 0, p['tgid'][i], p['dst'][i], p['src'][i]))
+        elif kind == 'ldu2':
+            out.append(scalar_out(pc.construct_ldu2, p['nac'][i], p['ss'][i], p['imbe'], p['lsd'][i], p['mi'][i], p['algid'][i], p['kid'][i]))
+    return out
+
+def batch_packets(p, kind):
+    if kind == 'tsdu':
+        frames = pc.tsdu_batch(p['nac'], p['ss'], p['blocks'], np.repeat(p['mfid'], p['blocks']), p['opcodes'], p['args'])
+    elif kind == 'hdu':
+        frames = pc.hdu_batch(p['nac'], p['ss'], p['mi'], p['mfid'], p['algid'], p['kid'], p['tgid'])
+    elif kind == 'ldu1':
+        lc = [pc.construct_lc(p['lco'][i], p['mfid'][i], 0x40, 0, p['tgid'][i], p['dst'][i], p['src'][i]) for i in range(len(p['nac']))]
+        frames = pc.ldu1_batch(p['nac'], p['ss'], p['imbe'], p['lsd'], lc)
+    elif kind == 'ldu2':
+        es = [pc.construct_es(p['mi'][i], p['algid'][i], p['kid'][i]) for i in range(len(p['nac']))]
+        frames = pc.ldu2_batch(p['nac'], p['ss'], p['imbe'], p['lsd'], es)
+    return split_out(batch_out(frames), len(p['nac']))
+
+KINDS = ('tsdu', 'hdu', 'ldu1', 'ldu2')
+
+def check(count, seed):
+    rng = random.Random(seed)
+    failures = 0
+    for kind in KINDS:
+        for rnd in range(4):
+            p = random_packets(rng, count)
+            a = scalar_packets(p, kind)
+            b = batch_packets(p, kind)
+            for i in range(count):
+                if a[i] != b[i]:
+                    failures += 1
+                    if failures <= 10:
+                        sys.stdout.write("MISMATCH %s packet %d, nac %03x\n" % (kind, i, p['nac'][i]))
+    sys.stdout.write("%d parity checks, %d failures\n" % (len(KINDS) * 4 * count, failures))
+    return failures == 0
+
+def bench(count, seed):
+    rng = random.Random(seed)
+    sys.stdout.write("%-8s %14s %14s %9s\n" % ("packet", "scalar/s", "batch/s", "speedup"))
+    for kind in KINDS:
+        p = random_packets(rng, count)
+        nscalar = max(1, count // 20)
+        q = dict(p, nac=p['nac'][:nscalar])
+        t0 = time.time()
+        scalar_packets(q, kind)
+        r_scalar = nscalar / (time.time() - t0)
+        t0 = time.time()
+        batch_packets(p, kind)
+        r_batch = count / (time.time() - t0)
+        sys.stdout.write("%-8s %14.0f %14.0f %8.1fx\n" % (kind, r_scalar, r_batch, r_batch / r_scalar))
+
+def main():
+    parser = OptionParser()
+    parser.add_option("-c", "--check-only", action="store_true", default=False, help="run the parity checks only")
+    parser.add_option("-n", "--count", type="int", default=100, help="packets per parity round")
+    parser.add_option("-b", "--bench-count", type="int", default=10000, help="packets per batch timing")
+    parser.add_option("-s", "--seed", type="int", default=1, help="random seed")
+    (options, args) = parser.parse_args()
+
+    if not check(options.count, options.seed):
+        sys.exit(1)
+    if not options.check_only:
+        bench(options.bench_count, options.seed)
+
+if __name__ == "__main__":
+    main()
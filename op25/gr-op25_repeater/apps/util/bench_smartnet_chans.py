@@ -0,0 +1,158 @@
+#!/bin/sh
+# This file is part of OP25 and part of GNU Radio
+# 
+# OP25 is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+# 
+# OP25 is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with OP25; see the file COPYING. If not, write to the Free
+# Software Foundation, Inc., 51 Franklin Street, Boston, MA
+# 02110-1301, USA.
+
+"true" '''\'
+DEFAULT_PYTHON2=/usr/bin/python
+DEFAULT_PYTHON3=/usr/bin/python3
+if [ -f op25_python ]; then
+    OP25_PYTHON=$(cat op25_python)
+else
+    OP25_PYTHON="/usr/bin/python"
+fi
+
+if [ -x $OP25_PYTHON ]; then
+    echo Using Python $OP25_PYTHON >&2
+    exec $OP25_PYTHON "$0" "$@"
+elif [ -x $DEFAULT_PYTHON2 ]; then
+    echo Using Python $DEFAULT_PYTHON2 >&2
+    exec $DEFAULT_PYTHON2 "$0" "$@"
+elif [ -x $DEFAULT_PYTHON3 ]; then
+    echo Using Python $DEFAULT_PYTHON3 >&2
+    exec $DEFAULT_PYTHON3 "$0" "$@"
+else
+    echo Unable to find Python >&2
+fi
+exit 127
+'''
+
+#
+# Benchmark for the SmartNet channel number to frequency tables in tk_smartnet.py
+#
+# For each bandplan the script first checks that the tables built by
+# osw_receiver.build_chan_tables() agree with is_chan() and get_freq() for
+# every 10 bit channel number, then replays an OSW stream through
+# osw_receiver.enqueue() and through a copy of the former enqueue() code,
+# which called is_chan() and get_freq() for every OSW, and reports OSWs/sec
+# for both.
+#
+# The OSW stream is read from a file written by bench_trunking.py --write
+# (only SmartNet OSW messages are used), or is the synthetic SmartNet stream
+# of bench_trunking.py when no file is given.
+#
+
+import os
+import sys
+import time
+from optparse import OptionParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_trunking import read_stream, smartnet_stream, msg_type, PROTO_SMARTNET
+from trunk_clock import system_clock
+import tk_smartnet
+
+OBT_CONFIG = {'bp_base': '406.1125', 'bp_base_spacing': '0.0125', 'bp_base_offset': '380',
+              'bp_mid': '409.0000', 'bp_mid_offset': '600', 'bp_tx_base_offset': '0'}
+
+BANDPLANS = ['800_domestic', '800_domestic_splinter', '800_rebanded', '800_international',
+             '800_international_splinter', '800_international_shuffled', '900', 'OBT']
+
+class bench_ctl(object):
+    # the parts of rx_ctl used by osw_receiver.__init__
+    def __init__(self):
+        self.clock = system_clock()
+
+def make_receiver(bandplan):
+    config = {'sysname': 'bench', 'bandplan': bandplan}
+    if bandplan == 'OBT':
+        config.update(OBT_CONFIG)
+    rx = tk_smartnet.osw_receiver(0, None, config, bench_ctl())
+    rx.build_chan_tables()
+    return rx
+
+def check_tables(rx):
+    # number of channel numbers where the tables differ from is_chan()/get_freq()
+    errors = 0
+    for chan in range(tk_smartnet.OSW_CHAN_COUNT):
+        if (rx.rx_chans[chan] != rx.is_chan(chan) or rx.tx_chans[chan] != rx.is_chan(chan, is_tx=True) or
+            (rx.rx_chans[chan] and rx.rx_freqs[chan] != rx.get_freq(chan)) or
+            (rx.tx_chans[chan] and rx.tx_freqs[chan] != rx.get_freq(chan, is_tx=True))):
+            errors += 1
+    if rx.is_obt_system() != (rx.get_bandplan_details()[0] == "OBT"):
+        errors += 1
+    return errors
+
+def reference_enqueue(rx, addr, grp, cmd, ts):
+    # enqueue() as it was before the channel tables
+    is_rx_chan = rx.is_chan(cmd)
+    is_tx_chan = rx.is_chan(cmd, is_tx=True)
+    rx_freq = 0.0
+    tx_freq = 0.0
+    if is_rx_chan:
+        rx_freq = rx.get_freq(cmd)
+    if is_tx_chan:
+        tx_freq = rx.get_freq(cmd, is_tx=True)
+    rx.osw_q.append((addr, (grp != 0), cmd, is_rx_chan, is_tx_chan, rx_freq, tx_freq, ts))
+
+def get_osws(stream):
+    osw_type = msg_type(PROTO_SMARTNET, tk_smartnet.M_SMARTNET_OSW)
+    osws = []
+    for (m_type, arg1, arg2, data) in stream:
+        if m_type != osw_type or len(data) < 5:
+            continue
+        s = bytearray(data)
+        osws.append(((s[0] << 8) | s[1], s[2], (s[3] << 8) | s[4], arg2))
+    return osws
+
+def run(enqueue, rx, osws, passes):
+    t0 = time.time()
+    for i in range(passes):
+        for (addr, grp, cmd, ts) in osws:
+            enqueue(rx, addr, grp, cmd, ts)
+    return len(osws) * passes / (time.time() - t0)
+
+def main():
+    parser = OptionParser(usage="%prog [options] [stream_file]")
+    parser.add_option("-B", "--bandplans", type="string", default=",".join(BANDPLANS), help="comma separated bandplans to test")
+    parser.add_option("-n", "--count", type="int", default=50000, help="number of synthetic messages when no file given")
+    parser.add_option("-p", "--passes", type="int", default=5, help="number of times the stream is replayed")
+    parser.add_option("-s", "--seed", type="int", default=1, help="random seed for synthetic stream")
+    (options, args) = parser.parse_args()
+
+    if len(args) > 0:
+        osws = get_osws(read_stream(args[0]))
+    else:
+        osws = get_osws(smartnet_stream(options.count, 100, options.seed, 20.0))
+    if not osws:
+        sys.stderr.write("no SmartNet OSWs in stream\n")
+        sys.exit(1)
+
+    failed = False
+    sys.stdout.write("%-28s %8s %12s %12s %8s\n" % ("bandplan", "errors", "ref osw/s", "table osw/s", "speedup"))
+    for bandplan in options.bandplans.split(','):
+        rx = make_receiver(bandplan)
+        errors = check_tables(rx)
+        failed = failed or errors > 0
+        ref = run(reference_enqueue, rx, osws, options.passes)
+        table = run(tk_smartnet.osw_receiver.enqueue, rx, osws, options.passes)
+        sys.stdout.write("%-28s %8d %12.0f %12.0f %7.1fx\n" % (bandplan, errors, ref, table, table / ref))
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+#!/bin/sh
+# This file is part of OP25 and part of GNU Radio
+# 
+# OP25 is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+# 
+# OP25 is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with OP25; see the file COPYING. If not, write to the Free
+# Software Foundation, Inc., 51 Franklin Street, Boston, MA
+# 02110-1301, USA.
+
+"true" '''\'
+DEFAULT_PYTHON2=/usr/bin/python
+DEFAULT_PYTHON3=/usr/bin/python3
+if [ -f op25_python ]; then
+    OP25_PYTHON=$(cat op25_python)
+else
+    OP25_PYTHON="/usr/bin/python"
+fi
+
+if [ -x $OP25_PYTHON ]; then
+    echo Using Python $OP25_PYTHON >&2
+    exec $OP25_PYTHON "$0" "$@"
+elif [ -x $DEFAULT_PYTHON2 ]; then
+    echo Using Python $DEFAULT_PYTHON2 >&2
+    exec $DEFAULT_PYTHON2 "$0" "$@"
+elif [ -x $DEFAULT_PYTHON3 ]; then
+    echo Using Python $DEFAULT_PYTHON3 >&2
+    exec $DEFAULT_PYTHON3 "$0" "$@"
+else
+    echo Unable to find Python >&2
+fi
+exit 127
+'''
+
+#
+# Benchmark for audio write coalescing in sockaudio.socket_audio
+#
+# Audio frames (160 samples, 20ms) are sent over udp to a socket_audio whose
+# pcm device is replaced by a sink that records each write.  Each traffic
+# pattern is run with coalescing off (every wakeup flushes, FLUSH_WINDOW 0 and
+# FLUSH_FRAMES 1) and with the FLUSH_WINDOW/FLUSH_FRAMES settings in
+# sockaudio.py, and the number of pcm writes, frames per write and the time
+# audio was held before being written are reported.
+#
+#   paced - one frame every 20ms, as the frame assembler sends phase 1 voice
+#   burst - nine frames back to back every 180ms (a whole LDU at once)
+#   tdma  - one frame every 20ms alternating between the two slot ports
+#
+
+import os
+import sys
+import time
+import socket
+import threading
+import numpy as np
+from optparse import OptionParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import sockaudio
+
+FRAME_BYTES = 320
+FRAME_SAMPLES = FRAME_BYTES // 2
+
+class counting_pcm(object):
+    def __init__(self):
+        self.writes = []            # (time, stereo frames) per write
+
+    def write(self, pcm_data):
+        self.writes.append((time.time(), len(pcm_data) // 2))
+        return 0
+
+    def drain(self):
+        return 0
+
+    def drop(self):
+        return 0
+
+    def check(self):
+        return 0
+
+    def close(self):
+        return 0
+
+class bench_audio(sockaudio.socket_audio):
+    def __init__(self, udp_port, two_channels):
+        self.keep_running = True
+        self.two_channels = two_channels
+        self.audio_gain = 1.0
+        self.pcm = counting_pcm()
+        self.setup_buffers()
+        self.setup_sockets("127.0.0.1", udp_port)
+
+def schedule(pattern, seconds):
+    # yields (send time offset, port offset) per frame
+    n = int(seconds / 0.02)
+    for i in range(n):
+        if pattern == 'paced':
+            yield (i * 0.02, 0)
+        elif pattern == 'burst':
+            yield ((i // 9) * 0.18, 0)
+        elif pattern == 'tdma':
+            yield (i * 0.02, 2 * (i & 1))
+
+def run(pattern, seconds, udp_port, coalesce):
+    saved = (sockaudio.FLUSH_WINDOW, sockaudio.FLUSH_FRAMES)
+    if not coalesce:
+        sockaudio.FLUSH_WINDOW, sockaudio.FLUSH_FRAMES = 0.0, 1
+    audio = bench_audio(udp_port, pattern == 'tdma')
+    sockaudio.FLUSH_WINDOW, sockaudio.FLUSH_FRAMES = saved
+    t = threading.Thread(target=audio.run)
+    t.daemon = True
+    t.start()
+
+    out = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    frame = np.zeros(FRAME_SAMPLES, dtype=np.int16).tobytes()
+    sent = []
+    t0 = time.time() + 0.05
+    for (offset, port) in schedule(pattern, seconds):
+        delay = t0 + offset - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        sent.append(time.time())
+        out.sendto(frame, ("127.0.0.1", udp_port + port))
+    time.sleep(0.2)
+    audio.stop()
+    out.sendto(b'\x01\x00', ("127.0.0.1", udp_port))      # wake the audio thread
+    t.join(1.0)
+    out.close()
+
+    # audio held: write time less arrival of the oldest frame in the write
+    holds = []
+    n = 0
+    for (ts, frames) in audio.pcm.writes:
+        holds.append(ts - sent[min(n, len(sent) - 1)])
+        n += frames // FRAME_SAMPLES
+    return len(sent), audio.pcm.writes, holds
+
+def main():
+    parser = OptionParser()
+    parser.add_option("-p", "--port", type="int", default=23470, help="udp port (port and port+2 are used)")
+    parser.add_option("-t", "--seconds", type="float", default=3.0, help="seconds of audio per run")
+    parser.add_option("-P", "--patterns", type="string", default="paced,burst,tdma", help="comma separated traffic patterns")
+    (options, args) = parser.parse_args()
+
+    sys.stdout.write("FLUSH_WINDOW %.3fs, FLUSH_FRAMES %d\n" % (sockaudio.FLUSH_WINDOW, sockaudio.FLUSH_FRAMES))
+    sys.stdout.write("%-8s %-9s %7s %7s %12s %10s %10s\n" % ("pattern", "coalesce", "frames", "writes", "frames/write", "mean hold", "max hold"))
+    for pattern in options.patterns.split(','):
+        for coalesce in (False, True):
+            frames, writes, holds = run(pattern, options.seconds, options.port, coalesce)
+            sys.stdout.write("%-8s %-9s %7d %7d %12.2f %8.1fms %8.1fms\n" % (pattern, "on" if coalesce else "off", frames, len(writes),
+                             float(frames) / max(1, len(writes)), 1e3 * np.mean(holds), 1e3 * np.max(holds)))
+
+if __name__ == "__main__":
+    main()
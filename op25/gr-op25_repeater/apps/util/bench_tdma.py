@@ -0,0 +1,198 @@
+#!/bin/sh
+# This file is part of OP25 and part of GNU Radio
+# 
+# OP25 is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+# 
+# OP25 is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with OP25; see the file COPYING. If not, write to the Free
+# Software Foundation, Inc., 51 Franklin Street, Boston, MA
+# 02110-1301, USA.
+
+"true" '''\'
+DEFAULT_PYTHON2=/usr/bin/python
+DEFAULT_PYTHON3=/usr/bin/python3
+if [ -f op25_python ]; then
+    OP25_PYTHON=$(cat op25_python)
+else
+    OP25_PYTHON="/usr/bin/python"
+fi
+
+if [ -x $OP25_PYTHON ]; then
+    echo Using Python $OP25_PYTHON >&2
+    exec $OP25_PYTHON "$0" "$@"
+elif [ -x $DEFAULT_PYTHON2 ]; then
+    echo Using Python $DEFAULT_PYTHON2 >&2
+    exec $DEFAULT_PYTHON2 "$0" "$@"
+elif [ -x $DEFAULT_PYTHON3 ]; then
+    echo Using Python $DEFAULT_PYTHON3 >&2
+    exec $DEFAULT_PYTHON3 "$0" "$@"
+else
+    echo Unable to find Python >&2
+fi
+exit 127
+'''
+
+#
+# Benchmark for P25 Phase 2 ISCH and DUID decoding in tdma/isch.py and tdma/duid.py
+#
+# Builds a synthetic stream of TDMA superframes (the S-ISCH sync word and an
+# I-ISCH in alternate slots, a valid DUID in every slot, random burst contents),
+# converts it to symbol levels and adds gaussian noise.  For each SNR the ISCH and DUID fields are then decoded by
+#   exact - codeword lookup only (the behaviour before error correction)
+#   hard  - nearest codeword on hard decision dibits
+#   soft  - correlation ranking on the received symbol levels
+# and the decode rate, the fraction recovered correctly, the fraction decoded
+# to the wrong value and the number of superframe lock losses (more than six
+# successive undecodable ISCH, as in tdma-decode.py) are reported.
+#
+# With -o the noisy stream at the last SNR is also written out, as dibits to
+# <file> and as float32 symbol levels to <file>.f32, for use with tdma-decode.py.
+#
+
+import os
+import sys
+import time
+import numpy as np
+from optparse import OptionParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tdma'))
+
+from fast_bit_utils import *
+import isch
+import duid
+
+SUPERFRAME_LEN = 2160
+SLOT_LEN = 180
+BURST_OFFSET = 10
+MAX_ERRORS = 6
+LEVELS = np.array([1.0, 3.0, -1.0, -3.0])     # symbol level of dibits 0..3
+DUID_POS = np.array([10, 47, 132, 169])
+
+def isch_sequence(count):
+    # isch values sent in each slot: sync (-2) in odd slots, and in even slots an I-ISCH
+    # with channel 0/1 and location 0-2, so the superframe starts at channel 0 location 0
+    slot = np.arange(count * 12)
+    sf, i = slot // 12, (slot % 12) // 2
+    ivals = ((i % 2) << 5) | ((i // 2) << 3) | ((sf % 4 == 0) << 2) | (sf % 4)
+    return np.where(slot % 2 == 1, -2, ivals)
+
+def synth_stream(count, seed, my_isch, my_duid):
+    # returns (dibits, isch values, duid values) for count superframes
+    rng = np.random.RandomState(seed)
+    nslots = count * 12
+    dibits = rng.randint(0, 4, count * SUPERFRAME_LEN + BURST_OFFSET).astype(np.uint8)
+    table = dict((v, c) for c, v in my_isch.isch_map.items())
+    table[-2] = isch.isch_sync
+    isch_vals = isch_sequence(count)
+    idibits = dict((v, bits_to_dibits(list(mk_array(int(c), 40)))) for v, c in table.items())
+    slots = dibits[:count * SUPERFRAME_LEN].reshape(nslots, SLOT_LEN)
+    slots[:, :20] = np.array([idibits[v] for v in isch_vals.tolist()], dtype=np.uint8)
+    dvals = np.array(sorted(my_duid.duid_str))[rng.randint(0, len(my_duid.duid_str), nslots)]
+    dwords = np.array([int(k, 2) for k in sorted(my_duid.duid_map, key=lambda k: my_duid.duid_map[k])])[dvals]
+    bursts = dibits[BURST_OFFSET : BURST_OFFSET + count * SUPERFRAME_LEN].reshape(nslots, SLOT_LEN)
+    for i, p in enumerate(DUID_POS):
+        bursts[:, p] = (dwords >> (6 - 2 * i)) & 3
+    return dibits, isch_vals, dvals
+
+def add_noise(dibits, snr_db, seed):
+    # snr is the mean symbol power over the noise variance
+    rng = np.random.RandomState(seed + 1)
+    sigma = np.sqrt(np.mean(LEVELS ** 2) / (10 ** (snr_db / 10.0)))
+    return (LEVELS[dibits] + rng.normal(0, sigma, len(dibits))).astype(np.float32)
+
+def isch_exact(my_isch, words):
+    v = np.empty(len(words), dtype=np.int64)
+    for i, w in enumerate(words.tolist()):
+        v[i] = my_isch.isch_map.get(w, -2 if w == isch.isch_sync else -1)
+    return v
+
+def duid_exact(my_duid, bursts):
+    v = np.empty(len(bursts), dtype=np.int64)
+    for i, b in enumerate(bursts.tolist()):
+        v[i] = my_duid.duid_map.get(duid.extract_duid(b), -1)
+    return v
+
+def isch_value(chn, loc, fr, cnt):
+    # inverse of isch.mk_isch, so results can be compared against what was sent
+    return np.where(chn < 0, chn, (chn << 5) | (loc << 3) | (fr << 2) | cnt)
+
+def lock_losses(ok):
+    # number of points at which the run of undecodable isch first exceeds MAX_ERRORS
+    run = 0
+    losses = 0
+    for good in ok.tolist():
+        run = 0 if good else run + 1
+        if run == MAX_ERRORS + 1:
+            losses += 1
+    return losses
+
+def timed(f, *args):
+    t0 = time.time()
+    v = f(*args)
+    return v, time.time() - t0
+
+def report(label, v, sent, elapsed, losses=None):
+    n = len(sent)
+    good = 100.0 * np.sum(v == sent) / n
+    wrong = 100.0 * np.sum((v >= 0) & (v != sent)) / n
+    sys.stdout.write("  %-12s %10.0f/s  %7.3f%% ok  %7.4f%% wrong" % (label, n / elapsed, good, wrong))
+    if losses is not None:
+        sys.stdout.write("  %5d lock losses" % losses)
+    sys.stdout.write("\n")
+
+def main():
+    parser = OptionParser()
+    parser.add_option("-n", "--superframes", type="int", default=2000, help="number of superframes")
+    parser.add_option("-s", "--snr", type="string", default="20,14,11,9,7", help="comma separated list of snr (dB)")
+    parser.add_option("-S", "--seed", type="int", default=1, help="random seed")
+    parser.add_option("-o", "--output-file", type="string", default=None, help="write noisy stream at the last snr")
+    (options, args) = parser.parse_args()
+
+    my_isch = isch.p25p2_isch()
+    my_duid = duid.p25p2_duid()
+    dibits, isch_sent, duid_sent = synth_stream(options.superframes, options.seed, my_isch, my_duid)
+    nslots = options.superframes * 12
+    sys.stdout.write("%d superframes, %d slots, isch dmin %d, corrects %d (hard) / %d (soft) bit errors\n" % (options.superframes, nslots, my_isch.min_distance, my_isch.max_errors, my_isch.max_soft_errors))
+
+    for snr in [float(s) for s in options.snr.split(',')]:
+        levels = add_noise(dibits, snr, options.seed)
+        hard = isch.slice_levels(levels)
+        ilevels = levels[:options.superframes * SUPERFRAME_LEN].reshape(nslots, SLOT_LEN)[:, :20]
+        words = isch.dibits_to_int(hard[:options.superframes * SUPERFRAME_LEN].reshape(nslots, SLOT_LEN)[:, :20])
+        blevels = levels[BURST_OFFSET : BURST_OFFSET + options.superframes * SUPERFRAME_LEN].reshape(nslots, SLOT_LEN)
+        bursts = isch.slice_levels(blevels)
+        ser = 100.0 * np.mean(hard != dibits)
+        sys.stdout.write("snr %.1f dB, symbol error rate %.3f%%\n" % (snr, ser))
+
+        sys.stdout.write(" isch\n")
+        v, elapsed = timed(isch_exact, my_isch, words)
+        report("exact", v, isch_sent, elapsed, lock_losses(v != -1))
+        r, elapsed = timed(my_isch.decode_isch_array, words)
+        v = isch_value(*r)
+        report("hard", v, isch_sent, elapsed, lock_losses(v != -1))
+        r, elapsed = timed(my_isch.decode_isch_soft, isch.soft_bits(ilevels))
+        v = isch_value(*r)
+        report("soft", v, isch_sent, elapsed, lock_losses(v != -1))
+
+        sys.stdout.write(" duid\n")
+        v, elapsed = timed(duid_exact, my_duid, bursts)
+        report("exact", v, duid_sent, elapsed)
+        v, elapsed = timed(my_duid.decode_duid_array, bursts)
+        report("hard", v, duid_sent, elapsed)
+        v, elapsed = timed(my_duid.decode_duid_soft, isch.soft_bits(blevels).reshape(nslots, SLOT_LEN, 2))
+        report("soft", v, duid_sent, elapsed)
+
+    if options.output_file is not None:
+        hard.tofile(options.output_file)
+        levels.tofile(options.output_file + '.f32')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+#!/bin/sh
+# This file is part of OP25 and part of GNU Radio
+# 
+# OP25 is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+# 
+# OP25 is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with OP25; see the file COPYING. If not, write to the Free
+# Software Foundation, Inc., 51 Franklin Street, Boston, MA
+# 02110-1301, USA.
+
+"true" '''\'
+DEFAULT_PYTHON2=/usr/bin/python
+DEFAULT_PYTHON3=/usr/bin/python3
+if [ -f op25_python ]; then
+    OP25_PYTHON=$(cat op25_python)
+else
+    OP25_PYTHON="/usr/bin/python"
+fi
+
+if [ -x $OP25_PYTHON ]; then
+    echo Using Python $OP25_PYTHON >&2
+    exec $OP25_PYTHON "$0" "$@"
+elif [ -x $DEFAULT_PYTHON2 ]; then
+    echo Using Python $DEFAULT_PYTHON2 >&2
+    exec $DEFAULT_PYTHON2 "$0" "$@"
+elif [ -x $DEFAULT_PYTHON3 ]; then
+    echo Using Python $DEFAULT_PYTHON3 >&2
+    exec $DEFAULT_PYTHON3 "$0" "$@"
+else
+    echo Unable to find Python >&2
+fi
+exit 127
+'''
+
+#
+# End-to-end replay benchmark for the trunking modules
+#
+# A control channel message stream is converted to gr.message objects with the
+# same type/arg1/arg2/data encoding the frame assemblers use, and fed through
+# rx_ctl.process_qmsg of tk_p25, tk_smartnet or tk_trbo.  frequency_set,
+# fa_ctrl and nbfm_ctrl are replaced by stubs that record what the trunking
+# module asked for.  When a voice receiver is tuned to a call, the receiver is
+# sent a call termination message --call-len messages later so that receivers
+# keep cycling through calls the way they do on a live system.
+#
+# For each combination of talkgroup count and receiver count the script
+# reports messages/sec, percentiles of the latency from message arrival to
+# each tune decision, and the growth of python heap memory over the run
+# (python 3 only, measured in a separate pass).  The "decisions" column is a
+# digest of every tune request made during the run.  With --msg-clock the
+# modules run on message timestamps rather than the system time, so the
+# digest is the same from run to run and only changes when the trunking
+# decisions change.
+#
+# The P25 stream is built from TSBKs made with the tx/p25craft.py formatters;
+# SmartNet and TRBO streams are built from OSWs and CSBKs directly.  Any stream
+# can be saved with --write and replayed later in place of the synthetic one.
+# The file format is one message per line: "<type hex> <arg1> <arg2> <data hex>"
+# where type is the full 32 bit msg.type() (protocol << 16 | message type).
+# Lines starting with '#' are ignored.
+#
+
+import os
+import sys
+import time
+import random
+import hashlib
+import binascii
+from optparse import OptionParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tx'))
+
+from gnuradio import gr
+from trunk_clock import msg_clock
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+PROTO_P25      = 0
+PROTO_DMR      = 1
+PROTO_SMARTNET = 2
+
+P25_NAC        = 0x293
+P25_WACN       = 0xbee00
+P25_SYSID      = 0x290
+P25_CC_FREQ    = 851012500
+P25_VC_CHANS   = 64
+SMARTNET_CC    = 0x1f0
+SMARTNET_CHANS = 0x2cf
+TRBO_LCNS      = 8
+
+def msg_type(proto, m_type):
+    return (proto << 16) | (m_type & 0xffff)
+
+def to_bytes(val, nbytes):
+    return bytes(bytearray([(val >> (8 * i)) & 0xff for i in range(nbytes - 1, -1, -1)]))
+
+def p25_stream(count, tgids, seed, rate):
+    # band plan and system broadcasts first, then grants on tgids talkgroups
+    # mixed with the other TSBKs seen on a busy control channel
+    import p25craft
+    rng = random.Random(seed)
+    tsbks = [p25craft.format_iden_up(0, 0x64, 0x1b4, 100, P25_CC_FREQ // 5),
+             p25craft.format_network_status_broadcast(0, P25_WACN, P25_SYSID, 0, 0x70),
+             p25craft.format_rfss_status_broadcast(0, 1, 1, P25_SYSID, 1, 1, 0, 0x70)]
+    ch = lambda: rng.randrange(1, P25_VC_CHANS)
+    ga = lambda: rng.randrange(1, tgids + 1)
+    while len(tsbks) < count:
+        r = rng.random()
+        if r < 0.35:
+            tsbks.append(p25craft.format_group_voice_channel_grant_update(ch(), ga(), ch(), ga()))
+        elif r < 0.5:   # grp_v_ch_grant: opts, ch, ga, sa
+            tsbks.append((0x00, (ch() << 40) | (ga() << 24) | rng.getrandbits(24)))
+        elif r < 0.7:
+            tsbks.append(tsbks[rng.randrange(3)])
+        else:           # affiliation, registration and other traffic
+            tsbks.append((rng.choice([0x28, 0x2c, 0x2f, 0x30]), rng.getrandbits(64)))
+    stream = []
+    for i, (opcode, args) in enumerate(tsbks[:count]):
+        data = to_bytes(P25_NAC, 2) + to_bytes((opcode << 72) | args, 10)
+        stream.append((msg_type(PROTO_P25, 7), 0, i / float(rate), data))
+    return stream
+
+def smartnet_stream(count, tgids, seed, rate):
+    rng = random.Random(seed)
+    osws = []
+    tg = lambda: rng.randrange(1, tgids + 1) << 4
+    ch = lambda: rng.randrange(0, SMARTNET_CHANS)
+    while len(osws) < count:
+        r = rng.random()
+        if r < 0.3:     # one osw group update
+            osws.append((tg(), 1, ch()))
+        elif r < 0.5:   # two osw group grant
+            osws.extend([(rng.randrange(1, 0xffff), 0, 0x308), (tg(), 1, ch())])
+        elif r < 0.6:   # system id and control channel
+            osws.extend([(0x1234, 0, 0x308), (0x1f00 | rng.getrandbits(8), 0, SMARTNET_CC)])
+        else:           # idle
+            osws.append((rng.getrandbits(16), 0, 0x2f8))
+    stream = []
+    for i, (addr, grp, cmd) in enumerate(osws[:count]):
+        data = to_bytes(addr, 2) + to_bytes(grp, 1) + to_bytes(cmd, 2)
+        stream.append((msg_type(PROTO_SMARTNET, 0), 0, i / float(rate), data))
+    return stream
+
+def trbo_stream(count, tgids, seed, rate):
+    # Connect Plus control channel: CACH SLC channel identification and CSBK grants
+    rng = random.Random(seed)
+    stream = []
+    for i in range(count):
+        if rng.random() < 0.3:
+            stream.append((msg_type(PROTO_DMR, 0), 0, i / float(rate), to_bytes((10 << 24) | 0x10010, 4)))
+        else:
+            lcn = rng.randrange(1, TRBO_LCNS + 1)
+            slot = rng.randrange(2)
+            data = to_bytes(3, 1) + to_bytes(6, 1) + to_bytes(rng.getrandbits(24), 3) + to_bytes(rng.randrange(1, tgids + 1), 3) + to_bytes((lcn << 4) | (slot << 3), 1)
+            stream.append((msg_type(PROTO_DMR, 5), slot, i / float(rate), data))
+    return stream
+
+STREAMS = {'p25': p25_stream, 'smartnet': smartnet_stream, 'trbo': trbo_stream}
+
+def read_stream(filename):
+    stream = []
+    with open(filename, 'r') as f:
+        for line in f:
+            fields = line.split()
+            if len(fields) < 3 or fields[0].startswith('#'):
+                continue
+            data = binascii.unhexlify(fields[3]) if len(fields) > 3 else b''
+            stream.append((int(fields[0], 16), int(fields[1]), float(fields[2]), data))
+    return stream
+
+def write_stream(filename, stream):
+    with open(filename, 'w') as f:
+        for (m_type, arg1, arg2, data) in stream:
+            f.write("%08x %d %f %s\n" % (m_type, arg1, arg2, binascii.hexlify(data).decode('ascii')))
+
+def make_msg(m_type, arg1, arg2, data):
+    return gr.message().make_from_string(data, m_type, arg1, arg2)
+
+def load_module(name, path):
+    if sys.version[0] == '2':
+        import imp
+        return imp.load_source(name, path)
+    import importlib.util
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * p / 100.0))]
+
+class replay(object):
+    # one trunking rx_ctl instance with recording stubs for its callbacks
+    def __init__(self, module, protocol, nreceivers, call_len, use_msg_clock = False):
+        self.protocol = protocol
+        self.call_len = call_len
+        self.t_msg = 0.0
+        self.seq = 0
+        self.latency = []
+        self.tunes = 0
+        self.fa_cmds = 0
+        self.pending = []           # (seq, msg) call terminations waiting to be sent
+        self.decisions = hashlib.sha1()
+        chans, configs = self.make_config(protocol, nreceivers)
+        kwds = {}
+        if use_msg_clock and 'clock' in module.rx_ctl.__init__.__code__.co_varnames:
+            kwds['clock'] = msg_clock()
+        self.rx_ctl = module.rx_ctl(debug = 0, frequency_set = self.frequency_set, nbfm_ctrl = self.nbfm_ctrl, fa_ctrl = self.fa_ctrl, chans = chans, **kwds)
+        for msgq_id, config in enumerate(configs):
+            self.rx_ctl.add_receiver(msgq_id, config, meta_q = None, freq = 0)
+        self.rx_ctl.post_init()
+
+    @staticmethod
+    def make_config(protocol, nreceivers):
+        if protocol == 'p25':
+            chans = [{'sysname': 'bench', 'control_channel_list': '%f' % (P25_CC_FREQ / 1e6), 'nac': str(P25_NAC)}]
+            configs = [{'name': 'rx%d' % i, 'trunking_sysname': 'bench'} for i in range(nreceivers)]
+        elif protocol == 'smartnet':
+            chans = [{'sysname': 'bench', 'control_channel_list': '851.0125', 'bandplan': '800_domestic'}]
+            configs = [{'name': 'cc', 'trunking_sysname': 'bench', 'destination': 'smartnet'}]
+            configs += [{'name': 'rx%d' % i, 'trunking_sysname': 'bench', 'destination': 'udp:127.0.0.1:%d' % (23456 + 2 * i)} for i in range(1, nreceivers)]
+        else:   # trbo has one control and one voice receiver
+            chans = [{'lcn': lcn, 'frequency': '%f' % (451.0 + 0.0125 * lcn)} for lcn in range(1, TRBO_LCNS + 1)]
+            configs = [{'name': 'rx%d' % i} for i in range(min(nreceivers, 2))]
+        return chans, configs
+
+    def frequency_set(self, params):
+        self.tunes += 1
+        self.decisions.update(("%d %s %s %s;" % (self.seq, params.get('tuner'), params.get('freq'), params.get('tgid'))).encode('ascii'))
+        if self.t_msg:
+            self.latency.append(time.time() - self.t_msg)
+        tuner = params.get('tuner', 0)
+        if tuner != 0 and self.call_len > 0 and self.protocol != 'trbo':
+            # call ends call_len messages from now
+            proto = PROTO_P25 if self.protocol == 'p25' else PROTO_SMARTNET
+            msg = make_msg(msg_type(proto, 15), tuner << 1, 0, to_bytes(P25_NAC, 2))
+            self.pending.append((self.seq + self.call_len, msg))
+
+    def fa_ctrl(self, params):
+        self.fa_cmds += 1
+
+    def nbfm_ctrl(self, msgq_id, enable):
+        pass
+
+    def run(self, msgs):
+        n = 0
+        t0 = time.time()
+        for msg in msgs:
+            while self.pending and self.pending[0][0] <= self.seq:
+                n += self.send(self.pending.pop(0)[1])
+            n += self.send(msg)
+        return n, time.time() - t0
+
+    def send(self, msg):
+        self.seq += 1
+        self.t_msg = time.time()
+        self.rx_ctl.process_qmsg(msg)
+        self.t_msg = 0.0
+        return 1
+
+def measure_memory(module, protocol, nreceivers, call_len, msgs, use_msg_clock = False):
+    # heap growth between the end of the first tenth of the stream and the end
+    if tracemalloc is None:
+        return None
+    r = replay(module, protocol, nreceivers, call_len, use_msg_clock)
+    split = len(msgs) // 10
+    tracemalloc.start()
+    r.run(msgs[:split])
+    start = tracemalloc.get_traced_memory()[0]
+    r.run(msgs[split:])
+    end, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return end - start, peak
+
+def main():
+    parser = OptionParser(usage="%prog [options] [stream_file]")
+    parser.add_option("-p", "--protocol", type="choice", choices=sorted(STREAMS.keys()), default="p25", help="trunking module: p25, smartnet or trbo")
+    parser.add_option("-b", "--baseline", type="string", default=None, help="path to baseline copy of the trunking module for comparison")
+    parser.add_option("-n", "--count", type="int", default=50000, help="number of synthetic messages when no file given")
+    parser.add_option("-t", "--tgids", type="string", default="100,1000", help="comma separated talkgroup counts to sweep")
+    parser.add_option("-R", "--receivers", type="string", default="2,8", help="comma separated receiver counts to sweep")
+    parser.add_option("-m", "--msg-rate", type="float", default=20.0, help="control channel messages/sec used for message timestamps")
+    parser.add_option("-c", "--call-len", type="int", default=200, help="messages until a tuned voice receiver gets a call termination (0=never)")
+    parser.add_option("-C", "--msg-clock", action="store_true", default=False, help="run the trunking modules on message timestamps instead of the system time")
+    parser.add_option("-M", "--no-memory", action="store_true", default=False, help="skip the memory growth pass")
+    parser.add_option("-s", "--seed", type="int", default=1, help="random seed for synthetic stream")
+    parser.add_option("-w", "--write", type="string", default=None, help="write the (first) message stream to file and exit")
+    (options, args) = parser.parse_args()
+
+    tgid_counts = [int(x) for x in options.tgids.split(',')]
+    rx_counts = [int(x) for x in options.receivers.split(',')]
+
+    modname = {'p25': 'tk_p25', 'smartnet': 'tk_smartnet', 'trbo': 'tk_trbo'}[options.protocol]
+    modules = [('current', __import__(modname))]
+    if options.baseline is not None:
+        modules.insert(0, ('baseline', load_module(modname + '_baseline', options.baseline)))
+
+    if len(args) > 0:
+        streams = [('file', read_stream(args[0]))]
+    else:
+        streams = [(str(t), STREAMS[options.protocol](options.count, t, options.seed, options.msg_rate)) for t in tgid_counts]
+    if options.write is not None:
+        write_stream(options.write, streams[0][1])
+        return
+
+    sys.stdout.write("%-9s %6s %4s %8s %10s %9s %9s %9s %9s %7s %10s %9s\n" % ("module", "tgids", "rx", "msgs", "msgs/s", "tune p50", "tune p90", "tune p99", "tune max", "tunes", "mem growth", "decisions"))
+    for (tgids_label, stream) in streams:
+        msgs = [make_msg(*m) for m in stream]
+        for nrx in rx_counts:
+            for (name, module) in modules:
+                r = replay(module, options.protocol, nrx, options.call_len, options.msg_clock)
+                n, elapsed = r.run(msgs)
+                lat = sorted(r.latency)
+                mem = None if options.no_memory else measure_memory(module, options.protocol, nrx, options.call_len, msgs, options.msg_clock)
+                mem_str = "n/a" if mem is None else "%dKB" % (mem[0] // 1024)
+                sys.stdout.write("%-9s %6s %4d %8d %10.0f %7.1fus %7.1fus %7.1fus %7.1fus %7d %10s %9s\n" % (
+                    name, tgids_label, nrx, n, n / elapsed,
+                    1e6 * percentile(lat, 50), 1e6 * percentile(lat, 90), 1e6 * percentile(lat, 99), 1e6 * (lat[-1] if lat else 0.0),
+                    r.tunes, mem_str, r.decisions.hexdigest()[:8]))
+
+if __name__ == "__main__":
+    main()
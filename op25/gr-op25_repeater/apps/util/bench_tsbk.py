@@ -0,0 +1,167 @@
+#!/bin/sh
+# This file is part of OP25 and part of GNU Radio
+# 
+# OP25 is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+# 
+# OP25 is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with OP25; see the file COPYING. If not, write to the Free
+# Software Foundation, Inc., 51 Franklin Street, Boston, MA
+# 02110-1301, USA.
+
+"true" '''\'
+DEFAULT_PYTHON2=/usr/bin/python
+DEFAULT_PYTHON3=/usr/bin/python3
+if [ -f op25_python ]; then
+    OP25_PYTHON=$(cat op25_python)
+else
+    OP25_PYTHON="/usr/bin/python"
+fi
+
+if [ -x $OP25_PYTHON ]; then
+    echo Using Python $OP25_PYTHON >&2
+    exec $OP25_PYTHON "$0" "$@"
+elif [ -x $DEFAULT_PYTHON2 ]; then
+    echo Using Python $DEFAULT_PYTHON2 >&2
+    exec $DEFAULT_PYTHON2 "$0" "$@"
+elif [ -x $DEFAULT_PYTHON3 ]; then
+    echo Using Python $DEFAULT_PYTHON3 >&2
+    exec $DEFAULT_PYTHON3 "$0" "$@"
+else
+    echo Unable to find Python >&2
+fi
+exit 127
+'''
+
+#
+# Micro-benchmark for the P25 TSBK decoder in tk_p25.py
+#
+# Replays a recorded TSBK stream (or a synthetic one) through the trunking
+# system object using both the per-message and the batched decode paths.
+# If --baseline names an older copy of tk_p25.py, the same stream is also
+# replayed through that module so the two implementations can be compared.
+#
+# Recorded stream format is one TSBK per line: "<nac hex> <tsbk hex>" where
+# tsbk is the 80 bit (10 byte) block without crc.  Lines starting with '#'
+# are ignored.
+#
+
+import os
+import sys
+import time
+import random
+from optparse import OptionParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from gnuradio import gr
+
+TSBK_OPCODES = [0x00, 0x00, 0x00, 0x02, 0x28, 0x29, 0x30, 0x3a, 0x3b, 0x3c, 0x39, 0x2c, 0x2f]
+
+def read_stream(filename):
+    tsbks = []
+    with open(filename, 'r') as f:
+        for line in f:
+            fields = line.split()
+            if len(fields) < 2 or fields[0].startswith('#'):
+                continue
+            tsbks.append((int(fields[0], 16), int(fields[1], 16)))
+    return tsbks
+
+def synth_stream(count, nac, seed, tgids=200):
+    # a fixed band plan plus grants on a limited pool of talkgroups and channels
+    # so that the system state grows the way it would on a real control channel
+    rng = random.Random(seed)
+    tsbks = []
+    for iden in range(4):       # iden_up: iden, bw, toff, spac, freq
+        body = (iden << 60) | (0x64 << 51) | (0x1b4 << 42) | (100 << 32) | ((851000000 + iden * 1000000) // 5)
+        tsbks.append((nac, (0x3d << 72) | body))
+    for i in range(count):
+        opcode = rng.choice(TSBK_OPCODES)
+        ch = lambda: (rng.randrange(4) << 12) | rng.randrange(16)
+        ga = lambda: rng.randrange(1, tgids + 1)
+        if opcode == 0x00:      # grp_v_ch_grant: opts, ch, ga, sa
+            body = (rng.getrandbits(8) << 56) | (ch() << 40) | (ga() << 24) | rng.getrandbits(24)
+        elif opcode == 0x02:    # grp_v_ch_grant_up: ch1, ga1, ch2, ga2
+            body = (ch() << 48) | (ga() << 32) | (ch() << 16) | ga()
+        else:
+            body = rng.getrandbits(64)
+        tsbks.append((nac, (opcode << 72) | body))
+    return tsbks
+
+def load_module(name, path):
+    if sys.version[0] == '2':
+        import imp
+        return imp.load_source(name, path)
+    import importlib.util
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def make_msgs(tsbks, msgq_id):
+    msgs = []
+    for (nac, tsbk) in tsbks:
+        s = bytes(bytearray([(nac >> 8) & 0xff, nac & 0xff] + [(tsbk >> (8 * i)) & 0xff for i in range(9, -1, -1)]))
+        msgs.append(gr.message().make_from_string(s, 7, msgq_id << 1, 0))
+    return msgs
+
+def make_system(module, nac):
+    config = {'sysname': 'bench', 'control_channel_list': '851.0125', 'nac': str(nac)}
+    return module.p25_system(debug = 0, config = config)
+
+def run_single(system, msgs):
+    t0 = time.time()
+    for msg in msgs:
+        system.process_qmsg(msg, t0)
+    return time.time() - t0
+
+def run_batch(system, msgs, batch):
+    t0 = time.time()
+    for i in range(0, len(msgs), batch):
+        system.process_qmsgs(msgs[i:i+batch], t0)
+    return time.time() - t0
+
+def report(label, elapsed, count):
+    sys.stdout.write("%-24s %8.3fs  %10.0f tsbk/s  %8.2fus/tsbk\n" % (label, elapsed, count / elapsed, 1e6 * elapsed / count))
+
+def main():
+    parser = OptionParser(usage="%prog [options] [tsbk_file]")
+    parser.add_option("-b", "--baseline", type="string", default=None, help="path to baseline tk_p25.py for comparison")
+    parser.add_option("-B", "--batch", type="int", default=32, help="messages per batch")
+    parser.add_option("-n", "--count", type="int", default=100000, help="number of synthetic tsbks when no file given")
+    parser.add_option("-N", "--nac", type="int", default=0x293, help="nac of synthetic stream")
+    parser.add_option("-r", "--repeat", type="int", default=3, help="number of passes (best is reported)")
+    parser.add_option("-s", "--seed", type="int", default=1, help="random seed for synthetic stream")
+    (options, args) = parser.parse_args()
+
+    if len(args) > 0:
+        tsbks = read_stream(args[0])
+    else:
+        tsbks = synth_stream(options.count, options.nac, options.seed)
+    if len(tsbks) == 0:
+        sys.stderr.write("%s: no tsbks to decode\n" % sys.argv[0])
+        sys.exit(1)
+    msgs = make_msgs(tsbks, 0)
+    nac = tsbks[0][0]
+
+    import tk_p25
+    modules = [('current', tk_p25)]
+    if options.baseline is not None:
+        modules.insert(0, ('baseline', load_module('tk_p25_baseline', options.baseline)))
+
+    sys.stdout.write("%d tsbks, %d passes\n" % (len(msgs), options.repeat))
+    for (name, module) in modules:
+        report("%s single" % name, min([run_single(make_system(module, nac), msgs) for i in range(options.repeat)]), len(msgs))
+        if hasattr(module.p25_system, 'process_qmsgs'):
+            report("%s batch(%d)" % (name, options.batch), min([run_batch(make_system(module, nac), msgs, options.batch) for i in range(options.repeat)]), len(msgs))
+
+if __name__ == "__main__":
+    main()
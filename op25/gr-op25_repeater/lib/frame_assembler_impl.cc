@@ -36,6 +36,7 @@
 #include <errno.h>
 #include <vector>
 #include <sys/time.h>
+#include <unistd.h>
 
 #include <nlohmann/json.hpp>
 using json = nlohmann::json;
@@ -84,6 +85,10 @@ namespace gr {
 			} else if (cmd == "dump_buffer") {
 			    if (d_sync)
                     d_sync->dump_buffer();
+            } else if (cmd == "set_sym_clock") {
+                logts.set_sym_clock(j["start"].get<double>(), j["rate"].get<double>());
+            } else if (cmd == "set_sym_rate") {
+                logts.set_sym_rate(j["rate"].get<double>());
             } else {
                 if (d_debug >= 10) {
                     fprintf(stderr, "%s frame_assembler_impl::control: unhandled cmd(%s)\n", logts.get(d_msgq_id), cmd.c_str());
@@ -115,6 +120,7 @@ namespace gr {
 
         static const int MIN_IN = 1;	// mininum number of input streams
         static const int MAX_IN = 1;	// maximum number of input streams
+        static const int SYM_CLOCK_CHECK = 64;	// symbols between message queue checks in batch replay
 
         /*
          * The private constructor
@@ -144,13 +150,30 @@ namespace gr {
             {
 
                 const uint8_t *in = (const uint8_t *) input_items[0];
+                int nconsumed = ninput_items[0];
 
-                if (d_sync) {
+                if (logts.sym_clock()) {
+                    // Batch replay: apply backpressure instead of letting the decoder drop
+                    // messages when python falls behind.  At most one message can be produced
+                    // in SYM_CLOCK_CHECK symbols, so a few free slots is enough headroom.
+                    // The python msgq_watcher only holds a bounded number of messages, so a
+                    // slow trunking module leaves this queue full and the decoder waits.
+                    unsigned int limit = d_msg_queue->limit();
+                    for (nconsumed = 0; nconsumed < ninput_items[0]; nconsumed++) {
+                        if (((nconsumed % SYM_CLOCK_CHECK) == 0) && (limit > 0) && (d_msg_queue->count() + 4 >= limit))
+                            break;
+                        logts.sym_tick();
+                        if (d_sync)
+                            d_sync->rx_sym(in[nconsumed]);
+                    }
+                    if (nconsumed == 0)
+                        usleep(1000);
+                } else if (d_sync) {
                     for (int i=0; i<ninput_items[0]; i++) {
                         d_sync->rx_sym(in[i]);
                     }
                 }
-                consume_each(ninput_items[0]);
+                consume_each(nconsumed);
                 // Tell runtime system how many output items we produced.
                 return 0;
             }
@@ -26,6 +26,7 @@
 #include <string.h>
 #include <string>
 #include <vector>
+#include <stdint.h>
 
 // helper for logging support
 inline std::string uint8_vector_to_hex_string(const std::vector<uint8_t>& v)
@@ -51,9 +52,15 @@ private:
 	struct tm curr_loc_time;
 	double tstamp;
 	char log_tstring[40];
+	double sym_base;	// symbol clock: capture time at the start of the current rate
+	double sym_rate;	// symbol clock: symbols per second, 0 if disabled
+	uint64_t sym_count;	// symbol clock: symbols received at the current rate
 
 public:
-	inline log_ts()
+	inline log_ts() :
+		sym_base(0),
+		sym_rate(0),
+		sym_count(0)
 	{
 		if (gettimeofday(&curr_time, 0) == 0)
 		{
@@ -111,9 +118,41 @@ public:
 		else
 			tstamp = 0;
 
+		if (sym_rate > 0)	// batch replay: timestamp is the capture time of the current symbol
+			tstamp = sym_base + (sym_count / sym_rate);
+
 		return tstamp;
 	}
 
+	// The symbol clock replaces the system time returned by get_ts() with the
+	// capture time derived from the number of symbols received, so that message
+	// timestamps stay correct when a recording is decoded faster than real time
+	inline void set_sym_clock(double start, double rate)
+	{
+		sym_base = start;
+		sym_rate = rate;
+		sym_count = 0;
+	}
+
+	inline void set_sym_rate(double rate)
+	{
+		if ((sym_rate <= 0) || (rate <= 0))
+			return;
+		sym_base += sym_count / sym_rate;
+		sym_rate = rate;
+		sym_count = 0;
+	}
+
+	inline bool sym_clock() const
+	{
+		return (sym_rate > 0);
+	}
+
+	inline void sym_tick()
+	{
+		sym_count++;
+	}
+
 	inline void mark_ts()
 	{
 		memcpy(&marker_time, &curr_time, sizeof(struct timeval));
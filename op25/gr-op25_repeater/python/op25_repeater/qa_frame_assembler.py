@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# 
+# This is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+# 
+# This software is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this software; see the file COPYING.  If not, write to
+# the Free Software Foundation, Inc., 51 Franklin Street,
+# Boston, MA 02110-1301, USA.
+# 
+
+import json
+import time
+import random
+from gnuradio import gr, gr_unittest, blocks
+from gnuradio import op25_repeater
+
+QUEUE_LIMIT = 100
+_rng = random.Random(1)
+SYMBOLS = [_rng.randrange(4) for i in range(100000)]
+
+class qa_frame_assembler (gr_unittest.TestCase):
+
+    def setUp (self):
+        self.tb = gr.top_block ()
+        self.msgq = gr.msg_queue(QUEUE_LIMIT)
+        self.src = blocks.vector_source_b(SYMBOLS, False)
+        self.fa = op25_repeater.frame_assembler("smartnet", 0, 0, self.msgq)
+        self.tb.connect(self.src, self.fa)
+
+    def tearDown (self):
+        self.tb = None
+
+    def fill_queue (self):
+        # stands in for a trunking module that has fallen behind
+        while not self.msgq.full_p():
+            self.msgq.insert_tail(gr.message().make_from_string("", -1, 0, 0))
+
+    def test_001_batch_stalls_on_full_queue (self):
+        # with the symbol clock enabled (batch replay) the decoder must stop
+        # consuming symbols while the message queue is full, and resume once
+        # it has been drained
+        self.fa.control(json.dumps({'tuner': 0, 'cmd': 'set_sym_clock', 'start': 0.0, 'rate': 4800.0}))
+        self.fill_queue()
+        self.tb.start()
+        time.sleep(0.5)
+        self.assertEqual(self.fa.nitems_read(0), 0)
+        deadline = time.time() + 10.0
+        while self.fa.nitems_read(0) < len(SYMBOLS) and time.time() < deadline:
+            self.msgq.flush()
+            time.sleep(0.01)
+        self.tb.stop()
+        self.tb.wait()
+        self.assertEqual(self.fa.nitems_read(0), len(SYMBOLS))
+
+    def test_002_realtime_drops_on_full_queue (self):
+        # without the symbol clock a full queue must not hold up the decoder
+        self.fill_queue()
+        self.tb.run()
+        self.assertEqual(self.fa.nitems_read(0), len(SYMBOLS))
+        self.assertEqual(self.msgq.count(), QUEUE_LIMIT)
+
+
+if __name__ == '__main__':
+    gr_unittest.run(qa_frame_assembler, "qa_frame_assembler.xml")
@@ -38,6 +38,17 @@ var fetch_errors = 0;
 var send_qfull = 0;
 var send_queue = [];
 var request_count = 0;
+var event_source = null;
+var stream_active = false;
+var stream_events = 0;
+var update_timer = null;
+var trunk_state = null;
+var trunk_version = null;
+var trunk_resyncs = 0;
+var trunk_resync_time = 0;
+const TRUNK_DELTA_SECTIONS = ["frequencies", "frequency_data", "patch_data", "adjacent_data", "band_plan"];
+const PLOT_ASPECT = 0.75;   // height / width of locally rendered plots
+const PLOT_DIVS = 8;        // grid divisions per axis
 var SEND_QLIMIT = 5;
 var c_freq = 0;
 var c_ppm = null;
@@ -111,6 +122,8 @@ document.addEventListener("DOMContentLoaded", function() {
 	  document.querySelectorAll(".plot-image").forEach(img => {
 		img.style.width = `${newWidth}px`;
 	  });
+	  document.querySelectorAll(".plot-canvas").forEach(c => plot_resize(c, newWidth));
+	  send_command('plot_width', newWidth, 0);
 	}
 	});
   
@@ -206,9 +219,59 @@ document.addEventListener("DOMContentLoaded", function() {
 
 
 function do_onload() {
-    send_command("get_terminal_config", 0, 0);
-    setInterval(do_update, 1000);
-    send_command("get_full_config", 0, 0);
+    if (!start_stream()) {
+        send_command("get_terminal_config", 0, 0);
+        update_timer = setInterval(do_update, 1000);
+        send_command("get_full_config", 0, 0);
+    }
+}
+
+// Server-sent event stream: the server issues updates on behalf of streaming clients and
+// pushes every message as soon as it is available.  On reconnect the browser sends
+// Last-Event-ID and any missed messages are replayed.  If the stream cannot be used
+// (old browser, server busy) fall back to polling with do_update.
+function start_stream() {
+    if (!window.EventSource)
+        return false;
+
+    event_source = new EventSource("/stream");
+
+    event_source.onopen = function() {
+        if (!stream_active) {
+            stream_active = true;
+            if (update_timer != null) {
+                clearInterval(update_timer);
+                update_timer = null;
+            }
+            send_command("get_terminal_config", 0, 0);
+            send_command("get_full_config", 0, 0);
+        }
+    };
+
+    event_source.onmessage = function(e) {
+        stream_events += 1;
+        try {
+            handle_response([JSON.parse(e.data)]);
+        } catch (err) {
+            console.error("Error handling stream event:", err.stack || err);
+        }
+        if (smartColors != undefined && smartColors.length == 0 && (stream_events % 10) == 0)
+            send_command("get_terminal_config", 0, 0);
+        f_debug();
+    };
+
+    event_source.onerror = function() {
+        if (event_source.readyState == EventSource.CLOSED) {   // refused; browser will not retry
+            event_source = null;
+            stream_active = false;
+            if (update_timer == null) {
+                send_command("get_terminal_config", 0, 0);
+                update_timer = setInterval(do_update, 1000);
+                send_command("get_full_config", 0, 0);
+            }
+        }
+    };
+    return true;
 }
 
 function find_parent(ele, tagname) {
@@ -302,9 +365,13 @@ function term_config(d) {  // json_type: "terminal_config"
 
 function rx_update(d) {
 
-	var plotsCount = d["files"].length;
+	var plotsCount = (d["plots"] != undefined) ? d["plots"].length : d["files"].length;
 	document.getElementById('plotsCount').innerText = plotsCount;
 
+    if (d["plots"] != undefined) {
+        plot_canvases(d["plots"]);
+    }
+
     plotfiles = [];
     
     if ((d["files"] != undefined) && (d["files"].length > 0)) {
@@ -1073,8 +1140,141 @@ function trunk_update(d) {
 }  // end trunk_update() - system freqencies table
 
 
+// plots rendered locally from "plot" messages (http_plot_render = "browser")
+
+function plot_channel() {
+    return (channel_list.length > 0) ? Number(channel_list[channel_index]) : 0;
+}
+
+function plot_canvas(chan, mode) {
+    var id = "plot-" + chan + "-" + mode;
+    var c = document.getElementById(id);
+    if (c == null) {
+        c = document.createElement("canvas");
+        c.id = id;
+        c.className = "plot-image plot-canvas";
+        c.dataset.chan = chan;
+        c.dataset.mode = mode;
+        plot_resize(c, parseInt(document.getElementById("plotSizeControl").value, 10));
+        document.getElementById("div_plot").appendChild(c);
+        updatePlotButtonStyles();
+    }
+    return c;
+}
+
+function plot_resize(c, width) {
+    // canvas resolution follows the displayed size; the server decimates plot data to match
+    c.width = width;
+    c.height = Math.round(width * PLOT_ASPECT);
+    c.style.width = width + "px";
+}
+
+function plot_array(v) {
+    // plot data arrays are sent either as plain json arrays or packed as
+    // { offset, scale, data } where data is base64 little endian uint16 codes and
+    // value = offset + scale * code; without data the values are an evenly spaced ramp
+    if ((v == undefined) || Array.isArray(v))
+        return v;
+    var out;
+    if (v["data"] == undefined) {
+        out = new Float64Array(v["count"]);
+        for (var i = 0; i < out.length; i++)
+            out[i] = v["offset"] + v["scale"] * i;
+        return out;
+    }
+    var bin = atob(v["data"]);
+    out = new Float64Array(bin.length >> 1);
+    for (var i = 0; i < out.length; i++)
+        out[i] = v["offset"] + v["scale"] * (bin.charCodeAt(2 * i) | (bin.charCodeAt(2 * i + 1) << 8));
+    return out;
+}
+
+function plot_canvases(plots) {
+    // drop canvases for plots which have been turned off and show only the current channel
+    var active = {};
+    for (var i = 0; i < plots.length; i++) {
+        active["plot-" + plots[i][0] + "-" + plots[i][1]] = true;
+    }
+    document.querySelectorAll(".plot-canvas").forEach(c => {
+        if (!(c.id in active)) {
+            c.remove();
+        }
+        else {
+            c.style.display = (Number(c.dataset.chan) == plot_channel()) ? "" : "none";
+        }
+    });
+}
+
 function plot(d) {
-    //TODO: implement local plot rendering using json data
+    if ((d["y"] == undefined) || (Number(d["chan"]) != plot_channel()))
+        return;
+    var c = plot_canvas(d["chan"], d["mode"]);
+    var ctx = c.getContext("2d");
+    var w = c.width, h = c.height;
+    var ml = 56, mr = 12, mt = 24, mb = 24;
+    var pw = w - ml - mr, ph = h - mt - mb;
+    var x0 = d["xrange"][0], x1 = d["xrange"][1];
+    var y0 = d["yrange"][0], y1 = d["yrange"][1];
+    var sx = pw / ((x1 - x0) || 1), sy = ph / ((y1 - y0) || 1);
+    var xs = plot_array(d["x"]), ys = plot_array(d["y"]);
+    var stride = d["stride"] || ys.length;
+
+    ctx.fillStyle = "#000";
+    ctx.fillRect(0, 0, w, h);
+    ctx.font = "11px sans-serif";
+    ctx.fillStyle = "#ccc";
+    ctx.textAlign = "center";
+    ctx.fillText(d["title"], w / 2, 15);
+
+    // grid and axis labels
+    ctx.strokeStyle = "#333";
+    ctx.lineWidth = 1;
+    ctx.textAlign = "right";
+    for (var i = 0; i <= PLOT_DIVS; i++) {
+        var gy = mt + (ph * i / PLOT_DIVS);
+        var gx = ml + (pw * i / PLOT_DIVS);
+        ctx.beginPath();
+        ctx.moveTo(ml, gy); ctx.lineTo(ml + pw, gy);
+        ctx.moveTo(gx, mt); ctx.lineTo(gx, mt + ph);
+        ctx.stroke();
+        ctx.fillText(+(y1 - ((y1 - y0) * i / PLOT_DIVS)).toFixed(1), ml - 4, gy + 4);
+    }
+    ctx.textAlign = "center";
+    for (var i = 0; i <= PLOT_DIVS; i += 2) {
+        ctx.fillText(+(x0 + ((x1 - x0) * i / PLOT_DIVS)).toFixed(3), ml + (pw * i / PLOT_DIVS), h - 8);
+    }
+
+    ctx.save();
+    ctx.beginPath();
+    ctx.rect(ml, mt, pw, ph);
+    ctx.clip();
+    if (d["marker"] != undefined) {
+        ctx.strokeStyle = "#ff5c5c";
+        ctx.beginPath();
+        ctx.moveTo(ml + (d["marker"] - x0) * sx, mt);
+        ctx.lineTo(ml + (d["marker"] - x0) * sx, mt + ph);
+        ctx.stroke();
+    }
+    ctx.strokeStyle = ctx.fillStyle = "#66ccff";
+    if (d["mode"] == "constellation" || d["mode"] == "symbol") {
+        for (var i = 0; i < ys.length; i++) {
+            var x = (xs != undefined) ? xs[i] : i;
+            ctx.fillRect(ml + (x - x0) * sx - 1, mt + ph - (ys[i] - y0) * sy - 1, 2, 2);
+        }
+    }
+    else {
+        ctx.beginPath();
+        for (var i = 0; i < ys.length; i++) {
+            var x = (xs != undefined) ? xs[i] : (i % stride);
+            var px = ml + (x - x0) * sx, py = mt + ph - (ys[i] - y0) * sy;
+            if (i % stride == 0)
+                ctx.moveTo(px, py);
+            else
+                ctx.lineTo(px, py);
+        }
+        ctx.stroke();
+    }
+    ctx.restore();
 }
 
 function call_log(d) {
@@ -1164,7 +1364,7 @@ function handle_response(dl) {
 	
     const dispatch = {
         call_log: call_log,
-        trunk_update: trunk_update,
+        trunk_update: trunk_delta,
         change_freq: change_freq,
         channel_update: channel_update,
         rx_update: rx_update,
@@ -1181,6 +1381,51 @@ function handle_response(dl) {
     }
 }
 
+// trunk_update messages are either a full snapshot or, for event stream clients, a delta
+// against the snapshot with version == d.base.  Deltas are merged into trunk_state and the
+// merged state is displayed; if a delta cannot be applied a full update is requested.
+function trunk_delta(d) {
+    if (!d.delta) {
+        trunk_state = d;
+        trunk_version = (d.version != undefined) ? d.version : null;
+        trunk_resync_time = 0;
+        trunk_update(d);
+        return;
+    }
+    if (trunk_state == null || d.base != trunk_version) {
+        if (Date.now() - trunk_resync_time > 5000) {   // one outstanding resync request at a time
+            trunk_resync_time = Date.now();
+            trunk_resyncs += 1;
+            send_command("update", 0, Number(channel_list[channel_index]));
+        }
+        return;
+    }
+    for (var syid in d) {
+        if (!is_digit(syid.charAt(0)))
+            continue;
+        if (trunk_state[syid] == undefined) {
+            trunk_state[syid] = d[syid];
+            continue;
+        }
+        for (var key in d[syid]) {
+            if (TRUNK_DELTA_SECTIONS.includes(key) && trunk_state[syid][key] != undefined)
+                Object.assign(trunk_state[syid][key], d[syid][key]);
+            else
+                trunk_state[syid][key] = d[syid][key];
+        }
+    }
+    for (var syid in d.removed) {
+        if (trunk_state[syid] == undefined)
+            continue;
+        for (var key in d.removed[syid]) {
+            for (const k of d.removed[syid][key])
+                delete trunk_state[syid][key][k];
+        }
+    }
+    trunk_version = d.version;
+    trunk_update(trunk_state);
+}
+
 function do_update() {
 
 	if (smartColors == undefined) {
@@ -1226,7 +1471,7 @@ async function send_process() {
     try {
         const response = await fetch("/", {
             method: "POST",
-            headers: { "Content-Type": "application/json" },
+            headers: { "Content-Type": "application/json", "X-OP25-Stream": stream_active ? "1" : "0" },
             body: cmd
         });
 
@@ -1353,6 +1598,7 @@ function f_tune_button(command) {
 }
 
 function f_plot_button(command) {
+    send_command('plot_width', parseInt(document.getElementById("plotSizeControl").value, 10), 0);
     if (channel_list.length == 0) {
         send_command('toggle_plot', command, 0);
     }
@@ -1452,6 +1698,8 @@ function f_debug() {
 	html += "<br>Fetch Errors: " + fetch_errors;
 	html += "<br>Send Queue Size " + send_queue.length;
 	html += "&nbsp;&nbsp;&nbsp;&nbsp;Queue Full " + send_qfull;	
+	html += "<br>Stream " + (stream_active ? "active" : "inactive") + ", events " + stream_events;
+	html += "&nbsp;&nbsp;&nbsp;&nbsp;Trunk version " + trunk_version + ", resyncs " + trunk_resyncs;
 	html += "<br>";
 	var div_debug = document.getElementById("div_debug");
 	div_debug.innerHTML = html;
@@ -1789,6 +2037,13 @@ function updatePlotButtonStyles() {
       }
     });
   }
+
+  // and each locally rendered plot
+  document.querySelectorAll(".plot-canvas").forEach(c => {
+    if (c.style.display === "none") return;
+    const btn = document.getElementById(`pb-${c.dataset.mode}`);
+    if (btn) btn.classList.add("plot-active");
+  });
 }
 
 function isNumber(value) {